@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: AdaptivePolling.py
+#
+#    Description: Learn the reporting cadence of each ( device, endpoint, cluster, attribute ) and use it to reduce polling
+#
+#    - Each Attribute Report received updates an exponential moving average of the interval between two reports.
+#    - While polling, an attribute which has a stable cadence and has been reported within its expected window is not read.
+#    - All Read Attributes of a polling cycle are buffered, and sent at the end of the cycle as one request per
+#      ( endpoint, cluster, manufacturer ), so several due attributes of the same cluster/endpoint share the same frame.
+#    - Frames and attributes not sent are accounted, to provide a projection of the radio airtime saved.
+#
+
+import time
+
+# Cadence learning
+EWMA_ALPHA = 0.25  # Weight of the latest interval in the moving average
+MIN_SAMPLES = 3  # Number of intervals required before trusting a cadence
+MIN_INTERVAL = 2  # Reports closer than that (in sec) are considered as part of the same report burst
+WINDOW_TOLERANCE = 1.5  # An attribute is fresh if reported within 1.5 times its cadence
+WINDOW_GRACE = 30  # ... plus some grace time for the device clock and the radio
+STALE_ENTRY = 7 * 24 * 3600  # Forget attributes not reported for a week
+PURGE_FREQUENCY = 3600
+
+# Airtime estimation on a 2.4Ghz 802.15.4 radio (250kbit/s), single hop
+AIRTIME_US_PER_BYTE = 32
+FRAME_OVERHEAD = 36  # PHY (6) + MAC (11) + NWK (8) + APS (8) + ZCL (3)
+MAC_ACK_SIZE = 11
+READ_REQUEST_BYTES_PER_ATTRIBUTE = 2  # Attribute Id
+READ_RESPONSE_BYTES_PER_ATTRIBUTE = 6  # Attribute Id, Status, Data Type and an average 2 bytes value
+
+
+class AdaptivePolling:
+    def __init__(self, pluginconf, log):
+        self.pluginconf = pluginconf
+        self.log = log
+
+        self.cadence = {}  # { ( nwkid, ep, cluster, attribute ): [ last report, average interval, samples ] }
+        self.last_purge = int(time.time())
+
+        # Polling cycle in progress
+        self.cycle_nwkid = None
+        self.cycle_suppress = False
+        self.pending = {}  # { ( EpIn, EpOut, Cluster, manuf_spec, manuf, ackIsDisabled ): [ attributes ] }
+        self.planned_frames = 0
+        self.planned_attributes = 0
+        self.suppressed_clusters = []  # ( EpOut, Cluster ) of the last cycle, with all attributes suppressed
+
+        # Statistics
+        self.start_time = int(time.time())
+        self.polled_attributes = 0
+        self.suppressed_attributes = 0
+        self.merged_attributes = 0
+        self.planned_frames_total = 0
+        self.sent_frames_total = 0
+        self.suppressed_frames = 0
+
+    def logging(self, logType, message, nwkid=None):
+        self.log.logging("ReadAttributes", logType, message, nwkid)
+
+    def enabled(self):
+        return self.pluginconf.pluginConf["enableAdaptivePolling"]
+
+    # Cadence learning
+
+    def report_received(self, nwkid, ep, cluster, attribute, now=None):
+        """ An Attribute Report has been received, update the attribute cadence """
+
+        now = now or time.time()
+        key = (nwkid, ep, cluster, attribute.lower())
+        entry = self.cadence.get(key)
+        if entry is None:
+            self.cadence[key] = [now, None, 0]
+
+        else:
+            interval = now - entry[0]
+            if interval >= MIN_INTERVAL:
+                entry[1] = interval if entry[1] is None else (EWMA_ALPHA * interval + (1 - EWMA_ALPHA) * entry[1])
+                entry[2] = min(entry[2] + 1, 1000)
+            entry[0] = now
+
+        if now - self.last_purge > PURGE_FREQUENCY:
+            self.purge(now)
+
+    def expected_window(self, nwkid, ep, cluster, attribute):
+        """ Return the time (in sec) within which the next report is expected, None if the cadence is not known yet """
+
+        entry = self.cadence.get((nwkid, ep, cluster, attribute.lower()))
+        if entry is None or entry[1] is None or entry[2] < MIN_SAMPLES:
+            return None
+        return entry[1] * WINDOW_TOLERANCE + WINDOW_GRACE
+
+    def is_fresh(self, nwkid, ep, cluster, attribute, now=None):
+        """ True if the attribute has a known cadence and has been reported within its expected window """
+
+        window = self.expected_window(nwkid, ep, cluster, attribute)
+        if window is None:
+            return False
+        now = now or time.time()
+        return (now - self.cadence[(nwkid, ep, cluster, attribute.lower())][0]) <= window
+
+    def purge(self, now=None):
+        now = now or time.time()
+        for key in [x for x, entry in self.cadence.items() if now - entry[0] > STALE_ENTRY]:
+            del self.cadence[key]
+        self.last_purge = now
+
+    # Polling cycle
+
+    def start_cycle(self, nwkid, suppress=True):
+        """ Start buffering the Read Attributes requested for nwkid. suppress=False only merges the requests """
+
+        self.cycle_nwkid = nwkid
+        self.cycle_suppress = suppress
+        self.pending = {}
+        self.planned_frames = 0
+        self.planned_attributes = 0
+
+    def in_cycle(self, nwkid):
+        return self.cycle_nwkid is not None and self.cycle_nwkid == nwkid
+
+    def queue_read(self, nwkid, EpIn, EpOut, Cluster, ListOfAttributes, manufacturer_spec, manufacturer, ackIsDisabled, max_by_request):
+        """ Buffer a Read Attribute requested while polling, and drop the attributes which have been reported recently """
+
+        if not isinstance(ListOfAttributes, list):
+            ListOfAttributes = [ListOfAttributes]
+
+        # What would have been sent without adaptive polling
+        self.planned_attributes += len(ListOfAttributes)
+        self.planned_frames += -(-len(ListOfAttributes) // max(1, max_by_request))
+
+        now = time.time()
+        request = (EpIn, EpOut, Cluster, manufacturer_spec, manufacturer, ackIsDisabled)
+        attributes = self.pending.setdefault(request, [])
+        for attribute in ListOfAttributes:
+            if self.cycle_suppress and self.is_fresh(nwkid, EpOut, Cluster, "%04x" % attribute, now):
+                self.logging("Debug", "Skip polling %s/%s %s %04x reported %ss ago" % (
+                    nwkid, EpOut, Cluster, attribute, int(now - self.cadence[(nwkid, EpOut, Cluster, "%04x" % attribute)][0])), nwkid)
+                self.suppressed_attributes += 1
+                continue
+            if attribute in attributes:
+                self.merged_attributes += 1
+                continue
+            attributes.append(attribute)
+
+    def end_cycle(self):
+        """ Close the polling cycle, and return the list of ( request, attributes ) to be sent """
+
+        requests = [(request, attributes) for request, attributes in self.pending.items() if attributes]
+        self.suppressed_clusters = [(request[1], request[2]) for request, attributes in self.pending.items() if not attributes]
+        self.polled_attributes += self.planned_attributes
+        self.planned_frames_total += self.planned_frames
+        if not requests and self.planned_frames:
+            self.suppressed_frames += self.planned_frames
+
+        self.cycle_nwkid = None
+        self.pending = {}
+        return requests
+
+    def frames_sent(self, nbframes):
+        self.sent_frames_total += nbframes
+
+    # Reporting
+
+    def airtime_projection(self):
+        """ Statistics and projection of the radio airtime saved by the adaptive polling """
+
+        elapsed = max(1, int(time.time()) - self.start_time)
+        saved_frames = max(0, self.planned_frames_total - self.sent_frames_total)
+        saved_attributes = self.suppressed_attributes + self.merged_attributes
+
+        # Each Read Attribute not sent is a request and a response, each one acknowledged at MAC level
+        saved_bytes = (
+            saved_frames * 2 * (FRAME_OVERHEAD + MAC_ACK_SIZE)
+            + saved_attributes * (READ_REQUEST_BYTES_PER_ATTRIBUTE + READ_RESPONSE_BYTES_PER_ATTRIBUTE)
+        )
+        saved_airtime_ms = saved_bytes * AIRTIME_US_PER_BYTE / 1000
+
+        return {
+            "Enabled": bool(self.enabled()),
+            "Since": self.start_time,
+            "LearnedAttributes": len(self.cadence),
+            "TrustedAttributes": sum(1 for entry in self.cadence.values() if entry[1] is not None and entry[2] >= MIN_SAMPLES),
+            "PolledAttributes": self.polled_attributes,
+            "SuppressedAttributes": self.suppressed_attributes,
+            "MergedAttributes": self.merged_attributes,
+            "PlannedFrames": self.planned_frames_total,
+            "SentFrames": self.sent_frames_total,
+            "SavedFrames": saved_frames,
+            "SuppressedFrames": self.suppressed_frames,
+            "SavedBytes": saved_bytes,
+            "SavedAirtimeMs": round(saved_airtime_ms, 1),
+            "ProjectedSavedAirtimeMsPerDay": round(saved_airtime_ms * 86400 / elapsed, 1),
+            "ProjectedSavedFramesPerDay": int(saved_frames * 86400 / elapsed),
+        }
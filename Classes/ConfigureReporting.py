@@ -18,7 +18,9 @@
 """
 
 
+import json
 import time
+from pathlib import Path
 
 from Classes.ZigateTransport.sqnMgmt import (TYPE_APP_ZCL,
                                              sqn_get_internal_sqn_from_app_sqn)
@@ -41,6 +43,8 @@ from Zigbee.zclCommands import (zcl_configure_reporting_requestv2,
                                 zcl_read_report_config_request)
 
 CONFIGURE_REPORT_PERFORM_TIME = 21  # Reenforce will be done each xx hours
+REPORTING_PLAN_FILENAME = "ConfigureReportingPlan-%02d.json"
+REPORTING_PLAN_SAVE_DELAY = 60  # Save the planner progress at most every minute
 
 
 def get_max_cfg_rpt_attribute_value( self, nwkid=None):
@@ -68,7 +72,8 @@ class ConfigureReporting:
         FirmwareVersion,
         IEEE2NWK,
         ZigateIEEE,
-        readZclClusters
+        readZclClusters,
+        HardwareID=None
     ):
 
         self.zigbee_communication = zigbee_communitation
@@ -89,6 +94,14 @@ class ConfigureReporting:
         # Local
         self.target = []
 
+        # Network wide planner. Configure Reporting in batch mode are queued per device and sent at a controlled pace
+        self.HardwareID = HardwareID
+        self.reporting_plan = {}  # { ieee: [ [ ep, cluster ], ... ] }
+        self.reporting_plan_dirty = False
+        self.reporting_plan_last_save = 0
+        self.frames_sent = 0
+        load_reporting_plan(self)
+
     def logging(self, logType, message, nwkid=None, context=None):
         self.log.logging("ConfigureReporting", logType, message, nwkid, context)
 
@@ -210,9 +223,62 @@ class ConfigureReporting:
             attribute_reporting_configuration,
             is_ack_tobe_disabled(self, key),
         )
+        self.frames_sent += 1
         for x in attribute_reporting_configuration:
             set_isqn_datastruct(self, STORE_CONFIGURE_REPORTING, key, Ep, cluster, x["Attribute"], i_sqn)
 
+    # Network wide planner
+
+    def reporting_planner_enabled(self):
+        return self.pluginconf.pluginConf["ConfigureReportingPlanner"]
+
+    def schedule_reporting(self, nwkid, ep, cluster):
+        """ Queue a Configure Reporting of one cluster. Return False if the device cannot be planned """
+
+        if nwkid not in self.ListOfDevices or "IEEE" not in self.ListOfDevices[nwkid]:
+            return False
+        clusters = self.reporting_plan.setdefault(self.ListOfDevices[nwkid]["IEEE"], [])
+        if [ep, cluster] not in clusters:
+            clusters.append([ep, cluster])
+            self.reporting_plan_dirty = True
+        return True
+
+    def reporting_planner_heartbeat(self):
+        """ Called every heartbeat. Send the planned Configure Reporting, best devices first, within the load and rate limits """
+
+        if self.reporting_plan:
+            budget = self.pluginconf.pluginConf["ConfigureReportingPlannerRate"]
+            for ieee in ordered_planned_devices(self):
+                if budget <= 0 or self.busy or self.ControllerLink.loadTransmit() > MAX_LOAD_ZIGATE:
+                    break
+                nwkid = self.IEEE2NWK[ieee]
+                clusters = self.reporting_plan[ieee]
+                while clusters and budget > 0 and self.ControllerLink.loadTransmit() <= MAX_LOAD_ZIGATE:
+                    ep, cluster = clusters.pop(0)
+                    self.reporting_plan_dirty = True
+                    budget -= configure_reporting_for_planned_cluster(self, nwkid, ep, cluster)
+                if not clusters:
+                    del self.reporting_plan[ieee]
+                    self.logging("Debug", f"reporting_planner_heartbeat - {nwkid} completed, {len(self.reporting_plan)} devices left", nwkid=nwkid)
+                    if not self.reporting_plan:
+                        self.logging("Status", f"Configure Reporting planner completed ({self.frames_sent} Configure Reporting requests sent so far)")
+
+        if self.reporting_plan_dirty and (not self.reporting_plan or time.time() > self.reporting_plan_last_save + REPORTING_PLAN_SAVE_DELAY):
+            self.save_reporting_plan()
+
+    def save_reporting_plan(self):
+        filename = reporting_plan_filename(self)
+        if filename is None or not self.reporting_plan_dirty:
+            return
+        try:
+            with open(filename, "wt") as handle:
+                json.dump({"Plan": self.reporting_plan}, handle)
+        except OSError as e:
+            self.logging("Error", f"save_reporting_plan - Unable to write {filename} - {e}")
+            return
+        self.reporting_plan_dirty = False
+        self.reporting_plan_last_save = time.time()
+
     def read_configure_reporting_response(self, MsgSQN, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttributeId, MsgStatus):
         # This is the response receive after a Configuration Reporting request
         self.logging( "Debug", "read_configure_reporting_response %s %s %s %s %s" %(MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttributeId, MsgStatus))
@@ -358,7 +424,7 @@ class ConfigureReporting:
                         continue
                     attribute_lst.append( int(attribute, 16) )
                 if attribute_lst:
-                    zcl_read_report_config_request( self, Nwkid, ZIGATE_EP, epout, cluster_id, "00", "0000", attribute_lst, is_ack_tobe_disabled(self, Nwkid),)
+                    self.read_report_configure_request( Nwkid, epout, cluster_id, attribute_lst)
                     wip_flag = True
                 else:
                     continue
@@ -461,13 +527,13 @@ class ConfigureReporting:
                         self.logging("Debug", f"-------- check_and_redo_configure_reporting_if_needed - NwkId: {Nwkid} {_ep} {_cluster} {attribut} return None !", nwkid=Nwkid)
                         # Better to check if we didn't have an error before
                         if is_valid_cluster_attribute( self, Nwkid, _ep, _cluster, attribut):
-                            configure_reporting_for_one_cluster(self, Nwkid, _ep, _cluster, True, cluster_configuration)
+                            redo_configure_reporting_for_one_cluster(self, Nwkid, _ep, _cluster, cluster_configuration)
                         continue
                     self.logging("Debug", f"-------- check_and_redo_configure_reporting_if_needed - NwkId: {Nwkid} {_ep} {_cluster} {attribut} ==> {attribute_current_configuration}", nwkid=Nwkid)
 
                     if "Status" in attribute_current_configuration and attribute_current_configuration["Status"] != "00":
                         if attribute_current_configuration["Status"] == '8b':
-                            configure_reporting_for_one_cluster(self, Nwkid, _ep, _cluster, True, cluster_configuration)
+                            redo_configure_reporting_for_one_cluster(self, Nwkid, _ep, _cluster, cluster_configuration)
                             # There is no need to continue as we have requested a Cluster
                             wip_flap = True
                             cluster_update = True
@@ -494,7 +560,7 @@ class ConfigureReporting:
                             self.logging( "Status", f"------ We have detected a miss configuration reports for device {Nwkid} on ep {_ep} and cluster {_cluster}" ,nwkid=Nwkid)
                         
                         self.logging( "Status", f" - Attribut {attribut} request to force a Configure Reporting due to field {x} '{attribute_current_configuration[ x ]}' != '{cluster_configuration[ attribut ][ x]}'", nwkid=Nwkid)
-                        configure_reporting_for_one_cluster(self, Nwkid, _ep, _cluster, True, cluster_configuration)
+                        redo_configure_reporting_for_one_cluster(self, Nwkid, _ep, _cluster, cluster_configuration)
                         wip_flap = True
                         cluster_update = True
                         break   # No need to check for an other difference
@@ -560,6 +626,10 @@ def configure_reporting_for_one_device(self, key, batchMode):
     if batchMode and "Health" in self.ListOfDevices[key] and self.ListOfDevices[key]["Health"] == "Not Reachable":
         return
 
+    if batchMode and self.reporting_planner_enabled() and self.ListOfDevices[key].get("IEEE") in self.reporting_plan:
+        self.logging("Debug", f"configure_reporting_for_one_device - {key} already planned", nwkid=key)
+        return
+
     cfgrpt_configuration = self.retreive_configuration_reporting_definition( key)
 
     self.logging("Debug", f"configure_reporting_for_one_device - processing {key} with {cfgrpt_configuration}", nwkid=key)
@@ -586,6 +656,9 @@ def configure_reporting_for_one_endpoint(self, key, Ep, batchMode, cfgrpt_config
     clusterList = getClusterListforEP(self, key, Ep)
     self.logging("Debug", f"--> configure_reporting_for_one_endpoint - processing {key}/{Ep} ClusterList: {clusterList}", nwkid=key)
 
+    # In batch mode, the planner takes care of the pace. Configure Reporting are sent at pairing time otherwise.
+    planned = batchMode and self.reporting_planner_enabled()
+
     now = time.time()
     for cluster in clusterList:
         if cluster not in cfgrpt_configuration:
@@ -623,6 +696,15 @@ def configure_reporting_for_one_endpoint(self, key, Ep, batchMode, cfgrpt_config
             
         self.logging("Debug", f"----> configure_reporting_for_one_endpoint it is time to work .....  {key}/{Ep} - {cluster}", nwkid=key) 
 
+        if "Attributes" not in cfgrpt_configuration[ cluster ]:
+            self.logging("Debug", f"----> configure_reporting_for_one_endpoint - for device: {key} on Cluster: {cluster} no Attributes key on {cfgrpt_configuration[ cluster ]}", nwkid=key)
+            continue
+
+        if planned:
+            self.logging("Debug", f"----> configure_reporting_for_one_endpoint - planned for device: {key} on Cluster: {cluster}", nwkid=key)
+            self.schedule_reporting(key, Ep, cluster)
+            continue
+
         if batchMode and (self.busy or self.ControllerLink.loadTransmit() > MAX_LOAD_ZIGATE):
             self.logging(
                 "Debug",
@@ -635,12 +717,7 @@ def configure_reporting_for_one_endpoint(self, key, Ep, batchMode, cfgrpt_config
 
         # If NWKID is not None, it means that we are asking a ConfigureReporting for a specific device
         # Which happens on the case of New pairing, or a re-join
-        
 
-        if "Attributes" not in cfgrpt_configuration[ cluster ]:
-            self.logging("Debug", f"----> configure_reporting_for_one_endpoint - for device: {key} on Cluster: {cluster} no Attributes key on {cfgrpt_configuration[ cluster ]}", nwkid=key)
-            continue
-        
         set_timestamp_datastruct(self, STORE_CONFIGURE_REPORTING, key, Ep, cluster, time.time())
         configure_reporting_for_one_cluster(self, key, Ep, cluster, batchMode, cfgrpt_configuration[cluster]["Attributes"])
 
@@ -648,13 +725,12 @@ def configure_reporting_for_one_endpoint(self, key, Ep, batchMode, cfgrpt_config
 def configure_reporting_for_one_cluster(self, key, Ep, cluster, batchMode, cluster_configuration):
     self.logging("Debug", f"---- configure_reporting_for_one_cluster - key: {key} ep: {Ep} cluster: {cluster} Cfg: {cluster_configuration}", nwkid=key)
 
-    manufacturer = "0000"
-    manufacturer_spec = "00"
     direction = "00"
 
     do_rebind_if_needed(self, key, Ep, batchMode, cluster)
     
-    ListOfAttributesToConfigure = []
+    # Attributes are grouped by manufacturer, so each group is packed in the minimum of requests
+    attributes_by_manufacturer = {}   # { ( manufacturer_spec, manufacturer ): [ attributes ] }
     for attr in cluster_configuration:
         # Check if the Attribute is listed in the Attributes List (provided by the Device
         # In case Attributes List exists, we have give the list of reported attribute.
@@ -677,36 +753,85 @@ def configure_reporting_for_one_cluster(self, key, Ep, cluster, batchMode, clust
         if is_tobe_skip(self, key, Ep, cluster, attr):
             continue
 
-        # Check if we have a Manufacturer Specific Cluster/Attribute. If that is the case, we need to send what we have ,
-        # and then send the Manufacturer attribute, and finaly continue the job
         manufacturer_code = manufacturer_specific_attribute(self, key, cluster, attr, cluster_configuration[attr])
         if manufacturer_code:
-            # Send what we have
-            if ListOfAttributesToConfigure:
-                self.prepare_and_send_configure_reporting( key, Ep, cluster_configuration, cluster, direction, manufacturer_spec, manufacturer, ListOfAttributesToConfigure, )
-
             self.logging("Debug", f"------> configure_reporting_for_one_cluster Reporting: Manuf Specific Attribute {attr}", nwkid=key)
+            attributes_by_manufacturer.setdefault(("01", manufacturer_code), []).append(attr)
+            continue
 
-            # Process the Attribute
-            ListOfAttributesToConfigure = []
-            ListOfAttributesToConfigure.append(attr)
-            
-            manufacturer_spec = "01"
+        attributes_by_manufacturer.setdefault(("00", "0000"), []).append(attr)
+        self.logging("Debug", f"------> configure_reporting_for_one_cluster  {key}/{Ep} Cluster {cluster} Adding attr: {attr} ", nwkid=key)
+
+    self.logging("Debug", f"------> configure_reporting_for_one_cluster  {key}/{Ep} Cluster {cluster} ready with: {attributes_by_manufacturer} ", nwkid=key)
+    for (manufacturer_spec, manufacturer), ListOfAttributesToConfigure in attributes_by_manufacturer.items():
+        self.prepare_and_send_configure_reporting( key, Ep, cluster_configuration, cluster, direction, manufacturer_spec, manufacturer, ListOfAttributesToConfigure, )
 
-            self.prepare_and_send_configure_reporting( key, Ep, cluster_configuration, cluster, direction, manufacturer_spec, manufacturer_code, ListOfAttributesToConfigure, )
 
-            # Look for the next attribute and do not assume it is Manuf Specif
-            ListOfAttributesToConfigure = []
-            manufacturer_spec = "00"
-            manufacturer = "0000"
+def redo_configure_reporting_for_one_cluster(self, key, Ep, cluster, cluster_configuration):
+    # Miss configuration detected, let the planner do it if enabled
+    if self.reporting_planner_enabled() and self.schedule_reporting(key, Ep, cluster):
+        return
+    configure_reporting_for_one_cluster(self, key, Ep, cluster, True, cluster_configuration)
 
-            continue  # Next Attribute
 
-        ListOfAttributesToConfigure.append(attr)
-        self.logging("Debug", f"------> configure_reporting_for_one_cluster  {key}/{Ep} Cluster {cluster} Adding attr: {attr} ", nwkid=key)
+def configure_reporting_for_planned_cluster(self, key, Ep, cluster):
+    # Send the Configure Reporting of a planned cluster, and return the number of frames sent
+
+    if key not in self.ListOfDevices or "Ep" not in self.ListOfDevices[key] or Ep not in self.ListOfDevices[key]["Ep"]:
+        return 0
+    if "Health" in self.ListOfDevices[key] and self.ListOfDevices[key]["Health"] == "Not Reachable":
+        return 0
+
+    cfgrpt_configuration = self.retreive_configuration_reporting_definition( key)
+    if cluster not in cfgrpt_configuration or "Attributes" not in cfgrpt_configuration[ cluster ]:
+        return 0
+
+    frames_before = self.frames_sent
+    set_timestamp_datastruct(self, STORE_CONFIGURE_REPORTING, key, Ep, cluster, time.time())
+    configure_reporting_for_one_cluster(self, key, Ep, cluster, True, cfgrpt_configuration[cluster]["Attributes"])
+    return max(1, self.frames_sent - frames_before)
 
-    self.logging("Debug", f"------> configure_reporting_for_one_cluster  {key}/{Ep} Cluster {cluster} ready with: {ListOfAttributesToConfigure} ", nwkid=key)
-    self.prepare_and_send_configure_reporting( key, Ep, cluster_configuration, cluster, direction, manufacturer_spec, manufacturer, ListOfAttributesToConfigure, )
+
+def ordered_planned_devices(self):
+    # Planned devices by availability: Live first, then best link quality, then most recently seen
+
+    def _sort_key(ieee):
+        device = self.ListOfDevices[self.IEEE2NWK[ieee]]
+        lqi = device["LQI"] if isinstance(device.get("LQI"), int) else 0
+        last_seen = device["Stamp"].get("LastSeen", 0) if isinstance(device.get("Stamp"), dict) else 0
+        return (device.get("Health") != "Live", -lqi, -last_seen)
+
+    for ieee in [x for x in self.reporting_plan if x not in self.IEEE2NWK or self.IEEE2NWK[x] not in self.ListOfDevices]:
+        # Device removed from the network
+        del self.reporting_plan[ieee]
+        self.reporting_plan_dirty = True
+
+    return sorted(
+        (ieee for ieee in self.reporting_plan if self.ListOfDevices[self.IEEE2NWK[ieee]].get("Health") != "Not Reachable"),
+        key=_sort_key,
+    )
+
+
+def reporting_plan_filename(self):
+    if self.HardwareID is None or self.pluginconf.pluginConf.get("pluginData") is None:
+        return None
+    return Path(self.pluginconf.pluginConf["pluginData"]) / (REPORTING_PLAN_FILENAME % int(self.HardwareID))
+
+
+def load_reporting_plan(self):
+    # Resume the Configure Reporting planned before the last stop
+    filename = reporting_plan_filename(self)
+    if filename is None or not filename.is_file():
+        return
+    try:
+        with open(filename, "rt") as handle:
+            self.reporting_plan = json.load(handle).get("Plan", {})
+    except (OSError, ValueError) as e:
+        self.logging("Error", f"load_reporting_plan - Unable to load {filename} - {e}")
+        self.reporting_plan = {}
+        return
+    if self.reporting_plan:
+        self.logging("Status", f"Configure Reporting planner resumes with {len(self.reporting_plan)} devices to be configured")
 
 
 def do_rebind_if_needed(self, nwkid, Ep, batchMode, cluster):
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: DeviceTemplates.py
+#
+#    Description: Registry of the device configuration templates ( DeviceConf ), with indexes compiled once
+#
+#    - DeviceTemplates is the DeviceConf dictionary ( model -> template ), loaded from DeviceConf.txt, the Local-Devices
+#      and the certified devices database, so all existing accesses and shared references stay valid.
+#    - The indexes ( by ProfileID/ZDeviceID, by cluster, by manufacturer, cluster lists per model ) are compiled at the
+#      end of the load, and compiled again at the first lookup after any change of the templates.
+#    - A reload ( plugin upgrade ) is loaded and compiled in a fresh DeviceTemplates, then swapped in with replace(),
+#      so the other threads never see an empty or partial DeviceConf.
+#    - typed() provides a parameter converted once ( bool, int, hex, list ), instead of converting it at each frame.
+#
+
+import time
+
+# Keys of an endpoint definition which are not clusters
+NOT_CLUSTERS = ("ClusterType", "Type", "ColorMode")
+
+# Sections of a template describing the endpoints
+EP_SECTIONS = ("Ep", "Epin", "Epout")
+
+
+def convert_parameter(value, kind):
+    if kind is bool:
+        return value not in (False, 0, "0", "", None, [], {})
+    if kind is int:
+        return int(value)
+    if kind == "hex":
+        return int(value, 16) if isinstance(value, str) else int(value)
+    if kind is list:
+        return list(value) if isinstance(value, (list, tuple)) else [value]
+    raise ValueError("unknown kind %s" % kind)
+
+
+def _cluster_list(section):
+    """ Clusters of an Epin / Epout section, as getListofClusterbyModel has always provided them """
+
+    clusters = []
+    for ep in list(section.keys()):
+        seen = ""
+        for cluster in sorted(section[ep]):
+            if cluster in NOT_CLUSTERS + (seen,):
+                continue
+            clusters.append(cluster)
+            seen = cluster
+    return tuple(clusters)
+
+
+class DeviceTemplates(dict):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.by_profile_device = {}
+        self.by_cluster = {}
+        self.by_manufacturer = {}
+        self.cluster_lists = {}
+        self.typed_values = {}
+        self.compiled = False
+        self.statistics = {"Compilations": 0, "CompileTime_ms": 0.0}
+
+    # Any change of the templates invalidates the indexes
+
+    def __setitem__(self, model, template):
+        self.compiled = False
+        super().__setitem__(model, template)
+
+    def __delitem__(self, model):
+        self.compiled = False
+        super().__delitem__(model)
+
+    def clear(self):
+        self.compiled = False
+        super().clear()
+
+    def update(self, *args, **kwargs):
+        self.compiled = False
+        super().update(*args, **kwargs)
+
+    def pop(self, *args):
+        self.compiled = False
+        return super().pop(*args)
+
+    def popitem(self):
+        self.compiled = False
+        return super().popitem()
+
+    def setdefault(self, model, template=None):
+        self.compiled = False
+        return super().setdefault(model, template)
+
+    def replace(self, templates):
+        """ Take the templates and the indexes of templates ( a compiled DeviceTemplates ), without ever emptying the registry """
+
+        # New templates first, then the new indexes, and the models which are gone are removed last
+        super().update(templates)
+        self.by_profile_device = templates.by_profile_device
+        self.by_cluster = templates.by_cluster
+        self.by_manufacturer = templates.by_manufacturer
+        self.cluster_lists = templates.cluster_lists
+        self.typed_values = {}
+        self.compiled = templates.compiled
+        for model in [x for x in self if x not in templates]:
+            super().__delitem__(model)
+
+    def compile(self):
+        start = time.perf_counter()
+        by_profile_device = {}
+        by_cluster = {}
+        by_manufacturer = {}
+        cluster_lists = {}
+        for model, template in self.items():
+            if not isinstance(template, dict):
+                continue
+            for in_out in ("Epin", "Epout"):
+                if isinstance(template.get(in_out), dict):
+                    cluster_lists[(model, in_out)] = _cluster_list(template[in_out])
+            if "ProfileID" in template and "ZDeviceID" in template:
+                # The first model wins, as the former scan of DeviceConf
+                by_profile_device.setdefault((template["ProfileID"], template["ZDeviceID"]), model)
+
+            for section in EP_SECTIONS:
+                for ep_definition in (template.get(section) or {}).values():
+                    if not isinstance(ep_definition, dict):
+                        continue
+                    for cluster in ep_definition:
+                        if cluster not in NOT_CLUSTERS:
+                            by_cluster.setdefault(cluster, set()).add(model)
+
+            for identifier in template.get("Identifier") or ():
+                if isinstance(identifier, (list, tuple)) and len(identifier) > 1:
+                    by_manufacturer.setdefault(identifier[1], set()).add(model)
+            for key in ("Manufacturer", "ManufacturerCode"):
+                if template.get(key):
+                    by_manufacturer.setdefault(template[key], set()).add(model)
+
+        self.by_profile_device = by_profile_device
+        self.by_cluster = {cluster: frozenset(models) for cluster, models in by_cluster.items()}
+        self.by_manufacturer = {manufacturer: frozenset(models) for manufacturer, models in by_manufacturer.items()}
+        self.cluster_lists = cluster_lists
+        self.typed_values = {}
+        self.compiled = True
+        self.statistics["Compilations"] += 1
+        self.statistics["CompileTime_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    def _ensure_compiled(self):
+        if not self.compiled:
+            self.compile()
+
+    def template(self, model):
+        """ Template of model, {} if unknown """
+
+        template = self.get(model) if isinstance(model, str) else None
+        return template if template is not None else {}
+
+    def parameter(self, model, attribute, default=None):
+        template = self.get(model) if isinstance(model, str) else None
+        if template is None:
+            return default
+        return template.get(attribute, default)
+
+    def typed(self, model, attribute, kind, default=None):
+        """ Parameter converted to kind ( bool, int, "hex", list ), default if missing or not convertible """
+
+        if not isinstance(model, str):
+            return default
+        self._ensure_compiled()
+        key = (model, attribute, kind)
+        if key in self.typed_values:
+            return self.typed_values[key]
+        template = self.get(model)
+        if template is None or attribute not in template:
+            return default
+        try:
+            value = convert_parameter(template[attribute], kind)
+        except (ValueError, TypeError):
+            value = default
+        self.typed_values[key] = value
+        return value
+
+    def model_by_profile_device(self, profile_id, zdevice_id):
+        self._ensure_compiled()
+        return self.by_profile_device.get((profile_id, zdevice_id), "")
+
+    def models_with_cluster(self, cluster):
+        self._ensure_compiled()
+        return self.by_cluster.get(cluster, frozenset())
+
+    def models_of_manufacturer(self, manufacturer):
+        self._ensure_compiled()
+        return self.by_manufacturer.get(manufacturer, frozenset())
+
+    def clusters(self, model, in_out):
+        """ Clusters of the Epin or Epout section of model, sorted by endpoint """
+
+        self._ensure_compiled()
+        return self.cluster_lists.get((model, in_out), ())
+
+    def report(self):
+        self._ensure_compiled()
+        return {
+            "Models": len(self),
+            "ProfileDeviceIDs": len(self.by_profile_device),
+            "Clusters": len(self.by_cluster),
+            "Manufacturers": len(self.by_manufacturer),
+            "Compilations": self.statistics["Compilations"],
+            "CompileTime_ms": self.statistics["CompileTime_ms"],
+        }
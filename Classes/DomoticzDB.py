@@ -13,17 +13,31 @@
 
 import base64
 import binascii
+import http.client
 import json
 import socket
+import ssl
+import threading
 import time
 import urllib.request
-import ssl
 
 from Modules.restartPlugin import restartPluginViaDomoticzJsonApi
 from Classes.LoggingManagement import LoggingManagement
 from Modules.tools import is_domoticz_new_API
 
 CACHE_TIMEOUT = (15 * 60) + 15  # num seconds
+FAILURE_CACHE_TIMEOUT = 60  # num seconds a failed request is not retried
+REQUEST_TIMEOUT = 10  # num seconds
+
+# Keep-alive connections to the Domoticz JSON API, shared by all DomoticzDB objects
+_CONNECTIONS = {}  # { ( scheme, netloc ): [ lock, connection ] }
+_CONNECTIONS_LOCK = threading.Lock()
+
+# Parsed responses of the Domoticz JSON API
+_CACHE = {}  # { url: ( expiry, result ) }
+_INFLIGHT = {}  # { url: threading.Event } requests in progress, other callers wait for them
+_CACHE_LOCK = threading.Lock()
+
 
 def init_domoticz_api(self):
     
@@ -34,17 +48,19 @@ def init_domoticz_api(self):
             "type=command&param=getsettings",
             "type=command&param=gethardware",
             "type=command&param=getdevices&rid=",
+            "type=command&param=getdevices&filter=all&used=all",
         )
     else:
         self.logging("Debug", 'Init domoticz api based on old api')
         init_domoticz_api_settings(
-            self, "type=settings", "type=hardware", "type=devices&rid="
+            self, "type=settings", "type=hardware", "type=devices&rid=", "type=devices&filter=all&used=all"
         )
         
-def init_domoticz_api_settings(self, settings_api, hardware_api, devices_api):
+def init_domoticz_api_settings(self, settings_api, hardware_api, devices_api, all_devices_api):
     self.DOMOTICZ_SETTINGS_API = settings_api
     self.DOMOTICZ_HARDWARE_API = hardware_api
     self.DOMOTICZ_DEVICEST_API = devices_api
+    self.DOMOTICZ_ALLDEVICES_API = all_devices_api
 
 
 def isBase64( sb ):    
@@ -125,33 +141,107 @@ def open_and_read( self, url ):
 
 def domoticz_request( self, url):
     self.logging("Debug",'domoticz request url: %s' %url)
-    try:
-        request = urllib.request.Request(url)
-    except urllib.error.URLError as e:
-        self.logging("Error", "Request to %s rejected. Error: %s" %(url, e))
+
+    split_url = urllib.parse.urlsplit(url)
+    if split_url.scheme not in ("http", "https") or not split_url.netloc:
+        self.logging("Error", "Request to %s rejected. Error: not an http(s) url" %url)
         return None
-    
-    self.logging("Debug",'domoticz request result: %s' %request)
+
+    headers = {"Connection": "keep-alive"}
     if self.authentication_str:
-        self.logging("Debug",'domoticz request Authorization: %s' %request)
-        request.add_header("Authorization", "Basic %s" % self.authentication_str)
-    self.logging("Debug",'domoticz request open url')
-    
+        self.logging("Debug",'domoticz request Authorization: %s' %url)
+        headers["Authorization"] = "Basic %s" % self.authentication_str
+
+    path = split_url.path or "/"
+    if split_url.query:
+        path += "?" + split_url.query
+
+    lock_connection = _get_connection(self, split_url.scheme, split_url.netloc)
+    with lock_connection[0]:
+        # A keep-alive connection might have been closed by Domoticz in between, in that case retry on a new one
+        for retry in (True, False):
+            if lock_connection[1] is None:
+                lock_connection[1] = _new_connection(self, split_url.scheme, split_url.netloc)
+            try:
+                lock_connection[1].request("GET", path, headers=headers)
+                response = lock_connection[1].getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                lock_connection[1].close()
+                lock_connection[1] = None
+                if retry:
+                    continue
+                self.logging("Error", "Urlopen to %s rejected. Error: %s" %(url, e))
+                return None
+
+            if response.will_close:
+                lock_connection[1].close()
+                lock_connection[1] = None
+            if response.status != 200:
+                self.logging("Error", "Urlopen to %s rejected. Error: %s %s" %(url, response.status, response.reason))
+                return None
+            return data
+
+
+def _get_connection(self, scheme, netloc):
+    with _CONNECTIONS_LOCK:
+        if (scheme, netloc) not in _CONNECTIONS:
+            _CONNECTIONS[(scheme, netloc)] = [threading.Lock(), None]
+        return _CONNECTIONS[(scheme, netloc)]
+
+
+def _new_connection(self, scheme, netloc):
+    self.logging("Debug", f'opening connection to {scheme}://{netloc}')
+    if scheme == "http":
+        return http.client.HTTPConnection(netloc, timeout=REQUEST_TIMEOUT)
+
     myssl_context = None
-    if "https" in url.lower() and not self.pluginconf.pluginConf["CheckSSLCertificateValidity"]:
+    if not self.pluginconf.pluginConf["CheckSSLCertificateValidity"]:
         myssl_context = ssl.create_default_context()
         myssl_context.check_hostname=False
         myssl_context.verify_mode=ssl.CERT_NONE
+    return http.client.HTTPSConnection(netloc, timeout=REQUEST_TIMEOUT, context=myssl_context)
+
+
+def domoticz_cached_request( self, url, ttl=CACHE_TIMEOUT):
+    """ Parsed json response of a Domoticz API request, kept ttl seconds. Concurrent identical requests are sent once """
 
+    while True:
+        with _CACHE_LOCK:
+            entry = _CACHE.get(url)
+            if entry and entry[0] > time.time():
+                return entry[1]
+            inflight = _INFLIGHT.get(url)
+            if inflight is None:
+                inflight = _INFLIGHT[url] = threading.Event()
+                break
+        # Somebody else is requesting it, wait for the result
+        inflight.wait(2 * REQUEST_TIMEOUT)
+
+    result = None
     try:
-        self.logging("Debug", f'opening url {request} with context {myssl_context}')
-        response = urllib.request.urlopen(request, context=myssl_context)
-    except urllib.error.URLError as e:
-        self.logging("Error", "Urlopen to %s rejected. Error: %s" %(url, e))
-        return None
-    
-    return response.read()
-  
+        dz_response = domoticz_request( self, url)
+        if dz_response is not None:
+            result = json.loads( dz_response )
+    except ValueError as e:
+        self.logging("Error", "Unexpected response from %s. Error: %s" %(url, e))
+
+    with _CACHE_LOCK:
+        _CACHE[url] = (time.time() + (ttl if result is not None else FAILURE_CACHE_TIMEOUT), result)
+        del _INFLIGHT[url]
+    inflight.set()
+    return result
+
+
+def domoticz_cache_invalidate( url_prefix=None):
+    """ Drop the cached responses ( all of them, or the ones of urls starting with url_prefix ) """
+
+    with _CACHE_LOCK:
+        for url in list(_CACHE):
+            if url_prefix is None or url.startswith(url_prefix):
+                del _CACHE[url]
+
+
 def domoticz_base_url(self):
     
     if self.url_ready:
@@ -206,11 +296,11 @@ class DomoticzDB_Preferences:
             return
         url += self.DOMOTICZ_HARDWARE_API
 
-        dz_response = domoticz_request( self, url)
+        dz_response = domoticz_cached_request( self, url)
         if dz_response is None:
             return
 
-        self.preferences = json.loads( dz_response )
+        self.preferences = dz_response
         
     def logging(self, logType, message):
         # sourcery skip: replace-interpolation-with-fstring
@@ -255,10 +345,9 @@ class DomoticzDB_Hardware:
             return
         url += self.DOMOTICZ_HARDWARE_API
 
-        dz_result = domoticz_request( self, url)
-        if dz_result is None:
+        result = domoticz_cached_request( self, url)
+        if result is None or 'result' not in result:
             return
-        result = json.loads( dz_result )
         
         for x in result['result']:
             idx = x[ "idx" ]
@@ -302,25 +391,61 @@ class DomoticzDB_DeviceStatus:
         self.DomoticzBuild = DomoticzBuild
         self.DomoticzMajor = DomoticzMajor
         self.DomoticzMinor = DomoticzMinor
+        self.devices = {}  # { idx: device status } of the widgets of this hardware
+        self.devices_expiry = 0
 
         init_domoticz_api(self)
+        self.prefetch()
 
     def logging(self, logType, message):
         # sourcery skip: replace-interpolation-with-fstring
         self.log.logging("DZDB", logType, message)
 
+    def prefetch(self):
+        """ Load in one request the status of all widgets of the plugin """
+        url = domoticz_base_url(self)
+        if url is None:
+            return
+
+        self.devices_expiry = time.time() + CACHE_TIMEOUT
+        # Only the widgets of this hardware are requested
+        all_devices_url = url + self.DOMOTICZ_ALLDEVICES_API + "&hwidx=%s" % self.HardwareID
+        result = domoticz_cached_request( self, all_devices_url)
+        domoticz_cache_invalidate( all_devices_url)
+        if result is None or 'result' not in result:
+            return
+        # Older Domoticz versions ignore hwidx, and return the widgets of all hardware
+        self.devices = {
+            str(x["idx"]): x
+            for x in result['result']
+            if "idx" in x and str(x.get("HardwareID")) == str(self.HardwareID)
+        }
+        self.logging("Debug", "prefetch %s widgets status" %len(self.devices))
+
+    def invalidate(self):
+        """ Forget the widgets status, they will be reloaded at the next request. Called when widgets are created or removed """
+        self.devices_expiry = 0
+        url = domoticz_base_url(self)
+        if url is None:
+            return
+        domoticz_cache_invalidate( url + self.DOMOTICZ_DEVICEST_API)
+        domoticz_cache_invalidate( url + self.DOMOTICZ_ALLDEVICES_API)
+
     def get_device_status(self, ID):
         # "http://%s:%s@127.0.0.1:%s" 
         # sourcery skip: replace-interpolation-with-fstring
+        if time.time() > self.devices_expiry:
+            self.prefetch()
+        if str(ID) in self.devices:
+            return {'result': [ self.devices[ str(ID) ] ]}
+
+        # Most likely a widget created after the last prefetch
         url = domoticz_base_url(self)
         if url is None:
             return
         url += self.DOMOTICZ_DEVICEST_API + "%s" %ID
 
-        dz_result = domoticz_request( self, url)
-        if dz_result is None:
-            return None
-        result = json.loads( dz_result )
+        result = domoticz_cached_request( self, url)
         self.logging("Debug", "Result: %s" %result)
         return result
     
@@ -6,12 +6,24 @@
 """
     Module: z_IAS.py
     Description: IAS Zone management
+
+    Each IAS zone ( device endpoint with a 0x0500 cluster ) has its own enrollment state machine, stored in
+    ListOfDevices[ nwkid ]["IAS"]["Auto-Enrollment"]["Ep"][ ep ]:
+
+        Queued -> Service Discovery -> set IAS CIE Address -> Wait for Enrollment request -> Enrolled
+                                    -> Enrolled ( zone already enrolled )
+
+    Transitions are triggered by the responses of the device ( Read Attribute, Write Attribute, Zone Enroll Request ).
+    A step not answered within IASEnrollmentTimeout is sent again, and the zone is Failed after IASEnrollmentRetries
+    attempts. At most IASEnrollmentConcurrency zones are enrolled at a time, the other ones are Queued, so a large
+    security installation does not flood the network after a restart.
 """
 
 
 import struct
 import time
 
+from Classes.TrafficScheduler import traffic_class
 from Modules.basicOutputs import write_attribute
 from Modules.bindings import bindDevice
 from Modules.sendZigateCommand import raw_APS_request
@@ -91,6 +103,13 @@ SIREN_MODES = {
 
 strobe_mode = 0x00
 
+# States of the enrollment of a zone
+ENROLLMENT_IN_PROGRESS = ("Service Discovery", "set IAS CIE Address", "Wait for Enrollment request")
+ENROLLMENT_COMPLETED = ("Enrolled", "Enrolled2")
+
+# Zone Status Change Notifications received twice ( same sqn, same status ) within this delay are retransmissions
+ZONE_STATUS_DUPLICATE_DELAY = 2.0
+
 
 class IAS_Zone_Management:
     
@@ -107,6 +126,11 @@ class IAS_Zone_Management:
         self.zigbee_communication = zigbee_communitation
         self.readZclClusters = readZclClusters
         self.FirmwareVersion = FirmwareVersion
+        self.enrolling = set()  # ( nwkid, ep ) of the zones with an enrollment step in progress
+        self.queued = []  # ( nwkid, ep ) of the zones waiting for an enrollment slot, in arrival order
+        self.resumed = False  # Enrollments in progress at plugin restart have been resumed
+        self.zone_status = {}  # { ( nwkid, ep ): ( sqn, zone status, time ) } last Zone Status Change Notification
+        self.ias_statistics = {"Enrolled": 0, "Failed": 0, "Retries": 0, "Alarms": 0, "Duplicates": 0}
 
     def logging(self, logType, message):
         self.log.logging("IAS", logType, message)
@@ -118,7 +142,7 @@ class IAS_Zone_Management:
     def IAS_write_CIE_after_match_descriptor( self, nwkid, ep):
         set_IAS_CIE_Address(self, nwkid, ep)
         
-    def IAS_device_enrollment(self, NwkId):
+    def IAS_device_enrollment(self, NwkId, Ep=None):
         # This is coming from the plugin.
         # Let's see first if anything has to be done
         if "Model" in self.ListOfDevices[NwkId] and self.ListOfDevices[NwkId]["Model"] in ("MOSZB-140", "SMSZB-120"):
@@ -129,39 +153,173 @@ class IAS_Zone_Management:
 
         ias_ep_list = getEpForCluster(self, NwkId, "0500", strict=True)
         self.logging("Debug", f"IAS device Enrollment for {NwkId} on {ias_ep_list}, type: {type(ias_ep_list)} ")
-        self.logging("Debug", "IAS_EP_LIST: %s" %str(ias_ep_list))
+        if ias_ep_list and Ep is not None:
+            ias_ep_list = [ x for x in ias_ep_list if x == Ep ]
         if not ias_ep_list:
             return
 
         if is_device_enrollment_completed(self, NwkId):
             return
 
-        self.logging("Debug", f"IAS device Enrollment for {NwkId} on {ias_ep_list}, type: {type(ias_ep_list)} ")
-        if "IAS" not in self.ListOfDevices[ NwkId ]:
-            self.ListOfDevices[NwkId]["IAS"] = {}
-        if "Auto-Enrollment" not in self.ListOfDevices[NwkId]["IAS"]:
-            self.ListOfDevices[NwkId]["IAS"]["Auto-Enrollment"] = {}
-        if "Status" not in self.ListOfDevices[NwkId]["IAS"]["Auto-Enrollment"]:
-
-            self.ListOfDevices[NwkId]["IAS"]["Auto-Enrollment"]["Status"] = "Enrollment In Progress"
-        if "Ep" not in self.ListOfDevices[NwkId]["IAS"]["Auto-Enrollment"]:
-            self.ListOfDevices[NwkId]["IAS"]["Auto-Enrollment"]["Ep"] ={}
-
-        if self.ListOfDevices[NwkId]["IAS"]["Auto-Enrollment"]["Status"] == "Enrolled":
+        auto_enrollment = self.ListOfDevices[NwkId].setdefault("IAS", {}).setdefault("Auto-Enrollment", {})
+        auto_enrollment.setdefault("Status", "Enrollment In Progress")
+        auto_enrollment.setdefault("Ep", {})
+        if auto_enrollment["Status"] == "Enrolled":
             return
 
-        self.logging("Debug", f"IAS device Enrollment for {NwkId} - IAS_EP: {ias_ep_list}, Ep: {self.ListOfDevices[NwkId]['IAS']['Auto-Enrollment']['Ep']}")
+        self.logging("Debug", f"IAS device Enrollment for {NwkId} - IAS_EP: {ias_ep_list}, Ep: {auto_enrollment['Ep']}")
         for ep in list(ias_ep_list):
-            self.logging("Debug", f"IAS device Enrollment for {NwkId} - Checking Ep: {ep}")
-            if self.ListOfDevices[NwkId]["IAS"]["Auto-Enrollment"]["Ep"] != {} and ep in self.ListOfDevices[NwkId]["IAS"]["Auto-Enrollment"]["Ep"]:
+            ep = str(ep)
+            if auto_enrollment["Ep"].get(ep, {}).get("Status") not in (None, "Failed"):
+                # Enrollment in progress or completed
                 continue
-
             self.logging("Debug", f"IAS device Enrollment for {NwkId} - start Enrollment on Ep: {ep}")
-            self.ListOfDevices[NwkId]["IAS"]["Auto-Enrollment"]["Ep"][str(ep)] = {"Status": "Service Discovery", "TimeStamp": time.time()}
-            IAS_CIE_service_discovery( self, NwkId, str(ep))
+            self._enroll_zone(NwkId, ep)
 
         if is_device_enrollment_completed(self, NwkId):
-            self.ListOfDevices[NwkId]["IAS"]["Auto-Enrollment"]["Status"] = "Enrolled"
+            auto_enrollment["Status"] = "Enrolled"
+
+    def _enroll_zone(self, NwkId, Ep):
+        """ Start the enrollment of a zone, or queue it if all enrollment slots are busy """
+
+        if len(self.enrolling) >= self.pluginconf.pluginConf.get("IASEnrollmentConcurrency", 4):
+            self._set_zone_state(NwkId, Ep, "Queued")
+            if (NwkId, Ep) not in self.queued:
+                self.queued.append((NwkId, Ep))
+            return
+        self._set_zone_state(NwkId, Ep, "Service Discovery")
+        self._send_enrollment_step(NwkId, Ep)
+
+    def _zone(self, NwkId, Ep):
+        return self.ListOfDevices[NwkId].setdefault("IAS", {}).setdefault("Auto-Enrollment", {}).setdefault("Ep", {}).setdefault(Ep, {})
+
+    def _zone_status(self, NwkId, Ep):
+        """ Enrollment status of a zone, without creating the zone ( read only ) """
+
+        zones = self.ListOfDevices.get(NwkId, {}).get("IAS", {})
+        zones = zones.get("Auto-Enrollment", {}) if isinstance(zones, dict) else {}
+        zones = zones.get("Ep", {}) if isinstance(zones, dict) else {}
+        zone = zones.get(Ep) if isinstance(zones, dict) else None
+        return zone.get("Status") if isinstance(zone, dict) else None
+
+    def _set_zone_state(self, NwkId, Ep, state):
+        zone = self._zone(NwkId, Ep)
+        if zone.get("Status") != state:
+            zone["Attempts"] = 0
+        zone["Status"] = state
+        zone["TimeStamp"] = time.time()
+
+        if state in ENROLLMENT_IN_PROGRESS:
+            self.enrolling.add((NwkId, Ep))
+            return
+        if (NwkId, Ep) in self.enrolling:
+            self.enrolling.discard((NwkId, Ep))
+            if state in ENROLLMENT_COMPLETED:
+                self.ias_statistics["Enrolled"] += 1
+            # A slot is available, start the next enrollment right away
+            self._admit_queued()
+
+    def _send_enrollment_step(self, NwkId, Ep):
+        """ Send the request of the current enrollment step of a zone """
+
+        zone = self._zone(NwkId, Ep)
+        zone["Attempts"] = zone.get("Attempts", 0) + 1
+        zone["TimeStamp"] = time.time()
+        if zone["Status"] == "Service Discovery":
+            IAS_CIE_service_discovery(self, NwkId, Ep)
+        elif zone["Status"] in ("set IAS CIE Address", "Wait for Enrollment request"):
+            # Writing the IAS CIE Address again triggers a new Zone Enroll Request
+            set_IAS_CIE_Address(self, NwkId, Ep)
+
+    def _admit_queued(self):
+        while self.queued and len(self.enrolling) < self.pluginconf.pluginConf.get("IASEnrollmentConcurrency", 4):
+            NwkId, Ep = self.queued.pop(0)
+            if self._zone_status(NwkId, Ep) == "Queued":
+                self._set_zone_state(NwkId, Ep, "Service Discovery")
+                self._send_enrollment_step(NwkId, Ep)
+
+    def IAS_heartbeat(self):
+        """ Retry the enrollment steps not answered on time, and give up after IASEnrollmentRetries attempts """
+
+        if not self.resumed:
+            self._resume_enrollments()
+
+        timeout = self.pluginconf.pluginConf.get("IASEnrollmentTimeout", 10)
+        retries = self.pluginconf.pluginConf.get("IASEnrollmentRetries", 3)
+        now = time.time()
+        for NwkId, Ep in list(self.enrolling):
+            if NwkId not in self.ListOfDevices:
+                self.enrolling.discard((NwkId, Ep))
+                continue
+            zone = self._zone(NwkId, Ep)
+            if now < zone.get("TimeStamp", 0) + timeout:
+                continue
+            if zone.get("Attempts", 0) >= retries:
+                self.logging("Log", f"IAS device Enrollment for {NwkId}/{Ep} failed at step {zone['Status']} after {zone.get('Attempts', 0)} attempts")
+                self.ias_statistics["Failed"] += 1
+                self._set_zone_state(NwkId, Ep, "Failed")
+                continue
+            self.logging("Debug", f"IAS device Enrollment for {NwkId}/{Ep} - retry step {zone['Status']}")
+            self.ias_statistics["Retries"] += 1
+            self._send_enrollment_step(NwkId, Ep)
+        self._admit_queued()
+
+    def _resume_enrollments(self):
+        """ Enrollments which were in progress when the plugin stopped """
+
+        self.resumed = True
+        for NwkId, device in list(self.ListOfDevices.items()):
+            zones = device.get("IAS", {}).get("Auto-Enrollment", {}).get("Ep", {}) if isinstance(device.get("IAS"), dict) else {}
+            for Ep, zone in list(zones.items()) if isinstance(zones, dict) else []:
+                if isinstance(zone, dict) and zone.get("Status") in ENROLLMENT_IN_PROGRESS + ("Queued",):
+                    zone["Status"] = None
+                    self._enroll_zone(NwkId, Ep)
+
+    def IAS_forget(self, NwkId):
+        self.enrolling = {zone for zone in self.enrolling if zone[0] != NwkId}
+        self.queued = [zone for zone in self.queued if zone[0] != NwkId]
+        for zone in [zone for zone in self.zone_status if zone[0] == NwkId]:
+            del self.zone_status[zone]
+
+    def zone_status_received(self, NwkId, Ep, sqn, zone_status):
+        """ False if the Zone Status Change Notification is a retransmission of the previous one """
+
+        now = time.time()
+        previous = self.zone_status.get((NwkId, Ep))
+        self.zone_status[(NwkId, Ep)] = (sqn, zone_status, now)
+        if previous and previous[0] == sqn and previous[1] == zone_status and now < previous[2] + ZONE_STATUS_DUPLICATE_DELAY:
+            self.ias_statistics["Duplicates"] += 1
+            return False
+        self.ias_statistics["Alarms"] += 1
+        return True
+
+    def report(self):
+        """ Enrollment state of the IAS zones """
+
+        zones = {}
+        summary = {}
+        for NwkId, device in list(self.ListOfDevices.items()):
+            ias = device.get("IAS")
+            if not isinstance(ias, dict) or not isinstance(ias.get("Auto-Enrollment"), dict):
+                continue
+            for Ep, zone in list(ias["Auto-Enrollment"].get("Ep", {}).items()):
+                if not isinstance(zone, dict):
+                    continue
+                status = zone.get("Status")
+                summary[status] = summary.get(status, 0) + 1
+                zones["%s/%s" % (NwkId, Ep)] = {
+                    "Model": device.get("Model", ""),
+                    "Status": status,
+                    "Attempts": zone.get("Attempts", 0),
+                    "TimeStamp": int(zone.get("TimeStamp", 0)),
+                }
+        return {
+            "Zones": zones,
+            "Summary": summary,
+            "Enrolling": len(self.enrolling),
+            "Queued": len(self.queued),
+            "Statistics": dict(self.ias_statistics),
+        }
 
     def force_IAS_registration_if_needed(self, NwkId):
         # Usally call when Model Name is define, so we can immediatly check if CIE needs to be writen on the device
@@ -196,14 +354,18 @@ class IAS_Zone_Management:
         if zone_state_value is None:
             return
 
+        if self._zone_status(NwkId, ep) not in ENROLLMENT_IN_PROGRESS:
+            # Not part of an enrollment ( polling )
+            return
+
         if zone_state_value == "00":
             # Not Enrolled, let's start the process
-            self.ListOfDevices[NwkId]["IAS"]["Auto-Enrollment"]["Ep"][ep]["Status"] = "set IAS CIE Address"
-            set_IAS_CIE_Address(self, NwkId, ep)
+            self._set_zone_state(NwkId, ep, "set IAS CIE Address")
+            self._send_enrollment_step(NwkId, ep)
         elif zone_state_value == "01":
             # Enrolled, let's req the IAS ICE address
             check_IAS_CIE_Address(self, NwkId, ep)
-            self.ListOfDevices[NwkId]["IAS"]["Auto-Enrollment"]["Ep"][ep]["Status"] = "Enrolled"
+            self._set_zone_state(NwkId, ep, "Enrolled")
 
         if is_device_enrollment_completed(self, NwkId):
             self.ListOfDevices[NwkId]["IAS"]["Auto-Enrollment"]["Status"] = "Enrolled"
@@ -237,7 +399,7 @@ class IAS_Zone_Management:
                 self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]["Ep"][ Ep ] = {}
 
             # We are may be in an Auto-Enrollment by the device ( Frient )
-            self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]["Ep"][ Ep ]["Status"] = "Enrolled2"
+            self._set_zone_state(NwkId, Ep, "Enrolled2")
             self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]["Ep"][ Ep ]["ZoneId"] = "%02x" %ZONE_ID
             IAS_Zone_enrollment_response(self, NwkId, Ep, sqn, ZONE_ID)
             check_IAS_CIE_Address(self, NwkId, Ep)
@@ -256,7 +418,7 @@ class IAS_Zone_Management:
             check_IAS_CIE_Address(self, NwkId, Ep)
             return
         
-        self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]["Ep"][ Ep ]["Status"] = "Enrolled"
+        self._set_zone_state(NwkId, Ep, "Enrolled")
         self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]["Ep"][ Ep ]["ZoneId"] = "%02x" %ZONE_ID
         IAS_Zone_enrollment_response(self, NwkId, Ep, sqn, ZONE_ID)
         check_IAS_CIE_Address(self, NwkId, Ep)
@@ -269,16 +431,16 @@ class IAS_Zone_Management:
         self.logging("Debug", f"IAS device Enrollment Request Response for {NwkId}/{Ep} Response: {EnrollResponseCode} ZoneId: {ZoneId}")
         if ( 
             NwkId not in self.ListOfDevices 
-            and "IAS" not in self.ListOfDevices[ NwkId ] 
-            and "Auto-Enrollment" not in self.ListOfDevices[ NwkId ]["IAS"] 
-            and "Ep" not in self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"] 
-            and Ep not in self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]["Ep"]
+            or "IAS" not in self.ListOfDevices[ NwkId ] 
+            or "Auto-Enrollment" not in self.ListOfDevices[ NwkId ]["IAS"] 
+            or "Ep" not in self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"] 
+            or Ep not in self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]["Ep"]
         ):
             self.logging("Error", f"IAS device Enrollment Request Response for {NwkId}/{Ep} Response: {EnrollResponseCode} ZoneId: {ZoneId}")
             return
         
         if EnrollResponseCode == "%02x" %ENROLL_RESPONSE_OK_CODE:
-            self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]["Ep"][ Ep ]["Status"] = "Enrolled"
+            self._set_zone_state(NwkId, Ep, "Enrolled")
         if is_device_enrollment_completed(self, NwkId):
             self.ListOfDevices[NwkId]["IAS"]["Auto-Enrollment"]["Status"] = "Enrolled"
             self.ListOfDevices[NwkId]["IAS"]["ZoneId"] = ZoneId
@@ -291,7 +453,7 @@ class IAS_Zone_Management:
             or "IAS" not in self.ListOfDevices[ NwkId ]
             or "Auto-Enrollment" not in self.ListOfDevices[ NwkId ]["IAS"]
             or "Ep" not in self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]
-            or Ep in "Status" not in self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]["Ep"]
+            or Ep not in self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]["Ep"]
             or "Status" not in self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]["Ep"][ Ep ]
             or self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]["Ep"][ Ep ]["Status"] != "set IAS CIE Address"
         ):
@@ -301,7 +463,7 @@ class IAS_Zone_Management:
         # We got the confirmation. Now we have to wait for the Enrollment Request
         if Status == "00":
             self.logging("Debug", f"IAS CIE write Response for {NwkId}/{Ep}  Waiting for Enrollment request")
-            self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]["Ep"][ Ep ]["Status"] = "Wait for Enrollment request"
+            self._set_zone_state(NwkId, Ep, "Wait for Enrollment request")
 
     def IASWD_enroll(self, NwkId, Epout):
         data_type = "%02X" % 0x21
@@ -313,6 +475,7 @@ class IAS_Zone_Management:
         duration = "%04x" %duration
         zcl_write_attribute( self, NwkId, ZIGATE_EP, Epout, "0502", "00", "0000", "0000", data_type, duration, ackIsDisabled=False )
 
+    @traffic_class("alarm")
     def write_IAS_WD_Squawk(self, NwkId, ep, SquawkMode):
         SQUAWKMODE = {"disarmed": 0b00000000, "armed": 0b00000001}
 
@@ -335,6 +498,7 @@ class IAS_Zone_Management:
         
         zcl_ias_wd_command_squawk(self, ZIGATE_EP, ep, NwkId, squawk_mode, strobe, squawk_level, ackIsDisabled=False)
 
+    @traffic_class("alarm")
     def warningMode(self, NwkId, ep, mode="both", siren_level=0x01, warning_duration=0x01, strobe_duty=0x32, strobe_level=0x00):
         self.logging("Debug", f"warningMode {mode} {siren_level} {warning_duration} {strobe_duty} {strobe_level}")
         
@@ -369,6 +533,7 @@ class IAS_Zone_Management:
         self.logging("Debug", "Device Alarm Off")
         self.warningMode(NwkId, ep, "stop")
 
+    @traffic_class("alarm")
     def iaswd_develco_warning(self, NwkId, ep, sirenonoff):
 
         if sirenonoff not in ( "00", "01"):
@@ -465,7 +630,7 @@ def IAS_Zone_enrollment_response(self, NwkId, Ep, sqn, ZoneID):
     if not self.ControllerIEEE:
         self.logging("Error", "IASZone_enroll_response_zoneIDzoneID - Zigate IEEE not yet known")
         return
-    self.ListOfDevices[ NwkId ]["IAS"]["Auto-Enrollment"]["Ep"][ Ep ]["Status"] = "Enrolled"
+    self._set_zone_state(NwkId, Ep, "Enrolled")
     zcl_ias_zone_enroll_response(self, NwkId, ZIGATE_EP, Ep, "%02x" %ENROLL_RESPONSE_OK_CODE, "%02x" %ZoneID, sqn=sqn, ackIsDisabled=False)
 
 def retreive_attributes(self, MsgData):
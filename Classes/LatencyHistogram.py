@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: LatencyHistogram.py
+#
+#    Description: HDR style latency histograms of the plugin pipeline stages
+#
+#    - Values are recorded in micro-seconds into log-linear buckets: 16 sub-buckets per power of 2, so any value is
+#      known with a relative precision of 6%, from 1us up to 60s, in a fixed array of 368 buckets.
+#    - Each thread records into its own shard, so the hot threads (serial reader, forwarder, writer, zigpy loop)
+#      never share a counter and do not need a lock. Shards are merged when the histogram is read.
+#
+
+import threading
+from functools import wraps
+from time import perf_counter
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS  # 16
+HIGHEST_VALUE = 60 * 1000 * 1000  # 60s in us, anything above is accounted in the last bucket
+NB_BUCKETS = ((HIGHEST_VALUE.bit_length() - SUB_BUCKET_BITS - 1) + 1) * SUB_BUCKETS + SUB_BUCKETS  # 368
+
+# Pipeline stages, in the order a frame goes through the plugin
+STAGES = (
+    "serial_read",  # Read of the serial line ( ZiGate )
+    "deframe",  # Frame extraction, unescaping, length and crc check ( ZiGate )
+    "decode",  # Decoding of a frame by the plugin ( zigbee_receive_message )
+    "domoMaj",  # Update of the Domoticz widgets from a decoded value ( MajDomoDevice )
+    "widget_update",  # Domoticz API call to update a widget
+    "writer_queue_wait",  # Time spent by a command in the writer queue
+    "ack_round_trip",  # From command sent to the coordinator ack ( 0x8000 on ZiGate, transport request on zigpy )
+    "ias_alarm",  # From an IAS Zone Status Change Notification decoded, to the alarm widgets updated
+)
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# Bucket boundaries (in seconds) of the Prometheus exposition
+PROMETHEUS_BOUNDS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def bucket_index(value):
+    """ Index of the bucket of a value in us """
+
+    if value < 2 * SUB_BUCKETS:
+        return max(0, value)
+    if value > HIGHEST_VALUE:
+        value = HIGHEST_VALUE
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKETS + (value >> shift)
+
+
+def bucket_range(index):
+    """ Lowest and highest value (in us) accounted in a bucket """
+
+    if index < 2 * SUB_BUCKETS:
+        return index, index
+    shift = index // SUB_BUCKETS - 1
+    sub_bucket = index - shift * SUB_BUCKETS
+    return sub_bucket << shift, ((sub_bucket + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self._shards = {}  # { thread ident: [ counts, count, sum, max ] }
+
+    def record(self, value):
+        """ Record a latency in us. Lock free, as each thread has its own shard """
+
+        shard = self._shards.get(threading.get_ident())
+        if shard is None:
+            shard = self._shards.setdefault(threading.get_ident(), [[0] * NB_BUCKETS, 0, 0, 0])
+        shard[0][bucket_index(value)] += 1
+        shard[1] += 1
+        shard[2] += value
+        if value > shard[3]:
+            shard[3] = value
+
+    def reset(self):
+        self._shards = {}
+
+    def snapshot(self):
+        """ Merge the shards, and return ( counts, count, sum, max ) """
+
+        counts = [0] * NB_BUCKETS
+        count = total = maximum = 0
+        for shard in list(self._shards.values()):
+            shard_counts = shard[0]
+            for index in range(NB_BUCKETS):
+                if shard_counts[index]:
+                    counts[index] += shard_counts[index]
+            count += shard[1]
+            total += shard[2]
+            maximum = max(maximum, shard[3])
+        return counts, count, total, maximum
+
+    @staticmethod
+    def value_at_quantile(counts, count, maximum, quantile):
+        """ Highest value (in us) of the bucket holding the quantile """
+
+        if count == 0:
+            return 0
+        target = max(1, int(quantile * count + 0.5))
+        cumulative = 0
+        for index, nb in enumerate(counts):
+            cumulative += nb
+            if cumulative >= target:
+                return min(bucket_range(index)[1], maximum)
+        return maximum
+
+    def summary(self):
+        counts, count, total, maximum = self.snapshot()
+        return {
+            "count": count,
+            "sum_us": total,
+            "mean_us": int(total / count) if count else 0,
+            "max_us": maximum,
+            "quantiles_us": {str(q): self.value_at_quantile(counts, count, maximum, q) for q in QUANTILES},
+            "buckets": [[bucket_range(index)[1], nb] for index, nb in enumerate(counts) if nb],
+        }
+
+
+def measure_latency(stage):
+    """ Decorator recording the time spent in a function, for methods of objects having a statistics attribute """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            statistics = getattr(self, "statistics", None)
+            if statistics is None or not statistics.latency_enabled():
+                return func(self, *args, **kwargs)
+            t_start = perf_counter()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                statistics.record_latency(stage, perf_counter() - t_start)
+
+        return wrapper
+
+    return decorator
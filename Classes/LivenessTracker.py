@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: LivenessTracker.py
+#
+#    Description: Liveness of the devices, and propagation to the Domoticz widgets
+#
+#    - Each frame received from a device records its last seen time in memory.
+#    - Touching the widgets, or setting/clearing their TimedOut flag, are Domoticz API calls, which are costly on
+#      chatty networks. They are queued per device ( only the last request is kept ) and pushed to Domoticz in bounded
+#      batches at each heartbeat.
+#    - The TimedOut flag pushed to Domoticz is memorized, so it does not have to be read back before each update.
+#
+#    The Domoticz side is done by Modules/domoTools.py
+#
+
+import threading
+import time
+
+
+class LivenessTracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_seen = {}  # { ieee: time of the last frame received }
+        self.pending = {}  # { ieee: "Live" | "TimedOut" }, in request order
+        self.timedout = {}  # { ieee: TimedOut flag as set in Domoticz }, missing when unknown
+        self.statistics = {"Requests": 0, "Coalesced": 0, "Pushed": 0, "Batches": 0, "Backlog": 0}
+
+    def seen(self, ieee):
+        self.last_seen[ieee] = time.time()
+
+    def request(self, ieee, state):
+        """ Request the widgets of a device to be Live ( touched, TimedOut cleared ) or TimedOut """
+
+        with self.lock:
+            self.statistics["Requests"] += 1
+            if ieee in self.pending:
+                self.statistics["Coalesced"] += 1
+                del self.pending[ieee]
+            self.pending[ieee] = state
+
+    def is_timedout(self, ieee):
+        """ TimedOut flag as set in Domoticz, None if unknown """
+
+        return self.timedout.get(ieee)
+
+    def pop_batch(self, size):
+        """ Return the oldest ( ieee, state ) requests, at most size """
+
+        with self.lock:
+            batch = []
+            for ieee in list(self.pending)[:size]:
+                batch.append((ieee, self.pending.pop(ieee)))
+            self.statistics["Backlog"] = len(self.pending)
+            if batch:
+                self.statistics["Batches"] += 1
+                self.statistics["Pushed"] += len(batch)
+            return batch
+
+    def pushed(self, ieee, timedout):
+        self.timedout[ieee] = timedout
+
+    def forget(self, ieee):
+        with self.lock:
+            self.pending.pop(ieee, None)
+            self.timedout.pop(ieee, None)
+            self.last_seen.pop(ieee, None)
+
+    def report(self, ListOfDevices):
+        """ Liveness of the whole mesh """
+
+        now = time.time()
+        devices = {}
+        summary = {"Live": 0, "TimedOut": 0, "Disabled": 0, "Unknown": 0}
+        for nwkid, device in list(ListOfDevices.items()):
+            ieee = device.get("IEEE")
+            if not ieee:
+                continue
+            health = device.get("Health", "")
+            if health in ("Live", "TimedOut", "Disabled"):
+                summary[health] += 1
+            else:
+                summary["Unknown"] += 1
+            last_seen = self.last_seen.get(ieee) or device.get("Stamp", {}).get("LastSeen", 0)
+            devices[nwkid] = {
+                "IEEE": ieee,
+                "Health": health,
+                "LastSeen": int(last_seen),
+                "Age": int(now - last_seen) if last_seen else None,
+                "DomoticzTimedOut": self.timedout.get(ieee),
+                "Pending": self.pending.get(ieee),
+            }
+        return {"Devices": devices, "Summary": summary, "Statistics": dict(self.statistics)}
@@ -21,11 +21,10 @@
 
 
 
-import json
-import os.path
-from pathlib import Path
 from time import time
 
+from Classes.NetworkEnergyReports import get_energy_report_store
+from Classes.TrafficScheduler import traffic_class
 from Modules.basicOutputs import maskChannel
 from Zigbee.zdpCommands import zdp_management_network_update_request
 
@@ -135,6 +134,7 @@ class NetworkEnergy:
                         self.logging("Log", "---> %s: %s" % (c, self.EnergyLevel[r][i]["Channels"][c]))
         self.logging("Log", "")
 
+    @traffic_class("bulk")
     def NwkScanReq(self, root, target, channels):
 
         # Scan Duration
@@ -298,31 +298,7 @@ class NetworkEnergy:
 
         self.logging("Debug", "Network Energly Level Report: %s" % storeEnergy)
 
-        _filename = Path( self.pluginconf.pluginConf["pluginReports"] ) / ("NetworkEnergy-v3-" + "%02d.json" % self.HardwareID)
-        if os.path.isdir( Path(self.pluginconf.pluginConf["pluginReports"]) ):
-
-            nbentries = 0
-            if os.path.isfile(_filename):
-                with open(_filename, "r") as fin:
-                    data = fin.read().splitlines(True)
-                    nbentries = len(data)
-
-            with open(_filename, "w") as fout:
-                # we need to short the list by todayNumReports - todayNumReports - 1
-                maxNumReports = self.pluginconf.pluginConf["numTopologyReports"]
-                start = 0
-                if nbentries >= maxNumReports:
-                    start = (nbentries - maxNumReports) + 1
-                self.logging("Debug", "Rpt max: %s , New Start: %s, Len:%s " % (maxNumReports, start, nbentries))
-
-                if nbentries != 0:
-                    fout.write("\n")
-                    fout.writelines(data[start:])
-                fout.write("\n")
-                json.dump(storeEnergy, fout)
-        else:
-            self.logging("Error", "Unable to get access to directory %s, please check PluginConf.txt" % (
-                self.pluginconf.pluginConf["pluginReports"]) )
+        get_energy_report_store(self.pluginconf, self.HardwareID, self.log).append(storeEnergy)
 
     def NwkScanResponse(self, MsgData):
 
@@ -425,6 +401,7 @@ class NetworkEnergy:
         self.EnergyLevel[root][entry]["Status"] = "Completed"
 
 
+    @traffic_class("bulk")
     def zigbee_zigpy_energy_scan(self):
         """ Energy Scan via zigpy Api"""
 
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#     Module: NetworkEnergyReports.py
+#
+#     Description: Indexed storage of the Network Energy scan reports
+#
+#     The reports are stored in NetworkEnergy-v3-xx.json, one JSON object per line { "<timestamp>": [ routers ] }.
+#     The file format is unchanged, but instead of re-parsing the whole file on each access, we maintain
+#     an in-memory index timestamp -> ( offset, length ) built once and updated on each append.
+#
+#     - Retreiving one report is a seek + read + json.loads of that single line.
+#     - Removing a report overwrite the line with blanks in place (tombstone), which is skipped by readers.
+#     - When tombstones represent a significant part of the file, a background compaction rewrite the file.
+#
+
+import json
+import os
+import os.path
+import re
+import threading
+from pathlib import Path
+
+ENERGY_REPORT_FILENAME = "NetworkEnergy-v3-%02d.json"
+COMPACTION_MIN_DEAD_BYTES = 64 * 1024  # Do not compact for less than that
+COMPACTION_DEAD_RATIO = 0.5  # Compact when dead bytes are more than half of the file
+
+TIMESTAMP_PREFIX = re.compile(rb'^\{\s*"([^"]+)"\s*:')
+
+# One store per file, shared between the WebServer, the native scanner and the zigpy scanner
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_energy_report_store(pluginconf, hardwareid, log=None):
+    """ Return the (unique) store associated to the NetworkEnergy report file of this plugin instance """
+
+    filename = Path(pluginconf.pluginConf["pluginReports"]) / (ENERGY_REPORT_FILENAME % int(hardwareid))
+    with _stores_lock:
+        store = _stores.get(str(filename))
+        if store is None:
+            store = _stores[str(filename)] = NetworkEnergyReports(filename, pluginconf, log)
+        elif store.log is None and log is not None:
+            store.log = log
+        return store
+
+
+class NetworkEnergyReports:
+    def __init__(self, filename, pluginconf, log=None):
+        self.filename = Path(filename)
+        self.pluginconf = pluginconf
+        self.log = log
+
+        self.index = None  # { timestamp: (offset, length) } in file order, None until built
+        self.dead_bytes = 0  # Bytes occupied by tombstones and empty lines
+        self.file_size = 0
+        self.compaction_thread = None
+        self.lock = threading.RLock()
+
+    def logging(self, logType, message):
+        if self.log:
+            self.log.logging("NetworkEnergy", logType, message)
+
+    # Index management
+
+    def _build_index(self):
+        """ Scan once the file and build the timestamp -> offset index. Must be called with the lock held """
+
+        self.index = {}
+        self.dead_bytes = 0
+        self.file_size = 0
+        if not os.path.isfile(self.filename):
+            return
+
+        offset = 0
+        with open(self.filename, "rb") as handle:
+            for line in handle:
+                length = len(line)
+                timestamp = _line_timestamp(line)
+                if timestamp is None:
+                    self.dead_bytes += length
+                else:
+                    if timestamp in self.index:
+                        # Duplicate, the latest wins
+                        self.dead_bytes += self.index[timestamp][1]
+                        del self.index[timestamp]
+                    self.index[timestamp] = (offset, length)
+                offset += length
+        self.file_size = offset
+        self.logging("Debug", "NetworkEnergyReports index built with %s reports (%s bytes, %s dead)" % (
+            len(self.index), self.file_size, self.dead_bytes))
+
+    def _ensure_index(self):
+        if self.index is None:
+            self._build_index()
+
+    # Public API
+
+    def timestamps(self):
+        """ Return the list of available reports timestamps """
+        with self.lock:
+            self._ensure_index()
+            return list(self.index)
+
+    def get(self, timestamp):
+        """ Return the report for timestamp, or None if not found """
+        with self.lock:
+            self._ensure_index()
+            entry = self.index.get(str(timestamp))
+            if entry is None:
+                return None
+            offset, length = entry
+            with open(self.filename, "rb") as handle:
+                handle.seek(offset)
+                line = handle.read(length)
+
+        try:
+            report = json.loads(line)
+        except ValueError as e:
+            self.logging("Error", "NetworkEnergyReports unable to decode report %s - %s" % (timestamp, e))
+            return None
+        return report.get(str(timestamp))
+
+    def append(self, report):
+        """ Append a new report { timestamp: [ routers ] } and enforce the numTopologyReports retention """
+
+        if not os.path.isdir(self.filename.parent):
+            self.logging("Error", "Unable to get access to directory %s, please check PluginConf.txt" % (self.filename.parent))
+            return False
+
+        with self.lock:
+            self._ensure_index()
+            for timestamp, value in report.items():
+                line = ("\n" + json.dumps({timestamp: value}) + "\n").encode("utf-8")
+                with open(self.filename, "ab") as handle:
+                    handle.seek(0, os.SEEK_END)
+                    offset = handle.tell() + 1  # the record starts after the leading new line
+                    handle.write(line)
+                self.dead_bytes += 1
+                if str(timestamp) in self.index:
+                    self._tombstone(str(timestamp))
+                self.index[str(timestamp)] = (offset, len(line) - 1)
+                self.file_size = offset + len(line) - 1
+
+            max_reports = self.pluginconf.pluginConf["numTopologyReports"]
+            while len(self.index) > max_reports:
+                self._tombstone(next(iter(self.index)))
+
+        self._compact_if_needed()
+        return True
+
+    def remove(self, timestamp):
+        """ Remove a report. Return True if found """
+
+        with self.lock:
+            self._ensure_index()
+            if str(timestamp) not in self.index:
+                return False
+            self._tombstone(str(timestamp))
+
+        self._compact_if_needed()
+        return True
+
+    def clear(self):
+        with self.lock:
+            if os.path.isfile(self.filename):
+                os.remove(self.filename)
+            self.index = {}
+            self.dead_bytes = self.file_size = 0
+
+    # Tombstones and compaction
+
+    def _tombstone(self, timestamp):
+        """ Blank the record in place, so it is ignored by any reader. Must be called with the lock held """
+
+        offset, length = self.index.pop(timestamp)
+        with open(self.filename, "r+b") as handle:
+            handle.seek(offset)
+            handle.write(b" " * (length - 1) + b"\n")
+        self.dead_bytes += length
+
+    def _compact_if_needed(self):
+        if self.dead_bytes < COMPACTION_MIN_DEAD_BYTES or self.dead_bytes < COMPACTION_DEAD_RATIO * self.file_size:
+            return
+        if self.compaction_thread and self.compaction_thread.is_alive():
+            return
+        self.compaction_thread = threading.Thread(name="EnergyReportsCompaction", target=self.compact, daemon=True)
+        self.compaction_thread.start()
+
+    def compact(self):
+        """ Rewrite the file with only the live records, and rebuild the index """
+
+        with self.lock:
+            self._ensure_index()
+            tmp_filename = self.filename.with_suffix(".tmp")
+            new_index = {}
+            offset = 0
+            with open(self.filename, "rb") as fin, open(tmp_filename, "wb") as fout:
+                for timestamp, (old_offset, length) in self.index.items():
+                    fin.seek(old_offset)
+                    record = fin.read(length)
+                    fout.write(b"\n")
+                    offset += 1
+                    fout.write(record)
+                    new_index[timestamp] = (offset, length)
+                    offset += length
+            os.replace(tmp_filename, self.filename)
+            self.logging("Debug", "NetworkEnergyReports compacted from %s to %s bytes" % (self.file_size, offset))
+            self.index = new_index
+            self.file_size = offset
+            self.dead_bytes = len(new_index)
+
+
+def _line_timestamp(line):
+    """ Return the timestamp of a record line, None for empty lines and tombstones """
+
+    if not line.startswith(b"{"):
+        return None
+    match = TIMESTAMP_PREFIX.match(line)
+    if match:
+        return match.group(1).decode("utf-8")
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    return next(iter(entry), None) if isinstance(entry, dict) and len(entry) == 1 else None
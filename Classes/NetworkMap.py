@@ -26,12 +26,16 @@
 
 import json
 import os.path
-from pathlib import Path
 import time
+from collections import deque
 from datetime import datetime
+from pathlib import Path
 
+from Classes.TrafficScheduler import traffic_class
+from Modules.deviceIdentity import invalidate_neighbours_index
 from Modules.zb_tables_management import (mgmt_rtg, start_new_table_scan,
                                           update_merge_new_device_to_last_entry)
+from Modules.zigateConsts import HEARTBEAT, MAX_LOAD_ZIGATE
 from Zigbee.zdpCommands import zdp_NWK_address_request, zdp_nwk_lqi_request
 
 
@@ -47,9 +51,11 @@ class NetworkMap:
         self.FirmwareVersion = None
 
         self._NetworkMapPhase = 0
-        self.LQIreqInProgress = []
-        self.LQIticks = 0
+        self.LQIreqInProgress = {}  # Mgmt_Lqi requests in flight { nwkid: time sent }
+        self.LQIreqPending = deque()  # Routers waiting for their next Mgmt_Lqi request
         self.Neighbours = {}  # Table of Neighbours
+        self.ScanStatistics = {}
+        self._progress = {"Current": 0, "Max": 0, "Unknown": 0, "Reported": None}
 
     def update_firmware(self, firmwareversion):
         self.FirmwareVersion = firmwareversion
@@ -61,14 +67,20 @@ class NetworkMap:
         return self._NetworkMapPhase
 
     def LQIresp(self, MsgData):
-        LQIresp_decoding(self, MsgData)
+        NwkIdSource = LQIresp_decoding(self, MsgData)
+        if self._NetworkMapPhase == 2:
+            _lqi_response_received(self, NwkIdSource)
 
     def start_scan(self):
         if len(self.Neighbours) != 0:
             self.logging("Debug", "start_scan - initialize data")
             del self.Neighbours
             self.Neighbours = {}
-            
+
+        self.LQIreqInProgress.clear()
+        self.LQIreqPending.clear()
+        self._progress = {"Current": 0, "Max": 0, "Unknown": 0, "Reported": None}
+        self.ScanStatistics = {"StartTime": time.time(), "Requests": 0, "Responses": 0, "TimedOut": 0}
         self.ListOfDevices["0000"]["TopologyStartTime"] = int(time.time())
         
         _initNeighbours(self)
@@ -76,84 +88,116 @@ class NetworkMap:
 
         prettyPrintNeighbours(self)
         self._NetworkMapPhase = 2
-        LQIreq(self)
+        _pump_lqi_requests(self)
 
     def continue_scan(self):
+        # Requests are sent on responses arrival, here we only take care of the timed out requests
+        # and of a pipeline which could have been stalled by the coordinator load.
 
-        self.logging("Debug", "len(self.LQIreqInProgress) - %s" % (len(self.LQIreqInProgress)))
+        self.logging("Debug", "continue_scan - in flight: %s pending: %s" % (len(self.LQIreqInProgress), len(self.LQIreqPending)))
+        now = time.time()
+        for nwkid, sent_time in list(self.LQIreqInProgress.items()):
+            if now - sent_time >= LQI_RESPONSE_TIMEOUT:
+                self.logging("Debug", "Command pending Timeout: %s" % nwkid)
+                self.ScanStatistics["TimedOut"] += 1
+                _lqi_request_failed(self, nwkid)
+
+        _pump_lqi_requests(self)
+
+
+LQI_RESPONSE_TIMEOUT = 2 * HEARTBEAT  # seconds before considering a Mgmt_Lqi request as lost
 
-        prettyPrintNeighbours(self)
-        if len(self.LQIreqInProgress) > 0 and self.LQIticks < 2:
-            self.logging("Debug", "continue_scan - Command pending")
-            self.LQIticks += 1
-            return
-
-        if len(self.LQIreqInProgress) > 0 and self.LQIticks >= 2:
-            entry = self.LQIreqInProgress.pop()
-            self.logging("Debug", "Commdand pending Timeout: %s" % entry)
-            if self.Neighbours[entry]["Status"] == "WaitResponse":
-                self.Neighbours[entry]["Status"] = "ScanRequired2"
-                self.logging("Debug", "LQI:continue_scan - Try one more for %s" % entry)
-            elif self.Neighbours[entry]["Status"] == "WaitResponse2":
-                self.Neighbours[entry]["Status"] = "TimedOut"
-                self.logging("Debug", "LQI:continue_scan - TimedOut for %s" % entry)
-
-            self.LQIticks = 0
-            self.logging("Debug", "continue_scan - %s" % (len(self.LQIreqInProgress)))
-
-        # We reach here because:
-        # self.LQIreqInProgress == 0
-        # self.LQIreqInProgress  0 and LQItick >= 2
-
-        waitResponse = False
-        progress = current_process = max_process = avg_size = 0
-        for entry in list(self.Neighbours):
-            if self.Neighbours[entry]["TableMaxSize"] > 0:
-                avg_size = (avg_size + self.Neighbours[entry]["TableMaxSize"]) / 2
-                current_process += self.Neighbours[entry]["TableCurSize"]
-                max_process += self.Neighbours[entry]["TableMaxSize"]
-            else:
-                # If Max size is 0 (not yet started), then we take the Average size of known table
-                max_process += avg_size
-            self.logging(
-                "Debug",
-                "== Entry: %s Current: %s Max: %s"
-                % (entry, self.Neighbours[entry]["TableCurSize"], self.Neighbours[entry]["TableMaxSize"]),
-            )
-        if max_process > 0:
-            progress = int((current_process / max_process) * 100)
-        self.logging("Status", "Network Topology progress: %s %%" % progress)
 
-        for entry in list(self.Neighbours):
-            if entry not in self.ListOfDevices:
-                self.logging("Debug", "LQIreq - device %s not found removing from the device to be scaned" % entry)
-                # Most likely this device as been removed, or change it Short Id
-                del self.Neighbours[entry]
-                continue
+def lqi_concurrency(self):
+    """ Number of Mgmt_Lqi requests which can be in flight at the same time """
 
-            if self.Neighbours[entry]["Status"] == "Completed":
-                continue
+    # Response can be matched to the request only if the source address is provided (zigpy, and ZiGate firmware 3.1a and above)
+    if (
+        self.zigbee_communication == "native" 
+        and ( self.FirmwareVersion is None or int(self.FirmwareVersion, 16) < 0x031A )
+    ):
+        return 1
+    return max(1, self.pluginconf.pluginConf["TopologyLQIConcurrency"])
 
-            if self.Neighbours[entry]["Status"] in ("TimedOut", "NotReachable"):
-                continue
 
-            if self.Neighbours[entry]["Status"] in ("WaitResponse", "WaitResponse2"):
-                if len(self.LQIreqInProgress) > 0:
-                    waitResponse = True
-                else:
-                    self.Neighbours[entry]["Status"] = "TimedOut"
-                continue
+def _schedule_lqi_request(self, nwkid):
+    if nwkid not in self.LQIreqPending and nwkid not in self.LQIreqInProgress:
+        self.LQIreqPending.append(nwkid)
 
-            elif self.Neighbours[entry]["Status"] in ("ScanRequired", "ScanRequired2"):
-                LQIreq(self, entry)
-                return
 
-        # We have been through all list of devices and not action triggered
-        if not waitResponse:
-            self.logging("Debug", "continue_scan - scan completed, all Neighbour tables received.")
-            
-            finish_scan(self)
-            self._NetworkMapPhase = 0
+def _pump_lqi_requests(self):
+    """ Fill the pipeline with Mgmt_Lqi requests, up to the concurrency and as long as the coordinator is not loaded """
+
+    concurrency = lqi_concurrency(self)
+    while (
+        self.LQIreqPending 
+        and len(self.LQIreqInProgress) < concurrency 
+        and self.ControllerLink.loadTransmit() < MAX_LOAD_ZIGATE
+    ):
+        LQIreq(self, self.LQIreqPending.popleft())
+
+    if self._NetworkMapPhase == 2 and not self.LQIreqPending and not self.LQIreqInProgress:
+        self.logging("Debug", "continue_scan - scan completed, all Neighbour tables received.")
+        finish_scan(self)
+        self._NetworkMapPhase = 0
+
+
+def _lqi_response_received(self, nwkid):
+    if nwkid is None or nwkid not in self.LQIreqInProgress:
+        return
+    del self.LQIreqInProgress[ nwkid ]
+    self.ScanStatistics["Responses"] += 1
+
+    if nwkid in self.Neighbours:
+        if self.Neighbours[nwkid]["Status"] in ("WaitResponse", "WaitResponse2"):
+            # Response received, but with an error status
+            _lqi_request_failed(self, nwkid)
+        elif self.Neighbours[nwkid]["Status"] in ("ScanRequired", "ScanRequired2"):
+            # Next page of the Neighbour table
+            _schedule_lqi_request(self, nwkid)
+        _report_progress(self)
+
+    _pump_lqi_requests(self)
+
+
+def _lqi_request_failed(self, nwkid):
+    self.LQIreqInProgress.pop(nwkid, None)
+    if nwkid not in self.Neighbours:
+        return
+    if self.Neighbours[nwkid]["Status"] == "WaitResponse":
+        self.Neighbours[nwkid]["Status"] = "ScanRequired2"
+        self.logging("Debug", "LQI:continue_scan - Try one more for %s" % nwkid)
+        _schedule_lqi_request(self, nwkid)
+    elif self.Neighbours[nwkid]["Status"] == "WaitResponse2":
+        self.Neighbours[nwkid]["Status"] = "TimedOut"
+        self.logging("Debug", "LQI:continue_scan - TimedOut for %s" % nwkid)
+
+
+def _update_progress(self, nwkid, cur_size=None, max_size=None):
+    """ Maintain the progress counters incrementally, when one Neighbour table is updated """
+
+    if max_size is not None:
+        if self.Neighbours[nwkid]["TableMaxSize"]:
+            self._progress["Max"] -= self.Neighbours[nwkid]["TableMaxSize"]
+        else:
+            self._progress["Unknown"] -= 1
+        self.Neighbours[nwkid]["TableMaxSize"] = max_size
+        self._progress["Max"] += max_size
+
+    if cur_size is not None:
+        self._progress["Current"] += cur_size - self.Neighbours[nwkid]["TableCurSize"]
+        self.Neighbours[nwkid]["TableCurSize"] = cur_size
+
+
+def _report_progress(self):
+    known = len(self.Neighbours) - self._progress["Unknown"]
+    # If Max size is not yet known, then we take the Average size of known table
+    avg_size = self._progress["Max"] / known if known else 0
+    max_process = self._progress["Max"] + avg_size * self._progress["Unknown"]
+    progress = int((self._progress["Current"] / max_process) * 100) if max_process > 0 else 0
+    if progress != self._progress["Reported"]:
+        self._progress["Reported"] = progress
+        self.logging("Status", "Network Topology progress: %s %%" % progress)
 
 
 def _initNeighbours(self):
@@ -170,8 +214,11 @@ def _initNeighboursTableEntry(self, nwkid):
         return
 
     start_new_table_scan(self, nwkid, "Neighbours")
+    invalidate_neighbours_index()
     self.logging("Debug", "_initNeighboursTableEntry - %s" % nwkid)
     self.Neighbours[nwkid] = {"Status": "ScanRequired", "TableMaxSize": 0, "TableCurSize": 0, "Neighbours": {}}
+    self._progress["Unknown"] += 1
+    _schedule_lqi_request(self, nwkid)
 
     # New router, let's trigger Routing Table and Associated Devices
     if self.pluginconf.pluginConf["TopologyV2"]:
@@ -260,10 +307,19 @@ def finish_scan(self):
 
             storeLQIforEndDevice( self, child, nwkid, int(self.Neighbours[nwkid]["Neighbours"][child]["_lnkqty"], 16) )
         update_merge_new_device_to_last_entry(self, nwkid, "Neighbours", element )
+        invalidate_neighbours_index()
 
     self.logging("Status", "--")
     prettyPrintNeighbours(self)
 
+    if self.ScanStatistics:
+        duration = time.time() - self.ScanStatistics["StartTime"]
+        self.ScanStatistics["Duration"] = round(duration, 1)
+        self.ScanStatistics["RequestsPerSecond"] = round(self.ScanStatistics["Requests"] / duration, 2) if duration else 0
+        self.logging("Status", "Network Topology scan of %s routers completed in %s s, %s requests ( %s req/s ) %s timed out, concurrency %s" % (
+            len(self.Neighbours), self.ScanStatistics["Duration"], self.ScanStatistics["Requests"], 
+            self.ScanStatistics["RequestsPerSecond"], self.ScanStatistics["TimedOut"], lqi_concurrency(self)))
+
     storeLQI = { int(self.ListOfDevices["0000"]["TopologyStartTime"]): dict(self.Neighbours) }
 
     if not self.pluginconf.pluginConf["TopologyV2"]:
@@ -328,6 +384,7 @@ def storeLQIforEndDevice(self, child, router, lqi):
     self.ListOfDevices[child]["MapLQI"][router] = lqi
 
 
+@traffic_class("bulk")
 def LQIreq(self, nwkid="0000"):
     """
     Send a Management LQI request
@@ -341,23 +398,33 @@ def LQIreq(self, nwkid="0000"):
     self.logging("Debug", "LQIreq - nwkid: %s" % nwkid)
 
     if nwkid not in self.Neighbours:
-        _initNeighboursTableEntry(self, nwkid)
-        
-    tobescanned = False
+        return
+
     if nwkid != "0000" and nwkid not in self.ListOfDevices:
+        self.logging("Debug", "LQIreq - device %s not found removing from the device to be scaned" % nwkid)
+        # Most likely this device as been removed, or change it Short Id
+        _remove_neighbour_entry(self, nwkid)
         return
 
     if not is_a_router(self, nwkid):
         self.logging("Debug", "Skiping %s as it's not a Router nor Coordinator, removing the entry" % nwkid)
-        if nwkid in self.Neighbours:
-            del self.Neighbours[nwkid]
+        _remove_neighbour_entry(self, nwkid)
+        return
+
+    if (
+        nwkid != "0000"
+        and "Health" in self.ListOfDevices[nwkid]
+        and self.ListOfDevices[nwkid]["Health"] in ( "Not Reachable", "Disabled", )
+    ):
+        self.logging("Debug", "LQIreq - skiping device %s which is Not Reachable or Disabled" % nwkid)
+        self.Neighbours[nwkid]["Status"] = "NotReachable"
         return
 
     # u8StartIndex is the Neighbour table index of the first entry to be included in the response to this request
     index = self.Neighbours[nwkid]["TableCurSize"]
 
-    self.LQIreqInProgress.append(nwkid)
-    datas = "%s%02X" % (nwkid, index)
+    self.LQIreqInProgress[ nwkid ] = time.time()
+    self.ScanStatistics["Requests"] += 1
 
     self.logging("Debug", "LQIreq - from: %s start at index: %s" % (nwkid, index))
     if self.Neighbours[nwkid]["Status"] == "ScanRequired":
@@ -366,19 +433,20 @@ def LQIreq(self, nwkid="0000"):
     elif self.Neighbours[nwkid]["Status"] == "ScanRequired2":
         self.Neighbours[nwkid]["Status"] = "WaitResponse2"
 
-    if (
-        nwkid != "0000"
-        and nwkid in self.ListOfDevices
-        and "Health" in self.ListOfDevices[nwkid]
-        and self.ListOfDevices[nwkid]["Health"] in ( "Not Reachable", "Disabled", )
-    ):
-        self.logging("Debug", "LQIreq - skiping device %s which is Not Reachable or Disabled" % nwkid)
-        self.Neighbours[nwkid]["Status"] = "NotReachable"
-        return
-
-    self.logging("Debug", "zdp_nwk_lqi_request %s" % datas)
+    self.logging("Debug", "zdp_nwk_lqi_request %s%02X" % (nwkid, index))
     zdp_nwk_lqi_request( self, nwkid, "%02x" %index)
-    #self.ControllerLink.sendData("004E", datas)
+
+
+def _remove_neighbour_entry(self, nwkid):
+    self.LQIreqInProgress.pop(nwkid, None)
+    if nwkid not in self.Neighbours:
+        return
+    if self.Neighbours[nwkid]["TableMaxSize"]:
+        self._progress["Max"] -= self.Neighbours[nwkid]["TableMaxSize"]
+    else:
+        self._progress["Unknown"] -= 1
+    self._progress["Current"] -= self.Neighbours[nwkid]["TableCurSize"]
+    del self.Neighbours[nwkid]
 
 
 def LQIresp_decoding(self, MsgData):
@@ -386,12 +454,13 @@ def LQIresp_decoding(self, MsgData):
     self.logging("Debug", "804E - %s" % (MsgData))
 
     NwkIdSource = None
-    if len(self.LQIreqInProgress) > 0:
-        NwkIdSource = self.LQIreqInProgress.pop()
+    if len(self.LQIreqInProgress) == 1:
+        # Only one request in flight, this is the one we are getting the response for
+        NwkIdSource = next(iter(self.LQIreqInProgress))
 
     if len(MsgData) < 10:
         self.logging("Error", "LQIresp_decoding - Incomplete message: %s (%s)" %(MsgData, len(MsgData)))
-        return
+        return None
 
     SQN = MsgData[:2]
     Status = MsgData[2:4]
@@ -408,12 +477,12 @@ def LQIresp_decoding(self, MsgData):
     self.logging("Debug", "LQIresp - MsgSrc: %s" % NwkIdSource)
 
     if NwkIdSource is None:
-        return
+        return None
 
     if Status != "00":
         self.logging("Debug", ("LQI:LQIresp - Status: %s for %s Sqn:%s (raw data: %s)" % (Status, MsgData[len(MsgData) - 4 :], SQN, MsgData)))
 
-        return
+        return NwkIdSource
 
     if len(ListOfEntries) // 42 != NeighbourTableListCount:
         self.logging(
@@ -431,28 +500,27 @@ def LQIresp_decoding(self, MsgData):
 
     if NwkIdSource not in self.Neighbours:
         # Un expected request. May be due to an async request
-        return
+        return NwkIdSource
 
     if not self.Neighbours[NwkIdSource]["TableMaxSize"] and NeighbourTableEntries:
-        self.Neighbours[NwkIdSource]["TableMaxSize"] = NeighbourTableEntries
+        _update_progress(self, NwkIdSource, max_size=NeighbourTableEntries)
         self.ListOfDevices[NwkIdSource]["NeighbourTableSize"] = self.Neighbours[NwkIdSource]["TableMaxSize"]
 
     if not NeighbourTableListCount and not NeighbourTableEntries:
         # No element in that list
         self.logging("Debug", "LQIresp -  No element in that list ")
         self.Neighbours[NwkIdSource]["Status"] = "Completed"
-        return
+        return NwkIdSource
 
     self.logging(
         "Debug",
         "mgtLQIresp - We have received %3s entries out of %3s" % (NeighbourTableListCount, NeighbourTableEntries),
     )
+    _update_progress(self, NwkIdSource, cur_size=StartIndex + NeighbourTableListCount)
     if (StartIndex + NeighbourTableListCount) == NeighbourTableEntries:
-        self.Neighbours[NwkIdSource]["TableCurSize"] = StartIndex + NeighbourTableListCount
         self.Neighbours[NwkIdSource]["Status"] = "Completed"
     else:
         self.Neighbours[NwkIdSource]["Status"] = "ScanRequired"
-        self.Neighbours[NwkIdSource]["TableCurSize"] = StartIndex + NeighbourTableListCount
 
     # Decoding the Table
     self.logging("Debug", "mgtLQIresp - ListOfEntries: %s" % len(ListOfEntries))
@@ -574,7 +642,7 @@ def LQIresp_decoding(self, MsgData):
                 "      - _relationshp: %s  versus %s"
                 % (_relationshp, self.Neighbours[NwkIdSource]["Neighbours"][_nwkid]["_relationshp"]),
             )
-            return
+            return NwkIdSource
 
         self.Neighbours[NwkIdSource]["Neighbours"][_nwkid] = {
             "_extPANID": _extPANID,
@@ -585,4 +653,6 @@ def LQIresp_decoding(self, MsgData):
             "_permitjnt": _permitjnt,
             "_relationshp": _relationshp,
             "_rxonwhenidl": _rxonwhenidl,
-        }
\ No newline at end of file
+        }
+
+    return NwkIdSource
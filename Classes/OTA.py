@@ -43,6 +43,7 @@ from os import listdir
 from os.path import exists, isfile, join
 from pathlib import Path
 
+from Classes.TrafficScheduler import traffic_class
 from Modules.sendZigateCommand import sendZigateCmd
 from Modules.tools import get_device_nickname
 from Modules.zigateConsts import ADDRESS_MODE, ZIGATE_EP
@@ -611,6 +612,7 @@ def update_list_in_update(self, offset, length):
     self.ListInUpdate["Sent"] = offset + length
 
 
+@traffic_class("bulk")
 def ota_send_block(self, dest_addr, dest_ep, image_type, msg_image_version, block_request, disable_ack=False):
 
     if image_type not in self.ListOfImages["ImageType"]:
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: PairingEngine.py
+#
+#    Description: Book keeping of the devices being paired
+#
+#    - Each interview request ( Active Endpoint, Simple Descriptor, Node Descriptor, Model ) sent to a device is a
+#      step, with the time it was sent and the number of attempts. Steps not answered on time are retried, and given up
+#      after a number of attempts.
+#    - Devices for which a response has been received are flagged ready, so the interview moves forward as soon as the
+#      frame has been processed, instead of waiting for the next heartbeat.
+#    - Provisioning ( widgets creation, binding, configure reporting, read attributes ) sends a burst of commands. Only
+#      a few devices are admitted at a time, and none while the transmit queue is loaded, so the radio is not flooded
+#      when many devices are paired together.
+#
+#    The actions themselves are done by Modules/pairingProcess.py
+#
+
+import threading
+import time
+
+
+class PairingEngine:
+    def __init__(self):
+        self.lock = threading.RLock()  # Serialize the interview of devices between the heartbeat and the inbound frames
+        self.steps = {}  # { nwkid: { ( step, ep ): [ sent time, attempts, given up ] } }
+        self.ready = set()  # nwkids with a response to move forward with
+        self.provisioning = {}  # { nwkid: admission time }
+        self.waiting = []  # nwkids waiting to be admitted to provisioning, in arrival order
+
+    def step_sent(self, nwkid, step, ep=None):
+        """ Record a request sent to a device, return the number of attempts """
+
+        state = self.steps.setdefault(nwkid, {}).setdefault((step, ep), [0, 0, False])
+        state[0] = time.time()
+        state[1] += 1
+        return state[1]
+
+    def step_in_progress(self, nwkid, step, ep=None):
+        """ True if a request has been sent, and is neither answered nor given up """
+
+        state = self.steps.get(nwkid, {}).get((step, ep))
+        return state is not None and not state[2]
+
+    def step_given_up(self, nwkid, step, ep=None):
+        state = self.steps.get(nwkid, {}).get((step, ep))
+        return state is not None and state[2]
+
+    def step_completed(self, nwkid, step, ep=None):
+        if nwkid in self.steps:
+            self.steps[nwkid].pop((step, ep), None)
+
+    def expired_steps(self, timeout):
+        """ Return the ( nwkid, step, ep, attempts ) of the requests not answered on time """
+
+        now = time.time()
+        return [
+            (nwkid, step, ep, state[1])
+            for nwkid, steps in list(self.steps.items())
+            for (step, ep), state in list(steps.items())
+            if not state[2] and now >= state[0] + timeout
+        ]
+
+    def give_up(self, nwkid, step, ep=None):
+        state = self.steps.get(nwkid, {}).get((step, ep))
+        if state:
+            state[2] = True
+
+    def notify(self, nwkid):
+        """ A response has been received from a device being paired """
+
+        self.ready.add(nwkid)
+
+    def pop_ready(self):
+        ready, self.ready = self.ready, set()
+        return ready
+
+    def admit(self, nwkid, max_concurrent, busy):
+        """ Admit a device to provisioning, if a slot is available and the radio is not busy """
+
+        if nwkid in self.provisioning:
+            return True
+        if nwkid not in self.waiting:
+            self.waiting.append(nwkid)
+        # First arrived, first admitted
+        if busy or self.waiting.index(nwkid) >= max_concurrent - len(self.provisioning):
+            return False
+        self.waiting.remove(nwkid)
+        self.provisioning[nwkid] = time.time()
+        return True
+
+    def is_waiting(self, nwkid):
+        return nwkid in self.waiting
+
+    def release_expired(self, duration, max_concurrent):
+        """ Release the provisioning slots held for more than duration ( the slot is normally released by forget(), this
+            is a safety net for devices lost during the provisioning ), return the devices which can now be admitted """
+
+        now = time.time()
+        for nwkid, admission in list(self.provisioning.items()):
+            if now >= admission + duration:
+                del self.provisioning[nwkid]
+        return self.waiting[:max(0, max_concurrent - len(self.provisioning))]
+
+    def forget(self, nwkid):
+        """ Pairing of a device is over ( success or failure ) """
+
+        self.steps.pop(nwkid, None)
+        self.ready.discard(nwkid)
+        self.provisioning.pop(nwkid, None)
+        if nwkid in self.waiting:
+            self.waiting.remove(nwkid)
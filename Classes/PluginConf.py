@@ -48,6 +48,8 @@ SETTINGS = {
             "zigatePartOfGroup0000": { "type": "bool", "default": 0, "current": None, "restart": 1, "hidden": False, "Advanced": True, "ZigpyRadio": "ezsp" },
             "TradfriKelvinStep": { "type": "int", "default": 51, "current": None, "restart": 0, "hidden": False, "Advanced": False, },
             "pingViaGroup": { "type": "hex", "default": 0, "current": None, "restart": 0, "hidden": False, "Advanced": False, },
+            "SceneBurstWindow": { "type": "int", "default": 150, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
+            "SceneBurstAdhocGroup": { "type": "int", "default": 5, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
         },
     },
     "Zigpy": {
@@ -62,6 +64,7 @@ SETTINGS = {
             "OverWriteCoordinatorIEEEOnlyOnce": {"type": "bool", "default": 0, "current": None, "restart": 1, "hidden": False, "Advanced": True, "ZigpyRadio": "ezsp"},
             "autoBackup": { "type": "bool", "default": 1, "current": None, "restart": 0, "hidden": False, "Advanced": False, },
             "autoRestore": {"type": "bool", "default": 1, "current": None, "restart": 0, "hidden": False, "Advanced": True,},
+            "autoBackupHistory": {"type": "int", "default": 30, "current": None, "restart": 0, "hidden": False, "Advanced": True,},
 
             "ZigpyTopologyReport": { "type": "bool", "default": 1, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
             "ZigpyTopologyReportAutoBackup": { "type": "bool", "default": 0, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
@@ -96,16 +99,26 @@ SETTINGS = {
             "LegrandCompatibilityMode": { "type": "bool", "default": 0, "current": None, "restart": 0, "hidden": False, "Advanced": False, },
             "enableSchneiderWiser": { "type": "bool", "default": 0, "current": None, "restart": 0, "hidden": False, "Advanced": False, },
             "ConfigureReportingChunk": { "type": "int", "default": 3, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
+            "ConfigureReportingPlanner": { "type": "bool", "default": 1, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
+            "ConfigureReportingPlannerRate": { "type": "int", "default": 2, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
             "AqaraOppleBulbMode": { "type": "bool", "default": 0, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
             "reenforcementWiser": { "type": "int", "default": 300, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
             "ReadAttributeChunk": { "type": "int", "default": 3, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
             "ZiGateConfigureReporting": {"type": "bool","default": 1,"current": None,"restart": 0,"hidden": False,"Advanced": True,"ZigpyRadio": ""},
+            "PairingConcurrency": { "type": "int", "default": 3, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
+            "PairingStepTimeout": { "type": "int", "default": 10, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
+            "PairingStepRetries": { "type": "int", "default": 3, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
+            "PairingProvisioningTimeout": { "type": "int", "default": 120, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
+            "IASEnrollmentConcurrency": { "type": "int", "default": 4, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
+            "IASEnrollmentTimeout": { "type": "int", "default": 10, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
+            "IASEnrollmentRetries": { "type": "int", "default": 3, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
         },
     },
     "WebInterface": {
         "Order": 7,
         "param": {
             "TopologyV2": { "type": "bool", "default": 1, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
+            "TopologyLQIConcurrency": { "type": "int", "default": 4, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
             "Sibling": { "type": "bool", "default": 1, "current": None, "restart": 0, "hidden": True, "Advanced": True, "ZigpyRadio": "" },
             "Lang": { "type": "str", "default": "en-US", "current": None, "restart": 0, "hidden": False, "Advanced": False, },
             "numTopologyReports": { "type": "int", "default": 4, "current": None, "restart": 0, "hidden": False, "Advanced": False, },
@@ -129,11 +142,15 @@ SETTINGS = {
             "resetConfigureReporting": { "type": "bool", "default": 0, "current": None, "restart": 1, "hidden": False, "Advanced": True, },
             "checkConfigurationReporting": { "type": "int", "default": 75600, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
             "resetReadAttributes": { "type": "bool", "default": 0, "current": None, "restart": 1, "hidden": False, "Advanced": True, },
+            "enableAdaptivePolling": { "type": "bool", "default": 1, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
             "resetMotiondelay": { "type": "int", "default": 30, "current": None, "restart": 0, "hidden": False, "Advanced": False, },
             "resetSwitchSelectorPushButton": { "type": "int", "default": 0, "current": None, "restart": 0, "hidden": False, "Advanced": False, },
             "forceSwitchSelectorPushButton": { "type": "bool", "default": 0, "current": None, "restart": 0, "hidden": False, "Advanced": False, },
             "doUnbindBind": { "type": "bool", "default": 0, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
             "allowReBindingClusters": { "type": "bool", "default": 1, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
+            "ZLinkyPublishCadence": { "type": "int", "default": 60, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
+            "ZLinkyPublishThreshold": { "type": "int", "default": 5, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
+            "livenessBatchSize": { "type": "int", "default": 50, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
         },
     },
     # Zigate Configuration
@@ -191,6 +208,7 @@ SETTINGS = {
             "RawReadAttribute": { "type": "bool", "default": 0, "current": None, "restart": 0, "hidden": True, "Advanced": True, },
             "RawWritAttribute": { "type": "bool", "default": 0, "current": None, "restart": 0, "hidden": True, "Advanced": True, },
             "writerTimeOut": { "type": "bool", "default": 1, "current": None, "restart": 0, "hidden": True, "Advanced": True, },
+            "LatencyHistograms": { "type": "bool", "default": 1, "current": None, "restart": 0, "hidden": False, "Advanced": True, },
         },
     },
     # Plugin Directories
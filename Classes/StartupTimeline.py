@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: StartupTimeline.py
+#
+#    Description: Record the steps of the plugin startup, and report where the boot time went
+#
+#    Each step is marked when completed. Its duration is the time elapsed since the previous step, so the
+#    report reads as a timeline starting at the import of plugin.py and ending when the coordinator is configured.
+#
+
+import time
+
+
+class StartupTimeline:
+    def __init__(self, start):
+        self.start = start  # time.perf_counter() when plugin.py started to be imported
+        self.steps = []  # [ ( step, duration, since start ) ]
+        self.last = start
+        self.completed = False
+        self.marked = set()
+
+    def mark(self, step):
+        """ Mark a step as completed ( only the first occurence of a step is recorded ) """
+
+        if self.completed or step in self.marked:
+            return
+        now = time.perf_counter()
+        self.steps.append((step, now - self.last, now - self.start))
+        self.marked.add(step)
+        self.last = now
+
+    def complete(self, step, log):
+        """ Mark the last step, and report the timeline """
+
+        if self.completed:
+            return
+        self.mark(step)
+        self.completed = True
+        log.logging("Plugin", "Status", "Z4D startup timeline ( %.2f sec )" % self.steps[-1][2])
+        for step, duration, since_start in self.steps:
+            log.logging("Plugin", "Status", "   %-35s: %8.3f sec  ( at %8.3f sec )" % (step, duration, since_start))
+
+    def report(self):
+        return {
+            "Completed": self.completed,
+            "Steps": [
+                {"Step": step, "Duration": round(duration, 3), "SinceStart": round(since_start, 3)}
+                for step, duration, since_start in self.steps
+            ],
+        }
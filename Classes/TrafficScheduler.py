@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: TrafficScheduler.py
+#
+#    Description: Traffic classes of the commands sent to the coordinator, and the writer queue scheduling them
+#
+#    - Each command belongs to a traffic class: alarm ( warning devices ), interactive ( Domoticz commands ),
+#      maintenance ( polling, configure reporting, binding, pairing ) and bulk ( OTA blocks, topology and energy scans ).
+#      The class is set at the call site with the traffic_class() scope ( context manager or decorator ), and is
+#      carried by the transports ( sendData ) down to the writer queue. Without scope, a highpriority command is
+#      interactive, and any other one is maintenance.
+#    - The writer queue has one lane per class, served by weighted round robin: over a round, a lane gets as many
+#      commands as its Weight ( its bandwidth share ). A command waiting for more than the SLO of its class is served
+#      first, so no lane is starved, even under a flood of higher classes. Promotions are limited to one command every
+#      PROMOTION_INTERVAL commands, so under overload ( all lanes late ) the weights still apply.
+#    - With slots enabled ( zigpy ), each class has a maximum number of requests in flight in the radio, so bulk and
+#      maintenance traffic never hold all the concurrency slots. The transport holds a slot during each radio attempt
+#      only: on_air() when the request is sent, done() as soon as this attempt ends. The delays, the wait for the
+#      device and the pauses between retries are out of the slot. A lane whose slots are all in use is skipped,
+#      its commands stay queued in order.
+#
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from queue import Empty
+
+from Classes.LatencyHistogram import LatencyHistogram
+
+# Traffic classes, from the most to the least urgent
+TRAFFIC_CLASSES = ("alarm", "interactive", "maintenance", "bulk")
+
+# Weight: commands served per round ( bandwidth share ). SLO: waiting time ( sec ) in the queue before promotion.
+# Slots: requests in flight in the radio ( zigpy )
+TRAFFIC_CLASS_SETTINGS = {
+    "alarm": {"Weight": 16, "SLO": 0.2, "Slots": 4},
+    "interactive": {"Weight": 8, "SLO": 0.5, "Slots": 4},
+    "maintenance": {"Weight": 3, "SLO": 10.0, "Slots": 2},
+    "bulk": {"Weight": 1, "SLO": 60.0, "Slots": 1},
+}
+
+# At most one command promoted ( served late, out of the round robin ) every PROMOTION_INTERVAL commands
+PROMOTION_INTERVAL = 4
+
+_SCOPE = threading.local()
+
+
+@contextmanager
+def traffic_class(name):
+    """ Commands sent within this scope belong to the traffic class name """
+
+    previous = getattr(_SCOPE, "name", None)
+    _SCOPE.name = name
+    try:
+        yield
+    finally:
+        _SCOPE.name = previous
+
+
+def current_traffic_class(highpriority=False):
+    name = getattr(_SCOPE, "name", None)
+    if name:
+        return name
+    return "interactive" if highpriority else "maintenance"
+
+
+class TrafficScheduler:
+    def __init__(self, with_slots=False, clock=time.time):
+        self.condition = threading.Condition()
+        self.clock = clock
+        self.with_slots = with_slots
+        self.control = deque()  # Transport control messages ( STOP ), always first
+        self.lanes = {name: deque() for name in TRAFFIC_CLASSES}  # deque of ( enqueued time, item )
+        self.credits = {name: 0 for name in TRAFFIC_CLASSES}
+        self.since_promotion = PROMOTION_INTERVAL
+        self.in_flight = {name: 0 for name in TRAFFIC_CLASSES}
+        self.statistics = {name: {"Queued": 0, "Sent": 0, "Promoted": 0, "SLOMissed": 0} for name in TRAFFIC_CLASSES}
+        self.waiting = {name: LatencyHistogram() for name in TRAFFIC_CLASSES}
+
+    def put(self, item, traffic_class=None):
+        """ Queue an item. Without traffic class, the item is a control message, served before anything else """
+
+        with self.condition:
+            if traffic_class is None:
+                self.control.append(item)
+            else:
+                if traffic_class not in self.lanes:
+                    traffic_class = "maintenance"
+                self.lanes[traffic_class].append((self.clock(), item))
+                self.statistics[traffic_class]["Queued"] += 1
+            self.condition.notify()
+
+    put_nowait = put
+
+    def get(self, block=True, timeout=None):
+        """ Return the next item to be sent, raise queue.Empty when nothing can be sent """
+
+        with self.condition:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                item = self._next()
+                if item is not None:
+                    return item[1]
+                if not block:
+                    raise Empty
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise Empty
+                self.condition.wait(remaining)
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def on_air(self, traffic_class):
+        """ A request of traffic_class is sent to the radio, it holds a slot until done() """
+
+        if not self.with_slots or traffic_class not in self.in_flight:
+            return
+        with self.condition:
+            self.in_flight[traffic_class] += 1
+
+    def done(self, traffic_class):
+        """ The radio attempt of a request of traffic_class has ended, its slot is released """
+
+        if not self.with_slots or traffic_class not in self.in_flight:
+            return
+        with self.condition:
+            self.in_flight[traffic_class] = max(0, self.in_flight[traffic_class] - 1)
+            self.condition.notify()
+
+    def qsize(self):
+        return len(self.control) + sum(len(lane) for lane in self.lanes.values())
+
+    def depth(self, traffic_class):
+        return len(self.lanes[traffic_class])
+
+    def items(self):
+        with self.condition:
+            return list(self.control) + [item for lane in self.lanes.values() for _, item in lane]
+
+    def _eligible(self, name):
+        if not self.lanes[name]:
+            return False
+        return not self.with_slots or self.in_flight[name] < TRAFFIC_CLASS_SETTINGS[name]["Slots"]
+
+    def _next(self):
+        """ ( traffic class, item ) to be sent next, None if none. Called with the condition held """
+
+        if self.control:
+            return None, self.control.popleft()
+
+        eligible = [name for name in TRAFFIC_CLASSES if self._eligible(name)]
+        if not eligible:
+            return None
+
+        # Commands waiting for more than their SLO first, the most overdue first
+        now = self.clock()
+        self.since_promotion += 1
+        overdue = max(eligible, key=lambda name: (now - self.lanes[name][0][0]) / TRAFFIC_CLASS_SETTINGS[name]["SLO"])
+        if self.since_promotion >= PROMOTION_INTERVAL and now - self.lanes[overdue][0][0] > TRAFFIC_CLASS_SETTINGS[overdue]["SLO"]:
+            self.since_promotion = 0
+            self.statistics[overdue]["Promoted"] += 1
+            return self._pop(overdue, now)
+
+        # Weighted round robin
+        for name in eligible:
+            if self.credits[name] > 0:
+                self.credits[name] -= 1
+                return self._pop(name, now)
+        for name in TRAFFIC_CLASSES:
+            self.credits[name] = TRAFFIC_CLASS_SETTINGS[name]["Weight"]
+        self.credits[eligible[0]] -= 1
+        return self._pop(eligible[0], now)
+
+    def _pop(self, name, now):
+        enqueued, item = self.lanes[name].popleft()
+        waited = now - enqueued
+        self.waiting[name].record(int(waited * 1000000))
+        self.statistics[name]["Sent"] += 1
+        if waited > TRAFFIC_CLASS_SETTINGS[name]["SLO"]:
+            self.statistics[name]["SLOMissed"] += 1
+        return name, item
+
+    def report(self):
+        report = {}
+        for name in TRAFFIC_CLASSES:
+            summary = self.waiting[name].summary()
+            report[name] = dict(self.statistics[name])
+            report[name].update({
+                "Depth": len(self.lanes[name]),
+                "InFlight": self.in_flight[name] if self.with_slots else None,
+                "Weight": TRAFFIC_CLASS_SETTINGS[name]["Weight"],
+                "SLO_ms": int(TRAFFIC_CLASS_SETTINGS[name]["SLO"] * 1000),
+                "Wait_us": {"mean": summary["mean_us"], "max": summary["max_us"], "quantiles": summary["quantiles_us"]},
+            })
+        return report
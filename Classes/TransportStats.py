@@ -8,6 +8,8 @@
 import json
 from time import time
 
+from Classes.LatencyHistogram import (PROMETHEUS_BOUNDS, QUANTILES, STAGES,
+                                      LatencyHistogram, bucket_range)
 from Modules.domoticzAbstractLayer import (domoticz_error_api,
                                            domoticz_log_api,
                                            domoticz_status_api)
@@ -45,6 +47,7 @@ class TransportStatistics:
         self._max_reading_zigpy_timing = self._cumul_reading_zigpy_timing = self._cnt_reading_zigpy_timing = self._average_reading_zigpy_timing = 0
         self._start = int(time())
         self.TrendStats = []
+        self.latency = {stage: LatencyHistogram() for stage in STAGES}
         self.pluginconf = pluginconf
         self.log = log
         self.zigbee_communication = zigbee_communication
@@ -127,6 +130,68 @@ class TransportStatistics:
                 % (self._maxRxProcesses, self._averageRxProcess)
             )
 
+    # Latency histograms
+    def latency_enabled(self):
+        return self.pluginconf.pluginConf["LatencyHistograms"]
+
+    def record_latency(self, stage, elapsed):
+        """ Record the time (in sec) spent in a pipeline stage """
+        if self.pluginconf.pluginConf["LatencyHistograms"]:
+            self.latency[stage].record(int(elapsed * 1000000))
+
+    def reset_latency(self):
+        for histogram in self.latency.values():
+            histogram.reset()
+
+    def latency_report(self):
+        return {stage: histogram.summary() for stage, histogram in self.latency.items()}
+
+    def prometheus_metrics(self):
+        """ Latency histograms and transport counters in the Prometheus text exposition format """
+
+        lines = [
+            "# HELP z4d_stage_latency_seconds Time spent in each stage of the plugin pipeline",
+            "# TYPE z4d_stage_latency_seconds histogram",
+        ]
+        quantiles = []
+        for stage, histogram in self.latency.items():
+            counts, count, total, maximum = histogram.snapshot()
+            cumulative = index = 0
+            for bound in PROMETHEUS_BOUNDS:
+                # A bucket is accounted once all its values are below the boundary
+                while index < len(counts) and bucket_range(index)[1] <= bound * 1000000:
+                    cumulative += counts[index]
+                    index += 1
+                lines.append('z4d_stage_latency_seconds_bucket{stage="%s",le="%s"} %s' % (stage, bound, cumulative))
+            lines.append('z4d_stage_latency_seconds_bucket{stage="%s",le="+Inf"} %s' % (stage, count))
+            lines.append('z4d_stage_latency_seconds_sum{stage="%s"} %s' % (stage, total / 1000000))
+            lines.append('z4d_stage_latency_seconds_count{stage="%s"} %s' % (stage, count))
+            for quantile in QUANTILES:
+                quantiles.append('z4d_stage_latency_quantile_seconds{stage="%s",quantile="%s"} %s' % (
+                    stage, quantile, histogram.value_at_quantile(counts, count, maximum, quantile) / 1000000))
+            quantiles.append('z4d_stage_latency_quantile_seconds{stage="%s",quantile="1"} %s' % (stage, maximum / 1000000))
+
+        lines.append("# HELP z4d_stage_latency_quantile_seconds Latency quantiles of each stage, with a 6% precision")
+        lines.append("# TYPE z4d_stage_latency_quantile_seconds gauge")
+        lines.extend(quantiles)
+
+        counters = (
+            ("z4d_frames_sent_total", "Commands sent to the coordinator", self._sent),
+            ("z4d_frames_received_total", "Frames received from the coordinator", self._received),
+            ("z4d_crc_errors_total", "Frames received with a crc error", self._crcErrors),
+            ("z4d_frame_errors_total", "Frames received with a frame error", self._frameErrors),
+            ("z4d_aps_failures_total", "Commands which failed at APS level", self._APSFailure),
+            ("z4d_retransmits_total", "Commands retransmitted", self._reTx),
+            ("z4d_status_timeouts_total", "Commands without status in time", self._TOstatus),
+            ("z4d_data_timeouts_total", "Commands without response in time", self._TOdata),
+        )
+        for name, description, value in counters:
+            lines.extend(("# HELP %s %s" % (name, description), "# TYPE %s counter" % name, "%s %s" % (name, value)))
+        lines.extend(("# HELP z4d_writer_queue_length Commands waiting in the writer queue", "# TYPE z4d_writer_queue_length gauge"))
+        lines.append("z4d_writer_queue_length %s" % self._Load)
+
+        return "\n".join(lines) + "\n"
+
     def addPointforTrendStats(self, TimeStamp):
 
         MAX_TREND_STAT_TABLE = 120
@@ -234,6 +299,13 @@ class TransportStatistics:
             domoticz_status_api("     Max              : %s ms" % (self._maxRxProcesses))
             domoticz_status_api("     Average          : %s ms" % (self._averageRxProcess))
 
+        if self.latency_enabled():
+            domoticz_status_api("  Pipeline latency (p50 / p99 / max)")
+            for stage, summary in self.latency_report().items():
+                if summary["count"]:
+                    domoticz_status_api("     %-17s: %s / %s / %s ms" % (
+                        stage, summary["quantiles_us"]["0.5"] / 1000, summary["quantiles_us"]["0.99"] / 1000, summary["max_us"] / 1000))
+
         t0 = self.starttime()
         t1 = int(time())
         _days = 0
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: VersionChecker.py
+#
+#    Description: Check the Internet access and the latest plugin and firmware versions, out of the plugin thread
+#
+#    - A background thread probes the Internet access and resolves the DNS TXT records of the latest versions
+#      ( Modules/checkingUpdate.py ). The plugin only reads the cached answers, it never waits on the network.
+#    - After a successful check, the next one is done REFRESH_PERIOD later. After a failure ( no Internet, DNS timeout ),
+#      the check is retried with an exponential backoff, from BACKOFF_MIN up to BACKOFF_MAX.
+#    - The last known answer is saved in VersionCheck-xx.json ( pluginData ), so it is available at startup, even
+#      with a broken uplink. If it is recent, no check is done at startup.
+#
+
+import json
+import threading
+import time
+from pathlib import Path
+
+from Modules.checkingUpdate import (PLUGIN_TXT_RECORD, ZIGATE_DNS_RECORDS,
+                                    available_versions, is_internet_available,
+                                    resolve_dns_txt_record)
+
+VERSION_CHECK_FILENAME = "VersionCheck-%02d.json"
+REFRESH_PERIOD = 12 * 3600
+BACKOFF_MIN = 60
+BACKOFF_MAX = 6 * 3600
+
+
+class VersionChecker:
+    def __init__(self, pluginconf, HardwareID, log=None, check_versions=True, resolver=resolve_dns_txt_record, probe=is_internet_available,
+                 refresh_period=REFRESH_PERIOD, backoff_min=BACKOFF_MIN, backoff_max=BACKOFF_MAX):
+        self.pluginconf = pluginconf
+        self.HardwareID = HardwareID
+        self.log = log
+        self.resolver = resolver
+        self.probe = probe
+        self.refresh_period = refresh_period
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.probed = threading.Event()  # Set once the Internet access is known
+        self.thread = None
+        self.running = False
+
+        self.internet = None  # Last known Internet access
+        self.records = {}  # { DNS TXT record: value }, last known answers
+        self.timestamp = 0  # Time of the last successful check
+        self.check_versions = check_versions  # If False, only the Internet access is checked
+        self.records_wanted = {PLUGIN_TXT_RECORD} if check_versions else set()
+        self.generation = 0  # Incremented each time new answers are available
+        self.generation_served = 0
+        self.failures = 0
+        self.next_check = 0
+        self.statistics = {"Checks": 0, "Failures": 0, "Polls": 0}
+        self._load()
+
+    def logging(self, logType, message):
+        if self.log:
+            self.log.logging("Plugin", logType, message)
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.running = True
+        self.thread = threading.Thread(name="VersionChecker", target=self._worker, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        self.running = False
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def internet_available(self, wait=0):
+        """ Last known Internet access, None if unknown. Wait up to wait seconds when unknown ( first start ) """
+
+        if self.internet is None and wait:
+            self.probed.wait(wait)
+        return self.internet
+
+    def poll(self, zigbee_communication, branch, zigate_model):
+        """ ( plugin version, firmware major, firmware minor ) if new answers are available since the last poll, else None.
+            ( 0, 0, 0 ) when the versions are not available. Never waits. """
+
+        self.statistics["Polls"] += 1
+        firmware_record = ZIGATE_DNS_RECORDS.get(zigate_model) if zigbee_communication == "native" else None
+        with self.lock:
+            if self.check_versions and firmware_record and firmware_record not in self.records_wanted:
+                # Firmware record needed, check as soon as possible
+                self.records_wanted.add(firmware_record)
+                self.next_check = 0
+                self.wakeup.set()
+            if self.generation == self.generation_served:
+                return None
+            if self.check_versions and firmware_record and firmware_record not in self.records:
+                # Not answered yet, wait for it rather than reporting a partial answer
+                return None
+            self.generation_served = self.generation
+            plugin_record = self.records.get(PLUGIN_TXT_RECORD)
+            firmware_value = self.records.get(firmware_record)
+
+        if plugin_record is None:
+            self.logging("Error", "Unable to get access to plugin expected version. Is Internet access available ?")
+            return (0, 0, 0)
+        versions = available_versions(plugin_record, firmware_value, zigbee_communication, branch)
+        if versions is None:
+            self.logging("Error", f"You are running {branch}-{plugin_record}, a NOT SUPPORTED version. ")
+            return (0, 0, 0)
+        return versions
+
+    def _worker(self):
+        while self.running:
+            delay = self.next_check - time.time()
+            if delay > 0:
+                self.wakeup.wait(delay)
+                self.wakeup.clear()
+                continue
+            self._check()
+
+    def _check(self):
+        self.statistics["Checks"] += 1
+        internet = bool(self.probe())
+        records = {}
+        if internet:
+            for record in list(self.records_wanted):
+                try:
+                    records[record] = self.resolver(record)
+                except Exception as e:
+                    self.logging("Debug", f"VersionChecker - Unable to resolve DNS TXT record {record}: {e}")
+
+        with self.lock:
+            self.internet = internet
+            success = internet and len(records) == len(self.records_wanted)
+            if success:
+                self.records.update(records)
+                self.timestamp = time.time()
+                self.generation += 1
+                self.failures = 0
+                self.next_check = time.time() + self.refresh_period
+            else:
+                self.failures += 1
+                self.statistics["Failures"] += 1
+                self.next_check = time.time() + min(self.backoff_max, self.backoff_min * 2 ** (self.failures - 1))
+        self.probed.set()
+
+        if success:
+            self._save()
+        elif self.failures == 1:
+            self.logging("Log", "Unable to check the latest plugin version ( Internet access: %s ), retry in %s s" % (
+                internet, int(self.next_check - time.time())))
+        else:
+            self.logging("Debug", "VersionChecker - check failed %s times, retry in %s s" % (self.failures, int(self.next_check - time.time())))
+
+    def _filename(self):
+        if self.HardwareID is None or self.pluginconf.pluginConf.get("pluginData") is None:
+            return None
+        return Path(self.pluginconf.pluginConf["pluginData"]) / (VERSION_CHECK_FILENAME % int(self.HardwareID))
+
+    def _load(self):
+        filename = self._filename()
+        if filename is None or not filename.is_file():
+            return
+        try:
+            with open(filename, "rt") as handle:
+                answer = json.load(handle)
+        except (OSError, ValueError):
+            return
+        self.internet = answer.get("Internet")
+        self.records = answer.get("Records", {})
+        if self.check_versions:
+            self.records_wanted.update(self.records)
+        self.timestamp = answer.get("TimeStamp", 0)
+        if self.records:
+            self.generation += 1
+        if self.internet is not None:
+            self.probed.set()
+        # A recent answer is not checked again at startup
+        self.next_check = self.timestamp + self.refresh_period if self.internet else 0
+
+    def _save(self):
+        filename = self._filename()
+        if filename is None:
+            return
+        with self.lock:
+            answer = {"TimeStamp": self.timestamp, "Internet": self.internet, "Records": dict(self.records)}
+        try:
+            with open(filename, "wt") as handle:
+                json.dump(answer, handle, sort_keys=True, indent=2)
+        except OSError as e:
+            self.logging("Error", f"VersionChecker - Unable to save {filename} - {e}")
+
+    def report(self):
+        with self.lock:
+            return {
+                "Internet": self.internet,
+                "Records": dict(self.records),
+                "LastCheck": int(self.timestamp),
+                "NextCheck": int(self.next_check),
+                "Failures": self.failures,
+                "Statistics": dict(self.statistics),
+            }
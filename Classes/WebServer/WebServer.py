@@ -6,10 +6,9 @@
 
 import json
 import mimetypes
-import os
-import os.path
 import time
 
+from Classes.NetworkEnergyReports import get_energy_report_store
 from Classes.PluginConf import SETTINGS
 from Classes.WebServer.headerResponse import (prepResponseMessage,
                                               setupHeadersResponse)
@@ -17,6 +16,9 @@ from Modules.actuators import actuators
 from Modules.basicOutputs import (PermitToJoin, ZigatePermitToJoin,
                                   initiate_change_channel, setExtendedPANID,
                                   zigateBlueLed)
+from Modules.deviceChanges import mark_device_changed
+from Modules.deviceIdentity import address_changes
+from Modules.deviceRecords import memory_report
 from Modules.domoticzAbstractLayer import (domo_read_BatteryLevel,
                                            domo_read_nValue_sValue,
                                            domo_read_SignalLevel,
@@ -24,12 +26,12 @@ from Modules.domoticzAbstractLayer import (domo_read_BatteryLevel,
                                            domoticz_error_api,
                                            domoticz_log_api,
                                            domoticz_status_api)
+from Modules.sceneBurst import scene_burst_report
 from Modules.sendZigateCommand import sendZigateCmd
 from Modules.tools import is_hex, get_device_nickname
 from Modules.txPower import set_TxPower
 from Modules.zigateCommands import zigate_set_mode
-from Modules.zigateConsts import (CERTIFICATION_CODE, ZCL_CLUSTERS_LIST,
-                                  ZIGATE_COMMANDS)
+from Modules.zigateConsts import CERTIFICATION_CODE, ZIGATE_COMMANDS
 
 MIMETYPES = {
     "gif": "image/gif",
@@ -79,6 +81,8 @@ class WebServer(object):
     from Classes.WebServer.rest_change_ModelName import rest_change_model_name
     from Classes.WebServer.rest_Device_Settings_Help import \
         rest_device_settings_help
+    from Classes.WebServer.rest_DeviceSummary import (rest_zDevice_delta,
+                                                      rest_zDevice_list)
     from Classes.WebServer.rest_Energy import (rest_req_nwk_full,
                                                rest_req_nwk_inter)
     from Classes.WebServer.rest_Groups import (rest_rescan_group,
@@ -164,6 +168,10 @@ class WebServer(object):
         self.networkmap = None
         self.networkenergy = None
         self.configureReporting = None
+        self.adaptivePolling = None
+        self.startupTimeline = None
+        self.livenessTracker = None
+        self.iaszonemgt = None
         self.transport = transport
 
         self.permitTojoin = permitTojoin
@@ -177,6 +185,8 @@ class WebServer(object):
         self.DeviceConf = DeviceConf
         self.Devices = Devices
         self.ListOfDomoticzWidget = ListOfDomoticzWidget
+        self.device_summary_cache = None
+        self.request_headers = {}  # Headers of the REST request being processed
         self.readZclClusters = readZclClusters
         self.ControllerIEEE = None
 
@@ -218,6 +228,18 @@ class WebServer(object):
 
     def update_configureReporting(self,configureReporting ):
         self.configureReporting = configureReporting
+
+    def update_adaptivePolling(self, adaptivePolling):
+        self.adaptivePolling = adaptivePolling
+
+    def update_startupTimeline(self, startupTimeline):
+        self.startupTimeline = startupTimeline
+
+    def update_livenessTracker(self, livenessTracker):
+        self.livenessTracker = livenessTracker
+
+    def update_iaszonemgt(self, iaszonemgt):
+        self.iaszonemgt = iaszonemgt
         
     def add_element_to_devices_in_pairing_mode( self, nwkid):
         if nwkid not in self.DevicesInPairingMode:
@@ -241,6 +263,92 @@ class WebServer(object):
         return _response
 
 
+    def rest_adaptive_polling(self, verb, data, parameters):
+        _response = prepResponseMessage(self, setupHeadersResponse())
+        _response["Headers"]["Content-Type"] = "application/json; charset=utf-8"
+        if verb == "GET":
+            _response["Data"] = json.dumps(self.adaptivePolling.airtime_projection() if self.adaptivePolling else {}, sort_keys=True)
+        return _response
+
+
+    def rest_device_memory(self, verb, data, parameters):
+        # Memory used by each record of ListOfDevices
+        _response = prepResponseMessage(self, setupHeadersResponse())
+        _response["Headers"]["Content-Type"] = "application/json; charset=utf-8"
+        if verb == "GET":
+            _response["Data"] = json.dumps(memory_report(self), sort_keys=True)
+        return _response
+
+
+    def rest_address_changes(self, verb, data, parameters):
+        # Audit log of the Short Address changes
+        _response = prepResponseMessage(self, setupHeadersResponse())
+        _response["Headers"]["Content-Type"] = "application/json; charset=utf-8"
+        if verb == "GET":
+            _response["Data"] = json.dumps(address_changes(), sort_keys=True)
+        return _response
+
+
+    def rest_ias_zones(self, verb, data, parameters):
+        # Enrollment state of the IAS zones
+        _response = prepResponseMessage(self, setupHeadersResponse())
+        _response["Headers"]["Content-Type"] = "application/json; charset=utf-8"
+        if verb == "GET":
+            _response["Data"] = json.dumps(self.iaszonemgt.report() if self.iaszonemgt else {}, sort_keys=True)
+        return _response
+
+
+    def rest_liveness(self, verb, data, parameters):
+        # Last seen and TimedOut state of all devices
+        _response = prepResponseMessage(self, setupHeadersResponse())
+        _response["Headers"]["Content-Type"] = "application/json; charset=utf-8"
+        if verb == "GET":
+            _response["Data"] = json.dumps(self.livenessTracker.report(self.ListOfDevices) if self.livenessTracker else {}, sort_keys=True)
+        return _response
+
+
+    def rest_scene_bursts(self, verb, data, parameters):
+        # Frames saved by the group fan-out of the scenes
+        _response = prepResponseMessage(self, setupHeadersResponse())
+        _response["Headers"]["Content-Type"] = "application/json; charset=utf-8"
+        if verb == "GET":
+            _response["Data"] = json.dumps(scene_burst_report(), sort_keys=True)
+        return _response
+
+
+    def rest_startup_timeline(self, verb, data, parameters):
+        _response = prepResponseMessage(self, setupHeadersResponse())
+        _response["Headers"]["Content-Type"] = "application/json; charset=utf-8"
+        if verb == "GET":
+            _response["Data"] = json.dumps(self.startupTimeline.report() if self.startupTimeline else {}, sort_keys=True)
+        return _response
+
+
+    def rest_traffic_classes(self, verb, data, parameters):
+        # Writer queue lanes: depth, in flight, SLO misses and waiting time per traffic class
+        _response = prepResponseMessage(self, setupHeadersResponse())
+        _response["Headers"]["Content-Type"] = "application/json; charset=utf-8"
+        if verb == "GET":
+            _response["Data"] = json.dumps(self.ControllerLink.get_traffic_classes() if self.ControllerLink else {}, sort_keys=True)
+        return _response
+
+
+    def rest_metrics(self, verb, data, parameters):
+        # Latency histograms of the pipeline stages. Prometheus text exposition format, or json with /metrics/json
+        _response = prepResponseMessage(self, setupHeadersResponse())
+        if verb == "DELETE":
+            self.statistics.reset_latency()
+            _response["Data"] = json.dumps({"status": "Ok"}, sort_keys=True)
+
+        elif verb == "GET" and len(parameters) == 1 and parameters[0] == "json":
+            _response["Data"] = json.dumps(self.statistics.latency_report(), sort_keys=True)
+
+        elif verb == "GET":
+            _response["Headers"]["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+            _response["Data"] = self.statistics.prometheus_metrics()
+        return _response
+
+
     def rest_plugin_health(self, verb, data, parameters):
 
         _response = prepResponseMessage(self, setupHeadersResponse())
@@ -376,53 +484,18 @@ class WebServer(object):
         self.logging("Debug", "rest_nwk_stat(self, %s, %s, %s)" % (verb, data, parameters))
         _response = prepResponseMessage(self, setupHeadersResponse())
         _response["Headers"]["Content-Type"] = "application/json; charset=utf-8"
-        _filename = self.pluginconf.pluginConf["pluginReports"] + "/NetworkEnergy-v3-" + "%02d" % self.hardwareID + ".json"
-
-        self.logging("Debug", "filename %s" % (_filename))
-        _timestamps_lst = []  # Just the list of Timestamps
-        _scan = {}
-        if os.path.isfile(_filename):
-            self.logging("Debug", "Opening file: %s" % _filename)
-            with open(_filename, "rt") as handle:
-                for line in handle:
-                    if line[0] != "{" and line[-1] != "}":
-                        continue
-
-                    entry = json.loads(line)
-                    for _ts in entry:
-                        _timestamps_lst.append(_ts)
-                        _scan[_ts] = entry[_ts]
+        energy_reports = get_energy_report_store(self.pluginconf, self.hardwareID, self.log)
 
         if verb == "DELETE":
             if len(parameters) == 0:
                 # os.remove( _filename )
-                action = {"Name": "File-Removed", "FileName": _filename}
+                action = {"Name": "File-Removed", "FileName": str(energy_reports.filename)}
                 _response["Data"] = json.dumps(action, sort_keys=True)
 
             elif len(parameters) == 1:
                 timestamp = parameters[0]
-                if timestamp in _timestamps_lst:
-                    self.logging("Debug", "Removing Report: %s from %s records" % (timestamp, len(_timestamps_lst)))
-                    with open(_filename, "r+") as handle:
-                        d = handle.readlines()
-                        handle.seek(0)
-                        for line in d:
-                            if not (line[0] == "{" or line[-1] == "}"):
-                                handle.write(line)
-                                continue
-
-                            entry = json.loads(line)
-                            entry_ts = entry.keys()
-                            if len(entry_ts) == 1:
-                                if timestamp in entry_ts:
-                                    self.logging("Debug", "--------> Skiping %s" % timestamp)
-                                    continue
-
-                            else:
-                                continue
-                            handle.write(line)
-                        handle.truncate()
-
+                if energy_reports.remove(timestamp):
+                    self.logging("Debug", "Removed Report: %s" % timestamp)
                     action = {"Name": "Report %s removed" % timestamp}
                     _response["Data"] = json.dumps(action, sort_keys=True)
                 else:
@@ -431,17 +504,15 @@ class WebServer(object):
 
         elif verb == "GET":
             if len(parameters) == 0:
-                _response["Data"] = json.dumps(_timestamps_lst, sort_keys=True)
+                _response["Data"] = json.dumps(energy_reports.timestamps(), sort_keys=True)
 
             elif len(parameters) == 1:
                 timestamp = parameters[0]
-                if timestamp in _scan:
-                    for r in _scan[timestamp]:
-                        self.logging("Log", "report: %s" % r)
-                        if r["_NwkId"] == "0000":
-                            _response["Data"] = json.dumps(r["MeshRouters"], sort_keys=True)
-                else:
-                    _response["Data"] = json.dumps([], sort_keys=True)
+                _response["Data"] = json.dumps([], sort_keys=True)
+                for r in energy_reports.get(timestamp) or []:
+                    self.logging("Debug", "report: %s" % r)
+                    if r["_NwkId"] == "0000":
+                        _response["Data"] = json.dumps(r["MeshRouters"], sort_keys=True)
 
         return _response
 
@@ -850,8 +921,11 @@ class WebServer(object):
                     nwkid = self.IEEE2NWK[ieee]
                 if nwkid:
                     del self.ListOfDevices[nwkid]
+                    mark_device_changed(nwkid)
                 if ieee:
                     del self.IEEE2NWK[ieee]
+                    if self.livenessTracker:
+                        self.livenessTracker.forget(ieee)
 
                 # for a remove in case device didn't send the leave
                 if "IEEE" in self.ControllerData and ieee:
@@ -963,6 +1037,7 @@ class WebServer(object):
                         
                         if self.ListOfDevices[dev]["ZDeviceName"] != x["ZDeviceName"]:
                             self.ListOfDevices[dev]["ZDeviceName"] = x["ZDeviceName"]
+                            mark_device_changed(dev)
                             self.logging( "Debug", "Updating ZDeviceName to %s for IEEE: %s NWKID: %s" % (
                                 self.ListOfDevices[dev]["ZDeviceName"], self.ListOfDevices[dev]["IEEE"], dev), )
                         
@@ -984,6 +1059,7 @@ class WebServer(object):
                         self.logging( "Debug", "Updating Param to %s for IEEE: %s NWKID: %s" % (
                             self.ListOfDevices[dev]["Param"], self.ListOfDevices[dev]["IEEE"], dev), )
                         self.ListOfDevices[dev]["CheckParam"] = True
+                        mark_device_changed(dev)
                 else:
                     domoticz_error_api("wrong data received: %s" % data)
 
@@ -1026,137 +1102,7 @@ class WebServer(object):
             if self.ListOfDevices is None or len(self.ListOfDevices) == 0:
                 return _response
             if len(parameters) == 0:
-                zdev_lst = []
-                for item in self.ListOfDevices:
-                    #if item == "0000":
-                    #    continue
-                    device = {"_NwkId": item}
-                    # Main Attributes
-                    for attribut in (
-                        "ZDeviceName",
-                        "ConsistencyCheck",
-                        "Stamp",
-                        "Health",
-                        "Status",
-                        "Battery",
-                        "LQI",
-                        "RSSI",
-                        "Model",
-                        "IEEE",
-                        "ProfileID",
-                        "ZDeviceID",
-                        "Manufacturer",
-                        "DeviceType",
-                        "LogicalType",
-                        "PowerSource",
-                        "ReceiveOnIdle",
-                        "App Version",
-                        "Stack Version",
-                        "HW Version",
-                        "Param",
-                        "CheckParam"
-                    ):
-                        if attribut == "Battery" and attribut in self.ListOfDevices[item]:
-                            if self.ListOfDevices[item]["Battery"] in ( {}, ) and "IASBattery" in self.ListOfDevices[item]:
-                                device[attribut] = str(self.ListOfDevices[item][ "IASBattery" ])
-                            elif isinstance( self.ListOfDevices[item]["Battery"], int):
-                                device[attribut] = self.ListOfDevices[item]["Battery"]
-                                device["BatteryInside"] = True
-                                
-                        elif item == "CheckParam":
-                            device[attribut] = True if "CheckParam" in self.ListOfDevices[item] and self.ListOfDevices[item]["CheckParam"] else False
-        
-                        elif item == "Param":
-                            device[attribut] = str(self.ListOfDevices[item][attribut])
-
-                        elif attribut in self.ListOfDevices[item]:
-                            if self.ListOfDevices[item][attribut] == {}:
-                                device[attribut] = ""
-
-                            elif attribut == "ConsistencyCheck" and "Status" in self.ListOfDevices[item] and self.ListOfDevices[item]["Status"] == "notDB":
-                                self.ListOfDevices[item][attribut] = "not in DZ"
-
-                            elif self.ListOfDevices[item][attribut] == "" and "MacCapa" in self.ListOfDevices[item] and self.ListOfDevices[item]["MacCapa"] == "8e":
-                                if attribut == "DeviceType":
-                                    device[attribut] = "FFD"
-                                elif attribut == "LogicalType":
-                                    device[attribut] = "Router"
-                                elif attribut == "PowerSource":
-                                    device[attribut] = "Main"
-
-                            elif attribut == "LogicalType" and attribut in self.ListOfDevices[item] and self.ListOfDevices[item][attribut] not in (
-                                "Router",
-                                "Coordinator",
-                                "End Device",
-                            ):
-                                if self.ListOfDevices[item]["MacCapa"] == "8e":
-                                    device[attribut] = "Router"
-                                elif self.ListOfDevices[item]["MacCapa"] == "80":
-                                    device[attribut] = "End Device"
-
-                            else:
-                                device[attribut] = self.ListOfDevices[item][attribut]
-                        else:
-                            device[attribut] = ""
-
-                    # Last Seen Information
-                    device["LastSeen"] = ""
-                    if "Stamp" in self.ListOfDevices[item] and "LastSeen" in self.ListOfDevices[item]["Stamp"]:
-                        device["LastSeen"] = self.ListOfDevices[item]["Stamp"]["LastSeen"]
-
-                    # ClusterType
-                    _widget_lst = []
-                    if "ClusterType" in self.ListOfDevices[item]:
-                        for widget_idx in self.ListOfDevices[item]["ClusterType"]:
-                            widget = {"_WidgetID": widget_idx, "WidgetName": ""}
-                            if int(widget_idx) in self.ListOfDomoticzWidget:
-                                widget["WidgetName"] = self.ListOfDomoticzWidget[int(widget_idx)]["Name"]
-                            widget["WidgetType"] = self.ListOfDevices[item]["ClusterType"][widget_idx]
-                            _widget_lst.append(widget)
-
-                    # Ep informations
-                    ep_lst = []
-                    if "Ep" in self.ListOfDevices[item]:
-                        for epId in self.ListOfDevices[item]["Ep"]:
-                            _ep = {"Ep": epId, "ClusterList": []}
-                            for cluster in self.ListOfDevices[item]["Ep"][epId]:
-                                if cluster == "ColorMode":
-                                    continue
-
-                                if cluster == "ClusterType":
-                                    for widget_idx in self.ListOfDevices[item]["Ep"][epId]["ClusterType"]:
-                                        widget = {"_WidgetID": widget_idx, "WidgetName": ""}
-                                        if int(widget_idx) in self.ListOfDomoticzWidget:
-                                            widget["WidgetName"] = self.ListOfDomoticzWidget[int(widget_idx)]["Name"]
-                                        widget["WidgetType"] = self.ListOfDevices[item]["Ep"][epId]["ClusterType"][widget_idx]
-                                        _widget_lst.append(widget)
-                                    continue
-
-                                elif cluster == "Type":
-                                    device["Type"] = self.ListOfDevices[item]["Ep"][epId]["Type"]
-                                    continue
-
-                                _cluster = {cluster: ZCL_CLUSTERS_LIST[cluster] if cluster in ZCL_CLUSTERS_LIST else "Unknown"}
-
-                                _ep["ClusterList"].append(_cluster)
-
-                            ep_lst.append(_ep)
-                    device["Ep"] = ep_lst
-                    device["WidgetList"] = _widget_lst
-
-                    # Last Commands
-                    lastcmd_lst = []
-                    if "Last Cmds" in self.ListOfDevices[item]:
-                        for lastCmd in self.ListOfDevices[item]["Last Cmds"]:
-                            timestamp = lastCmd[0]
-                            cmd = lastCmd[1]
-                            # payload = lastCmd[2]
-                            _cmd = {"CmdCode": cmd, "TimeStamps": timestamp}
-                            lastcmd_lst.append(_cmd)
-                    device["LastCmds"] = lastcmd_lst
-                    zdev_lst.append(device)
-
-                _response["Data"] = json.dumps(zdev_lst, sort_keys=True)
+                return self.rest_zDevice_list(_response)
         return _response
 
     def rest_zDevice_raw(self, verb, data, parameters):
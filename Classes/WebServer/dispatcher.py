@@ -15,6 +15,8 @@ REST_COMMANDS = {}
 def setup_list_rest_commands( self ):
     
     list_rest_commands = [
+        ( {"Name": "adaptive-polling", "Verbs": {"GET"}, "function": self.rest_adaptive_polling} ),
+        ( {"Name": "address-changes", "Verbs": {"GET"}, "function": self.rest_address_changes} ),
         ( {"Name": "battery-state", "Verbs": {"GET"}, "function": self.rest_battery_state} ),
         ( {"Name": "bind-lst-cluster", "Verbs": {"GET"}, "function": self.rest_bindLSTcluster} ),
         ( {"Name": "bind-lst-device", "Verbs": {"GET"}, "function": self.rest_bindLSTdevice} ),
@@ -32,11 +34,15 @@ def setup_list_rest_commands( self ):
         ( {"Name": "dev-cap", "Verbs": {"GET"}, "function": self.rest_dev_capabilities} ),
         ( {"Name": "dev-command", "Verbs": {"PUT"}, "function": self.rest_dev_command} ),
         ( {"Name": "device", "Verbs": {"GET"}, "function": self.rest_Device} ),
+        ( {"Name": "device-memory", "Verbs": {"GET"}, "function": self.rest_device_memory} ),
         ( {"Name": "device-settings-help", "Verbs": {"GET"}, "function": self.rest_device_settings_help} ),
         ( {"Name": "domoticz-env", "Verbs": {"GET"}, "function": self.rest_domoticz_env} ),
         ( {"Name": "help", "Verbs": {"GET"}, "function": None} ),
         ( {"Name": "full-reprovisionning", "Verbs": {"PUT"}, "function": self.rest_full_reprovisionning} ),
+        ( {"Name": "ias-zones", "Verbs": {"GET"}, "function": self.rest_ias_zones} ),
+        ( {"Name": "liveness", "Verbs": {"GET"}, "function": self.rest_liveness} ),
         ( {"Name": "log-error-history", "Verbs": {"GET"}, "function": self.rest_logErrorHistory} ),
+        ( {"Name": "metrics", "Verbs": {"GET", "DELETE"}, "function": self.rest_metrics} ),
         ( {"Name": "new-hrdwr", "Verbs": {"GET"}, "function": self.rest_new_hrdwr} ),
         ( {"Name": "nwk-stat", "Verbs": {"GET", "DELETE"}, "function": self.rest_nwk_stat} ),
         ( {"Name": "non-optmize-device-configuration", "Verbs": {"GET"}, "function": self.non_optmize_device_configuration} ),
@@ -62,17 +68,21 @@ def setup_list_rest_commands( self ):
         ( {"Name": "rescan-groups", "Verbs": {"GET"}, "function": self.rest_rescan_group} ),
         ( {"Name": "restart-needed", "Verbs": {"GET"}, "function": self.rest_restart_needed} ),
         ( {"Name": "scan-device-for-grp", "Verbs": {"PUT"}, "function": self.rest_scan_devices_for_group } ),
+        ( {"Name": "scene-bursts", "Verbs": {"GET"}, "function": self.rest_scene_bursts} ),
         ( {"Name": "setting-debug", "Verbs": {"GET", "PUT"}, "function": self.rest_Settings_with_debug} ),
         ( {"Name": "setting", "Verbs": {"GET", "PUT"}, "function": self.rest_Settings_wo_debug} ),
+        ( {"Name": "startup-timeline", "Verbs": {"GET"}, "function": self.rest_startup_timeline} ),
         ( {"Name": "sw-reset-zigate", "Verbs": {"GET"}, "function": self.rest_reset_zigate} ),
         ( {"Name": "sw-reset-coordinator", "Verbs": {"GET"}, "function": self.rest_reset_zigate} ),
         ( {"Name": "topologie", "Verbs": {"GET", "DELETE"}, "function": self.rest_netTopologie} ),
+        ( {"Name": "traffic-classes", "Verbs": {"GET"}, "function": self.rest_traffic_classes} ),
         ( {"Name": "unbinding", "Verbs": {"PUT"}, "function": self.rest_unbinding} ),
         ( {"Name": "unbinding-group", "Verbs": {"PUT"}, "function": self.rest_group_unbinding} ),
         ( {"Name": "upgrade-certified-devices", "Verbs": {"GET"}, "function": self.rest_certified_devices_update} ),
         ( {"Name": "zdevice-name", "Verbs": {"GET", "PUT", "DELETE"}, "function": self.rest_zDevice_name} ),
         ( {"Name": "zdevice-raw", "Verbs": {"GET", "PUT"}, "function": self.rest_zDevice_raw} ),
         ( {"Name": "zdevice", "Verbs": {"GET", "DELETE"}, "function": self.rest_zDevice} ),
+        ( {"Name": "zdevice-delta", "Verbs": {"GET"}, "function": self.rest_zDevice_delta} ),
         ( {"Name": "zgroup-list-available-device", "Verbs": {"GET"}, "function": self.rest_zGroup_lst_avlble_dev } ),
         ( {"Name": "zgroup", "Verbs": {"GET", "PUT"}, "function": self.rest_zGroup} ),
         ( {"Name": "zigate-erase-PDM", "Verbs": {"GET"}, "function": self.rest_zigate_erase_PDM} ),
@@ -91,6 +91,7 @@ def handle_rest_api(self, Connection, Data, parsed_query):
     self.logging("Debug", f"Receiving a REST API - Version: {api_version}, Verb: {verb}, Command: {command}, Params: {params}")
 
     if parsed_query[0] in ["rest-z4d", "rest-zigate"] and api_version == "1":
+        self.request_headers = Data.get("Headers", {})
         self.do_rest(Connection, verb, Data.get("Data"), api_version, command, params)
     else:
         domoticz_error_api(f"Unknown API {parsed_query}")
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: rest_DeviceSummary.py
+#
+#    Description: Versioned cache of the device summary served by the zdevice endpoint
+#
+#    Each device summary is kept pre-serialized together with a signature of the ListOfDevices fields it is built from.
+#    On request, only the devices reported as changed ( Modules/deviceChanges.py ) are checked, and the ones whose
+#    signature changed are rebuilt, each rebuild bumps the cache version. As a safety net for the writers which do
+#    not report their changes, all devices are checked every FULL_REFRESH_PERIOD.
+#    The full list is served as pre-serialized bytes, with an ETag based on the version, so the WebUI gets a
+#    304 when nothing changed, and can ask for the delta since a given version with zdevice-delta.
+#
+
+import json
+import time
+
+from Classes.WebServer.headerResponse import (prepResponseMessage,
+                                              setupHeadersResponse)
+from Modules.deviceChanges import pop_changed_devices
+from Modules.zigateConsts import ZCL_CLUSTERS_LIST
+
+SUMMARY_ATTRIBUTES = (
+    "ZDeviceName",
+    "ConsistencyCheck",
+    "Stamp",
+    "Health",
+    "Status",
+    "Battery",
+    "LQI",
+    "RSSI",
+    "Model",
+    "IEEE",
+    "ProfileID",
+    "ZDeviceID",
+    "Manufacturer",
+    "DeviceType",
+    "LogicalType",
+    "PowerSource",
+    "ReceiveOnIdle",
+    "App Version",
+    "Stack Version",
+    "HW Version",
+    "Param",
+    "CheckParam"
+)
+
+# Additional fields used to build the summary
+SIGNATURE_ATTRIBUTES = SUMMARY_ATTRIBUTES + ("IASBattery", "MacCapa")
+
+MAX_REMOVED_HISTORY = 256
+FULL_REFRESH_PERIOD = 300
+HOT_PERIOD = 5  # A changed device is checked for a few seconds, as a frame updates the device in several steps
+
+
+class DeviceSummaryCache:
+    def __init__(self, ListOfDevices, ListOfDomoticzWidget):
+        self.ListOfDevices = ListOfDevices
+        self.ListOfDomoticzWidget = ListOfDomoticzWidget
+
+        self.generation = "%x" % int(time.time())  # Make ETags unique across plugin restarts
+        self.version = 0
+        self.devices = {}  # { nwkid: { "Signature":, "Version":, "Json": } }
+        self.removed = {}  # { nwkid: version of removal }
+        self.removed_floor = 0  # Removals up to this version are no longer tracked
+        self.hot = {}  # { nwkid: time of the last change } devices to be checked at next access
+        self.next_full_refresh = 0
+        self._list_version = None
+        self._list_json = None
+
+    def etag(self, version=None):
+        return '"%s-%s"' % (self.generation, self.version if version is None else version)
+
+    def invalidate(self, nwkid=None):
+        """ Force the rebuild of one (or all) device summaries at next access """
+        if nwkid is None:
+            self.devices.clear()
+            self.next_full_refresh = 0
+        else:
+            self.devices.pop(nwkid, None)
+            self.hot[nwkid] = time.time()
+
+    def refresh(self):
+        """ Rebuild the summaries of the devices which have changed. Return the current version """
+
+        now = time.time()
+        self.hot.update(pop_changed_devices())
+        if now >= self.next_full_refresh:
+            self.next_full_refresh = now + FULL_REFRESH_PERIOD
+            candidates = set(self.ListOfDevices) | set(self.devices)
+        else:
+            # Devices added or removed without being reported are found by comparing the keys only
+            candidates = set(self.hot) | (self.ListOfDevices.keys() ^ self.devices.keys())
+        self.hot = {nwkid: stamp for nwkid, stamp in self.hot.items() if now - stamp < HOT_PERIOD}
+
+        for nwkid in candidates:
+            self._refresh_device(nwkid)
+        return self.version
+
+    def _refresh_device(self, nwkid):
+        device = self.ListOfDevices.get(nwkid)
+        if device is None:
+            if nwkid in self.devices:
+                self.version += 1
+                del self.devices[nwkid]
+                self.removed[nwkid] = self.version
+                if len(self.removed) > MAX_REMOVED_HISTORY:
+                    self.removed_floor = self.removed.pop(next(iter(self.removed)))
+            return
+
+        signature = device_signature(self, device)
+        cached = self.devices.get(nwkid)
+        if cached and cached["Signature"] == signature:
+            return
+
+        self.version += 1
+        summary = build_device_summary(self, nwkid)
+        self.devices[nwkid] = {
+            "Signature": device_signature(self, device),  # the build could have updated the device
+            "Version": self.version,
+            "Json": json.dumps(summary, sort_keys=True).encode("utf-8"),
+        }
+        self.removed.pop(nwkid, None)
+
+    def list_json(self):
+        """ Pre-serialized list of all device summaries, rebuilt only when the version changed """
+
+        self.refresh()
+        if self._list_version != self.version or self._list_json is None:
+            self._list_json = b"[" + b", ".join(self.devices[x]["Json"] for x in self.ListOfDevices if x in self.devices) + b"]"
+            self._list_version = self.version
+        return self._list_json
+
+    def delta_json(self, since):
+        """ Pre-serialized devices changed and removed after version since """
+
+        self.refresh()
+        if since > self.version or since < self.removed_floor:
+            # Unknown version (plugin restarted), or too old to know what was removed. A full resync is needed
+            since = 0
+
+        devices = b", ".join(
+            self.devices[x]["Json"] for x in self.ListOfDevices if x in self.devices and self.devices[x]["Version"] > since
+        )
+        removed = [x for x, version in self.removed.items() if version > since]
+        return b'{"Devices": [%s], "Full": %s, "Removed": %s, "Version": %d}' % (
+            devices, json.dumps(since == 0).encode("utf-8"), json.dumps(removed).encode("utf-8"), self.version)
+
+
+def device_signature(self, device):
+    """ Snapshot of all the device fields used by the summary. Values are not copied, this is only used for comparison """
+
+    stamp = device.get("Stamp")
+    last_cmds = device.get("Last Cmds")
+    ep_signature = None
+    if "Ep" in device and isinstance(device["Ep"], dict):
+        ep_signature = tuple(
+            (ep, tuple(device["Ep"][ep]), device["Ep"][ep].get("Type"), str(device["Ep"][ep].get("ClusterType")))
+            for ep in device["Ep"] if isinstance(device["Ep"][ep], dict)
+        )
+    cluster_type = device.get("ClusterType")
+    widget_names = tuple(
+        self.ListOfDomoticzWidget[int(x)]["Name"] if int(x) in self.ListOfDomoticzWidget else ""
+        for x in _widget_idx_list(device)
+    )
+    return (
+        tuple(str(device.get(x, "")) for x in SIGNATURE_ATTRIBUTES),
+        stamp.get("LastSeen") if isinstance(stamp, dict) else None,
+        (len(last_cmds), str(last_cmds[-1])) if last_cmds else None,
+        str(cluster_type) if cluster_type else None,
+        ep_signature,
+        widget_names
+    )
+
+
+def _widget_idx_list(device):
+    widgets = list(device.get("ClusterType", {}) or {})
+    for ep in device.get("Ep", {}) or {}:
+        if isinstance(device["Ep"][ep], dict) and "ClusterType" in device["Ep"][ep]:
+            widgets.extend(device["Ep"][ep]["ClusterType"])
+    return widgets
+
+
+def build_device_summary(self, item):
+    """ Summary of a device, as provided to the WebUI by the zdevice endpoint """
+
+    device = {"_NwkId": item}
+    # Main Attributes
+    for attribut in SUMMARY_ATTRIBUTES:
+        if attribut == "Battery" and attribut in self.ListOfDevices[item]:
+            if self.ListOfDevices[item]["Battery"] in ( {}, ) and "IASBattery" in self.ListOfDevices[item]:
+                device[attribut] = str(self.ListOfDevices[item][ "IASBattery" ])
+            elif isinstance( self.ListOfDevices[item]["Battery"], int):
+                device[attribut] = self.ListOfDevices[item]["Battery"]
+                device["BatteryInside"] = True
+
+        elif item == "CheckParam":
+            device[attribut] = True if "CheckParam" in self.ListOfDevices[item] and self.ListOfDevices[item]["CheckParam"] else False
+
+        elif item == "Param":
+            device[attribut] = str(self.ListOfDevices[item][attribut])
+
+        elif attribut in self.ListOfDevices[item]:
+            if self.ListOfDevices[item][attribut] == {}:
+                device[attribut] = ""
+
+            elif attribut == "ConsistencyCheck" and "Status" in self.ListOfDevices[item] and self.ListOfDevices[item]["Status"] == "notDB":
+                self.ListOfDevices[item][attribut] = "not in DZ"
+
+            elif self.ListOfDevices[item][attribut] == "" and "MacCapa" in self.ListOfDevices[item] and self.ListOfDevices[item]["MacCapa"] == "8e":
+                if attribut == "DeviceType":
+                    device[attribut] = "FFD"
+                elif attribut == "LogicalType":
+                    device[attribut] = "Router"
+                elif attribut == "PowerSource":
+                    device[attribut] = "Main"
+
+            elif attribut == "LogicalType" and attribut in self.ListOfDevices[item] and self.ListOfDevices[item][attribut] not in (
+                "Router",
+                "Coordinator",
+                "End Device",
+            ):
+                if self.ListOfDevices[item]["MacCapa"] == "8e":
+                    device[attribut] = "Router"
+                elif self.ListOfDevices[item]["MacCapa"] == "80":
+                    device[attribut] = "End Device"
+
+            else:
+                device[attribut] = self.ListOfDevices[item][attribut]
+        else:
+            device[attribut] = ""
+
+    # Last Seen Information
+    device["LastSeen"] = ""
+    if "Stamp" in self.ListOfDevices[item] and "LastSeen" in self.ListOfDevices[item]["Stamp"]:
+        device["LastSeen"] = self.ListOfDevices[item]["Stamp"]["LastSeen"]
+
+    # ClusterType
+    _widget_lst = []
+    if "ClusterType" in self.ListOfDevices[item]:
+        for widget_idx in self.ListOfDevices[item]["ClusterType"]:
+            widget = {"_WidgetID": widget_idx, "WidgetName": ""}
+            if int(widget_idx) in self.ListOfDomoticzWidget:
+                widget["WidgetName"] = self.ListOfDomoticzWidget[int(widget_idx)]["Name"]
+            widget["WidgetType"] = self.ListOfDevices[item]["ClusterType"][widget_idx]
+            _widget_lst.append(widget)
+
+    # Ep informations
+    ep_lst = []
+    if "Ep" in self.ListOfDevices[item]:
+        for epId in self.ListOfDevices[item]["Ep"]:
+            _ep = {"Ep": epId, "ClusterList": []}
+            for cluster in self.ListOfDevices[item]["Ep"][epId]:
+                if cluster == "ColorMode":
+                    continue
+
+                if cluster == "ClusterType":
+                    for widget_idx in self.ListOfDevices[item]["Ep"][epId]["ClusterType"]:
+                        widget = {"_WidgetID": widget_idx, "WidgetName": ""}
+                        if int(widget_idx) in self.ListOfDomoticzWidget:
+                            widget["WidgetName"] = self.ListOfDomoticzWidget[int(widget_idx)]["Name"]
+                        widget["WidgetType"] = self.ListOfDevices[item]["Ep"][epId]["ClusterType"][widget_idx]
+                        _widget_lst.append(widget)
+                    continue
+
+                elif cluster == "Type":
+                    device["Type"] = self.ListOfDevices[item]["Ep"][epId]["Type"]
+                    continue
+
+                _cluster = {cluster: ZCL_CLUSTERS_LIST[cluster] if cluster in ZCL_CLUSTERS_LIST else "Unknown"}
+
+                _ep["ClusterList"].append(_cluster)
+
+            ep_lst.append(_ep)
+    device["Ep"] = ep_lst
+    device["WidgetList"] = _widget_lst
+
+    # Last Commands
+    lastcmd_lst = []
+    if "Last Cmds" in self.ListOfDevices[item]:
+        for lastCmd in self.ListOfDevices[item]["Last Cmds"]:
+            timestamp = lastCmd[0]
+            cmd = lastCmd[1]
+            # payload = lastCmd[2]
+            _cmd = {"CmdCode": cmd, "TimeStamps": timestamp}
+            lastcmd_lst.append(_cmd)
+    device["LastCmds"] = lastcmd_lst
+    return device
+
+
+def device_summary_cache(self):
+    if self.device_summary_cache is None:
+        self.device_summary_cache = DeviceSummaryCache(self.ListOfDevices, self.ListOfDomoticzWidget)
+    return self.device_summary_cache
+
+
+def rest_zDevice_list(self, _response):
+    """ GET zdevice: full list of device summaries, with ETag / If-None-Match support """
+
+    cache = device_summary_cache(self)
+    data = cache.list_json()
+    etag = cache.etag()
+    _response["Headers"]["ETag"] = etag
+    _response["Headers"]["Cache-Control"] = "no-cache"
+    if self.request_headers.get("If-None-Match") == etag:
+        _response["Status"] = "304 Not Modified"
+        del _response["Data"]
+        return _response
+
+    _response["Data"] = data
+    return _response
+
+
+def rest_zDevice_delta(self, verb, data, parameters):
+    """ GET zdevice-delta/<version>: devices changed ( and removed ) since version """
+
+    _response = prepResponseMessage(self, setupHeadersResponse())
+    _response["Headers"]["Content-Type"] = "application/json; charset=utf-8"
+    if verb == "GET":
+        since = 0
+        if len(parameters) == 1 and parameters[0].isdigit():
+            since = int(parameters[0])
+        cache = device_summary_cache(self)
+        _response["Data"] = cache.delta_json(since)
+        _response["Headers"]["ETag"] = cache.etag()
+    return _response
@@ -4,13 +4,16 @@ import json
 import os
 import subprocess  # nosec
 from pathlib import Path
+from types import SimpleNamespace
 
 import distro
 import z4d_certified_devices
 
+from Classes.DeviceTemplates import DeviceTemplates
 from Classes.WebServer.headerResponse import (prepResponseMessage,
                                               setupHeadersResponse)
-from Modules.database import import_local_device_conf
+from Modules.database import (compile_device_templates,
+                              import_local_device_conf)
 
 PLUGIN_UPGRADE_SCRIPT = "Tools/plugin-auto-upgrade.sh"
 
@@ -59,11 +62,20 @@ def rest_reload_device_conf(self, verb, data, parameters):
 
 def _reload_device_conf(self):
     
-    self.DeviceConf = {}
-    self.ModelManufMapping = {}
-    import_local_device_conf(self)
+    # DeviceConf and ModelManufMapping are shared with the plugin thread. They are loaded and compiled aside,
+    # then swapped in, so they are never seen empty or partially loaded.
+    staging = SimpleNamespace(
+        log=self.log, pluginconf=self.pluginconf, pluginParameters=self.pluginParameters,
+        DeviceConf=DeviceTemplates(), ModelManufMapping={} )
+    import_local_device_conf(staging)
     z4d_certified_devices_pathname = os.path.dirname( z4d_certified_devices.__file__ ) + "/"
-    z4d_certified_devices.z4d_import_device_configuration(self, z4d_certified_devices_pathname )
+    z4d_certified_devices.z4d_import_device_configuration(staging, z4d_certified_devices_pathname )
+    compile_device_templates(staging)
+
+    self.DeviceConf.replace(staging.DeviceConf)
+    self.ModelManufMapping.update(staging.ModelManufMapping)
+    for identifier in [x for x in self.ModelManufMapping if x not in staging.ModelManufMapping]:
+        del self.ModelManufMapping[identifier]
 
 def certified_devices_update(self):
     
@@ -10,6 +10,7 @@ from Classes.WebServer.headerResponse import (prepResponseMessage,
                                               setupHeadersResponse)
 from Modules.basicOutputs import (ZigatePermitToJoin, setExtendedPANID,
                                   start_Zigate, zigateBlueLed)
+from Modules.deviceChanges import mark_device_changed
 from Modules.domoticzAbstractLayer import (domoticz_error_api,
                                            domoticz_log_api,
                                            domoticz_status_api)
@@ -287,5 +288,6 @@ def rest_full_reprovisionning(self, verb, data, parameters):
         del self.ListOfDevices[nwkid]["WriteAttributes"]
     
     self.ListOfDevices[nwkid]["Status"] = "provREQ"
+    mark_device_changed(nwkid)
 
     return _response
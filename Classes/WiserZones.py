@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: WiserZones.py
+#
+#    Description: Rooms ( zones ) of a Schneider Wiser installation
+#
+#    - Devices are grouped by their WiserRoomNumber parameter. The index is rebuilt every ROOMS_INDEX_TTL seconds,
+#      so a change of room made from the WebUI is taken into account, without scanning all devices at each heartbeat.
+#    - The heating demand of each room is memorized, so the thermostat widget is updated only when it changes.
+#    - Thermostat overrides ( setpoint for a time ) are kept in a timer queue, so they are reverted on time, even if
+#      the thermostat does not talk.
+#
+#    The Zigbee side is done by Modules/schneider_wiser.py
+#
+
+import heapq
+import time
+
+ROOMS_INDEX_TTL = 60
+
+
+class WiserZones:
+    def __init__(self):
+        self.rooms = {}  # { room: [ nwkid ] }
+        self.built = 0  # Time of the last index build
+        self.demand = {}  # { thermostat nwkid: heating demand last pushed to the widget }
+        self.dirty = set()  # rooms with a new heating demand reported
+        self.overrides = []  # heap of ( expiry time, nwkid, ep )
+        self.overrides_loaded = False
+
+    def index(self, ListOfDevices):
+        """ Return the rooms, after having rebuilt the index if needed """
+
+        if time.time() >= self.built + ROOMS_INDEX_TTL:
+            rooms = {}
+            for nwkid, device in list(ListOfDevices.items()):
+                room = room_number(device)
+                if room is not None:
+                    rooms.setdefault(room, []).append(nwkid)
+                if not self.overrides_loaded:
+                    self._load_override(nwkid, device)
+            self.rooms = rooms
+            self.built = time.time()
+            self.overrides_loaded = True
+        return self.rooms
+
+    def _load_override(self, nwkid, device):
+        """ Override in progress when the plugin has been restarted """
+
+        override = device.get("Schneider", {}).get("ThermostatOverride") if isinstance(device.get("Schneider"), dict) else None
+        if override and "OverrideStartTime" in override and "OverrideDuration" in override:
+            self.schedule_override(nwkid, "01", override["OverrideStartTime"] + override["OverrideDuration"])
+
+    def room_members(self, ListOfDevices, room):
+        return self.index(ListOfDevices).get(room, [])
+
+    def mark_dirty(self, room):
+        self.dirty.add(room)
+
+    def pop_dirty(self):
+        dirty, self.dirty = self.dirty, set()
+        return dirty
+
+    def demand_changed(self, nwkid, demand):
+        """ True if the heating demand has to be pushed to the widget """
+
+        if self.demand.get(nwkid) == demand:
+            return False
+        self.demand[nwkid] = demand
+        return True
+
+    def schedule_override(self, nwkid, ep, expiry):
+        heapq.heappush(self.overrides, (expiry, nwkid, ep))
+
+    def expired_overrides(self):
+        """ Return the ( nwkid, ep ) for which an override is over """
+
+        now = time.time()
+        expired = []
+        while self.overrides and self.overrides[0][0] <= now:
+            _, nwkid, ep = heapq.heappop(self.overrides)
+            expired.append((nwkid, ep))
+        return expired
+
+
+def room_number(device):
+    """ WiserRoomNumber of a device record, None if not set """
+
+    room = device.get("Param", {}).get("WiserRoomNumber") if isinstance(device.get("Param"), dict) else None
+    if room is None:
+        return None
+    try:
+        return int(room)
+    except (TypeError, ValueError):
+        return None
@@ -14,9 +14,10 @@ import json
 import queue
 import threading
 import time
-from queue import PriorityQueue, Queue
+from queue import Queue
 from threading import Semaphore
 
+from Classes.TrafficScheduler import TrafficScheduler, current_traffic_class
 from Classes.ZigateTransport.forwarderThread import start_forwarder_thread
 from Classes.ZigateTransport.readDecoder import decode_and_split_message
 from Classes.ZigateTransport.readerThread import (open_zigate_and_start_reader,
@@ -95,9 +96,8 @@ class ZigateTransport(object):
         # Writer
 
         self.writer_list_in_queue = []
-        self.writer_queue = PriorityQueue()
+        self.writer_queue = TrafficScheduler()  # One lane per traffic class, the ZiGate gets 1 command at a time
         self.writer_thread = None
-        self.prioriy_sqn = 0
         self.tcp_send_queue = Queue()  # We use a Queue as socket is not thread-safe in python
         self.serial_send_queue = Queue()  # We use a Queue as Serial is not thread-safe in python
 
@@ -165,7 +165,10 @@ class ZigateTransport(object):
         # Provide the Load of the Sending Queue
         return self.writer_queue.qsize()
 
-    def sendData(self, cmd, datas, highpriority=False, ackIsDisabled=False, waitForResponseIn=False, NwkId=None):
+    def get_traffic_classes(self):
+        return self.writer_queue.report()
+
+    def sendData(self, cmd, datas, highpriority=False, ackIsDisabled=False, waitForResponseIn=False, NwkId=None, traffic_class=None):
         # We receive a send Message command from above ( plugin ),
         # send it to the sending queue
 
@@ -184,21 +187,14 @@ class ZigateTransport(object):
             "InternalSqn": InternalSqn,
             "NwkId": NwkId,
             "TimeStamp": time.time(),
+            "TrafficClass": traffic_class or current_traffic_class(highpriority),
         }
         try:
-            if self.writer_queue.qsize() == 0:
-                # Queue is empty, we reset the priority_sqn number to 0
-                self.prioriy_sqn = 0
-            if highpriority:
-                self.logging_transport(
-                    "Debug",
-                    "Hih Priority command Hsqn: %s Cmd: %s Data: %s i_sqn: %s"
-                    % (self.prioriy_sqn, message["cmd"], message["datas"], message["InternalSqn"]),
-                )
-                self.writer_queue.put((self.prioriy_sqn, str(json.dumps(message))))
-                self.prioriy_sqn += 1
-            else:
-                self.writer_queue.put((InternalSqn, str(json.dumps(message))))
+            self.logging_transport(
+                "Debug",
+                "sendData - Cmd: %s Data: %s i_sqn: %s TrafficClass: %s" % (message["cmd"], message["datas"], message["InternalSqn"], message["TrafficClass"]),
+            )
+            self.writer_queue.put((InternalSqn, str(json.dumps(message))), message["TrafficClass"])
 
         except queue.Full:
             self.logging_transport("Error", "sendData - writer_queue Full")
@@ -316,7 +312,7 @@ class ZigateTransport(object):
             context = {}
         context["Queues"] = {
             "ListOfCommands": dict.copy(self.ListOfCommands),
-            "writeQueue": str(self.writer_queue.queue),
+            "writeQueue": str(self.writer_queue.items()),
             "forwardQueue": str(self.forwarder_queue.queue),
             "SemaphoreValue": self.semaphore_gate._value,
             "ForwardedQueueCurrentSize": self.get_forwarder_queue(),
@@ -144,6 +144,8 @@ def get_sqn_pdus(self, MsgData):
 def report_timing_8000(self, isqn):
     # Statistics on ZiGate reacting time to process the command
     timing = 0
+    if isqn in self.ListOfCommands and "TimeStamp" in self.ListOfCommands[isqn]:
+        self.statistics.record_latency("ack_round_trip", time.time() - self.ListOfCommands[isqn]["TimeStamp"])
     if self.pluginconf.pluginConf["ZiGateReactTime"]:
         if isqn in self.ListOfCommands and "TimeStamp" in self.ListOfCommands[isqn]:
             TimeStamp = self.ListOfCommands[isqn]["TimeStamp"]
@@ -6,6 +6,7 @@
 
 import binascii
 import struct
+from time import perf_counter
 
 from Classes.ZigateTransport.handleProtocol import process_frame
 
@@ -23,6 +24,7 @@ def decode_and_split_message(self, raw_message):
     while 1:  # Loop, detect frame and process, until there is no more frame.
         if len(self._ReqRcv) == 0:
             return
+        t_start = perf_counter()
         BinMsg = decode_frame(get_raw_frame_from_raw_message(self))
         if BinMsg is None:
             return
@@ -31,6 +33,7 @@ def decode_and_split_message(self, raw_message):
             continue
 
         AsciiMsg = binascii.hexlify(BinMsg).decode("utf-8")
+        self.statistics.record_latency("deframe", perf_counter() - t_start)
 
         # if self.pluginconf.pluginConf["coordinatorCmd"]:
         #    self.logging_reader('Log', "on_message AsciiMsg: %s , Remaining buffer: %s" %(AsciiMsg,  self._ReqRcv ))
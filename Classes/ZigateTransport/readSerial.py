@@ -136,7 +136,9 @@ def serial_read_from_zigate(self):
     data = None
     try:
         while self._connection.in_waiting:
+            t_start = time.perf_counter()
             data = self._connection.read(self._connection.in_waiting)
+            self.statistics.record_latency("serial_read", time.perf_counter() - t_start)
             self.logging_serial("Debug", "Receiving: %s" %str(data))
             if data:
                 decode_and_split_message(self, data)
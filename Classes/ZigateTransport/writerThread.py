@@ -59,12 +59,12 @@ def writer_thread(self):
                 break
 
             command = json.loads(command_str)
-            if _isqn != command["InternalSqn"]:
-                self.logging_writer(
-                    "Debug",
-                    "Hih Priority command HIsqn: %s Cmd: %s Data: %s i_sqn: %s"
-                    % (_isqn, command["cmd"], command["datas"], command["InternalSqn"]),
-                )
+            self.statistics.record_latency("writer_queue_wait", time.time() - command["TimeStamp"])
+            self.logging_writer(
+                "Debug",
+                "Next command TrafficClass: %s Cmd: %s Data: %s i_sqn: %s"
+                % (command.get("TrafficClass"), command["cmd"], command["datas"], command["InternalSqn"]),
+            )
 
             # self.logging_writer( 'Debug', "New command received:  %s" %(command))
             if (
@@ -13,11 +13,8 @@
 import asyncio
 import binascii
 import contextlib
-import json
 import logging
-import os.path
 import time
-from pathlib import Path
 
 import zigpy.application
 import zigpy.backups
@@ -30,6 +27,7 @@ import zigpy.zdo
 import zigpy.zdo.types as zdo_types
 from zigpy.backups import NetworkBackup
 
+from Classes.NetworkEnergyReports import get_energy_report_store
 from Classes.ZigpyTransport.instrumentation import write_capture_rx_frames
 from Classes.ZigpyTransport.plugin_encoders import (
     build_plugin_8002_frame_content, build_plugin_8014_frame_content,
@@ -497,29 +495,7 @@ async def network_interference_scan(self):
     
     self.log.logging( "NetworkEnergy", "Debug", "Network Energly Level Report: %s" % results)
 
-    _filename = Path( self.pluginconf.pluginConf["pluginReports"] ) / ("NetworkEnergy-v3-" + "%02d.json" % self.HardwareID)
-    if os.path.isdir( Path(self.pluginconf.pluginConf["pluginReports"]) ):
-
-        nbentries = 0
-        if os.path.isfile(_filename):
-            with open(_filename, "r") as fin:
-                data = fin.read().splitlines(True)
-                nbentries = len(data)
-
-        with open(_filename, "w") as fout:
-            # we need to short the list by todayNumReports - todayNumReports - 1
-            maxNumReports = self.pluginconf.pluginConf["numTopologyReports"]
-            start = (nbentries - maxNumReports) + 1 if nbentries >= maxNumReports else 0
-            self.log.logging( "NetworkEnergy", "Log", "Rpt max: %s , New Start: %s, Len:%s " % (maxNumReports, start, nbentries))
-
-            if nbentries != 0:
-                fout.write("\n")
-                fout.writelines(data[start:])
-            fout.write("\n")
-            json.dump(build_json_to_store(self, results), fout)
-    else:
-        self.log.logging( "NetworkEnergy", "Error", "Unable to get access to directory %s, please check PluginConf.txt" % (
-            self.pluginconf.pluginConf["pluginReports"]) )
+    get_energy_report_store(self.pluginconf, self.HardwareID, self.log).append(build_json_to_store(self, results))
 
 
 def build_json_to_store(self, scan_result):
@@ -9,6 +9,7 @@ import time
 import zigpy.application
 import zigpy.types as t
 
+from Classes.TrafficScheduler import current_traffic_class
 from Classes.ZigateTransport.sqnMgmt import sqn_init_stack
 from Classes.ZigpyTransport.forwarderThread import (forwarder_thread,
                                                     start_forwarder_thread,
@@ -97,7 +98,7 @@ class ZigpyTransport(object):
         self.zigpy_thread.join()
         self.forwarder_thread.join()
 
-    def sendData(self, cmd, datas, sqn=None, highpriority=False, ackIsDisabled=False, waitForResponseIn=False, NwkId=None):
+    def sendData(self, cmd, datas, sqn=None, highpriority=False, ackIsDisabled=False, waitForResponseIn=False, NwkId=None, traffic_class=None):
         
         if self.writer_queue is None:
             return
@@ -116,8 +117,8 @@ class ZigpyTransport(object):
 
         self.log.logging("Transport", "Debug", "===> sendData - Cmd: %s Datas: %s" % (cmd, datas))
 
-        message = {"cmd": cmd, "datas": datas, "NwkId": NwkId, "TimeStamp": time.time(), "ACKIsDisable": ackIsDisabled, "Sqn": sqn}
-        self.writer_queue.put_nowait(json.dumps(message))
+        message = {"cmd": cmd, "datas": datas, "NwkId": NwkId, "TimeStamp": time.time(), "ACKIsDisable": ackIsDisabled, "Sqn": sqn, "TrafficClass": traffic_class or current_traffic_class(highpriority)}
+        self.writer_queue.put_nowait(json.dumps(message), message["TrafficClass"])
         instrument_sendData( self, cmd, datas, sqn, message["TimeStamp"], highpriority, ackIsDisabled, waitForResponseIn, NwkId )
         
 
@@ -143,6 +144,9 @@ class ZigpyTransport(object):
     def get_writer_queue(self):
         return self.loadTransmit()
 
+    def get_traffic_classes(self):
+        return self.writer_queue.report() if self.writer_queue is not None else {}
+
     def get_forwarder_queue(self):
         return self.forwarder_queue.qsize()
 
@@ -42,6 +42,8 @@ from zigpy.exceptions import (APIException, ControllerException, DeliveryError,
 from zigpy_znp.exceptions import (CommandNotRecognized, InvalidCommandResponse,
                                   InvalidFrame)
 
+from Classes.TrafficScheduler import (TRAFFIC_CLASS_SETTINGS, TRAFFIC_CLASSES,
+                                      TrafficScheduler)
 from Classes.ZigpyTransport.plugin_encoders import (
     build_plugin_0302_frame_content, build_plugin_8009_frame_content,
     build_plugin_8011_frame_content,
@@ -123,7 +125,10 @@ async def start_zigpy_task(self, channel, extended_pan_id):
     await radio_start(self, self.statistics, self.pluginconf, self.use_of_zigpy_persistent_db, self._radiomodule, self._serialPort, set_channel=channel, set_extendedPanId=extended_pan_id),
 
     # Run forever
-    self.writer_queue = queue.Queue()  # We MUST use queue and not asyncio.Queue, because it is not compatible with the Domoticz framework
+    # We MUST use a thread-safe queue and not asyncio.Queue, because it is not compatible with the Domoticz framework
+    # One lane per traffic class, with a limited number of requests in flight in the radio per class
+    self.writer_queue = TrafficScheduler(with_slots=True)
+    self._traffic_slots = {name: asyncio.Semaphore(TRAFFIC_CLASS_SETTINGS[name]["Slots"]) for name in TRAFFIC_CLASSES}
 
     await worker_loop(self)
 
@@ -386,6 +391,7 @@ async def worker_loop(self):
 
 async def process_incoming_command(self, command_to_send):
     data = json.loads(command_to_send)
+    self.statistics.record_latency("writer_queue_wait", time.time() - data["TimeStamp"])
     try:
         await dispatch_command(self, data)
 
@@ -403,16 +409,16 @@ async def process_incoming_command(self, command_to_send):
 
 async def get_next_command(self):
     """Get the next command in the writer Queue."""
-    while True:
-        try:
-            return self.writer_queue.get_nowait()
+    try:
+        # Blocking get in a thread, so the asyncio loop keeps running the requests in flight
+        return await asyncio.get_running_loop().run_in_executor(None, self.writer_queue.get, True, 1.0)
 
-        except queue.Empty:
-            await asyncio.sleep(0.100)
+    except queue.Empty:
+        return None
 
-        except Exception as e:
-            self.log.logging("TransportZigpy", "Log", f"Error in get_next_command: {e}")
-            return None
+    except Exception as e:
+        self.log.logging("TransportZigpy", "Log", f"Error in get_next_command: {e}")
+        return None
 
 
 async def dispatch_command(self, data):
@@ -430,7 +436,7 @@ async def dispatch_command(self, data):
 
     elif cmd == "RAW-COMMAND":
         self.log.logging("TransportZigpy", "Debug", f"RAW-COMMAND: {properyly_display_data(datas)}")
-        await process_raw_command(self, datas, AckIsDisable=data["ACKIsDisable"], Sqn=data["Sqn"])
+        await process_raw_command(self, datas, AckIsDisable=data["ACKIsDisable"], Sqn=data["Sqn"], TrafficClass=data.get("TrafficClass"))
 
     elif cmd == "REMOVE-DEVICE":
         ieee = datas["Param1"]
@@ -491,7 +497,7 @@ async def _permit_to_joint(self, data):
     log.logging("TransportZigpy", "Debug", f"Returning from app.permit(time_s={duration}, node={target_router})")
 
 
-async def process_raw_command(self, data, AckIsDisable=False, Sqn=None):
+async def process_raw_command(self, data, AckIsDisable=False, Sqn=None, TrafficClass=None):
     Function = data["Function"]
     TimeStamp = data["timestamp"]
     Profile = data["Profile"]
@@ -522,7 +528,7 @@ async def process_raw_command(self, data, AckIsDisable=False, Sqn=None):
         result, msg = await _multicast_command(self, NwkId, Profile, Cluster, sEp, sequence, payload)
 
     elif transport_needs == "Unicast":
-        result, msg = await _unicast_command(self, destination, Profile, Cluster, sEp, dEp, sequence, payload, AckIsDisable, delay, extended_timeout, Function, Sqn)
+        result, msg = await _unicast_command(self, destination, Profile, Cluster, sEp, dEp, sequence, payload, AckIsDisable, delay, extended_timeout, Function, Sqn, TrafficClass)
 
     self.log.logging("TransportZigpy", "Debug", f"ZigyTransport: process_raw_command completed NwkId: {destination} result: {result} msg: {msg}")
 
@@ -541,13 +547,13 @@ async def _multicast_command(self, NwkId, Profile, Cluster, sEp, sequence, paylo
     return result, msg
 
 
-async def _unicast_command(self, destination, Profile, Cluster, sEp, dEp, sequence, payload, AckIsDisable, delay, extended_timeout, Function, Sqn):
+async def _unicast_command(self, destination, Profile, Cluster, sEp, dEp, sequence, payload, AckIsDisable, delay, extended_timeout, Function, Sqn, TrafficClass=None):
     self.log.logging("TransportZigpy", "Debug", f"process_raw_command Unicast destination: {destination} Profile: {Profile} Cluster: {Cluster} sEp: {sEp} dEp: {dEp} Seq: {sequence} Payload: {payload.hex()}")
     AckIsDisable = False if self.pluginconf.pluginConf["ForceAPSAck"] else AckIsDisable
 
     try:
-        task = asyncio.create_task(
-            transport_request(self, Function, destination, Profile, Cluster, sEp, dEp, sequence, payload, ack_is_disable=AckIsDisable, use_ieee=False, delay=delay, extended_timeout=extended_timeout),
+        asyncio.create_task(
+            transport_request(self, Function, destination, Profile, Cluster, sEp, dEp, sequence, payload, ack_is_disable=AckIsDisable, use_ieee=False, delay=delay, extended_timeout=extended_timeout, traffic_class=TrafficClass),
             name=f"_unicast_command-{Function}-{destination}-{Cluster}-{Sqn}"
         )
 
@@ -688,10 +694,12 @@ def measure_execution_time(func):
         if self.pluginconf.pluginConf.get("ZigpyReactTime", False):
             t_start = int(1000 * time.time())
 
+        t_request = time.perf_counter()
         try:
             await func(self, Function, destination, Profile, Cluster, sEp, dEp, sequence, payload, ack_is_disable, use_ieee, delay, extended_timeout)
 
         finally:
+            self.statistics.record_latency("ack_round_trip", time.perf_counter() - t_request)
             if t_start:
                 t_end = int(1000 * time.time())
                 t_elapse = t_end - t_start
@@ -701,7 +709,7 @@ def measure_execution_time(func):
 
 
 @measure_execution_time
-async def transport_request(self, Function, destination, Profile, Cluster, sEp, dEp, sequence, payload, ack_is_disable=False, use_ieee=False, delay=None, extended_timeout=False):
+async def transport_request(self, Function, destination, Profile, Cluster, sEp, dEp, sequence, payload, ack_is_disable=False, use_ieee=False, delay=None, extended_timeout=False, traffic_class=None):
     """Send a zigbee message based on different arguments
 
     Args:
@@ -716,6 +724,7 @@ async def transport_request(self, Function, destination, Profile, Cluster, sEp,
         use_ieee (bool, optional): for usage of IEEE. Defaults to False.
         delay (_type_, optional): delay in seconds. Defaults to None.
         extended_timeout (bool, optional): Is extended timeout needed. Defaults to False.
+        traffic_class (str, optional): traffic class of the request, its radio slot is only held during each attempt.
     """
 
     _nwkid = destination.nwk.serialize()[::-1].hex()
@@ -738,16 +747,17 @@ async def transport_request(self, Function, destination, Profile, Cluster, sEp,
             self.log.logging("TransportZigpy", "Debug", f"transport_request: Request {sequence} skipped NwkId: {_nwkid} not reachable - {_ieee} {str(self._currently_not_reachable)} {self._currently_waiting_requests_list[_ieee]}", _nwkid)
             return
 
-        await _send_and_retry(self, Function, destination, Profile, Cluster, _nwkid, sEp, dEp, sequence, payload, use_ieee, _ieee,ack_is_disable, extended_timeout )
+        await _send_and_retry(self, Function, destination, Profile, Cluster, _nwkid, sEp, dEp, sequence, payload, use_ieee, _ieee,ack_is_disable, extended_timeout, traffic_class )
 
 
-async def _send_and_retry(self, Function, destination, Profile, Cluster, _nwkid, sEp, dEp, sequence, payload, use_ieee, _ieee, ack_is_disable, extended_timeout):
+async def _send_and_retry(self, Function, destination, Profile, Cluster, _nwkid, sEp, dEp, sequence, payload, use_ieee, _ieee, ack_is_disable, extended_timeout, traffic_class=None):
     max_retry = MAX_ATTEMPS_REQUEST if self.pluginconf.pluginConf["PluginRetrys"] else 1
 
     for attempt in range(1, (max_retry + 1)):
         try:
             self.log.logging("TransportZigpy", "Debug", f"_send_and_retry: {_ieee} {Profile} {Cluster} - Expect_Reply: {ack_is_disable} extended_timeout: {extended_timeout} Attempts: {attempt}/{max_retry}")
-            result, msg = await self.app.request(destination, Profile, Cluster, sEp, dEp, sequence, payload, expect_reply=not ack_is_disable, use_ieee=use_ieee, extended_timeout=extended_timeout)
+            async with _traffic_slot(self, traffic_class):
+                result, msg = await self.app.request(destination, Profile, Cluster, sEp, dEp, sequence, payload, expect_reply=not ack_is_disable, use_ieee=use_ieee, extended_timeout=extended_timeout)
 
         except (asyncio.exceptions.TimeoutError, asyncio.exceptions.CancelledError, AttributeError, DeliveryError) as e:
             error_log_message = f"{Function} {_ieee}/0x{_nwkid} 0x{Profile} 0x{Cluster}:16 Ack: {ack_is_disable} RETRY: {attempt}/{max_retry} ({e})"
@@ -833,6 +843,25 @@ async def _limit_concurrency(self, destination, sequence):
             self._currently_waiting_requests_list[ieee] -= 1
 
 
+@contextlib.asynccontextmanager
+async def _traffic_slot(self, traffic_class):
+    """
+    Hold one radio slot of the traffic class during a request. The delays, the per device concurrency and the pause
+    between retries are out of the slot, so a slow or unreachable device does not block its traffic class.
+    """
+    semaphore = self._traffic_slots.get(traffic_class) if traffic_class else None
+    if semaphore is None:
+        yield
+        return
+
+    async with semaphore:
+        self.writer_queue.on_air(traffic_class)
+        try:
+            yield
+        finally:
+            self.writer_queue.done(traffic_class)
+
+
 def specific_endpoints(self):
     supported_plugins = ["Terncy", "Konke", "Wiser", "Orvibo", "Livolo", "Wiser2"]
 
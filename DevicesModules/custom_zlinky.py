@@ -1,4 +1,5 @@
 import binascii 
+import time
 
 from Modules.domoMaj import MajDomoDevice
 from Modules.tools import checkAndStoreAttributeValue
@@ -10,6 +11,51 @@ from Modules.zlinky import (ZLINK_CONF_MODEL, ZLinky_TIC_COMMAND,
                             zlinky_totalisateur)
 
 
+# Linky meters report dozens of TIC attributes every few seconds, most of them unchanged or barely changed. A widget is
+# updated when its value moves by more than ZLinkyPublishThreshold %, otherwise at most every ZLinkyPublishCadence
+# seconds. The latest value held back is published by the heartbeat once the cadence is reached.
+ZLINKY_PUBLISHED = {}  # { nwkid: { ( ep, cluster, attribute ): [ last publish time, last published value, held back value ] } }
+
+
+def zlinky_publish(self, Devices, nwkid, ep, cluster, value, Attribute_=""):
+    cadence = self.pluginconf.pluginConf["ZLinkyPublishCadence"]
+    published = ZLINKY_PUBLISHED.setdefault(nwkid, {})
+    entry = published.get((ep, cluster, Attribute_))
+    now = time.time()
+
+    if cadence and entry and now < entry[0] + cadence and not zlinky_significant_change(self, entry[1], value):
+        entry[2] = value
+        return
+
+    published[(ep, cluster, Attribute_)] = [now, value, None]
+    MajDomoDevice(self, Devices, nwkid, ep, cluster, value, Attribute_=Attribute_)
+
+
+def zlinky_significant_change(self, previous, value):
+    try:
+        previous = float(previous)
+        value = float(value)
+    except (TypeError, ValueError):
+        # Tarif, color, alarms ... are published as soon as they change
+        return previous != value
+
+    return abs(value - previous) * 100 > self.pluginconf.pluginConf["ZLinkyPublishThreshold"] * max(abs(previous), 1)
+
+
+def zlinky_publish_pending(self, Devices, nwkid):
+    if nwkid not in ZLINKY_PUBLISHED:
+        return
+
+    cadence = self.pluginconf.pluginConf["ZLinkyPublishCadence"]
+    now = time.time()
+    for (ep, cluster, attribute), entry in list(ZLINKY_PUBLISHED[nwkid].items()):
+        if entry[2] is not None and now >= entry[0] + cadence:
+            self.log.logging( "ZLinky", "Debug", "zlinky_publish_pending - %s/%s %s/%s Value: %s" % (
+                nwkid, ep, cluster, attribute, entry[2]), nwkid, )
+            ZLINKY_PUBLISHED[nwkid][(ep, cluster, attribute)] = [now, entry[2], None]
+            MajDomoDevice(self, Devices, nwkid, ep, cluster, entry[2], Attribute_=attribute)
+
+
 def zlinky_clusters(self, Devices, nwkid, ep, cluster, attribut, value):
     self.log.logging( "ZLinky", "Debug", "zlinky_clusters %s - %s/%s Attribute: %s Value: %s" % (
         cluster, nwkid, ep, attribut, value), nwkid, )
@@ -61,7 +107,7 @@ def zlinky_cluster_metering(self, Devices, nwkid, ep, cluster, attribut, value):
         # HP or Base
         self.log.logging( "ZLinky", "Debug", "Cluster0702 - 0x0000 ZLinky_TIC Value: %s" % (value), nwkid, )
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
-        MajDomoDevice(self, Devices, nwkid, ep, cluster, str(value), Attribute_=attribut)
+        zlinky_publish(self, Devices, nwkid, ep, cluster, str(value), Attribute_=attribut)
         store_ZLinky_infos( self, nwkid, 'BASE', value)
         store_ZLinky_infos( self, nwkid, 'EAST', value)
 
@@ -75,7 +121,7 @@ def zlinky_cluster_metering(self, Devices, nwkid, ep, cluster, attribut, value):
         if value == 0:
             return
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
-        MajDomoDevice(self, Devices, nwkid, ep, "0009", str(value), Attribute_="0020")
+        zlinky_publish(self, Devices, nwkid, ep, "0009", str(value), Attribute_="0020")
         zlinky_color_tarif(self, nwkid, str(value))
         store_ZLinky_infos( self, nwkid, 'PTEC', value)
 
@@ -86,7 +132,7 @@ def zlinky_cluster_metering(self, Devices, nwkid, ep, cluster, attribut, value):
         self.log.logging( "ZLinky", "Debug", "Cluster0702 - 0x0100 ZLinky_TIC Conso: %s " % (value), nwkid, )
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
         zlinky_totalisateur(self, nwkid, attribut, value)
-        MajDomoDevice(self, Devices, nwkid, ep, cluster, str(value), Attribute_=attribut)
+        zlinky_publish(self, Devices, nwkid, ep, cluster, str(value), Attribute_=attribut)
         store_ZLinky_infos( self, nwkid, 'EASF01', value)
         store_ZLinky_infos( self, nwkid, 'HCHC', value)
         store_ZLinky_infos( self, nwkid, 'EJPHN', value)
@@ -99,7 +145,7 @@ def zlinky_cluster_metering(self, Devices, nwkid, ep, cluster, attribut, value):
         self.log.logging( "ZLinky", "Debug", "Cluster0702 - 0x0100 ZLinky_TIC Conso: %s " % (value), nwkid, )
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
         zlinky_totalisateur(self, nwkid, attribut, value)
-        MajDomoDevice(self, Devices, nwkid, ep, cluster, str(value), Attribute_=attribut)
+        zlinky_publish(self, Devices, nwkid, ep, cluster, str(value), Attribute_=attribut)
         store_ZLinky_infos( self, nwkid, 'EASF02', value)
         store_ZLinky_infos( self, nwkid, 'HCHP', value)
         store_ZLinky_infos( self, nwkid, 'EJPHPM', value)
@@ -110,7 +156,7 @@ def zlinky_cluster_metering(self, Devices, nwkid, ep, cluster, attribut, value):
             return
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
         zlinky_totalisateur(self, nwkid, attribut, value)
-        MajDomoDevice(self, Devices, nwkid, "f2", cluster, str(value), Attribute_=attribut)
+        zlinky_publish(self, Devices, nwkid, "f2", cluster, str(value), Attribute_=attribut)
         store_ZLinky_infos( self, nwkid, 'EASF03', value)
         store_ZLinky_infos( self, nwkid, 'BBRHCJW', value)
 
@@ -120,7 +166,7 @@ def zlinky_cluster_metering(self, Devices, nwkid, ep, cluster, attribut, value):
             return
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
         zlinky_totalisateur(self, nwkid, attribut, value)
-        MajDomoDevice(self, Devices, nwkid, "f2", cluster, str(value), Attribute_=attribut)
+        zlinky_publish(self, Devices, nwkid, "f2", cluster, str(value), Attribute_=attribut)
         store_ZLinky_infos( self, nwkid, 'EASF04', value)
         store_ZLinky_infos( self, nwkid, 'BBRHPJW', value)
 
@@ -129,7 +175,7 @@ def zlinky_cluster_metering(self, Devices, nwkid, ep, cluster, attribut, value):
             return
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
         zlinky_totalisateur(self, nwkid, attribut, value)
-        MajDomoDevice(self, Devices, nwkid, "f3", cluster, str(value), Attribute_=attribut)
+        zlinky_publish(self, Devices, nwkid, "f3", cluster, str(value), Attribute_=attribut)
         store_ZLinky_infos( self, nwkid, 'EASF05', value)
         store_ZLinky_infos( self, nwkid, 'BBRHCJR', value)
 
@@ -138,7 +184,7 @@ def zlinky_cluster_metering(self, Devices, nwkid, ep, cluster, attribut, value):
             return
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
         zlinky_totalisateur(self, nwkid, attribut, value)
-        MajDomoDevice(self, Devices, nwkid, "f3", cluster, str(value), Attribute_=attribut)
+        zlinky_publish(self, Devices, nwkid, "f3", cluster, str(value), Attribute_=attribut)
         store_ZLinky_infos( self, nwkid, 'EASF06', value)
         store_ZLinky_infos( self, nwkid, 'BBRHPJR', value)
 
@@ -199,7 +245,7 @@ def zlinky_cluster_electrical_measurement(self, Devices, nwkid, ep, cluster, att
         
         self.log.logging("Cluster", "Debug", "zlinky_cluster_electrical_measurement %s - %s/%s Power %s" % (cluster, nwkid, ep, value))
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
-        MajDomoDevice(self, Devices, nwkid, ep, cluster, str(value))
+        zlinky_publish(self, Devices, nwkid, ep, cluster, str(value))
         store_ZLinky_infos( self, nwkid, 'CCASN', value)
 
     elif attribut == "090b":
@@ -211,7 +257,7 @@ def zlinky_cluster_electrical_measurement(self, Devices, nwkid, ep, cluster, att
             return
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
         if attribut == "0505":
-            MajDomoDevice(self, Devices, nwkid, ep, "0001", str(value))
+            zlinky_publish(self, Devices, nwkid, ep, "0001", str(value))
             if "Model" in self.ListOfDevices[nwkid] and self.ListOfDevices[nwkid]["Model"] in ZLINK_CONF_MODEL:
                 store_ZLinky_infos( self, nwkid, 'URMS1', value)
         elif attribut == "0905":
@@ -234,10 +280,10 @@ def zlinky_cluster_electrical_measurement(self, Devices, nwkid, ep, cluster, att
 
         store_ZLinky_infos( self, nwkid, 'IRMS1', value)
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
-        MajDomoDevice(self, Devices, nwkid, ep, cluster, str(value), Attribute_=attribut)
+        zlinky_publish(self, Devices, nwkid, ep, cluster, str(value), Attribute_=attribut)
 
         # Check if Intensity is below subscription level
-        MajDomoDevice( self, Devices, nwkid, ep, "0009", zlinky_check_alarm(self, Devices, nwkid, ep, value), Attribute_="0005", )
+        zlinky_publish(self, Devices, nwkid, ep, "0009", zlinky_check_alarm(self, Devices, nwkid, ep, value), Attribute_="0005", )
 
     elif attribut in ("050a", "090a", "0a0a"):  # Max Current
         if value == 0xFFFF:
@@ -338,22 +384,22 @@ def zlinky_cluster_electrical_measurement(self, Devices, nwkid, ep, cluster, att
         if "ZLinky" in self.ListOfDevices[nwkid] and "Color" in self.ListOfDevices[nwkid]["ZLinky"]:
             tarif_color = self.ListOfDevices[nwkid]["ZLinky"]["Color"]
             if tarif_color == "White":
-                MajDomoDevice(self, Devices, nwkid, "01", cluster, str(0), Attribute_=attribut)
-                MajDomoDevice(self, Devices, nwkid, "f2", cluster, str(value), Attribute_=attribut)
-                MajDomoDevice(self, Devices, nwkid, "f3", cluster, str(0), Attribute_=attribut)
+                zlinky_publish(self, Devices, nwkid, "01", cluster, str(0), Attribute_=attribut)
+                zlinky_publish(self, Devices, nwkid, "f2", cluster, str(value), Attribute_=attribut)
+                zlinky_publish(self, Devices, nwkid, "f3", cluster, str(0), Attribute_=attribut)
 
             elif tarif_color == "Red":
-                MajDomoDevice(self, Devices, nwkid, "01", cluster, str(0), Attribute_=attribut)
-                MajDomoDevice(self, Devices, nwkid, "f2", cluster, str(0), Attribute_=attribut)
-                MajDomoDevice(self, Devices, nwkid, "f3", cluster, str(value), Attribute_=attribut)
+                zlinky_publish(self, Devices, nwkid, "01", cluster, str(0), Attribute_=attribut)
+                zlinky_publish(self, Devices, nwkid, "f2", cluster, str(0), Attribute_=attribut)
+                zlinky_publish(self, Devices, nwkid, "f3", cluster, str(value), Attribute_=attribut)
 
             else:
                 # All others
-                MajDomoDevice(self, Devices, nwkid, "01", cluster, str(value), Attribute_=attribut)
-                MajDomoDevice(self, Devices, nwkid, "f2", cluster, str(0), Attribute_=attribut)
-                MajDomoDevice(self, Devices, nwkid, "f3", cluster, str(0), Attribute_=attribut)
+                zlinky_publish(self, Devices, nwkid, "01", cluster, str(value), Attribute_=attribut)
+                zlinky_publish(self, Devices, nwkid, "f2", cluster, str(0), Attribute_=attribut)
+                zlinky_publish(self, Devices, nwkid, "f3", cluster, str(0), Attribute_=attribut)
         else:
-            MajDomoDevice(self, Devices, nwkid, "01", cluster, str(value), Attribute_=attribut)
+            zlinky_publish(self, Devices, nwkid, "01", cluster, str(value), Attribute_=attribut)
 
         self.log.logging( "ZLinky", "Debug", "zlinky_cluster_electrical_measurement %s - %s/%s Apparent Power %s" % (cluster, nwkid, ep, value), nwkid, )
 
@@ -369,16 +415,16 @@ def zlinky_cluster_electrical_measurement(self, Devices, nwkid, ep, cluster, att
         if value == 0xFFFF:
             return
 
-        MajDomoDevice(self, Devices, nwkid, ep, cluster, str(value), Attribute_=attribut)
+        zlinky_publish(self, Devices, nwkid, ep, cluster, str(value), Attribute_=attribut)
         # Check if Intensity is below subscription level
         if attribut == "0908":
             self.log.logging("Cluster", "Debug", "zlinky_cluster_electrical_measurement %s - %s/%s %s Current L2 %s" % (cluster, nwkid, ep, attribut, value), nwkid)
-            MajDomoDevice( self, Devices, nwkid, "f2", "0009", zlinky_check_alarm(self, Devices, nwkid, ep, value), Attribute_="0005", )
+            zlinky_publish(self, Devices, nwkid, "f2", "0009", zlinky_check_alarm(self, Devices, nwkid, ep, value), Attribute_="0005", )
             store_ZLinky_infos( self, nwkid, 'IRMS2', value)
 
         elif attribut == "0a08":
             self.log.logging("Cluster", "Debug", "zlinky_cluster_electrical_measurement %s - %s/%s %s Current L3 %s" % (cluster, nwkid, ep, attribut, value), nwkid)
-            MajDomoDevice( self, Devices, nwkid, "f3", "0009", zlinky_check_alarm(self, Devices, nwkid, ep, value), Attribute_="0005", )
+            zlinky_publish(self, Devices, nwkid, "f3", "0009", zlinky_check_alarm(self, Devices, nwkid, ep, value), Attribute_="0005", )
             store_ZLinky_infos( self, nwkid, 'IRMS3', value)
         
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
@@ -432,13 +478,13 @@ def zlinky_cluster_lixee_private(self, Devices, nwkid, ep, cluster, attribut, va
 
         # Couleur du Lendemain DEMAIN Trigger Alarm
         if value == "BLAN":
-            MajDomoDevice(self, Devices, nwkid, ep, "0009", "20|Tomorrow WHITE day", Attribute_="0001")
+            zlinky_publish(self, Devices, nwkid, ep, "0009", "20|Tomorrow WHITE day", Attribute_="0001")
         elif value == "BLEU":
-            MajDomoDevice(self, Devices, nwkid, ep, "0009", "10|Tomorrow BLUE day", Attribute_="0001")
+            zlinky_publish(self, Devices, nwkid, ep, "0009", "10|Tomorrow BLUE day", Attribute_="0001")
         elif value == "ROUG":
-            MajDomoDevice(self, Devices, nwkid, ep, "0009", "40|Tomorrow RED day", Attribute_="0001")
+            zlinky_publish(self, Devices, nwkid, ep, "0009", "40|Tomorrow RED day", Attribute_="0001")
         else:
-            MajDomoDevice(self, Devices, nwkid, ep, "0009", "00|No information", Attribute_="0001")
+            zlinky_publish(self, Devices, nwkid, ep, "0009", "00|No information", Attribute_="0001")
 
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
 
@@ -467,9 +513,9 @@ def zlinky_cluster_lixee_private(self, Devices, nwkid, ep, cluster, attribut, va
         value = int(value)
 
         if value == 0:
-            MajDomoDevice(self, Devices, nwkid, ep, "0009", "00|No information", Attribute_="0001")
+            zlinky_publish(self, Devices, nwkid, ep, "0009", "00|No information", Attribute_="0001")
         else:
-            MajDomoDevice( self, Devices, nwkid, ep, "0009", "40|Mobile peak preannoncement: %s" % value, Attribute_="0001", )
+            zlinky_publish(self, Devices, nwkid, ep, "0009", "40|Mobile peak preannoncement: %s" % value, Attribute_="0001", )
 
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
 
@@ -492,15 +538,15 @@ def zlinky_cluster_lixee_private(self, Devices, nwkid, ep, cluster, attribut, va
             _tmpattr = "0a08"
 
         if value == 0:
-            MajDomoDevice(self, Devices, nwkid, _tmpep, "0009", "00|Normal", Attribute_="0005")
+            zlinky_publish(self, Devices, nwkid, _tmpep, "0009", "00|Normal", Attribute_="0005")
             return
 
         # value is equal to the Amper over the souscription
         # Issue critical alarm
-        MajDomoDevice(self, Devices, nwkid, _tmpep, "0009", "04|Critical", Attribute_="0005")
+        zlinky_publish(self, Devices, nwkid, _tmpep, "0009", "04|Critical", Attribute_="0005")
 
         # Isse Current on the corresponding Ampere
-        MajDomoDevice(self, Devices, nwkid, ep, "0b04", str(value), Attribute_=_tmpattr)
+        zlinky_publish(self, Devices, nwkid, ep, "0b04", str(value), Attribute_=_tmpattr)
 
     elif attribut == "0201":
         # Standard : NTARF
@@ -524,7 +570,7 @@ def zlinky_cluster_lixee_private(self, Devices, nwkid, ep, cluster, attribut, va
         elif "HC" in value:
             s_tarif += "HC"
 
-        MajDomoDevice(self, Devices, nwkid, ep, "0009", s_tarif, Attribute_="0020")
+        zlinky_publish(self, Devices, nwkid, ep, "0009", s_tarif, Attribute_="0020")
         checkAndStoreAttributeValue(self, nwkid, ep, cluster, attribut, value)
         store_ZLinky_infos( self, nwkid, 'NTARF', value)
         
@@ -15,8 +15,8 @@
 # - beta
 
 
-import dns.resolver
-import requests
+import urllib.error
+import urllib.request
 
 PLUGIN_TXT_RECORD = "zigate_plugin.pipiche.net"
 ZIGATEV1_FIRMWARE_TXT_RECORD = "zigatev1.pipiche.net"
@@ -30,30 +30,11 @@ ZIGATE_DNS_RECORDS = {
 }
 
 
-def check_plugin_version_against_dns(self, zigbee_communication, branch, zigate_model):
-    self.log.logging("Plugin", "Debug", f"check_plugin_version_against_dns {zigbee_communication} {branch} {zigate_model}")
+def available_versions(plugin_record, firmware_record, zigbee_communication, branch):
+    """ ( plugin version, firmware major, firmware minor ) from the DNS TXT records, None if not supported """
 
-    plugin_version = None
-    plugin_version = _get_dns_txt_record(self, PLUGIN_TXT_RECORD)
-    self.log.logging("Plugin", "Debug", f"check_plugin_version_against_dns {plugin_version}")
-
-    if plugin_version is None:
-        # Something weird happened
-        self.log.logging("Plugin", "Error", "Unable to get access to plugin expected version. Is Internet access available ?")
-        return (0, 0, 0)
-
-    plugin_version_dict = _parse_dns_txt_record( plugin_version)
-    self.log.logging("Plugin", "Debug", f"check_plugin_version_against_dns {plugin_version} {plugin_version_dict}")
-
-    # If native communication (zigate) let's find the zigate firmware
-    firmware_version = None
-    if zigbee_communication == "native":
-        zigate_plugin_record = ZIGATE_DNS_RECORDS.get(zigate_model)
-        firmware_version = _get_dns_txt_record(self, zigate_plugin_record)
-        firmware_version_dict = _parse_dns_txt_record(firmware_version)
-        self.log.logging("Plugin", "Debug", f"check_plugin_version_against_dns {firmware_version} {firmware_version_dict}")
-
-    self.log.logging("Plugin", "Debug", f"check_plugin_version_against_dns {plugin_version} {plugin_version_dict}")
+    plugin_version_dict = _parse_dns_txt_record(plugin_record)
+    firmware_version_dict = _parse_dns_txt_record(firmware_record)
 
     if zigbee_communication == "native" and branch in plugin_version_dict and "firmMajor" in firmware_version_dict and "firmMinor" in firmware_version_dict:
         return (plugin_version_dict[branch], firmware_version_dict["firmMajor"], firmware_version_dict["firmMinor"])
@@ -61,34 +42,23 @@ def check_plugin_version_against_dns(self, zigbee_communication, branch, zigate_
     if zigbee_communication == "zigpy" and branch in plugin_version_dict:
         return (plugin_version_dict[branch], 0, 0)
 
-    self.log.logging("Plugin", "Error", f"You are running {branch}-{plugin_version}, a NOT SUPPORTED version. ")
-    return (0, 0, 0)
-
-
-def _get_dns_txt_record(self, record, timeout=1):
-    if not self.internet_available:
-        return None
-
-    try:
-        result = dns.resolver.resolve(record, "TXT", tcp=True, lifetime=1).response.answer[0]
-        return str(result[0]).strip('"')
-
-    except dns.resolver.Timeout:
-        error_message = f"DNS resolution timed out for {record} after {timeout} second"
-        self.internet_available = False
+    return None
 
-    except dns.resolver.NoAnswer:
-        error_message = f"DNS TXT record not found for {record}"
 
-    except dns.resolver.NoNameservers:
-        error_message = f"No nameservers found for {record}"
-        self.internet_available = False
+def resolve_dns_txt_record(record, timeout=1, nameservers=None, port=53):
+    """ Value of the DNS TXT record. Raise an exception if it cannot be resolved """
 
-    except Exception as e:
-        error_message = f"An unexpected error occurred while resolving DNS TXT record for {record}: {e}"
+    # dnspython is only loaded when the version check is done, it is heavy to import at plugin startup
+    import dns.resolver
 
-    self.log.logging("Plugin", "Error", error_message)
-    return None
+    if nameservers:
+        resolver = dns.resolver.Resolver(configure=False)
+        resolver.nameservers = list(nameservers)
+        resolver.port = port
+    else:
+        resolver = dns.resolver.get_default_resolver()
+    result = resolver.resolve(record, "TXT", tcp=True, lifetime=timeout).response.answer[0]
+    return str(result[0]).strip('"')
 
 
 def _parse_dns_txt_record(txt_record):
@@ -129,10 +99,9 @@ def is_zigate_firmware_available(self, currentMajorVersion, currentFirmwareVersi
     return False
 
 
-def is_internet_available():
+def is_internet_available(url="http://www.google.com", timeout=3):
     try:
-        response = requests.get("http://www.google.com", timeout=3)
-        # Check if the status code is a success code (2xx)
-        return response.status_code == 200
-    except requests.ConnectionError:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError):
         return False
@@ -37,6 +37,7 @@ from Modules.ikeaTradfri import ikea_air_purifier_mode
 from Modules.legrand_netatmo import cable_connected_mode, legrand_fc40
 from Modules.livolo import livolo_OnOff
 from Modules.profalux import profalux_MoveToLiftAndTilt, profalux_stop
+from Modules.sceneBurst import scene_burst_onoff
 from Modules.schneider_wiser import (schneider_EHZBRTS_thermoMode,
                                      schneider_hact_fip_mode,
                                      schneider_hact_heater_type,
@@ -144,35 +145,83 @@ ACTIONATORS = [
 ]
 
 
-def domoticz_command(self, Devices, DeviceID, Unit, Nwkid, Command, Level, Color):
-    """ Handle Domoticz onCommand"""
-    
-    widget_name = domo_read_Name(self, Devices, DeviceID, Unit)
-    self.log.logging("Command", "Debug", f"mgtCommand ({Nwkid}) {DeviceID} {Unit} Name: {widget_name} Command: {Command} Level: {Level} Color: {Color}", Nwkid)
+# Routing of the commands: { ( DeviceID, Unit ): ( Nwkid, EPout, Widget Idx, DeviceType, forceUpdateDev, actionable ) }
+# The plan is built at the first command on a widget, and checked at each use against the device record and the
+# widget index, so a widget created/removed, a new widget type or a new Short Address leads to build it again.
+COMMAND_PLANS = {}
+
+
+def _widget_type(self, Nwkid, EPout, widget_idx):
+    """ DeviceType of a widget, as currently found in the device record """
+
+    device = self.ListOfDevices.get(Nwkid)
+    if device is None:
+        return None
+    if EPout == "00" and device.get("ClusterType"):
+        # Old fashion, with the widgets at the global level
+        return device["ClusterType"].get(widget_idx)
+    return device.get("Ep", {}).get(EPout, {}).get("ClusterType", {}).get(widget_idx)
+
+
+def command_plan(self, Devices, DeviceID, Unit, Nwkid):
+    """ Return ( EPout, DeviceType, forceUpdateDev, actionable ) for a widget, or None if it cannot be resolved """
+
+    plan = COMMAND_PLANS.get((DeviceID, Unit))
+    if plan is not None:
+        plan_nwkid, EPout, widget_idx, DeviceType, forceUpdateDev, actionable = plan
+        if (
+            plan_nwkid == Nwkid
+            and int(widget_idx) in self.ListOfDomoticzWidget
+            and _widget_type(self, Nwkid, EPout, widget_idx) == DeviceType
+        ):
+            return EPout, DeviceType, forceUpdateDev, actionable
+        del COMMAND_PLANS[(DeviceID, Unit)]
 
-    SignalLevel, BatteryLevel = RetreiveSignalLvlBattery(self, Nwkid)
     ClusterTypeList = RetreiveWidgetTypeList(self, Devices, DeviceID, Nwkid, Unit)
-    
     if not ClusterTypeList or len(ClusterTypeList) != 1:
         self.log.logging("Command", "Error", f"Unexpected ClusterTypeList: {ClusterTypeList} for Nwkid: {Nwkid}")
-        return
+        return None
 
     EPout, DeviceTypeWidgetId, DeviceType = ClusterTypeList[0]
+    forceUpdateDev = SWITCH_SELECTORS.get(DeviceType, {}).get("ForceUpdate", False)
+    actionable = DeviceType in ACTIONATORS
+    COMMAND_PLANS[(DeviceID, Unit)] = (Nwkid, EPout, DeviceTypeWidgetId, DeviceType, forceUpdateDev, actionable)
+    return EPout, DeviceType, forceUpdateDev, actionable
 
-    if self.ListOfDevices.get(Nwkid, {}).get("Health") == "Disabled":
-        self.log.logging("Command", "Error", f"Attempted action on a disabled device: {widget_name}/{Nwkid}")
+
+def invalidate_command_plans(DeviceID=None):
+    """ Drop the plans of a device ( all of them if DeviceID is None ) """
+
+    for key in list(COMMAND_PLANS):
+        if DeviceID is None or key[0] == DeviceID:
+            COMMAND_PLANS.pop(key, None)
+
+
+def domoticz_command(self, Devices, DeviceID, Unit, Nwkid, Command, Level, Color):
+    """ Handle Domoticz onCommand"""
+
+    if self.pluginconf.pluginConf.get("Command"):
+        widget_name = domo_read_Name(self, Devices, DeviceID, Unit)
+        self.log.logging("Command", "Debug", f"mgtCommand ({Nwkid}) {DeviceID} {Unit} Name: {widget_name} Command: {Command} Level: {Level} Color: {Color}", Nwkid)
+
+    plan = command_plan(self, Devices, DeviceID, Unit, Nwkid)
+    if plan is None:
         return
+    EPout, DeviceType, forceUpdateDev, actionable = plan
 
-    forceUpdateDev = SWITCH_SELECTORS.get(DeviceType, {}).get("ForceUpdate", False)
+    if self.ListOfDevices.get(Nwkid, {}).get("Health") == "Disabled":
+        self.log.logging("Command", "Error", f"Attempted action on a disabled device: {domo_read_Name(self, Devices, DeviceID, Unit)}/{Nwkid}")
+        return
 
-    if DeviceType not in ACTIONATORS and not self.pluginconf.pluginConf.get("forcePassiveWidget"):
-        self.log.logging("Command", "Log", f"mgtCommand - You are trying to action not allowed for Device: {widget_name} Type: {ClusterTypeList} and DeviceType: {DeviceType} Command: {Command} Level:{Level}", Nwkid)
+    if not actionable and not self.pluginconf.pluginConf.get("forcePassiveWidget"):
+        self.log.logging("Command", "Log", f"mgtCommand - You are trying to action not allowed for Device: {domo_read_Name(self, Devices, DeviceID, Unit)} DeviceType: {DeviceType} Command: {Command} Level:{Level}", Nwkid)
         return
     
     health_value = self.ListOfDevices.get(Nwkid, {}).get("Health")
     if health_value == "Not Reachable":
         self.ListOfDevices.setdefault(Nwkid, {})["Health"] = ""
 
+    SignalLevel, BatteryLevel = RetreiveSignalLvlBattery(self, Nwkid)
 
     if Command == "Stop":
         handle_command_stop(self, Devices, DeviceID, Unit, Nwkid, EPout, DeviceType, BatteryLevel, SignalLevel, forceUpdateDev)
@@ -473,7 +522,7 @@ def _off_command_default(self, Nwkid, EPout, profalux, model_name):
 
         actuator_off(self, Nwkid, EPout, "Light", effect)
     else:
-        actuator_off(self, Nwkid, EPout, "Light")
+        scene_burst_onoff(self, Nwkid, EPout, "Off")
 
     # Making a trick for the GLEDOPTO LED STRIP.
     if model_name == "GLEDOPTO" and EPout == "0a":
@@ -621,7 +670,7 @@ def handle_command_on(self,Devices, DeviceID, Unit, Level, Nwkid, EPout, DeviceT
             actuator_setlevel(self, Nwkid, EPout, 255, "Light", "0000", withOnOff=False)
 
     else:
-        actuator_on(self, Nwkid, EPout, "Light")
+        scene_burst_onoff(self, Nwkid, EPout, "On")
 
     if is_dimmable_blind(self, Devices, DeviceID, Unit):
         # (13, 14, 15, 16)
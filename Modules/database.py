@@ -22,9 +22,12 @@ import json
 import os.path
 import time
 from pathlib import Path
+from sys import intern, maxsize
 from typing import Dict
 
 import Modules.tools
+from Classes.DeviceTemplates import DeviceTemplates
+from Modules.deviceRecords import compact
 from Modules.domoticzAbstractLayer import getConfigItem, setConfigItem
 from Modules.manufacturer_code import check_and_update_manufcode
 from Modules.pluginDbAttributes import (STORE_CONFIGURE_REPORTING,
@@ -275,7 +278,7 @@ def loadTxtDatabase(self, dbName):
                 continue
             else:
                 nb += 1
-                CheckDeviceList(self, key, val)
+                CheckDeviceList(self, intern(key), dlVal)
     return res
 
 
@@ -350,6 +353,11 @@ def WriteDeviceList(self, count):  # sourcery skip: merge-nested-ifs
     self.HBcount = 0
 
 
+def ScheduleDeviceListWrite(self):
+    # The DeviceList will be written at the next call of WriteDeviceList (next heartbeat)
+    self.HBcount = maxsize
+
+
 def _write_DeviceList_txt(self):
     # Write in classic format ( .txt )
     _pluginData = Path( self.pluginconf.pluginConf["pluginData"] )
@@ -404,14 +412,16 @@ def _write_DeviceList_Domoticz(self):
 def importDeviceConf(self):
     # Import DeviceConf.txt
     tmpread = ""
-    self.DeviceConf = {}
+    if not isinstance(self.DeviceConf, DeviceTemplates):
+        # Loaded in a fresh registry ( startup, or the staging one of a reload ), never in one already shared
+        self.DeviceConf = DeviceTemplates()
     _pluginConfig = Path( self.pluginconf.pluginConf["pluginConfig"] )
     _DeviceConf = _pluginConfig / "DeviceConf.txt"
     if os.path.isfile(_DeviceConf):
         with open(_DeviceConf, "r") as myfile:
             tmpread += myfile.read().replace("\n", "")
             try:
-                self.DeviceConf = eval(tmpread)
+                self.DeviceConf.update(eval(tmpread))
             except (SyntaxError, NameError, TypeError, ZeroDivisionError):
                 self.log.logging("Database", "Error", "Error while loading %s in line : %s" % (
                     self.pluginconf.pluginConf["pluginConfig"] + "DeviceConf.txt", tmpread) )
@@ -481,6 +491,14 @@ def import_local_device_conf(self):
     self.log.logging("Database", "Status", "Z4D loads %s configuration from the local certified Db." %len(self.DeviceConf))
 
 
+def compile_device_templates(self):
+    # To be called once all templates are loaded ( DeviceConf.txt, Local-Devices and certified devices )
+    self.DeviceConf.compile()
+    report = self.DeviceConf.report()
+    self.log.logging("Database", "Status", "Z4D device templates compiled: %s models, %s clusters, %s manufacturers in %s ms" % (
+        report["Models"], report["Clusters"], report["Manufacturers"], report["CompileTime_ms"]))
+
+
 def checkDevices2LOD(self, Devices):
 
     for nwkid in self.ListOfDevices:
@@ -522,15 +540,14 @@ def saveZigateNetworkData(self, nkwdata):
         self.log.logging("Database", "Error", "Error while writing Zigate Network Details%s" % json_filename)
 
 
-def CheckDeviceList(self, key, val):
+def CheckDeviceList(self, key, DeviceListVal):
     """
     This function is call during DeviceList load
     """
 
     self.log.logging("Database", "Debug", "CheckDeviceList - Address search : " + str(key), key)
-    self.log.logging("Database", "Debug2", "CheckDeviceList - with value : " + str(val), key)
+    self.log.logging("Database", "Debug2", "CheckDeviceList - with value : " + str(DeviceListVal), key)
 
-    DeviceListVal = eval(val)
     # Do not load Devices in State == 'unknown' or 'left'
     if "Status" in DeviceListVal and DeviceListVal["Status"] in (
         "UNKNOW",
@@ -548,7 +565,7 @@ def CheckDeviceList(self, key, val):
 
     if Modules.tools.DeviceExist(self, key, DeviceListVal.get("IEEE", "")):
         # Do not load Devices
-        self.log.logging("Database", "Error", "Not Loading %s as no existing IEEE: %s" % (key, str(val)))
+        self.log.logging("Database", "Error", "Not Loading %s as no existing IEEE: %s" % (key, str(DeviceListVal)))
         return
 
     if key == "0000":
@@ -583,7 +600,7 @@ def CheckDeviceList(self, key, val):
             # self.log.logging( "Database", 'Debug', "--> Attributes not existing: %s" %attribute)
             continue
 
-        self.ListOfDevices[key][attribute] = DeviceListVal[attribute]
+        self.ListOfDevices[key][attribute] = compact(DeviceListVal[attribute])
 
         # Patching unitialize Model to empty
         if attribute == "Model" and self.ListOfDevices[key][attribute] == {}:
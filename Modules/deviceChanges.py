@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Implementation of Zigbee for Domoticz plugin.
+#
+# This file is part of Zigbee for Domoticz plugin. https://github.com/zigbeefordomoticz/Domoticz-Zigbee
+# (C) 2015-2024
+#
+# Initial authors: zaraki673 & pipiche38
+#
+# SPDX-License-Identifier:    GPL-3.0 license
+
+"""
+    Journal of the devices changed in ListOfDevices.
+
+    The main write paths ( inbound frames, commands sent, Short Address changes, WebUI updates ) mark the device as
+    changed, so the consumers ( the device summary cache of the WebServer ) only look at those devices instead of
+    scanning the whole ListOfDevices. The journal is shared by the plugin and the WebServer threads.
+"""
+
+import threading
+import time
+
+_CHANGES_LOCK = threading.Lock()
+_CHANGED = {}  # { nwkid: time of the last change }
+
+
+def mark_device_changed(nwkid):
+    with _CHANGES_LOCK:
+        _CHANGED[nwkid] = time.time()
+
+
+def pop_changed_devices():
+    """ Return and clear the devices changed since the last call, as { nwkid: time of the last change } """
+
+    global _CHANGED
+    with _CHANGES_LOCK:
+        changed, _CHANGED = _CHANGED, {}
+    return changed
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Implementation of Zigbee for Domoticz plugin.
+#
+# This file is part of Zigbee for Domoticz plugin. https://github.com/zigbeefordomoticz/Domoticz-Zigbee
+# (C) 2015-2024
+#
+# Initial authors: zaraki673 & pipiche38
+#
+# SPDX-License-Identifier:    GPL-3.0 license
+
+"""
+    Identity of the devices: Short Address ( NwkId ) <-> IEEE.
+
+    ListOfDevices ( keyed by NwkId ) and IEEE2NWK ( keyed by IEEE ) are the two sides of the index. When a device
+    comes back with a new Short Address, both are updated together under IDENTITY_LOCK, and the change is recorded in
+    an audit log. Domoticz widgets are attached to the IEEE, so they are not impacted by a new Short Address.
+
+    The Short Addresses found in the last neighbour table of each router are indexed as well, so an unknown Short
+    Address ( or a device not answering anymore ) can be resolved without scanning all tables. The index is rebuilt at
+    most every NEIGHBOURS_INDEX_TTL seconds, or NEIGHBOURS_INDEX_MISS_TTL seconds when an address is not found.
+"""
+
+import threading
+import time
+from collections import deque
+
+from Modules.deviceChanges import mark_device_changed
+
+IDENTITY_LOCK = threading.RLock()
+
+ADDRESS_CHANGES_SIZE = 500
+ADDRESS_CHANGES = deque(maxlen=ADDRESS_CHANGES_SIZE)  # ( time, ieee, old nwkid, new nwkid, reason )
+
+NEIGHBOURS_INDEX_TTL = 60
+NEIGHBOURS_INDEX_MISS_TTL = 5
+_NEIGHBOURS_INDEX = {"Time": 0, "Nwkid": {}, "IEEE": {}}
+
+
+def record_address_change(self, ieee, old_nwkid, new_nwkid, reason):
+    ADDRESS_CHANGES.append((int(time.time()), ieee, old_nwkid, new_nwkid, reason))
+    self.log.logging("PluginTools", "Debug", "record_address_change - %s %s -> %s ( %s )" % (ieee, old_nwkid, new_nwkid, reason))
+
+
+def address_changes():
+    """ Audit log of the Short Address changes, oldest first """
+
+    return [
+        {"Time": timestamp, "IEEE": ieee, "OldNwkId": old_nwkid, "NewNwkId": new_nwkid, "Reason": reason}
+        for timestamp, ieee, old_nwkid, new_nwkid, reason in list(ADDRESS_CHANGES)
+    ]
+
+
+def move_device_record(self, new_nwkid, ieee, old_nwkid, reason):
+    """ Move the record of a device to its new Short Address. Both sides of the index are updated together """
+
+    with IDENTITY_LOCK:
+        record = self.ListOfDevices[old_nwkid]
+        self.ListOfDevices[new_nwkid] = record
+        self.IEEE2NWK[ieee] = new_nwkid
+        del self.ListOfDevices[old_nwkid]
+        record_address_change(self, ieee, old_nwkid, new_nwkid, reason)
+        # The neighbour tables are unchanged, only the Short Address known for this IEEE is updated in the index
+        if ieee in _NEIGHBOURS_INDEX["IEEE"]:
+            _NEIGHBOURS_INDEX["IEEE"][ieee] = new_nwkid
+    mark_device_changed(old_nwkid)
+    mark_device_changed(new_nwkid)
+
+
+def drop_device_identity(self, nwkid, ieee, reason):
+    """ Forget a device, which will be (re)created by the Device Announcement """
+
+    with IDENTITY_LOCK:
+        if self.IEEE2NWK.get(ieee) == nwkid:
+            del self.IEEE2NWK[ieee]
+        self.ListOfDevices.pop(nwkid, None)
+        record_address_change(self, ieee, nwkid, None, reason)
+    mark_device_changed(nwkid)
+    if getattr(self, "livenessTracker", None):
+        self.livenessTracker.forget(ieee)
+
+
+def _build_neighbours_index(self):
+    nwkid_index = {}  # { nwkid: [ ieee ] } as seen by the routers
+    ieee_index = {}  # { ieee: nwkid }
+    # A router moved to a new Short Address while scanning would be missed, until the next rebuild
+    with IDENTITY_LOCK:
+        for router in list(self.ListOfDevices.keys()):
+            tables = self.ListOfDevices.get(router, {}).get("Neighbours")
+            if not tables or not isinstance(tables, list):
+                continue
+            # We are interested only on the last one
+            for item in tables[-1].get("Devices", ()):
+                if not isinstance(item, dict):
+                    continue
+                for nwkid, neighbour in item.items():
+                    if not isinstance(neighbour, dict) or "_IEEE" not in neighbour:
+                        continue
+                    ieee = neighbour["_IEEE"]
+                    candidates = nwkid_index.setdefault(nwkid, [])
+                    if ieee not in candidates:
+                        candidates.append(ieee)
+                    ieee_index.setdefault(ieee, nwkid)
+
+        _NEIGHBOURS_INDEX["Nwkid"] = nwkid_index
+        _NEIGHBOURS_INDEX["IEEE"] = ieee_index
+        _NEIGHBOURS_INDEX["Time"] = time.time()
+
+
+def _neighbours_index_lookup(self, table, key):
+    age = time.time() - _NEIGHBOURS_INDEX["Time"]
+    if age >= NEIGHBOURS_INDEX_TTL or (key not in _NEIGHBOURS_INDEX[table] and age >= NEIGHBOURS_INDEX_MISS_TTL):
+        _build_neighbours_index(self)
+    return _NEIGHBOURS_INDEX[table].get(key)
+
+
+def neighbours_ieee_candidates(self, nwkid):
+    """ IEEE(s) reported by the routers for a Short Address """
+
+    return _neighbours_index_lookup(self, "Nwkid", nwkid) or []
+
+
+def neighbours_nwkid(self, ieee):
+    """ Short Address reported by the routers for an IEEE """
+
+    return _neighbours_index_lookup(self, "IEEE", ieee)
+
+
+def invalidate_neighbours_index():
+    _NEIGHBOURS_INDEX["Time"] = 0
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Implementation of Zigbee for Domoticz plugin.
+#
+# This file is part of Zigbee for Domoticz plugin. https://github.com/zigbeefordomoticz/Domoticz-Zigbee
+# (C) 2015-2024
+#
+# Initial authors: zaraki673 & pipiche38
+#
+# SPDX-License-Identifier:    GPL-3.0 license
+
+"""
+    Interning of the ListOfDevices records, and memory report per device.
+
+    A device record is a tree of dicts keyed by short strings ( "Ep", "ClusterType", "0006", "01", "0000" ... ),
+    and most leaves are short strings as well. The DeviceList loader already gets the identifier-like ones
+    ( hex ids, keys ) interned by eval(), so compact() only shares the other short strings repeated across devices
+    ( model names, "End Device", "IKEA of Sweden" ... ). The records remain plain dicts.
+
+    On a synthetic 300 devices DeviceList, this saves about 3% of the footprint: dicts are about three quarters of it,
+    and are not changed. A typed, slotted record layer is not implemented.
+"""
+
+import sys
+from sys import intern
+
+# Strings longer than that ( names, payloads, IR codes ... ) are most likely unique, and are not interned
+INTERN_MAX_LENGTH = 32
+
+
+def compact(value):
+    """ Return a copy of a plugin data structure, where keys and short strings are interned """
+
+    if isinstance(value, dict):
+        return {(intern(key) if type(key) is str else key): compact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [compact(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(compact(item) for item in value)
+    if type(value) is str and len(value) <= INTERN_MAX_LENGTH:
+        return intern(value)
+    return value
+
+
+def compact_values(record):
+    """ Intern in place the short string values of a record. Done once, when the widgets of the device are created.
+
+    Keys are left untouched, as replacing a key requires to remove it and would expose a missing entry to the other
+    threads. Replacing a value is atomic.
+    """
+
+    stack = [record]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            for key, value in list(item.items()):
+                if type(value) is str and len(value) <= INTERN_MAX_LENGTH:
+                    item[key] = intern(value)
+                elif isinstance(value, (dict, list)):
+                    stack.append(value)
+        elif isinstance(item, list):
+            for index, value in enumerate(list(item)):
+                if type(value) is str and len(value) <= INTERN_MAX_LENGTH:
+                    item[index] = intern(value)
+                elif isinstance(value, (dict, list)):
+                    stack.append(value)
+
+
+def record_size(value, seen):
+    """ Memory (in bytes) used by a data structure, not counting the objects already in seen """
+
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set)):
+            stack.extend(item)
+    return size
+
+
+def memory_report(self):
+    """ Memory used by each device record, and by ListOfDevices as a whole.
+
+    "Size" is the footprint of the record on its own, "Own" is what is not shared with the records reported before,
+    so the sum of "Own" is the real footprint of ListOfDevices.
+    """
+
+    shared = set()
+    devices = {}
+    total = 0
+    for nwkid, record in list(self.ListOfDevices.items()):
+        own = record_size(record, shared)
+        total += own
+        devices[nwkid] = {
+            "IEEE": record.get("IEEE", ""),
+            "Model": record.get("Model", ""),
+            "Size": record_size(record, set()),
+            "Own": own,
+        }
+    return {"Devices": devices, "NbDevices": len(devices), "Total": total}
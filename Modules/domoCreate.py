@@ -16,6 +16,8 @@
 """
 
 
+from Modules.deviceChanges import mark_device_changed
+from Modules.deviceRecords import compact_values
 from Modules.domoticzAbstractLayer import (FreeUnit, domo_create_api)
 from Modules.domoTools import (GetType, subtypeRGB_FromProfile_Device_IDs,
                                subtypeRGB_FromProfile_Device_IDs_onEp2,
@@ -321,6 +323,9 @@ def CreateDomoDevice(self, Devices, NWKID):
 
     # for Ep
     update_device_type( self, NWKID, GlobalType )
+    # The record is complete ( provisioning, model update ), intern the values collected since its creation
+    compact_values(self.ListOfDevices[NWKID])
+    mark_device_changed(NWKID)
 
 def update_device_type( self, NWKID, GlobalType ):
     self.log.logging("WidgetCreation", "Debug", "GlobalType: %s" % (str(GlobalType)), NWKID)
@@ -16,6 +16,7 @@
     Description: Update of Domoticz Widget
 """
 
+from Classes.LatencyHistogram import measure_latency
 from Modules.domoticzAbstractLayer import (domo_check_unit,
                                            domo_read_Device_Idx,
                                            domo_read_nValue_sValue,
@@ -44,6 +45,7 @@ WIDGET_TO_BYPASS_EP_MATCH = ("XCube", "Aqara", "DSwitch", "DButton", "DButton_3"
 
 
 
+@measure_latency("domoMaj")
 def MajDomoDevice(self, Devices, NwkId, Ep, ClusterId, value, Attribute_="", Color_=""):
     """
     MajDomoDevice
@@ -19,9 +19,10 @@
 
 import time
 
+from Modules.deviceChanges import mark_device_changed
 from Modules.domoticzAbstractLayer import (
-    device_touch_api, domo_read_BatteryLevel, domo_read_Color,
-    domo_read_Device_Idx, domo_read_LastUpdate, domo_read_Name,
+    device_status_invalidate, device_touch_api, domo_read_BatteryLevel,
+    domo_read_Color, domo_read_Device_Idx, domo_read_LastUpdate, domo_read_Name,
     domo_read_nValue_sValue, domo_read_Options, domo_read_TimedOut,
     domo_update_api, domoticz_log_api, is_domoticz_extended,
     retreive_widgetid_from_deviceId_unit, timeout_widget_api,
@@ -310,14 +311,11 @@ def timedOutDevice(self, Devices, NwkId=None, MarkTimedOut=True):
         return
 
     device_info["Health"] = "TimedOut" if MarkTimedOut else "Live"
+    mark_device_changed(NwkId)
     self.log.logging("WidgetLevel3", "Debug", f"timedOutDevice Object {NwkId} MarkTimedOut: {MarkTimedOut}")
 
-    _IEEE = device_info["IEEE"]
-    
-    if MarkTimedOut and not domo_read_TimedOut(self, Devices, _IEEE):
-        timeout_widget_api(self, Devices, _IEEE, 1)
-    else:
-        timeout_widget_api(self, Devices, _IEEE, 0)
+    # Domoticz widgets will be updated by liveness_flush()
+    self.livenessTracker.request(device_info["IEEE"], "TimedOut" if MarkTimedOut else "Live")
 
 
 def lastSeenUpdate(self, Devices, NwkId=None):
@@ -334,25 +332,52 @@ def lastSeenUpdate(self, Devices, NwkId=None):
     if health_data not in ("Disabled", ):
         device_data["Health"] = "Live"
 
+    _IEEE = device_data.get("IEEE", "")
+    self.livenessTracker.seen(_IEEE)
+
     device_data_stamp = device_data.get( 'Stamp')
     device_data_stamp.setdefault("LastSeen", 0)
-    if device_data_stamp.get("LastSeen") and now < ( int(device_data_stamp.get("LastSeen")) + DELAY_BETWEEN_TOUCH):
+    if self.livenessTracker.is_timedout(_IEEE):
+        # Back from a TimedOut, let's clear it whatever the last touch
+        self.log.logging("WidgetLevel3", "Debug", f"lastSeenUpdate Nwkid {NwkId} back from TimedOut")
+
+    elif device_data_stamp.get("LastSeen") and now < ( int(device_data_stamp.get("LastSeen")) + DELAY_BETWEEN_TOUCH):
         self.log.logging("WidgetLevel3", "Debug", f"lastSeenUpdate Nwkid {NwkId} too early {device_data_stamp.get('LastSeen')}")     
         return
 
     device_data_stamp["LastSeen"] = now
-    _IEEE = device_data.get("IEEE", "")
-
-    if not is_domoticz_touch(self):
-        self.log.logging("WidgetLevel3", "Debug", f"Not the good Domoticz level for Touch {self.VersionNewFashion} {self.DomoticzMajor} {self.DomoticzMinor}", NwkId)
-        return
-    
+    mark_device_changed(NwkId)
     self.log.logging("WidgetLevel3", "Debug", f"lastSeenUpdate Nwkid {NwkId} DeviceId {_IEEE}")
+    self.livenessTracker.request(_IEEE, "Live")
 
-    if domo_read_TimedOut(self, Devices, _IEEE):
-        timeout_widget_api(self, Devices, _IEEE, 0) 
-    else:
-        device_touch_api(self, Devices, _IEEE)
+
+def liveness_flush(self, Devices):
+    """ Push to Domoticz a batch of the Touch and TimedOut requests """
+
+    for ieee, state in self.livenessTracker.pop_batch(self.pluginconf.pluginConf.get("livenessBatchSize", 50)):
+        if ieee not in self.IEEE2NWK:
+            # Removed in the meantime
+            continue
+
+        timedout = self.livenessTracker.is_timedout(ieee)
+        if timedout is None:
+            timedout = domo_read_TimedOut(self, Devices, ieee)
+
+        if state == "TimedOut":
+            if not timedout:
+                timeout_widget_api(self, Devices, ieee, 1)
+            self.livenessTracker.pushed(ieee, 1)
+
+        elif timedout:
+            timeout_widget_api(self, Devices, ieee, 0)
+            self.livenessTracker.pushed(ieee, 0)
+
+        else:
+            self.livenessTracker.pushed(ieee, 0)
+            if is_domoticz_touch(self):
+                device_touch_api(self, Devices, ieee)
+            else:
+                self.log.logging("WidgetLevel3", "Debug", f"Not the good Domoticz level for Touch {self.VersionNewFashion} {self.DomoticzMajor} {self.DomoticzMinor}")
 
 
 def GetType(self, Addr, Ep):
@@ -650,6 +675,7 @@ def remove_bad_cluster_type_entry(self, NwkId, Ep, clusterID, Widget_Idx ):
         and Widget_Idx in self.ListOfDevices[NwkId]["Ep"][Ep]["ClusterType"]
     ):
         del self.ListOfDevices[ NwkId ][ "Ep"][ Ep ][ "ClusterType" ][ Widget_Idx ]
+        mark_device_changed(NwkId)
         return True
     return False
 
@@ -662,12 +688,14 @@ def remove_all_widgets( self, Devices, NwkId):
     for _unit in list(Devices):
         if Devices[_unit].DeviceID == ieee:
             Devices[_unit].Delete()
+    device_status_invalidate(self)
         
     if "ClusterType" in self.ListOfDevices[NwkId]:
         self.ListOfDevices[NwkId]["ClusterType"] = {}
     for _ep in self.ListOfDevices[NwkId]["Ep"]:
         if "ClusterType" in self.ListOfDevices[NwkId]["Ep"][ _ep ]:
             self.ListOfDevices[NwkId]["Ep"][ _ep ]["ClusterType"] = {}
+    mark_device_changed(NwkId)
     
         
 def update_model_name( self, nwkid, new_model ):
@@ -20,6 +20,8 @@ import time
 #DOMOTICZ_EXTENDED_API = True#
 import Domoticz as Domoticz
 
+from Classes.LatencyHistogram import measure_latency
+
 DIMMABLE_WIDGETS = {
     (7, 1, 241): { "Widget": "Dimmable_Light", "Name": "RGBW", "partially_opened_nValue": 15},
     (7, 2, 241): { "Widget": "Dimmable_Light", "Name": "RGB", "partially_opened_nValue": 15},
@@ -355,6 +357,7 @@ def domo_create_api(self, Devices, DeviceID_, Unit_, Name_, widgetType=None, Typ
         myDev = domoticz_device_api_class( DeviceID=DeviceID_, Name=Name_, Unit=Unit_, Type=Type_, Subtype=Subtype_, )
 
     myDev.Create()
+    device_status_invalidate(self)
 
     if DOMOTICZ_EXTENDED_API:
         self.log.logging("AbstractDz", "Debug", "domo_create_api status %s" %Devices[DeviceID_].Units[Unit_].ID)
@@ -367,8 +370,15 @@ def domo_create_api(self, Devices, DeviceID_, Unit_, Name_, widgetType=None, Typ
     return myDev.ID
 
 
+def device_status_invalidate(self):
+    """ Widgets have been created or removed, the widgets status prefetched from Domoticz are no longer accurate """
+    if getattr(self, "domoticzdb_DeviceStatus", None):
+        self.domoticzdb_DeviceStatus.invalidate()
+
+
 def domo_delete_widget( self, Devices, DeviceID_, Unit_):
     self.log.logging("AbstractDz", "Debug", "domo_delete_widget: DeviceID_ : %s Unit_: %s " %( DeviceID_, Unit_))
+    device_status_invalidate(self)
 
     if DOMOTICZ_EXTENDED_API:
         Devices[DeviceID_].Units[Unit_].Delete()
@@ -381,6 +391,7 @@ def domo_delete_widget( self, Devices, DeviceID_, Unit_):
         load_list_of_domoticz_widget(self, Devices)
 
 
+@measure_latency("widget_update")
 def domo_update_api(self, Devices, DeviceID_, Unit_, nValue, sValue, SignalLevel=None, BatteryLevel=None, TimedOut=None, Color="", Options=None, SuppressTriggers=False):
     """
     Does a widget (domoticz device) value update ( nValue,sValue, Color, Battery and Signal Level)
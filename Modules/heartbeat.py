@@ -20,6 +20,7 @@
 import datetime
 import time
 
+from DevicesModules.custom_zlinky import zlinky_publish_pending
 from Modules.basicOutputs import getListofAttribute
 from Modules.casaia import pollingCasaia
 from Modules.danfoss import danfoss_room_sensor_polling
@@ -29,7 +30,7 @@ from Modules.domoTools import (RetreiveWidgetTypeList,
                                reset_device_ieee_unit_if_needed,
                                timedOutDevice)
 from Modules.pairingProcess import (binding_needed_clusters_with_zigate,
-                                    processNotinDBDevices)
+                                    pairing_engine_tick, processNotinDBDevices)
 from Modules.paramDevice import sanity_check_of_param
 from Modules.pluginDbAttributes import STORE_CONFIGURE_REPORTING
 from Modules.readAttributes import (READ_ATTRIBUTES_REQUEST,
@@ -51,7 +52,8 @@ from Modules.readAttributes import (READ_ATTRIBUTES_REQUEST,
                                     ReadAttributeRequest_0702_ZLinky_TIC,
                                     ReadAttributeRequest_ff66,
                                     ping_device_with_read_attribute,
-                                    ping_devices_via_group, ping_tuya_device)
+                                    ping_devices_via_group, ping_tuya_device,
+                                    polled_read_attributes)
 from Modules.schneider_wiser import schneiderRenforceent
 from Modules.switchSelectorWidgets import SWITCH_SELECTORS
 from Modules.tools import (ReArrangeMacCapaBasedOnModel, deviceconf_device,
@@ -63,6 +65,7 @@ from Modules.tuya import tuya_polling
 from Modules.tuyaTRV import tuya_switch_online
 from Modules.zb_tables_management import mgmt_rtg, mgtm_binding
 from Modules.zigateConsts import HEARTBEAT, MAX_LOAD_ZIGATE
+from Modules.zlinky import ZLINK_CONF_MODEL
 from Zigbee.zdpCommands import (zdp_node_descriptor_request,
                                 zdp_NWK_address_request)
 
@@ -399,25 +402,29 @@ def pollingDeviceStatus(self, NwkId):
         return True
     
     self.log.logging("Heartbeat", "Debug", "--------> pollingDeviceStatus Device %s" % NwkId, NwkId)
+    list_of_functions = []
     if len(getListOfEpForCluster(self, NwkId, "0006")) != 0:
-        ReadAttributeRequest_0006_0000(self, NwkId)
+        list_of_functions.append( ReadAttributeRequest_0006_0000 )
         self.log.logging("Heartbeat", "Debug", "++ pollingDeviceStatus -  %s  for ON/OFF" % (NwkId), NwkId)
 
     if len(getListOfEpForCluster(self, NwkId, "0008")) != 0:
-        ReadAttributeRequest_0008_0000(self, NwkId)
+        list_of_functions.append( ReadAttributeRequest_0008_0000 )
         self.log.logging("Heartbeat", "Debug", "++ pollingDeviceStatus -  %s  for LVLControl" % (NwkId), NwkId)
 
     if len(getListOfEpForCluster(self, NwkId, "0102")) != 0:
-        ReadAttributeRequest_0102_0008(self, NwkId)
+        list_of_functions.append( ReadAttributeRequest_0102_0008 )
         self.log.logging("Heartbeat", "Debug", "++ pollingDeviceStatus -  %s  for WindowCovering" % (NwkId), NwkId)
 
     if len(getListOfEpForCluster(self, NwkId, "0101")) != 0:
-        ReadAttributeRequest_0101_0000(self, NwkId)
+        list_of_functions.append( ReadAttributeRequest_0101_0000 )
         self.log.logging("Heartbeat", "Debug", "++ pollingDeviceStatus -  %s  for DoorLock" % (NwkId), NwkId)
 
     if len(getListOfEpForCluster(self, NwkId, "0201")) != 0:
-        ReadAttributeRequest_0201_0012(self, NwkId)
+        list_of_functions.append( ReadAttributeRequest_0201_0012 )
         self.log.logging("Heartbeat", "Debug", "++ pollingDeviceStatus -  %s  for Thermostat" % (NwkId), NwkId)
+
+    # This is a polling after an action, we need the actual state. Requests are only merged, never suppressed
+    polled_read_attributes(self, NwkId, list_of_functions, suppress=False)
     return False
 
 
@@ -648,6 +655,10 @@ def hr_process_device(self, Devices, NwkId):
         del self.ListOfDevices[NwkId]["pingDeviceRetry"]
 
     model = self.ListOfDevices[NwkId].get("Model", "") 
+    if model in ZLINK_CONF_MODEL:
+        # Publish the ZLinky values held back since the last widget update
+        zlinky_publish_pending(self, Devices, NwkId)
+
     enabledEndDevicePolling = bool(self.DeviceConf.get(model, {}).get("PollingEnabled", False))
 
     check_param = self.ListOfDevices.get(NwkId, {}).get("CheckParam", False)
@@ -855,7 +866,9 @@ def process_read_attributes(self, NwkId, model):
                 continue
 
             self.log.logging("Heartbeat", "Debug", f"process_read_attributes - {NwkId}/{ep} and time to request ReadAttribute for {Cluster}", NwkId)
-            READ_ATTRIBUTES_REQUEST[Cluster][0](self, NwkId)
+            if polled_read_attributes(self, NwkId, [ READ_ATTRIBUTES_REQUEST[Cluster][0] ]) == 0:
+                # Adaptive Polling: all attributes have been reported recently, nothing sent. Let's look at the next one
+                continue
             return True
 
     return False
@@ -927,6 +940,9 @@ def processListOfDevices(self, Devices):
     # self.ControllerLink.checkTOwaitFor()
     entriesToBeRemoved = []
 
+    # Retry the interview requests of the devices being paired
+    pairing_engine_tick(self)
+
     for NwkId in list(self.ListOfDevices.keys()):
         if NwkId in ("ffff", "0000"):
             continue
@@ -997,7 +1013,8 @@ def processListOfDevices(self, Devices):
 
         elif status not in ("inDB", "UNKNOW", "erasePDM"):
             # Discovery process 0x004d -> 0x0042 -> 0x8042 -> 0w0045 -> 0x8045 -> 0x0043 -> 0x8043
-            processNotinDBDevices(self, Devices, NwkId, status, RIA)
+            with self.pairingEngine.lock:
+                processNotinDBDevices(self, Devices, NwkId, status, RIA)
     # end for key in ListOfDevices
 
     if (
@@ -17,6 +17,7 @@
 
 """
 
+from Classes.LatencyHistogram import measure_latency
 from Modules.basicOutputs import getListofAttribute
 from Z4D_decoders.z4d_decoder_Active_Ep_Rsp import Decode8045
 from Z4D_decoders.z4d_decoder_Attr_Discovery_Rsp import Decode8140
@@ -30,7 +31,6 @@ from Z4D_decoders.z4d_decoder_Device_Annoucement import Decode004D
 from Z4D_decoders.z4d_decoder_Discovery_Rsp import Decode804B
 from Z4D_decoders.z4d_decoder_groups import (Decode8060, Decode8061,
                                              Decode8062, Decode8063)
-from Z4D_decoders.z4d_decoder_helpers import extract_message_infos
 from Z4D_decoders.z4d_decoder_IAS import (Decode0400, Decode8046, Decode8400,
                                           Decode8401)
 from Z4D_decoders.z4d_decoder_IEEE_addr_req import Decode0041
@@ -71,75 +71,78 @@ from Z4D_decoders.z4d_decoder_Zigate_Time_Srv import Decode8017
 from Zigbee.decode8002 import decode8002_and_process
 
 DECODERS = {
-    "004d": Decode004D,
-    "0040": Decode0040,
-    "0041": Decode0041,
-    "0042": Decode0042,
-    "0100": Decode0100,
-    "0110": Decode0110,
-    "0302": Decode0302,
-    "0400": Decode0400,
-    "8000": Decode8000_v2,
-    "8002": Decode8002,
-    "8003": Decode8003,
-    "8004": Decode8004,
-    "8005": Decode8005,
-    "8006": Decode8006,
-    "8007": Decode8007,
-    "8008": Decode8008,
-    "8009": Decode8009,
-    "8010": Decode8010,
-    "8014": Decode8014,
-    "8015": Decode8015,
-    "8017": Decode8017,
-    "8024": Decode8024,
-    "8028": Decode8028,
-    "802b": Decode802B,
-    "802c": Decode802C,
-    "8030": Decode8030,
-    "8031": Decode8031,
-    "8034": Decode8034,
-    "8040": Decode8040,
-    "8041": Decode8041,
-    "8042": Decode8042,
-    "8043": Decode8043,
-    "8044": Decode8044,
-    "8045": Decode8045,
-    "8046": Decode8046,
-    "8047": Decode8047,
-    "8048": Decode8048,
-    "8049": Decode8049,
-    "804a": Decode804A,
-    "804b": Decode804B,
-    "804e": Decode804E,
-    "8060": Decode8060,
-    "8061": Decode8061,
-    "8062": Decode8062,
-    "8063": Decode8063,
-    "8085": Decode8085,
-    "8095": Decode8095,
-    "80a5": Decode80A5,
-    "80a6": Decode80A6,
-    "80a7": Decode80A7,
-    "8100": Decode8100,
-    "8101": Decode8101,
-    "8102": Decode8102,
-    "8110": Decode8110,
-    "8120": Decode8120,
-    "8122": Decode8122,
-    "8139": Decode8140,
-    "8140": Decode8140,
-    "8400": Decode8400,
-    "8401": Decode8401,
-    "8501": Decode8501,
-    "8502": Decode8502,
-    "8503": Decode8503,
-    "8701": Decode8701,
-    "8806": Decode8806,
-    "8807": Decode8807,
-    "7000": Decode7000,
+    # MsgType : Decoder( self, Devices, MsgData, MsgLQI )
+    0x004d: Decode004D,
+    0x0040: Decode0040,
+    0x0041: Decode0041,
+    0x0042: Decode0042,
+    0x0100: Decode0100,
+    0x0110: Decode0110,
+    0x0302: Decode0302,
+    0x0400: Decode0400,
+    0x8000: Decode8000_v2,
+    0x8002: Decode8002,
+    0x8003: Decode8003,
+    0x8004: Decode8004,
+    0x8005: Decode8005,
+    0x8006: Decode8006,
+    0x8007: Decode8007,
+    0x8008: Decode8008,
+    0x8009: Decode8009,
+    0x8010: Decode8010,
+    0x8011: Decode8011,
+    0x8014: Decode8014,
+    0x8015: Decode8015,
+    0x8017: Decode8017,
+    0x8024: Decode8024,
+    0x8028: Decode8028,
+    0x802b: Decode802B,
+    0x802c: Decode802C,
+    0x8030: Decode8030,
+    0x8031: Decode8031,
+    0x8034: Decode8034,
+    0x8040: Decode8040,
+    0x8041: Decode8041,
+    0x8042: Decode8042,
+    0x8043: Decode8043,
+    0x8044: Decode8044,
+    0x8045: Decode8045,
+    0x8046: Decode8046,
+    0x8047: Decode8047,
+    0x8048: Decode8048,
+    0x8049: Decode8049,
+    0x804a: Decode804A,
+    0x804b: Decode804B,
+    0x804e: Decode804E,
+    0x8060: Decode8060,
+    0x8061: Decode8061,
+    0x8062: Decode8062,
+    0x8063: Decode8063,
+    0x8085: Decode8085,
+    0x8095: Decode8095,
+    0x80a5: Decode80A5,
+    0x80a6: Decode80A6,
+    0x80a7: Decode80A7,
+    0x8100: Decode8100,
+    0x8101: Decode8101,
+    0x8102: Decode8102,
+    0x8110: Decode8110,
+    0x8120: Decode8120,
+    0x8122: Decode8122,
+    0x8139: Decode8140,
+    0x8140: Decode8140,
+    0x8400: Decode8400,
+    0x8401: Decode8401,
+    0x8501: Decode8501,
+    0x8502: Decode8502,
+    0x8503: Decode8503,
+    0x8701: Decode8701,
+    0x8806: Decode8806,
+    0x8807: Decode8807,
+    0x7000: Decode7000,
 }
 
+@measure_latency("decode")
 def zigbee_receive_message(self, Devices, Data):
     if Data is None:
         return
@@ -150,32 +153,22 @@ def zigbee_receive_message(self, Devices, Data):
         self.log.logging("Input", "Error", f"zigbee_receive_message - received a non-zigate frame Data: {Data} FS/FS = {FrameStart}/{FrameStop}")
         return
 
-    MsgType, MsgData, MsgLQI = extract_message_infos(self, Data)
     self.Ping["Nb Ticks"] = 0  # We receive a valid packet
 
-    self.log.logging("Input", "Debug", f"zigbee_receive_message - MsgType: {MsgType}, Data: {MsgData}, LQI: {int(MsgLQI, 16)}")
-
-    if MsgType == "8002":
+    msg_type = int(Data[2:6], 16)
+    if msg_type == 0x8002:
         # Let's try to see if we can decode it, and then get a new MsgType
-        decoded_frame = decode8002_and_process(self, Data)
-        if decoded_frame is None:
+        Data = decode8002_and_process(self, Data)
+        if Data is None:
             return
-        MsgType, MsgData, MsgLQI = extract_message_infos(self, decoded_frame)
-
-    _decode_message(self, MsgType, Devices, Data, MsgData, MsgLQI)
+        msg_type = int(Data[2:6], 16)
 
+    # Payload: data + rssi
+    MsgData, MsgLQI = (Data[12:-4], Data[-4:-2]) if len(Data) > 12 else ("", "00")
+    self.log.logging("Input", "Debug", f"zigbee_receive_message - MsgType: {msg_type:04x}, Data: {MsgData}, LQI: {int(MsgLQI, 16)}")
 
-def _decode_message(self, MsgType, Devices, Data, MsgData, MsgLQI):
-    
-    if MsgType in DECODERS:
-        decoding_method = DECODERS[MsgType]
-        decoding_method(self, Devices, MsgData, MsgLQI)
-        
-    elif MsgType == "8002":
-        Decode8002(self, Devices, Data, MsgData, MsgLQI)
-        
-    elif MsgType == "8011":
-        Decode8011(self, Devices, MsgData, MsgLQI)
-        
-    else:
-        self.log.logging("Input", "Error", f"_decode_message - not found for {MsgType}")
+    decoder = DECODERS.get(msg_type)
+    if decoder is None:
+        self.log.logging("Input", "Error", f"zigbee_receive_message - decoder not found for {msg_type:04x}")
+        return
+    decoder(self, Devices, MsgData, MsgLQI)
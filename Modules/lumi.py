@@ -26,9 +26,9 @@ from Modules.domoTools import Update_Battery_Device
 from Modules.readAttributes import ReadAttributeRequest_0b04_050b
 from Modules.tools import (checkAndStoreAttributeValue,
                            get_deviceconf_parameter_value,
-                           getListOfEpForCluster, is_ack_tobe_disabled,
+                           getListOfEpForCluster, is_ack_tobe_disabled, is_hex,
                            voltage2batteryP)
-from Modules.zigateConsts import MAX_LOAD_ZIGATE, SIZE_DATA_TYPE, ZIGATE_EP
+from Modules.zigateConsts import MAX_LOAD_ZIGATE, ZIGATE_EP
 
 XIAOMI_POWERMETER_EP = {
     "lumi.plug": "02",
@@ -532,91 +532,168 @@ def AqaraOppleDecoding0012(self, Devices, nwkid, Ep, ClusterId, AttributeId, Val
         MajDomoDevice(self, Devices, nwkid, Ep, "0006", OPPLE_MAPPING[Value])
 
 
-def retreive4Tag(tag, chain):
-    c = str.find(chain, tag) + 4
-    return "" if c == 3 else chain[c : (c + 4)]
-
-
-def retreive8Tag(tag, chain):
-    c = str.find(chain, tag) + 4
-    return "" if c == 3 else chain[c : (c + 8)]
-
-
-def twos_comp(val, bits):
-    """compute the 2's complement of int value val"""
-    if (val & (1 << (bits - 1))) != 0:  # if sign bit is set e.g., 8bit: 128-255
-        val = val - (1 << bits)  # compute negative value
-    return val  # return positive value as is
-
-
-def readXiaomiClusterv2(
-    self, Devices, MsgSQN, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, MsgAttType, MsgAttSize, MsgClusterData
-):
-
-    XIAOMI_TAGS = {
-        # ( Tag, Data Type)
-        ("01", "21"): "BatteryLevel",  # Battery Level
-        ("03", "20"): "DeviceTemp",  # Device Temp
-        # ('05', '21'): 'RSSI', # RSSI db
-        # ('06', '24'): 'LQI', # LQI
-        ("0b", "21"): "LightLevel",  # Light Level
-        ("64", "10"): "OnOff",  # OnOff lumi.ctrl_ln2 endpoint 01
-        (
-            "64",
-            "20",
-        ): "OnOff2",  # OnOff for Aqara Bulb / Current position lift for lumi.curtain /lumi.sensor_smoke/lumi.sensor_natgas
-        ("64", "29"): "Temp",  # Temp
-        ("65", "10"): "OnOff3",  # OnOff lumi.ctrl_ln2 endpoint 02
-        ("65", "21"): "Humi",  # Humi
-        ("66", "2b"): "Pressure",  # Pressure
-        ("95", "39"): "Consumption",  # Consumption to be multiplied by 1000 to get Wh
-        ("96", "39"): "Voltage",  # Voltage
-        ("97", "39"): "Current",  # Current mA
-        ("98", "39"): "Power",  # Power W
-        ("9b", "10"): "ConsumerConnected",  # Consumer connected lumi.plug.mmeu01
-    }
-
-    for idx in range(len(MsgClusterData)):
-        if (MsgClusterData[idx : idx + 2], MsgClusterData[idx + 2 : idx + 4]) in XIAOMI_TAGS:
-
-            TagXiaomi = MsgClusterData[idx : idx + 2]
-            dtype = MsgClusterData[idx + 2 : idx + 4]
-            infos = XIAOMI_TAGS[(TagXiaomi, dtype)]
-
-            self.log.logging( "Lumi", "Log", "Infos: %s Tag: %s Dtype: %s" % (infos, TagXiaomi, dtype))
-            if dtype not in SIZE_DATA_TYPE:
-                self.log.logging( "Lumi", "Log", "Unknown DType: %s for Tage: %s" % (dtype, TagXiaomi))
-                continue
-
-            nbByteToRead = 2 * SIZE_DATA_TYPE[dtype]
-            svalue = MsgClusterData[idx + 4 : idx + 4 + nbByteToRead]
-
-            self.log.logging( "Lumi", "Log", "----- svalue: %s" % (svalue))
-
-            if dtype == "10":
-                value = svalue
+# Zigbee data types found in the Xiaomi TLV structure: data type -> ( size in bytes, kind ). Strings are prefixed by their length
+LUMI_TLV_DATA_TYPES = {
+    0x10: (1, "uint"),  # Boolean
+    0x18: (1, "uint"),  # 8Bit bitmap
+    0x19: (2, "uint"),  # 16Bit bitmap
+    0x20: (1, "uint"),
+    0x21: (2, "uint"),
+    0x22: (3, "uint"),
+    0x23: (4, "uint"),
+    0x24: (5, "uint"),
+    0x25: (6, "uint"),
+    0x26: (7, "uint"),
+    0x27: (8, "uint"),
+    0x28: (1, "int"),
+    0x29: (2, "int"),
+    0x2a: (3, "int"),
+    0x2b: (4, "int"),
+    0x2c: (5, "int"),
+    0x2d: (6, "int"),
+    0x2e: (7, "int"),
+    0x2f: (8, "int"),
+    0x30: (1, "uint"),  # 8Bit enum
+    0x31: (2, "uint"),  # 16Bit enum
+    0x39: (4, "float"),
+    0x3a: (8, "double"),
+    0x41: (None, "string"),  # Octet string
+    0x42: (None, "string"),  # Character string
+}
 
-            elif dtype == "20":
-                value = int(svalue)
+# Taging: https://github.com/dresden-elektronik/deconz-rest-plugin/issues/42#issuecomment-370152404
+# ( Tag, Data Type ) -> Name of the value
+LUMI_TLV_TAGS = {
+    (0x01, 0x21): "BatteryVoltage",
+    (0x03, 0x28): "DeviceTemperature",
+    (0x05, 0x21): "RSSI",
+    (0x05, 0x41): "EventCounter",
+    (0x06, 0x24): "LQI",
+    (0x0b, 0x21): "LightLevel",
+    (0x64, 0x10): "OnOff",  # OnOff lumi.ctrl_ln2 endpoint 01
+    (0x64, 0x20): "OnOff2",  # OnOff for Aqara Bulb / Current position lift for lumi.curtain
+    (0x64, 0x29): "Temperature",
+    (0x65, 0x20): "Level",  # Dim level for Aqara Bulb
+    (0x65, 0x21): "Humidity",
+    (0x65, 0x29): "Humidity2",
+    (0x66, 0x2b): "Pressure",
+    (0x95, 0x39): "Consumption",  # Cummulative Consumption
+    (0x96, 0x39): "Voltage",
+    (0x97, 0x39): "Current",
+    (0x98, 0x39): "Power",  # Power Watt
+    (0x9b, 0x10): "ConsumerConnected",  # Consumer connected lumi.plug.mmeu01
+}
 
-            elif dtype == "21":
-                value = struct.unpack(">H", struct.pack("H", int(svalue, 16)))[0]
+# Models for which some tags have a different meaning. None means the tag is ignored
+LUMI_TLV_MODEL_TAGS = {
+    "lumi.motion.ac01": {
+        # 0328180521010008213/ 6010a2100000c2014102001122000 652001/ 662003/ 672000/ 682000/ 692001/ 6a2001/ 6b2003
+        **LUMI_TLV_TAGS,
+        (0x65, 0x20): "Presence",
+        (0x66, 0x20): "Sensibility",
+        (0x67, 0x20): "MonitoringMode",
+        (0x68, 0x20): "s68",
+        (0x69, 0x20): "ApproachDistance",
+        (0x6a, 0x20): "s6a",
+        (0x6b, 0x20): "s6b",
+    },
+    "lumi.motion.ac02": {
+        **LUMI_TLV_TAGS,
+        (0x65, 0x21): "Illuminance",
+        (0x69, 0x20): "DetectionInterval",
+        (0x6a, 0x20): "MotionSensitivity",
+        (0x6b, 0x20): "TriggerIndicator",
+    },
+    "lumi.curtain.acn002": {
+        **LUMI_TLV_TAGS,
+        (0x01, 0x21): None,
+        (0x65, 0x21): "BatteryVoltage",
+    },
+}
 
-            elif dtype == "24":  # 40Uint
-                value = struct.unpack(">Q", struct.pack("Q", int(svalue, 16)))[0]
 
-            elif dtype == "29":
-                value = struct.unpack(">h", struct.pack("H", int(svalue, 16)))[0]
+# Fixed size values are unpacked straight from the payload, without slicing it
+_LUMI_TLV_STRUCT_FORMATS = {
+    (1, "uint"): "<B", (2, "uint"): "<H", (4, "uint"): "<I", (8, "uint"): "<Q",
+    (1, "int"): "<b", (2, "int"): "<h", (4, "int"): "<i", (8, "int"): "<q",
+    (4, "float"): "<f", (8, "double"): "<d",
+}
+LUMI_TLV_UNPACKERS = {
+    dtype: (size, struct.Struct(_LUMI_TLV_STRUCT_FORMATS[(size, kind)]).unpack_from if (size, kind) in _LUMI_TLV_STRUCT_FORMATS else None)
+    for dtype, (size, kind) in LUMI_TLV_DATA_TYPES.items()
+}
 
-            elif dtype == "2b":
-                value = struct.unpack(">i", struct.pack("I", int(svalue, 16)))[0]
 
-            elif dtype == "39":
-                value = struct.unpack(">f", struct.pack("I", int(svalue, 16)))[0]
-            else:
-                return
+def lumi_tlv_decode(self, nwkid, payload, tlv_tags):
+    """ Decode in one pass the Xiaomi TLV structure ( tag, data type, value ), return { name: ( value, raw hex value ) } """
+
+    try:
+        data = bytes.fromhex(payload)
+    except ValueError:
+        data = b""
+
+    values = _lumi_tlv_walk(payload, data, 0, tlv_tags)
+    if values is None and data and data[0] == len(data) - 1:
+        # Structure prefixed by its length
+        values = _lumi_tlv_walk(payload, data, 1, tlv_tags)
+
+    if values is None:
+        # Not a structure we can walk through, let's look for the tags
+        self.log.logging( "Lumi", "Debug", "lumi_tlv_decode - %s unexpected TLV structure %s, searching tags" % (nwkid, payload), nwkid)
+        values = _lumi_tlv_search(payload, tlv_tags)
+    return values
+
+
+def _lumi_tlv_walk(payload, data, idx, tlv_tags):
+    values = {}
+    length = len(data)
+    unpackers = LUMI_TLV_UNPACKERS
+    while idx < length:
+        if idx + 2 > length:
+            return None
+        dtype = data[idx + 1]
+        unpacker = unpackers.get(dtype)
+        if unpacker is None:
+            return None
+        size, unpack_from = unpacker
+        name = tlv_tags.get((data[idx], dtype))
+        idx += 2
+        if size is None:
+            if idx >= length:
+                return None
+            size = data[idx]
+            idx += 1
+        if idx + size > length:
+            return None
+        if name:
+            raw = payload[2 * idx:2 * (idx + size)]
+            value = unpack_from(data, idx)[0] if unpack_from else _lumi_tlv_value(dtype, data[idx:idx + size])
+            values[name] = (value, raw)
+        idx += size
+    return values
+
+
+def _lumi_tlv_search(payload, tlv_tags):
+    values = {}
+    for (tag, dtype), name in tlv_tags.items():
+        size = LUMI_TLV_DATA_TYPES[dtype][0]
+        if not name or size is None:
+            continue
+        idx = payload.find("%02x%02x" % (tag, dtype))
+        raw = payload[idx + 4:idx + 4 + 2 * size] if idx >= 0 else ""
+        if len(raw) == 2 * size and is_hex(raw):
+            values[name] = (_lumi_tlv_value(dtype, bytes.fromhex(raw)), raw)
+    return values
+
+
+def _lumi_tlv_value(dtype, raw):
+    size, unpack_from = LUMI_TLV_UNPACKERS[dtype]
+    if unpack_from:
+        return unpack_from(raw)[0]
+    if LUMI_TLV_DATA_TYPES[dtype][1] == "string":
+        return raw
+    return int.from_bytes(raw, "little", signed=(LUMI_TLV_DATA_TYPES[dtype][1] == "int"))
 
-            self.log.logging("Lumi", "Log", "-----  value: %s" % (value), MsgSrcAddr)
 
 def readLumiLock( self, Devices, MsgSQN, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, MsgAttType, MsgAttSize, MsgClusterData ):
     lumi_lock(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, MsgClusterData)
@@ -686,310 +763,252 @@ def lumi_private_cluster(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgA
     if MsgClusterId == "fcc0" and MsgAttrID != "00f7":
         return lumi_cluster_fcc0(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, MsgClusterData)
     
-    # Taging: https://github.com/dresden-elektronik/deconz-rest-plugin/issues/42#issuecomment-370152404
-    # 0x0624 might be the LQI indicator and 0x0521 the RSSI dB
-    
-    sBatteryLvl = retreive4Tag("0121", MsgClusterData)  # 16BitUint
-    sTemp2 = retreive4Tag("0328", MsgClusterData)  # Device Temperature (int8)
-    sModeSwitch = retreive4Tag("0421", MsgClusterData)  # Mode Switch4: 'anti_flicker_mode', 1: 'quick_mode'
-    stag04 = retreive4Tag("0424", MsgClusterData)
-    sRSSI = retreive4Tag("0521", MsgClusterData)  # RSSI (16BitUint)
-    sCountEvent = retreive4Tag("0541", MsgClusterData)
-    sLQI = retreive4Tag("0624", MsgClusterData)  # LQI
-    sLighLevel = retreive4Tag("0b21", MsgClusterData)  # 16BitUint
-
-    sOnOff = retreive4Tag("6410", MsgClusterData)[:2]
-    sOnOff2 = retreive4Tag("6420", MsgClusterData)[:2]  # OnOff for Aqara Bulb / Current position lift for lumi.curtain
-    sTemp = retreive4Tag("6429", MsgClusterData)
-    sOnOff3 = retreive4Tag("6510", MsgClusterData)  # On/off lumi.ctrl_ln2 EP 02 (Bool)
-    sHumid = retreive4Tag("6521", MsgClusterData)  # 16BitUint
-    sHumid2 = retreive4Tag("6529", MsgClusterData)
-    sLevel = retreive4Tag("6520", MsgClusterData)[:2]  # Dim level for Aqara Bulb
-    sPress = retreive8Tag("662b", MsgClusterData)
-
-    sConsumption = retreive8Tag("9539", MsgClusterData)  # Cummulative Consumption
-    sVoltage = retreive8Tag("9639", MsgClusterData)  # Voltage
-    sCurrent = retreive8Tag("9739", MsgClusterData)  # Ampere
-    sPower = retreive8Tag("9839", MsgClusterData)  # Power Watt
-    sConsumerConnected = retreive4Tag("9b10", MsgClusterData)[:2]
-
-    # "lumi.motion.ac01"
-    # 0328180521010008213/ 6010a2100000c2014102001122000 652001/ 662003/ 672000/ 682000/ 692001/ 6a2001/ 6b2003
-    sPresence = retreive4Tag("6520", MsgClusterData)[:2]
-    sSensibility = retreive4Tag("6620", MsgClusterData)[:2]
-    sMonitoringMode = retreive4Tag("6720", MsgClusterData)[:2]
-    s68 = retreive4Tag("6820", MsgClusterData)[:2]
-    sApproachDistance = retreive4Tag("6920", MsgClusterData)[:2]
-    s6a = retreive4Tag("6a20", MsgClusterData)[:2]
-    s6b = retreive4Tag("6b20", MsgClusterData)[:2]
-
-    if self.ListOfDevices[MsgSrcAddr]["Model"] == "lumi.motion.ac02":
-        # "lumi.motion.ac02"
-        sIlluminence = retreive4Tag("6521", MsgClusterData)[:4]
-        sDetectionInterval = retreive4Tag("6920", MsgClusterData)[:2]
-        sMotionSensitivity = retreive4Tag("6a20", MsgClusterData)[:2]
-        sTriggerIndicator = retreive4Tag("6b20", MsgClusterData)[:2]
-
-        if sIlluminence != "":
-            illuminance = struct.unpack("h", struct.pack(">H", int(sIlluminence, 16)))[0] 
-            illuminance = 0 if illuminance > 0xffdc else illuminance
-            store_lumi_attribute(self, MsgSrcAddr, "Illuminance", str( illuminance ) )
-            MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0400", str( illuminance ))
-            self.log.logging( "Lumi", "Debug", "ReadCluster - %s/%s Saddr: %s sIlluminence %s/%s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, sIlluminence, illuminance), MsgSrcAddr, )
-
-        if sDetectionInterval != "":
-            store_lumi_attribute(self, MsgSrcAddr, "DetectionInterval", sDetectionInterval)
-            self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s sDetectionInterval %s/%s" % (
-                MsgClusterId, MsgAttrID, MsgSrcAddr, sDetectionInterval, int(sDetectionInterval,16)), MsgSrcAddr, )
-
-        if sMotionSensitivity != "":
-            store_lumi_attribute(self, MsgSrcAddr, "MotionSensitivity", sMotionSensitivity)
-            self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s MotionSensitivity %s/%s" % (
-                MsgClusterId, MsgAttrID, MsgSrcAddr, sMotionSensitivity, int(sMotionSensitivity,16)), MsgSrcAddr, )
-
-        if sTriggerIndicator != "":
-            store_lumi_attribute(self, MsgSrcAddr, "TriggerIndicator", sTriggerIndicator)
-            self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s TriggerIndicator %s/%s" % (
-                MsgClusterId, MsgAttrID, MsgSrcAddr, sTriggerIndicator, int(sTriggerIndicator,16)), MsgSrcAddr, )
-
-    if self.ListOfDevices[MsgSrcAddr]["Model"] == "lumi.motion.ac01":
-        if s68 != "":
-            store_lumi_attribute(self, MsgSrcAddr, "s68", s68)
-            self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s s68 %s/%s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, s68, int(s68,16)), MsgSrcAddr, )
-        if s6a != "":
-            store_lumi_attribute(self, MsgSrcAddr, "s6a", s6a)
-            self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s s6a %s/%s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, s68, int(s68,16)), MsgSrcAddr, )
-   
-        if s6b != "":    
-            store_lumi_attribute(self, MsgSrcAddr, "s6b", s6b)
-            self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s s6b %s/%s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, s68, int(s68,16)), MsgSrcAddr, )
-   
-        if sPresence != "":
-            _PRESENCE = { 0: 'False', 1: 'True' }
-            store_lumi_attribute(self, MsgSrcAddr, "Presence", sPresence)
-            self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s Presence %s/%s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, sPresence, MsgClusterData), MsgSrcAddr, )
-            if int(sPresence,16) in _PRESENCE:
-                self.log.logging( "Lumi", "Debug", "%s/%s RTCZCGQ11LM (lumi.motion.ac01) presence : %s" %(MsgSrcAddr, MsgSrcEp,_PRESENCE[ int(sPresence,16) ]) )
-                MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0406", sPresence)
-
-        if sSensibility != "":
-            store_lumi_attribute(self, MsgSrcAddr, "Sensibility", sSensibility)
-            self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s sSensibility %s/%s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, sSensibility, MsgClusterData), MsgSrcAddr, )
-
-        if sMonitoringMode != "":
-            _MONITORING_MODE = {0: 'Undirected', 1: 'Left_right'}
-            store_lumi_attribute(self, MsgSrcAddr, "MonitoringMode", sMonitoringMode)
-            self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s MonitoringMode %s/%s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, sMonitoringMode, MsgClusterData), MsgSrcAddr, )
-            if int(sMonitoringMode,16) in _MONITORING_MODE:
-                self.log.logging( "Lumi", "Debug", "%s/%s RTCZCGQ11LM (lumi.motion.ac01) Monitoring mode : %s" %(MsgSrcAddr, MsgSrcEp,_MONITORING_MODE[ int(sMonitoringMode,16) ]) )
-
-        if sApproachDistance!= "": 
-            _APPROCHING_DISTANCE = {0: 'Far', 1: 'Medium', 2: 'Near'}
-            store_lumi_attribute(self, MsgSrcAddr, "ApprochingDistance", sApproachDistance)
-            self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s ApprochingDistance %s/%s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, sApproachDistance, MsgClusterData), MsgSrcAddr, )
-            if int(sApproachDistance,16) in _APPROCHING_DISTANCE:
-                self.log.logging( "Lumi", "Debug", "%s/%s RTCZCGQ11LM (lumi.motion.ac01) Approaching distance : %s" %(MsgSrcAddr, MsgSrcEp,_APPROCHING_DISTANCE[ int(sApproachDistance,16) ]) )
-
-    if self.ListOfDevices[MsgSrcAddr]["Model"] == "lumi.curtain.acn002":
-        sBatteryLvl = retreive4Tag("6521", MsgClusterData)
-        sHumid = ""
-
-    if sCountEvent != "":
-        value = int(sCountEvent, 16)
-        store_lumi_attribute(self, MsgSrcAddr, "EventCounter", value)
-        self.log.logging(
-            "Lumi",
-            "Debug",
-            "lumi_private_cluster - %s/%s Saddr: %s Count of events sent %s/%s"
-            % (MsgClusterId, MsgAttrID, MsgSrcAddr, sCountEvent, value),
-            MsgSrcAddr,
-        )
+    tlv_tags = LUMI_TLV_MODEL_TAGS.get(model, LUMI_TLV_TAGS)
+    values = lumi_tlv_decode(self, MsgSrcAddr, MsgClusterData, tlv_tags)
 
-    if sTemp2 != "":
-        self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s sTemp2 %s Temp2 %s" % (
-            MsgClusterId, MsgAttrID, MsgSrcAddr, sTemp2, int(sTemp2, 16)), MsgSrcAddr,)
-        store_lumi_attribute(self, MsgSrcAddr, "DeviceTemperature", round(int(sTemp2, 16) / 100, 1))
-
-    if sConsumerConnected != "":
-        self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s sConsumerConnected %s" % (
-            MsgClusterId, MsgAttrID, MsgSrcAddr, sConsumerConnected), MsgSrcAddr,)
-        store_lumi_attribute(self, MsgSrcAddr, "ConsumerConnected", sConsumerConnected)
-
-    if sConsumption != "":
-        # Consumption/Summation
-        multiplier = get_deviceconf_parameter_value(self, self.ListOfDevices[MsgSrcAddr]["Model"], "SummationMeteringMultiplier")
-        divisor = get_deviceconf_parameter_value(self, self.ListOfDevices[MsgSrcAddr]["Model"], "SummationMeteringDivisor")
-        if multiplier is None:
-            multiplier = 1000
-        if divisor is None:
-            divisor = 1
-
-        consumption = (struct.unpack("f", struct.pack(">I", int(sConsumption, 16)))[0])
-        consumption = round( (( consumption * multiplier ) / divisor ), 3)
-        
-        self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s sConsumption %s Consumption %s Multiplier: %s Divisor: %s" % (
-            MsgClusterId, MsgAttrID, MsgSrcAddr, sConsumption, consumption, multiplier, divisor ), )
-        store_lumi_attribute(self, MsgSrcAddr, "Consumption", consumption)
-        
-        EPforPower = get_xiaomi_metering_ep( self, MsgSrcAddr, MsgSrcEp, model )
-        checkAndStoreAttributeValue(self, MsgSrcAddr, EPforPower, "0702", "0000", consumption)
-
-    if sVoltage != "":
-        divisor = get_deviceconf_parameter_value(self, self.ListOfDevices[MsgSrcAddr]["Model"], "RMSVoltageDivisor")
-        multiplier = get_deviceconf_parameter_value(self, self.ListOfDevices[MsgSrcAddr]["Model"], "RMSVoltageMultiplier")
-        if multiplier is None:
-            multiplier = 1
-        if divisor is None:
-            divisor = 1
-        voltage = struct.unpack("f", struct.pack(">I", int(sVoltage, 16)))[0]
-        voltage = round( (( voltage * multiplier ) / divisor ), 3)
-        
-        self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s Voltage %s multiplier %s divisor %s" % (
-            MsgClusterId, MsgAttrID, MsgSrcAddr, voltage, multiplier, divisor ) )
-        checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0001", "0000", voltage)
-        store_lumi_attribute(self, MsgSrcAddr, "Voltage", voltage)
-        # Update Voltage ( cluster 0001 )
-        MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0001", voltage)
-
-    if sCurrent != "":
-        divisor = get_deviceconf_parameter_value(self, self.ListOfDevices[MsgSrcAddr]["Model"], "RMSCurrentDivisor")
-        multiplier = get_deviceconf_parameter_value(self, self.ListOfDevices[MsgSrcAddr]["Model"], "RMSCurrentMultiplier")
-        if multiplier is None:
-            multiplier = 1
-        if divisor is None:
-            divisor = 1
-
-        current = struct.unpack("f", struct.pack(">I", int(sCurrent, 16)))[0]
-        current = round( (( current * multiplier ) / divisor ), 3 )
-
-        self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s Courant %s %s multiplier %s divisor %s" % (
-            MsgClusterId, MsgAttrID, MsgSrcAddr, sCurrent, current, multiplier, divisor ) )
-
-        store_lumi_attribute(self, MsgSrcAddr, "Current", current)
-        MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0b04", current, Attribute_="0508" )
-
-    if sPower != "":
-        multiplier = get_deviceconf_parameter_value(self, self.ListOfDevices[MsgSrcAddr]["Model"], "PowerMeteringMultiplier")
-        divisor = get_deviceconf_parameter_value(self, self.ListOfDevices[MsgSrcAddr]["Model"], "PowerMeteringDivisor")
-        if multiplier is None:
-            multiplier = 1
-        if divisor is None:
-            divisor = 1
-
-        # Instant Power
-        power = struct.unpack("f", struct.pack(">I", int(sPower, 16)))[0]
-        power = round( (( power * multiplier ) / divisor ), 3)
-        if power > 0x7FFFFFFFFFFFFFFF:
-            self.log.logging( "Lumi", "Eror", "lumi_private_cluster - %s/%s Saddr: %s sPower %s Power %s (Overflow)" % (MsgClusterId, MsgAttrID, MsgSrcAddr, sPower, power), )
+    for name, handler in LUMI_TLV_HANDLERS:
+        if name in values and handler(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, *values[name]) is False:
             return
-        self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s sPower %s Power %s multiplier %s divisor %s" % (
-            MsgClusterId, MsgAttrID, MsgSrcAddr, sPower, power, multiplier, divisor ) )
 
-        store_lumi_attribute(self, MsgSrcAddr, "Power", power)
-        
-        EPforPower = get_xiaomi_metering_ep( self, MsgSrcAddr, MsgSrcEp, model )
-        checkAndStoreAttributeValue(self, MsgSrcAddr, EPforPower, "0702", "0400", str(power))
 
-        MajDomoDevice(self, Devices, MsgSrcAddr, EPforPower, "0702", str(power))
+def _lumi_store_hex(attribute):
+    # Handler storing an enum value as it used to be: a 2 digits hex string
+    def handler(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+        store_lumi_attribute(self, MsgSrcAddr, attribute, "%02x" % value)
+        self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s %s %02x" % (
+            MsgClusterId, MsgAttrID, MsgSrcAddr, attribute, value), MsgSrcAddr, )
 
-    if sLighLevel != "":
-        value = struct.unpack(">H", struct.pack("H", int(sLighLevel, 16)))[0]
-        if model in ("lumi.sensor_motion", "lumi.sensor_motion.aq2"):
-            # Lux
-            store_lumi_attribute(self, MsgSrcAddr, "Lux", value)
-            MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0400", str(value))
-        else:
-            self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s Light Level: %s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, value), MsgSrcAddr, )
+    return handler
 
-    if sRSSI != "":
-        # RSSI = struct.unpack('>H',struct.pack('H',int(sRSSI,16)))[0]
-        RSSI = int(sRSSI[:2], 16) - 256
 
-        self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s RSSI: %s/%s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, sRSSI, RSSI), MsgSrcAddr, )
-        store_lumi_attribute(self, MsgSrcAddr, "RSSI dB", RSSI)
+def _lumi_illuminance(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    illuminance = 0 if value > 0xffdc else value
+    store_lumi_attribute(self, MsgSrcAddr, "Illuminance", str( illuminance ) )
+    MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0400", str( illuminance ))
+    self.log.logging( "Lumi", "Debug", "ReadCluster - %s/%s Saddr: %s sIlluminence %s/%s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, raw, illuminance), MsgSrcAddr, )
 
-    if sLQI != "":
-        LQI = int(sLQI, 16)
-        self.log.logging(
-            "Lumi",
-            "Debug",
-            "lumi_private_cluster  - %s/%s Saddr: %s LQI: %s/%s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, sLQI, LQI),
-            MsgSrcAddr,
-        )
-        store_lumi_attribute(self, MsgSrcAddr, "LQI", sLQI)
 
-    if ( sBatteryLvl != "" and self.ListOfDevices[MsgSrcAddr]["MacCapa"] != "8e" and self.ListOfDevices[MsgSrcAddr]["MacCapa"] != "84" and self.ListOfDevices[MsgSrcAddr]["PowerSource"] != "Main" ):
-        voltage = "%s%s" % (str(sBatteryLvl[2:4]), str(sBatteryLvl[:2]))
-        voltage = int(voltage, 16)
-        ValueBattery = voltage2batteryP(voltage, 3150, 2750)
-        self.log.logging(
-            "Lumi",
-            "Debug",
-            "lumi_private_cluster - %s/%s Saddr: %s Battery: %s Voltage: %s MacCapa: %s PowerSource: %s"
-            % ( MsgClusterId, MsgAttrID, MsgSrcAddr, ValueBattery, voltage, self.ListOfDevices[MsgSrcAddr]["MacCapa"], self.ListOfDevices[MsgSrcAddr]["PowerSource"], ), MsgSrcAddr, )
-        self.ListOfDevices[MsgSrcAddr]["Battery"] = ValueBattery
-        self.ListOfDevices[MsgSrcAddr]["BatteryUpdateTime"] = int(time.time())
-        Update_Battery_Device(self, Devices, MsgSrcAddr, ValueBattery)
-        checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0001", "0000", voltage)
-        store_lumi_attribute(self, MsgSrcAddr, "BatteryVoltage", voltage)
-
-    if sTemp != "":
-        Temp = struct.unpack("h", struct.pack(">H", int(sTemp, 16)))[0]
-        if Temp != -10000:
-            ValueTemp = round(Temp / 100, 1)
-            self.log.logging( "Lumi", "Debug", "lumi_private_cluster - 0000/ff01 Saddr: " + str(MsgSrcAddr) + " Temperature : " + str(ValueTemp), MsgSrcAddr, )
-            MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0402", ValueTemp)
-            checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0402", "0000", ValueTemp)
-
-    if sHumid != "":
-        ValueHumid = struct.unpack("H", struct.pack(">H", int(sHumid, 16)))[0]
-        ValueHumid = round(ValueHumid / 100, 1)
-        self.log.logging("Lumi","Debug","lumi_private_cluster - 0000/ff01 Saddr: " + str(MsgSrcAddr) + " Humidity : " + str(ValueHumid),MsgSrcAddr,)
-        MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0405", ValueHumid)
-        checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0405", "0000", ValueHumid)
-
-    if sHumid2 != "":
-        Humid2 = struct.unpack("h", struct.pack(">H", int(sHumid2, 16)))[0]
-        ValueHumid2 = round(Humid2 / 100, 1)
-        self.log.logging(
-            "Lumi",
-            "Debug",
-            "lumi_private_cluster - 0000/ff01 Saddr: " + str(MsgSrcAddr) + " Humidity2 : " + str(ValueHumid2),
-            MsgSrcAddr,
-        )
+def _lumi_presence(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    _PRESENCE = { 0: 'False', 1: 'True' }
+    store_lumi_attribute(self, MsgSrcAddr, "Presence", "%02x" % value)
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s Presence %02x" % (MsgClusterId, MsgAttrID, MsgSrcAddr, value), MsgSrcAddr, )
+    if value in _PRESENCE:
+        self.log.logging( "Lumi", "Debug", "%s/%s RTCZCGQ11LM (lumi.motion.ac01) presence : %s" %(MsgSrcAddr, MsgSrcEp,_PRESENCE[ value ]) )
+        MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0406", "%02x" % value)
 
-    if sPress != "":
-        Press = "%s%s%s%s" % (str(sPress[6:8]), str(sPress[4:6]), str(sPress[2:4]), str(sPress[:2]))
-        try:
-            ValuePress = round((struct.unpack("i", struct.pack("i", int(Press, 16)))[0]) / 100, 1)
 
-        except Exception as e:
-            self.log.logging("Lumi","Error","lumi_private_cluster - 0000/ff01 Saddr: %s Wrong Atmospheric Pressure: orig: %s, convert: %s Error: %s"% (MsgSrcAddr, sPress, Press, e),MsgSrcAddr,)
-            return
+def _lumi_monitoring_mode(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    _MONITORING_MODE = {0: 'Undirected', 1: 'Left_right'}
+    store_lumi_attribute(self, MsgSrcAddr, "MonitoringMode", "%02x" % value)
+    if value in _MONITORING_MODE:
+        self.log.logging( "Lumi", "Debug", "%s/%s RTCZCGQ11LM (lumi.motion.ac01) Monitoring mode : %s" %(MsgSrcAddr, MsgSrcEp,_MONITORING_MODE[ value ]) )
 
-        self.log.logging(
-            "Lumi",
-            "Debug",
-            "lumi_private_cluster - 0000/ff01 Saddr: " + str(MsgSrcAddr) + " Atmospheric Pressure : " + str(ValuePress),
-            MsgSrcAddr,
-        )
-        MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0403", ValuePress)
-        checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0403", "0000", sPress)
-
-    if sOnOff != "" and self.ListOfDevices[MsgSrcAddr]["Model"] not in ( "lumi.sensor_wleak.aq1", "lumi.sensor_motion.aq2", ):
-            self.log.logging( "Lumi", "Debug", "lumi_private_cluster - 0000/ff01 Saddr: %s sOnOff: %s" % (MsgSrcAddr, sOnOff), MsgSrcAddr )
-            MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0006", sOnOff)
-            checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0006", "0000", sOnOff)
-
-    if sOnOff2 != "" and self.ListOfDevices[MsgSrcAddr]["MacCapa"] == "8e" and self.ListOfDevices[MsgSrcAddr]["Model"] not in ("lumi.sensor_wleak.aq1",):
-        self.log.logging( "Lumi", "Debug", "lumi_private_cluster - 0000/ff01 Saddr: %s sOnOff2: %s" % (MsgSrcAddr, sOnOff2), MsgSrcAddr )
-        MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0006", sOnOff2)
-        checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0006", "0000", sOnOff)
-
-    if sLevel != "":
-        self.log.logging( "Lumi", "Debug", "lumi_private_cluster - 0000/ff01 Saddr: %s sLevel: %s" % (MsgSrcAddr, sLevel), MsgSrcAddr )
-        MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0008", sLevel)
-        checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0008", "0000", sLevel)
+
+def _lumi_approach_distance(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    _APPROCHING_DISTANCE = {0: 'Far', 1: 'Medium', 2: 'Near'}
+    store_lumi_attribute(self, MsgSrcAddr, "ApprochingDistance", "%02x" % value)
+    if value in _APPROCHING_DISTANCE:
+        self.log.logging( "Lumi", "Debug", "%s/%s RTCZCGQ11LM (lumi.motion.ac01) Approaching distance : %s" %(MsgSrcAddr, MsgSrcEp,_APPROCHING_DISTANCE[ value ]) )
+
+
+def _lumi_event_counter(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    value = int.from_bytes(value, "little")
+    store_lumi_attribute(self, MsgSrcAddr, "EventCounter", value)
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s Count of events sent %s/%s" % (
+        MsgClusterId, MsgAttrID, MsgSrcAddr, raw, value), MsgSrcAddr, )
+
+
+def _lumi_device_temperature(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s sTemp2 %s Temp2 %s" % (
+        MsgClusterId, MsgAttrID, MsgSrcAddr, raw, value), MsgSrcAddr,)
+    store_lumi_attribute(self, MsgSrcAddr, "DeviceTemperature", value)
+
+
+def _lumi_consumer_connected(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s sConsumerConnected %02x" % (
+        MsgClusterId, MsgAttrID, MsgSrcAddr, value), MsgSrcAddr,)
+    store_lumi_attribute(self, MsgSrcAddr, "ConsumerConnected", "%02x" % value)
+
+
+def _lumi_multiplier_divisor(self, model, multiplier_parameter, divisor_parameter, default_multiplier=1):
+    multiplier = get_deviceconf_parameter_value(self, model, multiplier_parameter)
+    divisor = get_deviceconf_parameter_value(self, model, divisor_parameter)
+    return (default_multiplier if multiplier is None else multiplier), (1 if divisor is None else divisor)
+
+
+def _lumi_consumption(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    # Consumption/Summation
+    multiplier, divisor = _lumi_multiplier_divisor(self, model, "SummationMeteringMultiplier", "SummationMeteringDivisor", 1000)
+    consumption = round( (( value * multiplier ) / divisor ), 3)
+
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s sConsumption %s Consumption %s Multiplier: %s Divisor: %s" % (
+        MsgClusterId, MsgAttrID, MsgSrcAddr, raw, consumption, multiplier, divisor ), )
+    store_lumi_attribute(self, MsgSrcAddr, "Consumption", consumption)
+
+    EPforPower = get_xiaomi_metering_ep( self, MsgSrcAddr, MsgSrcEp, model )
+    checkAndStoreAttributeValue(self, MsgSrcAddr, EPforPower, "0702", "0000", consumption)
+
+
+def _lumi_voltage(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    multiplier, divisor = _lumi_multiplier_divisor(self, model, "RMSVoltageMultiplier", "RMSVoltageDivisor")
+    voltage = round( (( value * multiplier ) / divisor ), 3)
+
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s Voltage %s multiplier %s divisor %s" % (
+        MsgClusterId, MsgAttrID, MsgSrcAddr, voltage, multiplier, divisor ) )
+    checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0001", "0000", voltage)
+    store_lumi_attribute(self, MsgSrcAddr, "Voltage", voltage)
+    # Update Voltage ( cluster 0001 )
+    MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0001", voltage)
+
+
+def _lumi_current(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    multiplier, divisor = _lumi_multiplier_divisor(self, model, "RMSCurrentMultiplier", "RMSCurrentDivisor")
+    current = round( (( value * multiplier ) / divisor ), 3 )
+
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s Courant %s %s multiplier %s divisor %s" % (
+        MsgClusterId, MsgAttrID, MsgSrcAddr, raw, current, multiplier, divisor ) )
+
+    store_lumi_attribute(self, MsgSrcAddr, "Current", current)
+    MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0b04", current, Attribute_="0508" )
+
+
+def _lumi_power(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    multiplier, divisor = _lumi_multiplier_divisor(self, model, "PowerMeteringMultiplier", "PowerMeteringDivisor")
+
+    # Instant Power
+    power = round( (( value * multiplier ) / divisor ), 3)
+    if power > 0x7FFFFFFFFFFFFFFF:
+        self.log.logging( "Lumi", "Error", "lumi_private_cluster - %s/%s Saddr: %s sPower %s Power %s (Overflow)" % (MsgClusterId, MsgAttrID, MsgSrcAddr, raw, power), )
+        return False
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s sPower %s Power %s multiplier %s divisor %s" % (
+        MsgClusterId, MsgAttrID, MsgSrcAddr, raw, power, multiplier, divisor ) )
+
+    store_lumi_attribute(self, MsgSrcAddr, "Power", power)
+
+    EPforPower = get_xiaomi_metering_ep( self, MsgSrcAddr, MsgSrcEp, model )
+    checkAndStoreAttributeValue(self, MsgSrcAddr, EPforPower, "0702", "0400", str(power))
+
+    MajDomoDevice(self, Devices, MsgSrcAddr, EPforPower, "0702", str(power))
+
+
+def _lumi_light_level(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    if model in ("lumi.sensor_motion", "lumi.sensor_motion.aq2"):
+        # Lux
+        store_lumi_attribute(self, MsgSrcAddr, "Lux", value)
+        MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0400", str(value))
+    else:
+        self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s Light Level: %s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, value), MsgSrcAddr, )
+
+
+def _lumi_rssi(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    RSSI = (value & 0xff) - 256
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - %s/%s Saddr: %s RSSI: %s/%s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, raw, RSSI), MsgSrcAddr, )
+    store_lumi_attribute(self, MsgSrcAddr, "RSSI dB", RSSI)
+
+
+def _lumi_lqi(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster  - %s/%s Saddr: %s LQI: %s/%s" % (MsgClusterId, MsgAttrID, MsgSrcAddr, raw, value), MsgSrcAddr, )
+    store_lumi_attribute(self, MsgSrcAddr, "LQI", raw[:4])
+
+
+def _lumi_battery_voltage(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    if self.ListOfDevices[MsgSrcAddr]["MacCapa"] in ("8e", "84") or self.ListOfDevices[MsgSrcAddr]["PowerSource"] == "Main":
+        return
+    voltage = value
+    ValueBattery = voltage2batteryP(voltage, 3150, 2750)
+    self.log.logging(
+        "Lumi",
+        "Debug",
+        "lumi_private_cluster - %s/%s Saddr: %s Battery: %s Voltage: %s MacCapa: %s PowerSource: %s"
+        % ( MsgClusterId, MsgAttrID, MsgSrcAddr, ValueBattery, voltage, self.ListOfDevices[MsgSrcAddr]["MacCapa"], self.ListOfDevices[MsgSrcAddr]["PowerSource"], ), MsgSrcAddr, )
+    self.ListOfDevices[MsgSrcAddr]["Battery"] = ValueBattery
+    self.ListOfDevices[MsgSrcAddr]["BatteryUpdateTime"] = int(time.time())
+    Update_Battery_Device(self, Devices, MsgSrcAddr, ValueBattery)
+    checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0001", "0000", voltage)
+    store_lumi_attribute(self, MsgSrcAddr, "BatteryVoltage", voltage)
+
+
+def _lumi_temperature(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    if value == -10000:
+        return
+    ValueTemp = round(value / 100, 1)
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - 0000/ff01 Saddr: " + str(MsgSrcAddr) + " Temperature : " + str(ValueTemp), MsgSrcAddr, )
+    MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0402", ValueTemp)
+    checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0402", "0000", ValueTemp)
+
+
+def _lumi_humidity(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    ValueHumid = round(value / 100, 1)
+    self.log.logging("Lumi","Debug","lumi_private_cluster - 0000/ff01 Saddr: " + str(MsgSrcAddr) + " Humidity : " + str(ValueHumid),MsgSrcAddr,)
+    MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0405", ValueHumid)
+    checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0405", "0000", ValueHumid)
+
+
+def _lumi_humidity2(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - 0000/ff01 Saddr: " + str(MsgSrcAddr) + " Humidity2 : " + str(round(value / 100, 1)), MsgSrcAddr, )
+
+
+def _lumi_pressure(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    ValuePress = round(value / 100, 1)
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - 0000/ff01 Saddr: " + str(MsgSrcAddr) + " Atmospheric Pressure : " + str(ValuePress), MsgSrcAddr, )
+    MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0403", ValuePress)
+    checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0403", "0000", raw)
+
+
+def _lumi_onoff(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    if model in ( "lumi.sensor_wleak.aq1", "lumi.sensor_motion.aq2", ):
+        return
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - 0000/ff01 Saddr: %s sOnOff: %02x" % (MsgSrcAddr, value), MsgSrcAddr )
+    MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0006", "%02x" % value)
+    checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0006", "0000", "%02x" % value)
+
+
+def _lumi_onoff2(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    if self.ListOfDevices[MsgSrcAddr]["MacCapa"] != "8e" or model in ("lumi.sensor_wleak.aq1",):
+        return
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - 0000/ff01 Saddr: %s sOnOff2: %02x" % (MsgSrcAddr, value), MsgSrcAddr )
+    MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0006", "%02x" % value)
+    checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0006", "0000", "%02x" % value)
+
+
+def _lumi_level(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, model, value, raw):
+    self.log.logging( "Lumi", "Debug", "lumi_private_cluster - 0000/ff01 Saddr: %s sLevel: %02x" % (MsgSrcAddr, value), MsgSrcAddr )
+    MajDomoDevice(self, Devices, MsgSrcAddr, MsgSrcEp, "0008", "%02x" % value)
+    checkAndStoreAttributeValue(self, MsgSrcAddr, MsgSrcEp, "0008", "0000", "%02x" % value)
+
+
+# Values of the TLV structure, in the order they are processed. A handler returning False stops the processing
+LUMI_TLV_HANDLERS = (
+    ("Illuminance", _lumi_illuminance),
+    ("DetectionInterval", _lumi_store_hex("DetectionInterval")),
+    ("MotionSensitivity", _lumi_store_hex("MotionSensitivity")),
+    ("TriggerIndicator", _lumi_store_hex("TriggerIndicator")),
+    ("s68", _lumi_store_hex("s68")),
+    ("s6a", _lumi_store_hex("s6a")),
+    ("s6b", _lumi_store_hex("s6b")),
+    ("Presence", _lumi_presence),
+    ("Sensibility", _lumi_store_hex("Sensibility")),
+    ("MonitoringMode", _lumi_monitoring_mode),
+    ("ApproachDistance", _lumi_approach_distance),
+    ("EventCounter", _lumi_event_counter),
+    ("DeviceTemperature", _lumi_device_temperature),
+    ("ConsumerConnected", _lumi_consumer_connected),
+    ("Consumption", _lumi_consumption),
+    ("Voltage", _lumi_voltage),
+    ("Current", _lumi_current),
+    ("Power", _lumi_power),
+    ("LightLevel", _lumi_light_level),
+    ("RSSI", _lumi_rssi),
+    ("LQI", _lumi_lqi),
+    ("BatteryVoltage", _lumi_battery_voltage),
+    ("Temperature", _lumi_temperature),
+    ("Humidity", _lumi_humidity),
+    ("Humidity2", _lumi_humidity2),
+    ("Pressure", _lumi_pressure),
+    ("OnOff", _lumi_onoff),
+    ("OnOff2", _lumi_onoff2),
+    ("Level", _lumi_level),
+)
 
 
 def lumi_cluster_fcc0(self, Devices, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, MsgClusterData):
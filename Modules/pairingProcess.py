@@ -16,6 +16,10 @@
 
     Description: Manage all actions done during the onHeartbeat() call
 
+    Interview requests are tracked by the PairingEngine ( Classes/PairingEngine.py ): they are retried when not
+    answered on time, the interview moves forward as soon as a response is received, and the number of devices being
+    provisioned at the same time is capped.
+
 """
 
 import time
@@ -52,13 +56,113 @@ from Modules.tuyaSiren import tuya_sirene_registration
 from Modules.tuyaTools import tuya_TS0121_registration
 from Modules.tuyaTRV import tuya_eTRV_registration
 from Modules.zb_tables_management import mgmt_rtg
-from Modules.zigateConsts import CLUSTERS_LIST, ZIGATE_EP
+from Modules.zigateConsts import CLUSTERS_LIST, MAX_LOAD_ZIGATE, ZIGATE_EP
 from Zigbee.zdpCommands import (zdp_active_endpoint_request,
                                 zdp_node_descriptor_request,
                                 zdp_simple_descriptor_request)
 from Zigbee.zdpRawCommands import zdp_raw_match_desc_req_0500
 
 
+# Interview requests which are retried when not answered on time
+PAIRING_STEP_REQUESTS = {
+    "ActiveEndpoint": lambda self, nwkid, ep: zdp_active_endpoint_request(self, nwkid),
+    "SimpleDescriptor": lambda self, nwkid, ep: zdp_simple_descriptor_request(self, nwkid, ep),
+    "NodeDescriptor": lambda self, nwkid, ep: zdp_node_descriptor_request(self, nwkid),
+    "Model": lambda self, nwkid, ep: ReadAttributeRequest_0000(self, nwkid, fullScope=False),
+}
+
+# Status for which the device is not (or not anymore) in the interview
+NOT_IN_PAIRING_STATUS = ("inDB", "UNKNOW", "erasePDM", "failDB", "Leave", "notDB", "provREQ")
+
+
+def pairing_step_request(self, nwkid, step, ep=None):
+    """ Send an interview request, unless one is already waiting for its response (it will be retried if needed) """
+
+    engine = self.pairingEngine
+    if engine.step_in_progress(nwkid, step, ep) or engine.step_given_up(nwkid, step, ep):
+        return False
+    engine.step_sent(nwkid, step, ep)
+    PAIRING_STEP_REQUESTS[step](self, nwkid, ep)
+    return True
+
+
+def _pairing_step_answered(self, nwkid, step, ep):
+    device = self.ListOfDevices[nwkid]
+    if step == "ActiveEndpoint":
+        return device.get("Ep") not in (None, "", {})
+    if step == "SimpleDescriptor":
+        return ep in device.get("Epv2", {}) and device.get("Ep", {}).get(ep) not in (None, "", {})
+    if step == "NodeDescriptor":
+        return device.get("Manufacturer", "") not in ("", {})
+    if step == "Model":
+        return device.get("Model", "") not in ("", {})
+    return False
+
+
+def pairing_engine_tick(self):
+    """ Called at each heartbeat, retry the interview requests not answered on time """
+
+    engine = self.pairingEngine
+    timeout = self.pluginconf.pluginConf["PairingStepTimeout"]
+    with engine.lock:
+        for nwkid, step, ep, attempts in engine.expired_steps(timeout):
+            if nwkid not in self.ListOfDevices or self.ListOfDevices[nwkid].get("Status") in NOT_IN_PAIRING_STATUS:
+                engine.forget(nwkid)
+                continue
+
+            if _pairing_step_answered(self, nwkid, step, ep):
+                engine.step_completed(nwkid, step, ep)
+                continue
+
+            if attempts >= self.pluginconf.pluginConf["PairingStepRetries"]:
+                self.log.logging("Pairing", "Status", "[-] NEW OBJECT: %s no response to %s %s after %s attempts" % (
+                    nwkid, step, ep or "", attempts))
+                engine.give_up(nwkid, step, ep)
+                if step == "SimpleDescriptor":
+                    # Let's move to the next Ep
+                    request_next_Ep(self, nwkid)
+                continue
+
+            self.log.logging("Pairing", "Status", "[-] NEW OBJECT: %s retry %s %s (attempt %s)" % (
+                nwkid, step, ep or "", attempts + 1))
+            engine.step_sent(nwkid, step, ep)
+            PAIRING_STEP_REQUESTS[step](self, nwkid, ep)
+
+        for nwkid in engine.release_expired(self.pluginconf.pluginConf["PairingProvisioningTimeout"], self.pluginconf.pluginConf["PairingConcurrency"]):
+            # A provisioning slot is available
+            engine.notify(nwkid)
+
+
+def pairing_advance(self, Devices):
+    """ Move forward the interview of the devices which got a response, without waiting for the next heartbeat """
+
+    engine = self.pairingEngine
+    with engine.lock:
+        for nwkid in engine.pop_ready():
+            if nwkid not in self.ListOfDevices:
+                continue
+            device = self.ListOfDevices[nwkid]
+            status = device.get("Status")
+            if status in NOT_IN_PAIRING_STATUS:
+                continue
+            if status != "8043" and device.get("Model") not in self.DeviceConf:
+                # Still describing the device, the heartbeat will take care
+                continue
+            RIA = int(device["RIA"]) if device.get("RIA") not in (None, "", {}) else 0
+            processNotinDBDevices(self, Devices, nwkid, status, RIA)
+
+
+def pairing_admit(self, nwkid):
+    """ Admit a device to the provisioning, if the radio can take it """
+
+    busy = self.ControllerLink.loadTransmit() >= MAX_LOAD_ZIGATE
+    if self.pairingEngine.admit(nwkid, self.pluginconf.pluginConf["PairingConcurrency"], busy):
+        return True
+    self.log.logging("Pairing", "Debug", "[-] NEW OBJECT: %s waiting for provisioning ( %s devices in progress, load: %s )" % (
+        nwkid, len(self.pairingEngine.provisioning), self.ControllerLink.loadTransmit()), nwkid)
+    return False
+
+
 def processNotinDBDevices(self, Devices, NWKID, status, RIA):
 
     # Starting V 4.1.x
@@ -124,6 +228,9 @@ def processNotinDBDevices(self, Devices, NWKID, status, RIA):
         # We do a request_node_description in case of unknown.
         request_node_descriptor(self, NWKID, RIA=None, status=None)
         interview_state_createDB(self, Devices, NWKID, RIA, status)
+        if self.pairingEngine.is_waiting(NWKID):
+            # Waiting for a provisioning slot, this is not a retry
+            return
 
     if status != "CreateDB":
         if HB_ > 2 and not knownModel and status in ("004d", "0045"):
@@ -162,6 +269,9 @@ def interview_state_004d(self, NWKID, RIA=None, status=None):
     self.ListOfDevices[NWKID]["Heartbeat"] = "0"
     self.ListOfDevices[NWKID]["Status"] = "0045"
 
+    # (Re)Starting the interview
+    self.pairingEngine.forget(NWKID)
+
     request_tuya_magic_read = self.pluginconf.pluginConf["TuyaMagicRead"]
 
     MsgIEEE = self.ListOfDevices[NWKID].get("IEEE", None)
@@ -178,7 +288,7 @@ def interview_state_004d(self, NWKID, RIA=None, status=None):
     # Check if Cluster 0500 is on this device. If so this will trigger IAS asap
     zdp_raw_match_desc_req_0500( self,NWKID )
 
-    zdp_active_endpoint_request(self, NWKID )
+    pairing_step_request(self, NWKID, "ActiveEndpoint")
     return "0045"
 
 
@@ -197,7 +307,7 @@ def interview_state_8043(self, NWKID, RIA, knownModel, status):
 
     if "Model" not in self.ListOfDevices[NWKID] or self.ListOfDevices[NWKID]["Model"] in ( "", {}):
         self.log.logging("Pairing", "Debug", "[%s] NEW OBJECT: %s Request Model Name" % (RIA, NWKID))
-        ReadAttributeRequest_0000(self, NWKID, fullScope=False)  # Reuest Model Name
+        pairing_step_request(self, NWKID, "Model")
 
     request_node_descriptor(self, NWKID, RIA=None, status=None)
 
@@ -229,13 +339,14 @@ def request_node_descriptor(self, NWKID, RIA=None, status=None):
         self.log.logging( "Pairing", "Debug", "[%s] NEW OBJECT: %s Manufacturer: %s Model: %s" % (RIA, NWKID, manufacturer, model), NWKID, )
         return False
 
-    self.log.logging("Pairing", "Status", "[%s] NEW OBJECT: %s Request Node Descriptor" % (RIA, NWKID))
-    zdp_node_descriptor_request(self, NWKID)
+    if pairing_step_request(self, NWKID, "NodeDescriptor"):
+        self.log.logging("Pairing", "Status", "[%s] NEW OBJECT: %s Request Node Descriptor" % (RIA, NWKID))
     return True
 
 
 def interview_state_8045(self, NWKID, RIA=None, status=None):
     self.log.logging( "Pairing", "Debug", "interview_state_8045 - NWKID: %s, Status: %s, RIA: %s," % ( NWKID, status, RIA, ), )
+    self.pairingEngine.step_completed(NWKID, "ActiveEndpoint")
     if RIA:
         self.ListOfDevices[NWKID]["RIA"] = str(RIA + 1)
     self.ListOfDevices[NWKID]["Heartbeat"] = "0"
@@ -243,14 +354,12 @@ def interview_state_8045(self, NWKID, RIA=None, status=None):
 
     if "Model" not in self.ListOfDevices[NWKID] or self.ListOfDevices[NWKID]["Model"] in ( {}, ""):
         self.log.logging("Pairing", "Debug", "[%s] NEW OBJECT: %s Request Model Name" % (RIA, NWKID))
-        ReadAttributeRequest_0000(self, NWKID, fullScope=False)  # Reuest Model Name
+        pairing_step_request(self, NWKID, "Model")
 
     return "0043" if request_next_Ep(self, NWKID) else "0045"
 
 def request_next_Ep(self, Nwkid):
-    if "ReqEpv2" not in self.ListOfDevices[Nwkid]:
-        self.ListOfDevices[Nwkid]["ReqEpv2"] = {}
-        
+    engine = self.pairingEngine
     for iterEp in list(self.ListOfDevices[Nwkid]["Ep"]):
         if is_fake_ep(self, Nwkid, iterEp):
             continue
@@ -260,19 +369,23 @@ def request_next_Ep(self, Nwkid):
             continue
         
         if iterEp in self.ListOfDevices[Nwkid]["Epv2"] and self.ListOfDevices[Nwkid]["Ep"][ iterEp ] not in ( "", {}):
+            engine.step_completed(Nwkid, "SimpleDescriptor", iterEp)
             continue
-        
-        if iterEp in self.ListOfDevices[Nwkid]["ReqEpv2"] and self.ListOfDevices[Nwkid]["ReqEpv2"][ iterEp ] < ( time.time() + 120 ):
+
+        if engine.step_given_up(Nwkid, "SimpleDescriptor", iterEp):
             continue
 
+        if engine.step_in_progress(Nwkid, "SimpleDescriptor", iterEp):
+            # Let's wait for the response (or the retry) before requesting the next one
+            return False
+
         # Let's request only 1 Ep, in order wait for the response and then request the next one
         self.log.logging("Pairing", "Status", "[%s] NEW OBJECT: %s Request Simple Descriptor for Ep: %s" % ("-", Nwkid, iterEp))
-        self.ListOfDevices[Nwkid]["ReqEpv2"][ iterEp ] = time.time()
-        zdp_simple_descriptor_request(self, Nwkid, iterEp)
+        pairing_step_request(self, Nwkid, "SimpleDescriptor", iterEp)
         return False
         
     # We have been all Ep, and so nothing else to do
-
+    engine.notify(Nwkid)
     return True
 
    
@@ -286,8 +399,7 @@ def interview_timeout(self, Devices, NWKID, RIA, status):
     self.log.logging("Pairing", "Error", "processNotinDB - Collected Infos are : %s" % (str(self.ListOfDevices[NWKID])))
     self.adminWidgets.updateNotificationWidget(Devices, "Unable to collect all informations for enrollment of this devices. See Logs")
     self.CommiSSionning = False
-    if "ReqEpv2" in self.ListOfDevices[NWKID]:
-        del self.ListOfDevices[NWKID]["ReqEpv2"]
+    self.pairingEngine.forget(NWKID)
 
     return "UNKNOW"
 
@@ -352,10 +464,15 @@ def create_device_without_Domoticz_Widgets( self, Nwkid):
         self.ListOfDevices[Nwkid]["Status"] = "notDB"
         self.ListOfDevices[Nwkid]["PairingInProgress"] = False
         self.CommiSSionning = False
+        self.pairingEngine.forget(Nwkid)
         self.ListOfDevices[ Nwkid ]["CertifiedDevice"] = self.ListOfDevices[Nwkid]["Model"] in self.DeviceConf
    
 def full_provision_device(self, Devices, NWKID, RIA, status):
 
+    if not pairing_admit(self, NWKID):
+        # Too many devices being provisioned, or the radio is busy. Will be back when a slot is available
+        return
+
     self.log.logging(
         "Pairing",
         "Debug",
@@ -398,6 +515,7 @@ def full_provision_device(self, Devices, NWKID, RIA, status):
     self.ListOfDevices[NWKID]["Heartbeat"] = 0
     self.adminWidgets.updateNotificationWidget(Devices, "Successful creation of Widget for :%s DeviceID: %s" % (self.ListOfDevices[NWKID]["Model"], NWKID))
     self.CommiSSionning = False
+    self.pairingEngine.forget(NWKID)
 
     self.ListOfDevices[NWKID]["PairingInProgress"] = False
 
@@ -459,9 +577,6 @@ def zigbee_provision_device(self, Devices, NWKID, RIA, status):
     # 6- Updating the Certified devices list
     self.ListOfDevices[ NWKID ]["CertifiedDevice"] = modelName in self.DeviceConf
 
-    # Cleanup if needed
-    if "ReqEpv2" in self.ListOfDevices[NWKID]:
-        del self.ListOfDevices[NWKID]["ReqEpv2"]
 
 
 def binding_needed_clusters_with_zigate(self, NWKID):
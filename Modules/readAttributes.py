@@ -111,7 +111,12 @@ def ReadAttributeReq( self, addr, EpIn, EpOut, Cluster, ListOfAttributes, manufa
 
     maxReadAttributesByRequest = get_max_read_attribute_value( self, addr )    
 
-    if forceLen:
+    adaptive_polling = getattr(self, "adaptivePolling", None)
+    if not forceLen and adaptive_polling and adaptive_polling.in_cycle(addr):
+        # We are polling, the request will be merged with the others of the cycle and sent by polled_read_attributes()
+        adaptive_polling.queue_read(addr, EpIn, EpOut, Cluster, ListOfAttributes, manufacturer_spec, manufacturer, ackIsDisabled, maxReadAttributesByRequest)
+
+    elif forceLen:
         normalizedReadAttributeReq(self, addr, EpIn, EpOut, Cluster, ListOfAttributes, manufacturer_spec, manufacturer, ackIsDisabled, force=True) 
         
     elif not isinstance(ListOfAttributes, list) or len(ListOfAttributes) <= maxReadAttributesByRequest:
@@ -121,6 +126,43 @@ def ReadAttributeReq( self, addr, EpIn, EpOut, Cluster, ListOfAttributes, manufa
             normalizedReadAttributeReq(self, addr, EpIn, EpOut, Cluster, shortlist, manufacturer_spec, manufacturer, ackIsDisabled)
 
 
+def polled_read_attributes(self, NwkId, list_of_functions, suppress=True):
+    """
+    Call the ReadAttributeRequest_xxxx functions as a polling cycle of NwkId.
+    When Adaptive Polling is enabled, attributes reported within their expected window are not read (if suppress),
+    and the attributes of the same Ep/Cluster are merged into the minimum of requests.
+    Return the number of Read Attribute requests sent, None if Adaptive Polling is not enabled.
+    """
+
+    adaptive_polling = getattr(self, "adaptivePolling", None)
+    if adaptive_polling is None or not adaptive_polling.enabled():
+        for func in list_of_functions:
+            func(self, NwkId)
+        return None
+
+    adaptive_polling.start_cycle(NwkId, suppress)
+    try:
+        for func in list_of_functions:
+            func(self, NwkId)
+    finally:
+        requests = adaptive_polling.end_cycle()
+
+    maxReadAttributesByRequest = get_max_read_attribute_value( self, NwkId )
+    nbframes = 0
+    for (EpIn, EpOut, Cluster, manufacturer_spec, manufacturer, ackIsDisabled), ListOfAttributes in requests:
+        for shortlist in split_list(ListOfAttributes, wanted_parts=maxReadAttributesByRequest):
+            normalizedReadAttributeReq(self, NwkId, EpIn, EpOut, Cluster, shortlist, manufacturer_spec, manufacturer, ackIsDisabled)
+            nbframes += 1
+    adaptive_polling.frames_sent(nbframes)
+
+    # Nothing sent for those clusters, but the poll is done: stamp them as read, so they are not checked again ( and the
+    # saved work accounted again ) at each heartbeat until the next scheduled poll
+    now = int(time.time())
+    for EpOut, Cluster in adaptive_polling.suppressed_clusters:
+        set_timestamp_datastruct(self, "ReadAttributes", NwkId, EpOut, Cluster, now)
+    return nbframes
+
+
 def split_list(list_in, wanted_parts=1):
     """
     Split the list of attrributes in wanted part
@@ -19,7 +19,7 @@ from pathlib import Path
 from DevicesModules import FUNCTION_MODULE, FUNCTION_WITH_ACTIONS_MODULE
 from Modules.batterieManagement import UpdateBatteryAttribute
 from Modules.domoMaj import MajDomoDevice
-from Modules.tools import (checkAndStoreAttributeValue,
+from Modules.tools import (checkAndStoreAttributeValue, compile_formula,
                            get_device_config_param, getAttributeValue)
 from Modules.zclClusterHelpers import (decoding_attribute_data,
                                        handle_model_name)
@@ -447,10 +447,9 @@ def compute_attribute_value( self, nwkid, ep, cluster, attribut, value, _eval_in
         func = FUNCTION_MODULE[ _function ]
         return func( self, nwkid, ep, cluster, attribut, value )
         
-    evaluation_result = value
-    custom_variable = {}
+    variables = {}
     if _eval_inputs is not None:
-        for idx, x in enumerate(_eval_inputs):
+        for x in _eval_inputs:
             #  "EvalExpCustomVariables": {"scale": { "ClusterId": "0403", "AttributeId": "0014"}},
             if "ClusterId" in _eval_inputs[x] and "AttributeId" in _eval_inputs[x]:
                 cluster = _eval_inputs[x][ "ClusterId" ]
@@ -462,32 +461,71 @@ def compute_attribute_value( self, nwkid, ep, cluster, attribut, value, _eval_in
                     self.log.logging("ZclClusters", "Error", "process_cluster_attribute_response - unable to found Input variable: %s Cluster: %s Attribute: %s" %(
                         x, cluster, attribute))
                     continue
-                custom_variable[ idx ] = custom_value
-                _eval_formula = _update_eval_formula( self, _eval_formula, x, "custom_variable[ %s ]" % idx)
-                self.log.logging("ZclClusters", "Debug", " . Updated formula: %s" %_eval_formula)
+                variables[ x ] = custom_value
 
-        for x in custom_variable:
-            self.log.logging("ZclClusters", "Debug", " . custom_variable[ %s ] = %s" %( idx, custom_variable[ idx ]))
-        
-    if _eval_formula is not None and _eval_formula != "":
+    if _eval_formula is None or _eval_formula == "":
+        return None
+
+    formula = zcl_formula( self, _eval_formula, tuple(variables))
+    if formula is None:
+        return evaluate_zcl_formula( self, nwkid, ep, cluster, attribut, value, _eval_formula, variables)
+
+    try:
+        evaluation_result = formula( value, *variables.values() )
+        self.log.logging("ZclClusters", "Debug", " . after evaluation value: %s -> %s" %( value, evaluation_result))
+        return evaluation_result
+
+    except (ArithmeticError, TypeError, ValueError) as e:
+        self.log.logging("ZclClusters", "Error", "Error while computing the formula %s/%s %s %s" %(
+            nwkid, ep, cluster, attribut))
+        _log_error_formula( self, e, _eval_formula, variables)
+    return None
+
+
+# EvalExp formulas are compiled once per set of custom variables ( compile_formula ), formulas outside of the
+# whitelist are evaluated at runtime
+ZCL_FORMULAS = {}  # { ( formula, custom variable names ): compiled formula, None if evaluated at runtime }
+
+
+def zcl_formula( self, _eval_formula, variable_names):
+
+    key = ( _eval_formula, variable_names )
+    if key not in ZCL_FORMULAS:
         try:
-            evaluation_result = eval( _eval_formula )
-            self.log.logging("ZclClusters", "Debug", " . after evaluation value: %s -> %s" %( value, evaluation_result))
-            return evaluation_result
-
-        except NameError as e:
-            self.log.logging("ZclClusters", "Error", "Undefined variable, please check the formula %s/%s %s %s" %(
-                nwkid, ep, cluster, attribut))
-            _log_error_formula( self, e, _eval_formula, custom_variable)
-        
-        except SyntaxError as e:
-            self.log.logging("ZclClusters", "Error", "Syntax error, please check the formula")
-            _log_error_formula( self, e, _eval_formula, custom_variable)
-            
-        except ValueError as e:
-            self.log.logging("ZclClusters", "Error", "Value Error, please check the formula")
-            _log_error_formula( self, e, _eval_formula, custom_variable)
-            
+            ZCL_FORMULAS[ key ] = compile_formula( _eval_formula, variable_names)
+        except SyntaxError:
+            ZCL_FORMULAS[ key ] = None
+        if ZCL_FORMULAS[ key ] is None:
+            self.log.logging("ZclClusters", "Log", "Formula %s cannot be compiled, it will be evaluated at runtime" % _eval_formula)
+    return ZCL_FORMULAS[ key ]
+
+
+def evaluate_zcl_formula( self, nwkid, ep, cluster, attribut, value, _eval_formula, variables):
+
+    custom_variable = {}
+    for idx, x in enumerate(variables):
+        custom_variable[ idx ] = variables[ x ]
+        _eval_formula = _update_eval_formula( self, _eval_formula, x, "custom_variable[ %s ]" % idx)
+        self.log.logging("ZclClusters", "Debug", " . Updated formula: %s" %_eval_formula)
+
+    try:
+        evaluation_result = eval( _eval_formula )
+        self.log.logging("ZclClusters", "Debug", " . after evaluation value: %s -> %s" %( value, evaluation_result))
+        return evaluation_result
+
+    except NameError as e:
+        self.log.logging("ZclClusters", "Error", "Undefined variable, please check the formula %s/%s %s %s" %(
+            nwkid, ep, cluster, attribut))
+        _log_error_formula( self, e, _eval_formula, custom_variable)
+
+    except SyntaxError as e:
+        self.log.logging("ZclClusters", "Error", "Syntax error, please check the formula")
+        _log_error_formula( self, e, _eval_formula, custom_variable)
+
+    except ValueError as e:
+        self.log.logging("ZclClusters", "Error", "Value Error, please check the formula")
+        _log_error_formula( self, e, _eval_formula, custom_variable)
+
     return None
 
 def _log_error_formula( self, e, _eval_formula, custom_variable):
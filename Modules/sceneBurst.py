@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Implementation of Zigbee for Domoticz plugin.
+#
+# This file is part of Zigbee for Domoticz plugin. https://github.com/zigbeefordomoticz/Domoticz-Zigbee
+# (C) 2015-2024
+#
+# Initial authors: zaraki673 & pipiche38
+#
+# SPDX-License-Identifier:    GPL-3.0 license
+
+"""
+    Fan-out of the On/Off commands sent by Domoticz scenes.
+
+    A scene switching many lights ends up in one onCommand per light, so in one unicast per light. When the lights
+    are already members of a Zigbee group, a single group command does the job.
+
+    The first On/Off command after a quiet period is sent right away ( a single command is not delayed ). The next
+    ones, received within SceneBurstWindow milliseconds, are collected. Once the window is over, the groups whose
+    members are all targeted by the same command are used ( largest first ), and the remaining targets get their
+    unicast. A group is never used if one of its members is not targeted, as it would be switched as well.
+
+    The collected commands are sent from the plugin thread ( scene_burst_flush_due() is called by onCommand,
+    onMessage and onHeartbeat ), as sendData and the device structures are not thread safe.
+
+    Sets of devices often switched together with unicasts are reported, as candidates for a group.
+"""
+
+import threading
+import time
+
+from Classes.TrafficScheduler import traffic_class
+from Modules.actuators import actuator_off, actuator_on
+from Modules.zigateConsts import ZIGATE_EP
+from Zigbee.zclCommands import (zcl_group_onoff_off_noeffect,
+                                zcl_group_onoff_on)
+
+SCENE_BURST_LOCK = threading.Lock()
+_BURST = {
+    "Last": 0,  # time of the last On/Off command
+    "Sent": {},  # { ( nwkid, ep ): command } sent right away, at the beginning of the burst
+    "Pending": {},  # { ( nwkid, ep ): command } collected during the window
+    "Deadline": None,  # end of the window, when commands are collected
+}
+
+SCENE_BURST_STATS = {"Commands": 0, "Bursts": 0, "GroupFrames": 0, "UnicastFrames": 0, "FramesSaved": 0}
+
+ADHOC_GROUPS_SIZE = 20
+ADHOC_GROUPS_REPORT = 3  # Number of bursts with the same devices before reporting them
+_ADHOC_GROUPS = {}  # { frozenset( ( nwkid, ep ) ): number of bursts }
+
+
+def scene_burst_onoff(self, nwkid, ep, command):
+    """ Send an On/Off command ( command is "On" or "Off" ), possibly as part of a group command """
+
+    window = self.pluginconf.pluginConf.get("SceneBurstWindow", 0) / 1000
+    if not window or self.groupmgt is None or not self.groupmgt.ListOfGroups:
+        _send_unicast(self, nwkid, ep, command)
+        return
+
+    with SCENE_BURST_LOCK:
+        SCENE_BURST_STATS["Commands"] += 1
+        now = time.time()
+        quiet = now - _BURST["Last"] > window and _BURST["Deadline"] is None
+        _BURST["Last"] = now
+        if quiet:
+            _BURST["Sent"] = {(nwkid, ep): command}
+        else:
+            _BURST["Pending"][(nwkid, ep)] = command
+            if _BURST["Deadline"] is None:
+                _BURST["Deadline"] = now + window
+
+    if quiet:
+        _send_unicast(self, nwkid, ep, command)
+        with SCENE_BURST_LOCK:
+            SCENE_BURST_STATS["UnicastFrames"] += 1
+
+
+def scene_burst_flush_due(self):
+    """ Called from the plugin thread: send the collected commands, if the window is over """
+
+    deadline = _BURST["Deadline"]
+    if deadline is not None and time.time() >= deadline:
+        scene_burst_flush(self)
+
+
+def scene_burst_cancel():
+    """ Drop the commands collected and not sent ( plugin stop ) """
+
+    with SCENE_BURST_LOCK:
+        _BURST["Pending"], _BURST["Sent"], _BURST["Deadline"] = {}, {}, None
+
+
+@traffic_class("interactive")  # Flushed from onHeartbeat or onMessage as well, out of the onCommand scope
+def scene_burst_flush(self):
+    """ End of the window: send the collected commands """
+
+    with SCENE_BURST_LOCK:
+        pending, sent = _BURST["Pending"], _BURST["Sent"]
+        _BURST["Pending"], _BURST["Sent"], _BURST["Deadline"] = {}, {}, None
+    if not pending:
+        return
+
+    group_frames = unicast_frames = 0
+    for command in ("On", "Off"):
+        targets = {target for target, value in pending.items() if value == command}
+        if not targets:
+            continue
+        # Targets already switched at the beginning of the burst can be part of a group command as well
+        already_sent = {target for target, value in sent.items() if value == command}
+        for group_id in select_groups(self, targets, already_sent):
+            self.log.logging("Command", "Debug", "scene_burst_flush - %s to group %s" % (command, group_id))
+            if command == "On":
+                zcl_group_onoff_on(self, group_id, ZIGATE_EP, "01")
+            else:
+                zcl_group_onoff_off_noeffect(self, group_id, ZIGATE_EP, "01")
+            targets -= _group_members(self, group_id)
+            group_frames += 1
+
+        for nwkid, ep in sorted(targets):
+            _send_unicast(self, nwkid, ep, command)
+            unicast_frames += 1
+        _record_adhoc_group(self, targets)
+
+    with SCENE_BURST_LOCK:
+        SCENE_BURST_STATS["Bursts"] += 1
+        SCENE_BURST_STATS["GroupFrames"] += group_frames
+        SCENE_BURST_STATS["UnicastFrames"] += unicast_frames
+        SCENE_BURST_STATS["FramesSaved"] += len(pending) - group_frames - unicast_frames
+
+    if group_frames:
+        self.log.logging("Command", "Log", "Scene burst: %s commands sent as %s group and %s unicast frames" % (
+            len(pending), group_frames, unicast_frames))
+
+
+def select_groups(self, targets, already_sent=()):
+    """ Return the groups to be used for targets ( set of ( nwkid, ep ) ), largest first """
+
+    candidates = []
+    for group_id in list(self.groupmgt.ListOfGroups):
+        if self.groupmgt.ListOfGroups.get(group_id, {}).get("Cluster") == "0102":
+            # Window Covering groups have their own commands
+            continue
+        members = _group_members(self, group_id)
+        if members and members <= (targets | set(already_sent)) and len(members & targets) >= 2:
+            candidates.append((len(members & targets), group_id, members))
+
+    selected = []
+    remaining = set(targets)
+    for _, group_id, members in sorted(candidates, reverse=True):
+        # A group is worth it, only if it saves at least one frame
+        if len(members & remaining) >= 2:
+            selected.append(group_id)
+            remaining -= members
+    return selected
+
+
+def _group_members(self, group_id):
+    return {(nwkid, ep) for nwkid, ep, *_ in self.groupmgt.ListOfGroups.get(group_id, {}).get("Devices", [])}
+
+
+def _send_unicast(self, nwkid, ep, command):
+    if command == "On":
+        actuator_on(self, nwkid, ep, "Light")
+    else:
+        actuator_off(self, nwkid, ep, "Light")
+
+
+def _record_adhoc_group(self, targets):
+    minimum = self.pluginconf.pluginConf.get("SceneBurstAdhocGroup", 0)
+    if not minimum or len(targets) < minimum:
+        return
+
+    key = frozenset(targets)
+    with SCENE_BURST_LOCK:
+        _ADHOC_GROUPS[key] = _ADHOC_GROUPS.pop(key, 0) + 1
+        count = _ADHOC_GROUPS[key]
+        while len(_ADHOC_GROUPS) > ADHOC_GROUPS_SIZE:
+            del _ADHOC_GROUPS[next(iter(_ADHOC_GROUPS))]
+
+    if count == ADHOC_GROUPS_REPORT:
+        self.log.logging("Command", "Status", "Scene burst: %s devices are often switched together, a group would save %s frames: %s" % (
+            len(targets), len(targets) - 1, ", ".join("%s/%s" % target for target in sorted(targets))))
+
+
+def scene_burst_report():
+    """ Statistics of the fan-out, and the sets of devices which could be grouped """
+
+    with SCENE_BURST_LOCK:
+        return {
+            "Statistics": dict(SCENE_BURST_STATS),
+            "AdhocGroups": [
+                {"Devices": ["%s/%s" % target for target in sorted(targets)], "Bursts": count}
+                for targets, count in _ADHOC_GROUPS.items()
+            ],
+        }
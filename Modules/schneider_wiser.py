@@ -22,6 +22,7 @@ import os.path
 import struct
 from time import time
 
+from Classes.WiserZones import room_number
 from Modules.basicOutputs import read_attribute, write_attribute
 from Modules.bindings import WebBindStatus, webBind
 from Modules.domoMaj import MajDomoDevice
@@ -80,74 +81,58 @@ def callbackDeviceAwake_Schneider(self, Devices, NwkId, EndPoint, cluster):
         check_end_of_override_setpoint(self, Devices, NwkId, EndPoint)
 
 
+# Contribution of a room member endpoint to the heating demand of the room: ( applicable to the endpoint, cluster,
+# attribute, demand in % from the attribute value ). The first applicable and available source of an endpoint is used.
+WISER_HEATING_DEMAND_SOURCES = (
+    # Pi Heating Demand of a thermostat or a valve
+    (lambda ep: "0201" in ep, "0201", "0008", lambda value: int(value)),
+    # Mostlikely a FIP, then we check if there is some instant power or not
+    (lambda ep: "0201" in ep, "0702", "0400", lambda value: 100 if int(value) > 0 else 0),
+    # Simple On/Off
+    (lambda ep: "0201" not in ep, "0006", "0000", lambda value: 100 if int(value) else 0),
+)
+
+
 def wiser_thermostat_monitoring_heating_demand(self, Devices):
-    # Let check what is the Heating Demand
-    updated_pi_demand = None
+    """ Heartbeat of the Wiser rooms: overrides to be reverted, and heating demand of the Wiser Thermostats """
 
-    for NwkId in list(self.ListOfDevices):
-        if "Model" not in self.ListOfDevices[NwkId]:
-            continue
-        if self.ListOfDevices[NwkId]["Model"] != "Wiser2-Thermostat":
-            continue
-        if "Param" not in self.ListOfDevices[NwkId]:
-            continue
-        if "WiserRoomNumber" not in self.ListOfDevices[NwkId]["Param"]:
-            continue
-        if "0201" not in self.ListOfDevices[NwkId]["Ep"]["01"]:
-            continue
-        if "0008" not in self.ListOfDevices[NwkId]["Ep"]["01"]["0201"]:
-            self.ListOfDevices[NwkId]["Ep"]["01"]["0201"]["0008"] = 0
-        if "Model" not in self.ListOfDevices[NwkId]:
-            continue
+    for NwkId, Ep in self.wiserZones.expired_overrides():
+        if NwkId in self.ListOfDevices:
+            check_end_of_override_setpoint(self, Devices, NwkId, Ep)
 
-        # We have found a Wiser Thermostat
-        thermostat_room_number = int(self.ListOfDevices[NwkId]["Param"]["WiserRoomNumber"])
-        updated_pi_demand = 0
-        cnt_actioners = 0
+    rooms = self.wiserZones.index(self.ListOfDevices)
+    dirty = self.wiserZones.pop_dirty()
+    for room, members in rooms.items():
+        for NwkId in members:
+            if self.ListOfDevices.get(NwkId, {}).get("Model") == "Wiser2-Thermostat":
+                wiser_room_heating_demand(self, Devices, NwkId, room, force=room in dirty)
 
-        # We need to find if there is any devices where this parameter is set and with the same value
-        for x in list(self.ListOfDevices):
-            if x == NwkId:
-                continue
-            if "Param" not in self.ListOfDevices[x]:
-                continue
-            if "WiserRoomNumber" not in self.ListOfDevices[x]["Param"]:
-                continue
-            if int(self.ListOfDevices[x]["Param"]["WiserRoomNumber"]) != thermostat_room_number:
-                continue
 
-            # We have a device which belongs to the same room
-            for y in list(self.ListOfDevices[x]["Ep"]):
-                if "0201" in self.ListOfDevices[x]["Ep"][y]:
-                    if "0008" in self.ListOfDevices[x]["Ep"][y]["0201"]:
-                        # Pi Demand based on 0201 Cluster
-                        updated_pi_demand += int(self.ListOfDevices[x]["Ep"][y]["0201"]["0008"])
-                        cnt_actioners += 1
-
-                    elif "0702" in self.ListOfDevices[x]["Ep"][y] and "0400" in self.ListOfDevices[x]["Ep"][y]["0702"]:
-                        # Mostlikely a FIP, then we check if there is some instant power or not
-                        cnt_actioners += 1
-                        if int(self.ListOfDevices[x]["Ep"][y]["0702"]["0400"]) > 0:
-                            updated_pi_demand += 100
-
-                elif "0006" in self.ListOfDevices[x]["Ep"][y]:
-                    # It is a simple ON/Off
-                    if "0000" in self.ListOfDevices[x]["Ep"][y]["0006"]:
-                        cnt_actioners += 1
-                        if int(self.ListOfDevices[x]["Ep"][y]["0006"]["0000"]):
-                            updated_pi_demand += 100
-
-        if cnt_actioners:
-            self.ListOfDevices[NwkId]["Ep"]["01"]["0201"]["0008"] = int(round(updated_pi_demand / cnt_actioners))
-            MajDomoDevice(
-                self,
-                Devices,
-                NwkId,
-                "01",
-                "0201",
-                self.ListOfDevices[NwkId]["Ep"]["01"]["0201"]["0008"],
-                Attribute_="0008",
-            )
+def wiser_room_heating_demand(self, Devices, NwkId, room, force=False):
+    """ Heating demand of a Wiser Thermostat, as the average of the demand of the actuators of its room """
+
+    thermostat = self.ListOfDevices[NwkId].get("Ep", {}).get("01", {}).get("0201")
+    if thermostat is None:
+        return
+    thermostat.setdefault("0008", 0)
+
+    updated_pi_demand = cnt_actioners = 0
+    for x in self.wiserZones.room_members(self.ListOfDevices, room):
+        if x == NwkId or x not in self.ListOfDevices:
+            continue
+        for ep in list(self.ListOfDevices[x].get("Ep", {}).values()):
+            for applicable, cluster, attribute, demand in WISER_HEATING_DEMAND_SOURCES:
+                if applicable(ep) and attribute in ep.get(cluster, {}):
+                    updated_pi_demand += demand(ep[cluster][attribute])
+                    cnt_actioners += 1
+                    break
+
+    if not cnt_actioners:
+        return
+
+    thermostat["0008"] = int(round(updated_pi_demand / cnt_actioners))
+    if self.wiserZones.demand_changed(NwkId, thermostat["0008"]) or force:
+        MajDomoDevice( self, Devices, NwkId, "01", "0201", thermostat["0008"], Attribute_="0008", )
 
 
 def callbackDeviceAwake_Schneider_SetPoints(self, NwkId, EndPoint, cluster):
@@ -1013,13 +998,10 @@ def schneider_thermostat_answer_attribute_request(self, NWKID, EPout, ClusterID,
         EPout {[type]} -- [description]
         ClusterID {[type]} -- [description]
         sqn {[type]} -- [description]
-        rawAttr {[type]} -- [description]
+        rawAttr {[type]} -- attribute, or list of attributes answered in a single Read Attributes Response
     """
     self.log.logging("Schneider", "Debug", f"Schneider receive attribute request: nwkid {NWKID} ep: {EPout} , clusterId: {ClusterID}, sqn: {sqn},rawAttr: {attr}", NWKID)
 
-
-    data = dataType = payload = ""
-
     zigate_ep = ZIGATE_EP
     if "Model" in self.ListOfDevices[NWKID] and self.ListOfDevices[NWKID]["Model"] in ("Wiser2-Thermostat",):
         EPout = "01"
@@ -1032,6 +1014,32 @@ def schneider_thermostat_answer_attribute_request(self, NWKID, EPout, ClusterID,
     else:
         cluster_frame = "18"
 
+    records = ""
+    for attribute in ([attr] if isinstance(attr, str) else attr):
+        records += _schneider_thermostat_attribute_record(self, NWKID, EPout, ClusterID, attribute)
+    if records == "":
+        return
+
+    cmd = "01"
+    payload = cluster_frame + sqn + cmd + records
+
+    raw_APS_request(
+        self,
+        NWKID,
+        EPout,
+        ClusterID,
+        "0104",
+        payload,
+        zigate_ep=zigate_ep,
+        ackIsDisabled=is_ack_tobe_disabled(self, NWKID),
+    )
+
+
+def _schneider_thermostat_attribute_record(self, NWKID, EPout, ClusterID, attr):
+    """ Read Attributes Response record of an attribute, empty if the attribute is not answered """
+
+    data = dataType = ""
+
     if attr == "0000":  # Local Temperature
         dataType = "29"
         if ( "Model" in self.ListOfDevices[NWKID] and self.ListOfDevices[NWKID]["Model"] in ( "iTRV",) ):
@@ -1086,35 +1094,16 @@ def schneider_thermostat_answer_attribute_request(self, NWKID, EPout, ClusterID,
         data = "01"  # 0x02 then 0x030, 0x11
 
     else:
-        return
-
-    if data == dataType == "":
-        # Unable to find a match
-        wiser_unsupported_attribute(self, NWKID, EPout, sqn, ClusterID, attr)
-        return
+        return ""
 
-    cmd = "01"
     status = "00"
 
-    self.log.logging("Schneider", "Debug", f"schneider_thermostat_answer_attribute_request: nwkid {NWKID} ep: {EPout} , clusterId: {ClusterID}, sqn: {sqn}, attr: {attr}, dataType: {dataType}, data: {data}", NWKID)
-
+    self.log.logging("Schneider", "Debug", f"schneider_thermostat_answer_attribute_request: nwkid {NWKID} ep: {EPout} , clusterId: {ClusterID}, attr: {attr}, dataType: {dataType}, data: {data}", NWKID)
 
     if dataType == "29":
-        payload = cluster_frame + sqn + cmd + attr[2:4] + attr[:2] + status + dataType + data[2:4] + data[:2]
+        return attr[2:4] + attr[:2] + status + dataType + data[2:4] + data[:2]
+    return attr[2:4] + attr[:2] + status + dataType + data
 
-    else:
-        payload = cluster_frame + sqn + cmd + attr[2:4] + attr[:2] + status + dataType + data
-
-    raw_APS_request(
-        self,
-        NWKID,
-        EPout,
-        ClusterID,
-        "0104",
-        payload,
-        zigate_ep=zigate_ep,
-        ackIsDisabled=is_ack_tobe_disabled(self, NWKID),
-    )
 
 def define_heating_demand_for_iTRV(self, NwkId):
     # We force to use Ep 0x01 even if the iTRV is communicating on Ep 0x02
@@ -1323,6 +1312,7 @@ def schneiderReadRawAPS(self, Devices, srcNWKID, srcEp, ClusterID, dstNWKID, dst
             #     Sqn + srcNWKID + srcEp + "01" + ClusterID + "01" + ManufSpec + ManufCode + "%02x" % (len(Data) // 4)
             # )
             idx = nbAttribute = 0
+            attributes = []
             while idx < len(Data):
                 nbAttribute += 1
                 Attribute = "%04x" % struct.unpack("H", struct.pack(">H", int(Data[idx: idx + 4], 16)))[0]
@@ -1331,8 +1321,11 @@ def schneiderReadRawAPS(self, Devices, srcNWKID, srcEp, ClusterID, dstNWKID, dst
                     wiser_unsupported_attribute(self, srcNWKID, srcEp, Sqn, ClusterID, Attribute)
                 else:
                     self.log.logging("Schneider", "Debug", f"Schneider cmd 0x00 [{Sqn}] Read Attribute Request on Src: {srcNWKID}/{srcEp} for {ClusterID}/{Attribute} Dst: {dstNWKID}/{dstEP}", srcNWKID)
+                    attributes.append(Attribute)
 
-                    schneider_thermostat_answer_attribute_request(self, srcNWKID, srcEp, ClusterID, Sqn, Attribute)
+            if attributes:
+                # All attributes are answered in one Read Attributes Response
+                schneider_thermostat_answer_attribute_request(self, srcNWKID, srcEp, ClusterID, Sqn, attributes)
 
         elif not GlobalCommand and Command == "00":  # Setpoint Raise/Lower
             # Decode8002 - NwkId: 656d Ep: 01 Cluster: 0201 GlobalCommand: False Command: 00 Data: 00fb  - 0,05
@@ -1753,6 +1746,11 @@ def receiving_heatingdemand_attribute( self, Devices, NwkId, Ep, value, MsgClust
         return
     checkAndStoreAttributeValue(self, NwkId, Ep, MsgClusterId, MsgAttrID, value)
 
+    # The Wiser Thermostat of the room will be updated at the next heartbeat
+    room = room_number(self.ListOfDevices[NwkId])
+    if room is not None:
+        self.wiserZones.mark_dirty(room)
+
 
 def receiving_heatingpoint_attribute( self, Devices, NwkId, Ep, ValueTemp, value, ClusterId, AttributeId):
 
@@ -1973,6 +1971,7 @@ def override_setpoint(self, NwkId, Ep, override, duration):
     self.ListOfDevices[NwkId]["Schneider"]["ThermostatOverride"]["OverrideDuration"] = duration * 60
     self.ListOfDevices[NwkId]["Schneider"]["ThermostatOverride"]["OverrideStartTime"] = time()
     self.ListOfDevices[NwkId ]["Schneider"]["BoostDemand"] = True
+    self.wiserZones.schedule_override(NwkId, Ep, time() + duration * 60)
 
     return override
 
@@ -2035,17 +2034,13 @@ def get_local_temperature_from_wiserroom( self, NwkId, room=None):
     
     self.log.logging("Schneider", "Debug", f"get_local_temperature_from_wiserroom for: {NwkId} and room: {room}")
 
-    if room is None:
+    try:
+        room = int(room)
+    except (TypeError, ValueError):
         return None
 
-    for x in list(self.ListOfDevices):
-        if x == NwkId:
-            continue
-        if "Param" not in self.ListOfDevices[x]:
-            continue
-        if "WiserRoomNumber" not in self.ListOfDevices[x]["Param"]:
-            continue
-        if self.ListOfDevices[x]["Param"]["WiserRoomNumber"] != room:
+    for x in self.wiserZones.room_members(self.ListOfDevices, room):
+        if x == NwkId or x not in self.ListOfDevices:
             continue
 
         # We have a device which belongs to the same WiserRoomNumber
@@ -20,6 +20,7 @@
 import sys
 import time
 
+from Modules.deviceChanges import mark_device_changed
 from Modules.zigateConsts import ADDRESS_MODE, ZIGATE_COMMANDS, ZIGATE_EP
 
 
@@ -41,6 +42,7 @@ def add_Last_Cmds(self, isqn, address_mode, nwkid, cmd, datas):
     if isqn is None:
         isqn = "None"
     self.ListOfDevices[nwkid]["Last Cmds"].append((isqn, address_mode, nwkid, cmd, datas))
+    mark_device_changed(nwkid)
 
 
 def send_zigatecmd_zcl_ack(self, address, cmd, datas):
@@ -304,7 +306,7 @@ def zigpy_raw_APS_request( self, targetaddr, dest_ep, cluster, profileId, payloa
         % ( callingfunction, data['Profile'], data['Cluster'], data['TargetNwk'], data['TargetEp'], data['SrcEp'], data['payload'])
     )
 
-    return self.ControllerLink.sendData( "RAW-COMMAND", data, NwkId=int(targetaddr,16), sqn=int(zigpyzqn,16), ackIsDisabled=ackIsDisabled )
+    return self.ControllerLink.sendData( "RAW-COMMAND", data, NwkId=int(targetaddr,16), sqn=int(zigpyzqn,16), highpriority=highpriority, ackIsDisabled=ackIsDisabled )
 
 def device_listening_on_iddle(self, nwkid):
     
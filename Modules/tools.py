@@ -17,12 +17,20 @@
     Description: Zigate toolbox
 """
 
+import ast
 import datetime
 import os.path
 import time
+import types
 from pathlib import Path
 
-from Modules.database import WriteDeviceList
+from Classes.DeviceTemplates import DeviceTemplates, convert_parameter
+from Modules.database import ScheduleDeviceListWrite
+from Modules.deviceChanges import mark_device_changed
+from Modules.deviceIdentity import (IDENTITY_LOCK, drop_device_identity,
+                                    move_device_record,
+                                    neighbours_ieee_candidates,
+                                    neighbours_nwkid)
 from Modules.pluginDbAttributes import STORE_CONFIGURE_REPORTING
 from Modules.zigateConsts import HEARTBEAT
 from Modules.domoticzAbstractLayer import domo_read_Device_Idx, domo_read_Name
@@ -217,7 +225,7 @@ def DeviceExist(self, Devices, lookupNwkId, lookupIEEE=""):
             # We have an entry in IEEE2NWK, but no corresponding
             # in ListOfDevices !!
             # Let's cleanup
-            del self.IEEE2NWK[lookupIEEE]
+            drop_device_identity(self, exitsingNwkId, lookupIEEE, "Inconsistency")
             self.log.logging("PluginTools", "Error", "DeviceExist - Found inconsistency ! Not Device %s not found, while looking for %s (%s)" % (
                 exitsingNwkId, lookupIEEE, lookupNwkId))
             return False
@@ -228,9 +236,8 @@ def DeviceExist(self, Devices, lookupNwkId, lookupIEEE=""):
             # We might have to do some cleanup here !
             # Cleanup
             # Delete the entry in IEEE2NWK as it will be recreated in Decode004d
-            del self.IEEE2NWK[ lookupIEEE ]
             # Delete the all Data Structure
-            del self.ListOfDevices[ exitsingNwkId ]
+            drop_device_identity(self, exitsingNwkId, lookupIEEE, "Inconsistency")
             self.log.logging("PluginTools", "Error", "DeviceExist - Found inconsistency ! Not 'Status' attribute for Device %s, while looking for %s (%s)" % (
                 exitsingNwkId, lookupIEEE, lookupNwkId))
             return False
@@ -242,9 +249,8 @@ def DeviceExist(self, Devices, lookupNwkId, lookupIEEE=""):
             # In case we receive asynchronously messages (which should be possible), they must be
             # dropped in the corresponding Decodexxx function
             # Delete the entry in IEEE2NWK as it will be recreated in Decode004d
-            del self.IEEE2NWK[lookupIEEE]
             # Delete the all Data Structure
-            del self.ListOfDevices[exitsingNwkId]
+            drop_device_identity(self, exitsingNwkId, lookupIEEE, "New ShortId during provisioning")
             self.log.logging("PluginTools", "Status", "DeviceExist - Device %s changed its ShortId: from %s to %s during provisioning. Restarting !" % (
                 lookupIEEE, exitsingNwkId, lookupNwkId))
             return False
@@ -263,6 +269,11 @@ def DeviceExist(self, Devices, lookupNwkId, lookupIEEE=""):
 def reconnectNWkDevice(self, new_NwkId, IEEE, old_NwkId):
     # We got a new Network ID for an existing IEEE. So just re-connect.
     # - mapping the information to the new new_NwkId
+    with IDENTITY_LOCK:
+        return _reconnect_nwkid_device(self, new_NwkId, IEEE, old_NwkId)
+
+
+def _reconnect_nwkid_device(self, new_NwkId, IEEE, old_NwkId):
     if old_NwkId not in self.ListOfDevices:
         return False
     if old_NwkId == new_NwkId:
@@ -272,17 +283,9 @@ def reconnectNWkDevice(self, new_NwkId, IEEE, old_NwkId):
         self.log.logging("PluginTools", "Log", "reconnectNWkDevice - Looks like we have an IEEE matching a Coordinator nwkid , this is not possible by definition New: %s Old: %s IEEE: %s !!!" % (
             new_NwkId, old_NwkId, IEEE))
         return False
-    
-    self.ListOfDevices[new_NwkId] = dict(self.ListOfDevices[old_NwkId])
-    self.IEEE2NWK[IEEE] = new_NwkId
-
-    if "ZDeviceName" in self.ListOfDevices[new_NwkId]:
-        devName = self.ListOfDevices[new_NwkId]["ZDeviceName"]
 
-    # MostLikely exitsingKey(the old NetworkID) is not needed any more
-    if removeNwkInList(self, old_NwkId) is None:
-        self.log.logging("PluginTools", "Error", "reconnectNWkDevice - something went wrong in the reconnect New NwkId: %s Old NwkId: %s IEEE: %s" % (
-            new_NwkId, old_NwkId, IEEE))
+    # The record is moved to the new NwkId, and the old one ( most likely not needed any more ) removed
+    move_device_record(self, new_NwkId, IEEE, old_NwkId, "Reconnect")
 
     if self.groupmgt:
         # We should check if this belongs to a group
@@ -303,21 +306,18 @@ def reconnectNWkDevice(self, new_NwkId, IEEE, old_NwkId):
             del self.ListOfDevices[new_NwkId][STORE_CONFIGURE_REPORTING]
         self.ListOfDevices[new_NwkId]["Heartbeat"] = "0"
 
-    WriteDeviceList(self, 0)
+    # Written at the next heartbeat, so a mass rejoin ends up in a single write
+    ScheduleDeviceListWrite(self)
     self.log.logging("PluginTools", "Status", "NetworkID: %s is replacing %s for object: %s" % (new_NwkId, old_NwkId, IEEE))
     return True
 
 
 def removeNwkInList(self, NWKID):
-    # Sanity check
+    # Sanity check: remove the entry only if the IEEE is now pointing to another NwkId
     safe = None
-    if "IEEE" in self.ListOfDevices[NWKID]:
-        for x in list(self.ListOfDevices.keys()):
-            if x == NWKID:
-                continue
-            if "IEEE" in self.ListOfDevices[x] and self.ListOfDevices[x]["IEEE"] == self.ListOfDevices[NWKID]["IEEE"]:
-                safe = x
-                break
+    ieee = self.ListOfDevices[NWKID].get("IEEE")
+    if ieee and self.IEEE2NWK.get(ieee) not in (None, NWKID) and self.IEEE2NWK[ieee] in self.ListOfDevices:
+        safe = self.IEEE2NWK[ieee]
 
     if safe:
         del self.ListOfDevices[NWKID]
@@ -428,6 +428,7 @@ def timeStamped(self, key, Type):
         "%Y-%m-%d %H:%M:%S"
     )
     self.ListOfDevices[key]["Stamp"]["MsgType"] = "%4x" % (Type)
+    mark_device_changed(key)
 
 
 # Used by zcl/zdpRawCommands
@@ -478,6 +479,7 @@ def updLQI(self, key, LQI):
         if len(self.ListOfDevices[key]["RollingLQI"]) > 10:
             del self.ListOfDevices[key]["RollingLQI"][0]
         self.ListOfDevices[key]["RollingLQI"].append(int(LQI, 16))
+        mark_device_changed(key)
 
     return
 
@@ -521,13 +523,9 @@ def is_bind_ep( self, nwkid, ep):
     
 def deviceconf_device(self, nwkid):
     
-    if (
-        "Model" in self.ListOfDevices[nwkid ]
-        and self.ListOfDevices[nwkid]["Model"] in self.DeviceConf
-    ):
-        return self.DeviceConf[ self.ListOfDevices[nwkid]["Model"] ]
-    else:
-        return {}
+    model = self.ListOfDevices[nwkid].get("Model")
+    template = self.DeviceConf.get(model) if isinstance(model, str) else None
+    return template if template is not None else {}
     
 def getTypebyCluster(self, Cluster):
     clustersType = {
@@ -564,6 +562,10 @@ def getListofClusterbyModel(self, Model, InOut):
         self.log.logging("PluginTools", "Error", "getListofClusterbyModel - Argument error : " + Model + " " + InOut)
         return ""
 
+    if isinstance(self.DeviceConf, DeviceTemplates):
+        # Compiled once per model
+        return list(self.DeviceConf.clusters(Model, InOut))
+
     if Model in self.DeviceConf and InOut in self.DeviceConf[Model]:
         for ep in list(self.DeviceConf[Model][InOut].keys()):
             seen = ""
@@ -601,12 +603,41 @@ def getModelbyZDeviceIDProfileID(self, ZDeviceID, ProfileID):
     """
     Provide a Model for a given ZdeviceID, ProfileID
     """
+    if isinstance(self.DeviceConf, DeviceTemplates):
+        return self.DeviceConf.model_by_profile_device(ProfileID, ZDeviceID)
+
     for model in list(self.DeviceConf.keys()):
-        if self.DeviceConf[model]["ProfileID"] == ProfileID and self.DeviceConf[model]["ZDeviceID"] == ZDeviceID:
+        if self.DeviceConf[model].get("ProfileID") == ProfileID and self.DeviceConf[model].get("ZDeviceID") == ZDeviceID:
             return model
     return ""
 
 
+def getModelsbyCluster(self, Cluster):
+    """
+    Provide the Models having Cluster on one of their Ep
+    """
+    if isinstance(self.DeviceConf, DeviceTemplates):
+        return self.DeviceConf.models_with_cluster(Cluster)
+    return frozenset(
+        model for model, template in self.DeviceConf.items()
+        for section in ("Ep", "Epin", "Epout") for ep in (template.get(section) or {}).values()
+        if isinstance(ep, dict) and Cluster in ep
+    )
+
+
+def getModelsbyManufacturer(self, Manufacturer):
+    """
+    Provide the Models of a Manufacturer ( Identifier manufacturer name, or ManufacturerCode )
+    """
+    if isinstance(self.DeviceConf, DeviceTemplates):
+        return self.DeviceConf.models_of_manufacturer(Manufacturer)
+    return frozenset(
+        model for model, template in self.DeviceConf.items()
+        if Manufacturer in (template.get("Manufacturer"), template.get("ManufacturerCode"))
+        or any(len(identifier) > 1 and identifier[1] == Manufacturer for identifier in template.get("Identifier") or ())
+    )
+
+
 def getListofType(self, Type):
     """
     For a given DeviceConf Type "Plug/Power/Meters" return a list of Type [ 'Plug', 'Power', 'Meters' ]
@@ -867,25 +898,13 @@ def try_to_reconnect_via_neighbours(self, old_nwkid):
         return None
     ieee = self.ListOfDevices[ old_nwkid ]["IEEE"]
 
-    for key in list(self.ListOfDevices.keys()):
-        if "Neighbours" not in self.ListOfDevices[key]:
-            continue
-        if len(self.ListOfDevices[key]["Neighbours"]) == 0:
-            continue
-        # We are interested only on the last one
-        lastScan = self.ListOfDevices[key]["Neighbours"][-1]
-        for item in lastScan["Devices"]:
-            if not isinstance(item, dict):
-                continue
-            for x in item:
-                if "_IEEE" not in item[x]:
-                    continue
-                if item[x]["_IEEE"] == ieee:
-                    new_nwkid = x
-                    if new_nwkid != old_nwkid:
-                        reconnectNWkDevice(self, new_nwkid, ieee, old_nwkid)
-                        self.log.logging("PluginTools", "Log", "try_to_reconnect_via_neighbours found %s as replacement of %s" % (new_nwkid, old_nwkid))
-                    return new_nwkid
+    new_nwkid = neighbours_nwkid(self, ieee)
+    if new_nwkid is None:
+        return None
+    if new_nwkid != old_nwkid:
+        reconnectNWkDevice(self, new_nwkid, ieee, old_nwkid)
+        self.log.logging("PluginTools", "Log", "try_to_reconnect_via_neighbours found %s as replacement of %s" % (new_nwkid, old_nwkid))
+    return new_nwkid
 
 def chk_and_update_IEEE_NWKID(self, nwkid, ieee):
     if ieee in self.IEEE2NWK and nwkid in self.ListOfDevices:
@@ -909,35 +928,22 @@ def lookupForIEEE(self, nwkid, reconnect=False):
     # This is used when receiving a message from an unknown device !
     # """
 
-    for key in list(self.ListOfDevices.keys()):
-        if "Neighbours" not in self.ListOfDevices[key]:
-            continue
-        if len(self.ListOfDevices[key]["Neighbours"]) == 0:
+    for ieee in neighbours_ieee_candidates(self, nwkid):
+        if ieee not in self.IEEE2NWK:
             continue
-        # We are interested only on the last one
-        lastScan = self.ListOfDevices[key]["Neighbours"][-1]
-        for item in lastScan["Devices"]:
-            if nwkid not in item:
-                continue
-            if "_IEEE" not in item[nwkid]:
-                continue
-            ieee = item[nwkid]["_IEEE"]
-            old_NwkId = "none"
-            if ieee not in self.IEEE2NWK:
-                continue
 
-            old_NwkId = self.IEEE2NWK[ieee]
-            if old_NwkId not in self.ListOfDevices:
-                del self.IEEE2NWK[ieee]
-                self.log.logging("PluginTools", "Error", "lookupForIEEE found an inconsitency %s not existing but pointed by %s, cleanup" % (
-                    old_NwkId, ieee) )
-                continue
+        old_NwkId = self.IEEE2NWK[ieee]
+        if old_NwkId not in self.ListOfDevices:
+            drop_device_identity(self, old_NwkId, ieee, "Inconsistency")
+            self.log.logging("PluginTools", "Error", "lookupForIEEE found an inconsitency %s not existing but pointed by %s, cleanup" % (
+                old_NwkId, ieee) )
+            continue
 
-            if reconnect:
-                reconnectNWkDevice(self, nwkid, ieee, old_NwkId)
-                self.log.logging("PluginTools", "Status", "lookupForIEEE found a matching IEEE: %s in the Router Neighbours %s with Nwkid: %s (old Nwkid was %s)" %(
-                    ieee, key, nwkid, old_NwkId))
-            return ieee
+        if reconnect:
+            reconnectNWkDevice(self, nwkid, ieee, old_NwkId)
+            self.log.logging("PluginTools", "Status", "lookupForIEEE found a matching IEEE: %s in the Router Neighbours with Nwkid: %s (old Nwkid was %s)" %(
+                ieee, nwkid, old_NwkId))
+        return ieee
     return None
 
 def zigpy_plugin_sanity_check(self, nwkid):
@@ -1447,13 +1453,25 @@ def how_many_devices(self):
 def get_deviceconf_parameter_value(self, model, attribute, return_default=None):
     """ Retreive Configuration Attribute from Config file"""
     
-    if model in ( '', {}):
+    template = self.DeviceConf.get(model) if model and isinstance(model, str) else None
+    if template is None:
         return return_default
-    if model not in self.DeviceConf:
+    return template.get(attribute, return_default)
+
+
+def get_deviceconf_typed_value(self, model, attribute, kind, return_default=None):
+    """ Retreive Configuration Attribute from Config file, converted to kind ( bool, int, "hex", list ) """
+
+    if isinstance(self.DeviceConf, DeviceTemplates):
+        return self.DeviceConf.typed(model, attribute, kind, return_default)
+
+    value = get_deviceconf_parameter_value(self, model, attribute)
+    if value is None:
         return return_default
-    if attribute not in self.DeviceConf[ model ]:
+    try:
+        return convert_parameter(value, kind)
+    except (ValueError, TypeError):
         return return_default
-    return self.DeviceConf[ model ][ attribute ]
 
 
 def night_shift_jobs( self ):
@@ -1699,28 +1717,65 @@ def is_domoticz_touch(self):
 def get_device_config_param(self, NwkId, config_parameter):
     """Retrieve config_parameter from the Param section in Config or Device"""
 
-    # Log debug information
-    self.log.logging("Input", "Debug", f"get_device_config_param: {NwkId} Config: {config_parameter}")
-
-    # Get the device dictionary for the given NwkId, defaulting to None if not found
+    # Get the device dictionary for the given NwkId, and its "Param" section
     device = self.ListOfDevices.get(NwkId)
+    param_section = device.get("Param") if device else None
 
-    # If device dictionary does not exist, return None
-    if not device:
-        return None
-
-    # Get the "Param" section dictionary from the device, defaulting to None if not found
-    param_section = device.get("Param")
-
-    # If "Param" section dictionary does not exist, return None
+    # If the device or its "Param" section does not exist, return None
     if not param_section:
         return None
 
     # Get the value of config_parameter from the "Param" section, defaulting to None if not found
     param_value = param_section.get(config_parameter)
 
-    # Log debug information
-    self.log.logging("Input", "Debug", f"get_device_config_param: {NwkId} Config: {config_parameter} return {param_value}")
+    # Log debug information, the message being built only when debugging
+    if self.pluginconf.pluginConf.get("Input"):
+        self.log.logging("Input", "Debug", f"get_device_config_param: {NwkId} Config: {config_parameter} return {param_value}")
 
     # Return the value of config_parameter
     return param_value
+
+
+# Formulas of the configuration files ( EvalExp, action_Exp ) are validated against a whitelist of Python
+# expressions, and compiled once into functions, instead of being eval() on each value received.
+
+FORMULA_FUNCTIONS = {
+    "int": int,
+    "float": float,
+    "round": round,
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "pow": pow,
+    "str": str,
+    "hex": hex,
+    "bool": bool,
+}
+
+FORMULA_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Call, ast.Name, ast.Load,
+    ast.Constant, ast.operator, ast.unaryop, ast.boolop, ast.cmpop,
+)
+
+
+def compile_formula(expression, variables=()):
+    """ Compile a formula into a function of ( value, *variables ). None if the formula is outside of the whitelist.
+        Raise SyntaxError if the formula is not a valid expression """
+
+    arguments = ("value",) + tuple(variables)
+    if not all(x.isidentifier() for x in arguments):
+        return None
+
+    tree = ast.parse(str(expression).strip(), mode="eval")
+    for node in ast.walk(tree):
+        if (
+            not isinstance(node, FORMULA_NODES)
+            or (isinstance(node, ast.Name) and node.id not in arguments and node.id not in FORMULA_FUNCTIONS)
+            or (isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in FORMULA_FUNCTIONS or node.keywords))
+        ):
+            return None
+
+    # The expression has been validated, wrap it in a lambda and build the function from the compiled code object
+    code = compile("lambda %s: (%s)" % (", ".join(arguments), str(expression).strip()), "<formula %s>" % expression, "eval")
+    function_code = next(x for x in code.co_consts if isinstance(x, types.CodeType))
+    return types.FunctionType(function_code, dict(FORMULA_FUNCTIONS, __builtins__={}))
@@ -37,7 +37,7 @@ from Modules.tuyaTools import (get_tuya_attribute, store_tuya_attribute,
                                tuya_cmd)
 from Modules.tuyaTRV import tuya_eTRV_response
 from Modules.tuyaTS011F import tuya_read_cluster_e001
-from Modules.tuyaTS0601 import ts0601_response
+from Modules.tuyaTS0601 import ts0601_decode_dp_stream, ts0601_response
 from Modules.zigateConsts import ZIGATE_EP
 
 # Tuya TRV Commands
@@ -210,24 +210,9 @@ def tuyaReadRawAPS(self, Devices, NwkId, srcEp, ClusterID, dstNWKID, dstEP, MsgP
 
         transid = MsgPayload[8:10]  # uint8
         self.log.logging( "Tuya", "Debug", "    TransId: %s" % ( transid ), NwkId, )
-        idx = 10
-        while idx < len(MsgPayload):
-            self.log.logging( "Tuya", "Debug", "    working on remaining payload %s idx: %s" % ( MsgPayload[idx:], idx ), NwkId, )
-            
-            dp = int(MsgPayload[idx:idx + 2], 16)
-            idx += 2
-            
-            datatype = int(MsgPayload[idx:idx + 2], 16)
-            idx += 2
-            
-            len_data = 2 * int(MsgPayload[idx:idx + 4], 16)
-            idx += 4
-            
-            data = MsgPayload[idx:idx + len_data]
-            idx += len_data
-            
-            self.log.logging( "Tuya", "Debug", "tuyaReadRawAPS - command %s dp: %s dt: %s len: %s data: %s idx: %s" % (
-                cmd, dp, datatype, len_data, data, idx ), NwkId, )
+        for dp, datatype, data in ts0601_decode_dp_stream(MsgPayload, 10):
+            self.log.logging( "Tuya", "Debug", "tuyaReadRawAPS - command %s dp: %s dt: %s len: %s data: %s" % (
+                cmd, dp, datatype, len(data), data ), NwkId, )
             tuya_response(self, Devices, _ModelName, NwkId, srcEp, ClusterID, dstNWKID, dstEP, dp, datatype, data)
             
     elif cmd == "06":  # TY_DATA_SEARCH
@@ -236,7 +221,6 @@ def tuyaReadRawAPS(self, Devices, NwkId, srcEp, ClusterID, dstNWKID, dstEP, MsgP
         dp = int(MsgPayload[10:12], 16)
         datatype = int(MsgPayload[12:14], 16)
         fn = MsgPayload[14:16]
-        len_data = MsgPayload[16:18]
         data = MsgPayload[18:]
         self.log.logging(
             "Tuya",
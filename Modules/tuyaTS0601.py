@@ -21,8 +21,9 @@ import struct
 
 from Modules.domoMaj import MajDomoDevice
 from Modules.domoTools import Update_Battery_Device
-from Modules.tools import (checkAndStoreAttributeValue, get_and_inc_ZCL_SQN,
-                           get_deviceconf_parameter_value, getAttributeValue)
+from Modules.tools import (checkAndStoreAttributeValue, compile_formula,
+                           get_and_inc_ZCL_SQN, get_deviceconf_parameter_value,
+                           get_deviceconf_typed_value, getAttributeValue)
 from Modules.tuyaTools import (get_tuya_attribute, store_tuya_attribute,
                                tuya_cmd)
 
@@ -32,38 +33,40 @@ def ts0601_response(self, Devices, model_name, NwkId, Ep, dp, datatype, data):
     self.log.logging("Tuya0601", "Debug", "ts0601_response - %s %s %s %s %s" % (
         NwkId, model_name, dp, datatype, data), NwkId)
     
-    dps_mapping = ts0601_extract_data_point_infos( self, model_name) 
-    if dps_mapping is None:
+    codec = ts0601_codec( self, model_name)
+    if codec is None:
         return False
     
-    str_dp = "%02x" %dp
-    if str_dp not in dps_mapping:
-        self.log.logging("Tuya0601", "Log", "ts0601_response - warning/unknow dp %s %s %s %s %s" % (
-            NwkId, str_dp, datatype, data, str(dps_mapping)), NwkId)
+    if dp not in codec["Sensors"]:
+        self.log.logging("Tuya0601", "Log", "ts0601_response - warning/unknow dp %s %02x %s %s %s" % (
+            NwkId, dp, datatype, data, str(codec["Mapping"])), NwkId)
         store_tuya_attribute(self, NwkId, "UnknowDp_0x%02x_Dt_0x%02x" % (dp, datatype) , data)
         return False
 
+    str_dp, single, compiled_items = codec["Sensors"][ dp ]
+
     value = int(data, 16)
     # If we have a signed number in an unsigned, let's convert
-    if len(data) <= 8:
-        value = struct.unpack('>i', struct.pack('>I', value))[0]
+    if len(data) <= 8 and value >= 0x80000000:
+        value -= 0x100000000
     
     self.log.logging("Tuya0601", "Debug", "                - value: %s" % (value), NwkId)
-    self.log.logging("Tuya0601", "Debug", "                - dps_mapping[ %s ]: %s (%s)" % (
-        str_dp, dps_mapping[ str_dp ], type(dps_mapping[ str_dp ])), NwkId)
+    self.log.logging("Tuya0601", "Debug", "                - dps_mapping[ %s ]: %s" % (
+        str_dp, codec["Mapping"][ str_dp ]), NwkId)
     
-    if not isinstance( dps_mapping[ str_dp ], list):
+    if single:
         # We complex data point which provide multiple value
-        return process_dp_item( self, Devices, model_name, NwkId, Ep, dp, datatype, data, dps_mapping[ str_dp ], value)
+        return process_dp_item( self, Devices, model_name, NwkId, Ep, dp, datatype, data, compiled_items[0], value) if compiled_items else False
 
-    for dps_mapping_item in dps_mapping[ str_dp ]:
-        process_dp_item( self, Devices, model_name, NwkId, Ep, dp, datatype, data, dps_mapping_item, value)
+    for compiled_item in compiled_items:
+        process_dp_item( self, Devices, model_name, NwkId, Ep, dp, datatype, data, compiled_item, value)
     return True 
 
-def process_dp_item( self, Devices, model_name, NwkId, Ep, dp, datatype, data, dps_mapping_item, value):
-    if "EvalExp" in dps_mapping_item:
-        value = evaluate_expression_with_data(self, dps_mapping_item[ "EvalExp"], value)
-    self.log.logging("Tuya0601", "Debug", "                - after evaluate_expression_with_data() value: %s" % (value), NwkId)
+def process_dp_item( self, Devices, model_name, NwkId, Ep, dp, datatype, data, compiled_item, value):
+    dps_mapping_item = compiled_item["Item"]
+    if compiled_item["Transform"]:
+        value = compiled_item["Transform"]( value )
+        self.log.logging("Tuya0601", "Debug", "                - after EvalExp value: %s" % (value), NwkId)
 
     if "store_tuya_value" in dps_mapping_item:
         store_tuya_attribute(self, NwkId, dps_mapping_item["store_tuya_value"], value)
@@ -71,31 +74,32 @@ def process_dp_item( self, Devices, model_name, NwkId, Ep, dp, datatype, data, d
     elif "store_tuya_attribute" in dps_mapping_item:
         store_tuya_attribute(self, NwkId, dps_mapping_item["store_tuya_attribute"], data)
 
-    return sensor_type( self, Devices, NwkId, Ep, value, dp, datatype, data, dps_mapping_item )
+    return sensor_type( self, Devices, NwkId, Ep, value, dp, datatype, data, compiled_item )
    
     
-def sensor_type( self, Devices, NwkId, Ep, value, dp, datatype, data, dps_mapping_item ):
+def sensor_type( self, Devices, NwkId, Ep, value, dp, datatype, data, compiled_item ):
+    dps_mapping_item = compiled_item["Item"]
     self.log.logging("Tuya0601", "Debug", "sensor_type - %s %s %s %s %s %s %s" % (
         NwkId, Ep, value, dp, datatype, data, dps_mapping_item), NwkId)
 
-    if "sensor_type" not in dps_mapping_item:
+    sensor_type = compiled_item["SensorType"]
+    if sensor_type is None:
         if "store_tuya_attribute" not in dps_mapping_item:
             store_tuya_attribute(self, NwkId, "UnknowDp_0x%02x_Dt_0x%02x" % (dp, datatype) , data)
         return True
     
     # we will overwrite the end point as, we have to force the domo update on a specific ep.add()
-    domo_ep = dps_mapping_item.get("domo_ep", Ep)
+    domo_ep = compiled_item["DomoEp"] or Ep
     self.log.logging("Tuya0601", "Debug", "                - Ep to be used for domo update %s" %domo_ep) 
   
-    divisor = dps_mapping_item.get("domo_divisor", 1)
+    divisor = compiled_item["Divisor"]
     value /= divisor
 
-    rounding = dps_mapping_item.get("domo_round", 0)
+    rounding = compiled_item["Rounding"]
     value = round(value, rounding) if rounding else int(value)
 
     self.log.logging("Tuya0601", "Debug", "                - after sensor_type() value: %s divisor: %s rounding: %s" % (value, divisor, rounding), NwkId)
    
-    sensor_type = dps_mapping_item[ "sensor_type"]
     return process_sensor_data(self, sensor_type, dps_mapping_item, value, Devices, NwkId, domo_ep)
 
 
@@ -107,29 +111,28 @@ def ts0601_actuator( self, NwkId, command, value=None):
     if model_name is None:
         return
     
-    dps_mapping = ts0601_extract_data_point_infos( self, model_name) 
-    if dps_mapping is None:
+    codec = ts0601_codec( self, model_name)
+    if codec is None:
         self.log.logging("Tuya0601", "Error", "ts0601_actuator - No DPS stanza in config file for %s %s %s" %(
             NwkId, model_name, command))
         return False
+    dps_mapping = codec["Mapping"]
     
     if command not in DP_ACTION_FUNCTION and command not in TS0601_COMMANDS:
         self.log.logging("Tuya0601", "Error", "ts0601_actuator - unknow command %s in core plugin" % command)
         return False
     
     # Check if we have the command via a TS0601_DP
-    str_dp = ts0601_actuator_dp( command, dps_mapping)
-    if str_dp is None:
+    if command not in codec["Actions"]:
         self.log.logging("Tuya0601", "Error", "ts0601_actuator - unknow command %s in config file" % command)
         return False
+    str_dp, dp, action_transform = codec["Actions"][ command ]
 
-    if "action_Exp" in dps_mapping[ str_dp ]:
+    if action_transform:
         # Correct Value to proper format
-        value = evaluate_expression_with_data(self, dps_mapping[ str_dp ]["action_Exp"], value)
+        value = action_transform( value )
         self.log.logging("Tuya0601", "Debug", "      corrected value: %s" % ( value ))
 
-    dp = int(str_dp, 16)
-
     self.log.logging("Tuya0601", "Debug", "ts0601_actuator - requesting %s %s %s" %(
         command, dp, value))
 
@@ -226,6 +229,108 @@ def ts0601_extract_data_point_infos( self, model_name):
 def ts0601_actuator_dp( command, dps_mapping):
     return next( ( dp for dp in dps_mapping if "action_type" in dps_mapping[dp] and command == dps_mapping[dp]["action_type"] ), None, )
 
+
+# Compiled TS0601_DP codec
+#
+# The TS0601_DP stanza of a model is compiled once into int-keyed tables:
+# - Sensors: { dp: ( str_dp, single item, [ compiled items ] ) } used when receiving a datapoint,
+# - Actions: { action_type: ( str_dp, dp, action transform ) } used when sending a command.
+# EvalExp and action_Exp formulas are compiled once into functions of value ( compile_formula ), instead of being
+# eval() on each datapoint received.
+# The compiled codec is cached per model, and rebuilt if the DeviceConf stanza is reloaded.
+
+TS0601_CODECS = {}  # { model_name: compiled codec }
+
+
+def ts0601_codec(self, model_name):
+    """ Return the compiled codec of model_name, None if the model has no TS0601_DP stanza """
+
+    dps_mapping = ts0601_extract_data_point_infos(self, model_name)
+    if dps_mapping is None:
+        return None
+
+    codec = TS0601_CODECS.get(model_name)
+    if codec is None or codec["Mapping"] is not dps_mapping:
+        codec = TS0601_CODECS[model_name] = compile_ts0601_codec(self, model_name, dps_mapping)
+    return codec
+
+
+def compile_ts0601_codec(self, model_name, dps_mapping):
+
+    codec = {"Mapping": dps_mapping, "Sensors": {}, "Actions": {}}
+    for str_dp, dps_mapping_items in dps_mapping.items():
+        try:
+            dp = int(str_dp, 16)
+        except ValueError:
+            self.log.logging("Tuya0601", "Error", "compile_ts0601_codec - %s invalid dp %s in TS0601_DP" % (model_name, str_dp))
+            continue
+
+        single = not isinstance(dps_mapping_items, list)
+        items = [dps_mapping_items] if single else dps_mapping_items
+        codec["Sensors"][dp] = (str_dp, single, [compile_dp_item(self, item) for item in items if isinstance(item, dict)])
+
+        if single and isinstance(dps_mapping_items, dict) and "action_type" in dps_mapping_items:
+            action_type = dps_mapping_items["action_type"]
+            if action_type not in codec["Actions"]:
+                transform = compile_expression(self, dps_mapping_items["action_Exp"]) if "action_Exp" in dps_mapping_items else None
+                codec["Actions"][action_type] = (str_dp, dp, transform)
+
+    self.log.logging("Tuya0601", "Debug", "compile_ts0601_codec - %s compiled %s dps, %s actions" % (
+        model_name, len(codec["Sensors"]), len(codec["Actions"])))
+    return codec
+
+
+def compile_dp_item(self, dps_mapping_item):
+    """ Pre-compute once everything needed to process a datapoint value """
+
+    return {
+        "Item": dps_mapping_item,
+        "Transform": compile_expression(self, dps_mapping_item["EvalExp"]) if "EvalExp" in dps_mapping_item else None,
+        "SensorType": dps_mapping_item.get("sensor_type"),
+        "DomoEp": dps_mapping_item.get("domo_ep"),
+        "Divisor": dps_mapping_item.get("domo_divisor", 1),
+        "Rounding": dps_mapping_item.get("domo_round", 0),
+    }
+
+
+def compile_expression(self, expression):
+    """ Compile a formula into a function of value. Formulas outside of the whitelist are kept evaluated at runtime """
+
+    try:
+        function = compile_formula(expression)
+    except SyntaxError:
+        self.log.logging("Tuya0601", "Error", "Syntax error, please check the formula %s" % expression)
+        return lambda value: value
+
+    if function is None:
+        self.log.logging("Tuya0601", "Log", "Formula %s cannot be compiled, it will be evaluated at runtime" % expression)
+        return lambda value: evaluate_expression_with_data(self, expression, value)
+
+    def compiled_expression(value):
+        try:
+            return function(value)
+        except (ArithmeticError, TypeError, ValueError) as e:
+            self.log.logging("Tuya0601", "Error", "Error while computing formula %s with value %s. Error: %s" % (expression, value, e))
+        return value
+
+    return compiled_expression
+
+
+def ts0601_decode_dp_stream(payload, idx=0):
+    """ Decode in one pass a Tuya datapoint stream ( dp, datatype, length, data )*, yield ( dp, datatype, hex data ) """
+
+    try:
+        raw = bytes.fromhex(payload[idx:] if len(payload[idx:]) % 2 == 0 else payload[idx:-1])
+    except ValueError:
+        return
+
+    offset = 0
+    while offset + 4 <= len(raw):
+        dp, datatype, len_data = raw[offset], raw[offset + 1], (raw[offset + 2] << 8) | raw[offset + 3]
+        offset += 4
+        yield dp, datatype, raw[offset:offset + len_data].hex()
+        offset += len_data
+
     
 # Sensors responses
 
@@ -381,8 +486,8 @@ def ts0601_instant_power(self, Devices, nwkid, ep, value):
 
     model_name = self.ListOfDevices[ nwkid ]["Model"] if "Model" in self.ListOfDevices[ nwkid ] else None
     rely_on_eval_expression = get_deviceconf_parameter_value( self, model_name, "RELY_ON_EVAL_EXP", return_default=False )
-    twocomplement_tst = int( get_deviceconf_parameter_value( self, model_name, "TWO_COMPLEMENT_TST", return_default="0" ),16)
-    twocomplement_val = int( get_deviceconf_parameter_value( self, model_name, "TWO_COMPLEMENT_VAL", return_default="0" ),16)
+    twocomplement_tst = get_deviceconf_typed_value( self, model_name, "TWO_COMPLEMENT_TST", "hex", return_default=0 )
+    twocomplement_val = get_deviceconf_typed_value( self, model_name, "TWO_COMPLEMENT_VAL", "hex", return_default=0 )
     self.log.logging( "Tuya0601", "Debug", "ts0601_instant_power - Instant Power Two's Complement : %s %s" %(
         twocomplement_tst, twocomplement_val))
     self.log.logging( "Tuya0601", "Debug", "ts0601_instant_power - Rely on Eval Exp : %s" %( rely_on_eval_expression))
@@ -216,6 +216,10 @@ def handle_model_name( self, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, MsgA
     if _update_data_structutre_based_on_model_name( self, MsgSrcAddr, modelName) and self.iaszonemgt:
         self.iaszonemgt.force_IAS_registration_if_needed(MsgSrcAddr)
 
+    if self.ListOfDevices[MsgSrcAddr].get("PairingInProgress"):
+        # The interview can move forward with the Model
+        self.pairingEngine.notify(MsgSrcAddr)
+
 
 def _update_data_structutre_based_on_model_name( self, MsgSrcAddr, modelName):
     # Let's see if this model is known in DeviceConf. If so then we will retreive already the Eps
@@ -10,11 +10,40 @@
 #
 # SPDX-License-Identifier:    GPL-3.0 license
 
+"""
+    History of the coordinator backups provided by zigpy.
+
+    Backups are stored in Coordinator-XX.backups/ :
+    - objects/<sha256>.json : the backups, named after the sha256 of their content, so an identical backup is stored
+      once, and a corrupted file is detected when loaded.
+    - history.json : the list of the backups, oldest first, with for each the changes against the previous one
+      ( channel, keys, devices joined/left/readdressed, frame counters ).
+
+    zigpy provides a backup periodically, and the frame counters are moving all the time. A backup is stored only if
+    the network state changed, or if the network frame counter moved by more than FRAME_COUNTER_STEP since the last
+    stored backup ( zigpy adds a larger margin to the frame counter when restoring a backup ).
+
+    Coordinator-XX.backup is still written with the last stored backup, for the tools relying on it, and is used at
+    startup when there is no history yet.
+"""
+
+import hashlib
 import json
+import os
 import os.path
+import time
 from pathlib import Path
 
-import Modules.tools
+BACKUP_HISTORY_FILE = "history.json"
+BACKUP_OBJECTS_DIR = "objects"
+
+FRAME_COUNTER_STEP = 5000
+
+# Keys which are moving all the time, and do not make a network state change
+VOLATILE_KEYS = {"metadata", "frame_counter", "rx_counter", "tx_counter"}
+
+# Mandatory entries of a backup ( Open Coordinator Backup format ), for it to be restored
+MANDATORY_KEYS = ("coordinator_ieee", "pan_id", "extended_pan_id", "channel", "network_key")
 
 
 def handle_zigpy_backup(self, backup):
@@ -23,36 +52,171 @@ def handle_zigpy_backup(self, backup):
         self.log.logging("TransportZigpy", "Log","Backup is incomplete, it is not possible to restore")
         return
 
-    _pluginData = Path( self.pluginconf.pluginConf["pluginData"] )
-    _coordinator_backup = _pluginData / ("Coordinator-%02d.backup" %self.HardwareID )
     self.log.logging("TransportZigpy", "Debug", "Backups: %s" %backup)
+    backup = backup.as_dict()
 
-    if os.path.exists(_coordinator_backup):
-        Modules.tools.helper_versionFile(_coordinator_backup, self.pluginconf.pluginConf["numDeviceListVersion"])
+    store = _backup_store(self)
+    history = _load_history(self, store)
+    previous = _load_object(self, store, history[-1]["Hash"]) if history else None
 
+    changes = backup_changes(previous, backup)
+    if not changes:
+        self.log.logging("TransportZigpy", "Debug", "Coordinator backup not stored, no significant change")
+        return
+
+    content = json.dumps(backup, sort_keys=True)
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
     try:
-        with open(_coordinator_backup, "wt") as file:
-            file.write(json.dumps((backup.as_dict())))
-            self.log.logging("TransportZigpy", "Status", "Coordinator backup is available: %s" %_coordinator_backup)
+        objects = store / BACKUP_OBJECTS_DIR
+        objects.mkdir(parents=True, exist_ok=True)
+        if not (objects / ("%s.json" % digest)).exists():
+            _write_atomic(objects / ("%s.json" % digest), content)
+
+        history.append({"Time": int(time.time()), "Hash": digest, "Changes": changes})
+        history = history[-max(1, self.pluginconf.pluginConf.get("autoBackupHistory", 30)):]
+        _write_atomic(store / BACKUP_HISTORY_FILE, json.dumps(history, indent=1))
+        _garbage_collect(store, history)
+
+        _write_atomic(_last_backup_file(self), content)
+        self.log.logging("TransportZigpy", "Status", "Coordinator backup is available: %s ( %s )" % (
+            _last_backup_file(self), ", ".join(changes)))
 
     except IOError:
-        self.log.logging("TransportZigpy", "Error", "Error while Writing Coordinator backup %s" % _coordinator_backup)
+        self.log.logging("TransportZigpy", "Error", "Error while Writing Coordinator backup %s" % store)
 
 
 def handle_zigpy_retreive_last_backup( self ):
-    
-    # Return the last backup
-    _pluginData = Path( self.pluginconf.pluginConf["pluginData"] )
-    _coordinator_backup = _pluginData / ("Coordinator-%02d.backup" %self.HardwareID)
+
+    # Return the most recent valid backup
+    store = _backup_store(self)
+    for entry in reversed(_load_history(self, store)):
+        backup = _load_object(self, store, entry["Hash"])
+        if backup is not None:
+            return backup
+        self.log.logging("TransportZigpy", "Error", "Coordinator backup %s is corrupted, looking for the previous one" % entry["Hash"])
+
+    # No history, let's use the last backup written by a previous version of the plugin
+    _coordinator_backup = _last_backup_file(self)
     if not os.path.exists(_coordinator_backup):
         return None
 
     with open(_coordinator_backup, "r") as _coordinator:
         self.log.logging("TransportZigpy", "Debug", "Open : %s" % _coordinator_backup)
         try:
-            return json.load(_coordinator)
+            backup = json.load(_coordinator)
         except json.JSONDecodeError:
             return None
         except Exception:
             return None
-    return None
\ No newline at end of file
+    return backup if is_valid_backup(backup) else None
+
+
+def coordinator_backup_history(self):
+    """ List of the stored backups, oldest first """
+
+    return _load_history(self, _backup_store(self))
+
+
+def is_valid_backup(backup):
+    return isinstance(backup, dict) and all(key in backup for key in MANDATORY_KEYS)
+
+
+def backup_changes(previous, backup):
+    """ Return the list of the significant changes between two backups, as human readable strings """
+
+    if previous is None:
+        return ["first backup"]
+
+    changes = [
+        "%s changed" % key
+        for key in sorted(set(previous) | set(backup))
+        if key not in VOLATILE_KEYS and key != "devices" and _significant(previous.get(key)) != _significant(backup.get(key))
+    ]
+
+    previous_devices = {device.get("ieee_address"): device for device in previous.get("devices", [])}
+    devices = {device.get("ieee_address"): device for device in backup.get("devices", [])}
+    changes.extend("%s joined" % ieee for ieee in sorted(set(devices) - set(previous_devices)))
+    changes.extend("%s left" % ieee for ieee in sorted(set(previous_devices) - set(devices)))
+    changes.extend(
+        "%s changed" % ieee
+        for ieee in sorted(set(devices) & set(previous_devices))
+        if _significant(devices[ieee]) != _significant(previous_devices[ieee])
+    )
+
+    frame_counter = _frame_counter(backup) - _frame_counter(previous)
+    if frame_counter >= FRAME_COUNTER_STEP:
+        changes.append("frame counter +%s" % frame_counter)
+    return changes
+
+
+def _significant(value):
+    """ Value without the volatile entries """
+
+    if isinstance(value, dict):
+        return {key: _significant(item) for key, item in value.items() if key not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [_significant(item) for item in value]
+    return value
+
+
+def _frame_counter(backup):
+    network_key = backup.get("network_key") or {}
+    return network_key.get("frame_counter", 0) if isinstance(network_key, dict) else 0
+
+
+def _backup_store(self):
+    return Path(self.pluginconf.pluginConf["pluginData"]) / ("Coordinator-%02d.backups" % self.HardwareID)
+
+
+def _last_backup_file(self):
+    return Path(self.pluginconf.pluginConf["pluginData"]) / ("Coordinator-%02d.backup" % self.HardwareID)
+
+
+def _load_history(self, store):
+    history_file = store / BACKUP_HISTORY_FILE
+    if not history_file.exists():
+        return []
+    try:
+        with open(history_file, "r") as handle:
+            history = json.load(handle)
+    except (IOError, ValueError):
+        self.log.logging("TransportZigpy", "Error", "Coordinator backup history %s is corrupted" % history_file)
+        return []
+    return [entry for entry in history if isinstance(entry, dict) and "Hash" in entry]
+
+
+def _load_object(self, store, digest):
+    """ Return the backup, if it is found and passes the integrity checks """
+
+    try:
+        with open(store / BACKUP_OBJECTS_DIR / ("%s.json" % digest), "r") as handle:
+            content = handle.read()
+    except IOError:
+        return None
+    if hashlib.sha256(content.encode("utf-8")).hexdigest() != digest:
+        return None
+    try:
+        backup = json.loads(content)
+    except ValueError:
+        return None
+    return backup if is_valid_backup(backup) else None
+
+
+def _garbage_collect(store, history):
+    """ Remove the backups not referenced anymore by the history """
+
+    referenced = {"%s.json" % entry["Hash"] for entry in history}
+    for item in (store / BACKUP_OBJECTS_DIR).iterdir():
+        if item.name not in referenced:
+            item.unlink()
+
+
+def _write_atomic(filename, content):
+    """ Write to a temporary file, then rename it, so a crash never leaves a truncated file """
+
+    temporary = Path("%s.tmp" % filename)
+    with open(temporary, "wt") as handle:
+        handle.write(content)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, filename)
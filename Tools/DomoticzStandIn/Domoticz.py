@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: Domoticz.py
+#
+#    Description: Stand-in of the Domoticz python framework ( legacy API ), to run the plugin outside of Domoticz
+#
+#    Only what the plugin is using is implemented. Widgets are kept in memory, Connections do nothing.
+#    Calls to the API are counted in Statistics, so the replay benchmark can report the Domoticz side load.
+#
+
+import time
+
+Devices = {}  # { Unit: Device }
+Images = {}
+Parameters = {}
+Settings = {}
+
+Statistics = {
+    "Log": 0,
+    "Status": 0,
+    "Error": 0,
+    "Debug": 0,
+    "Create": 0,
+    "Update": 0,
+    "Touch": 0,
+    "Delete": 0,
+}
+
+# Output of the Log/Status/Error/Debug API. Set to print to get the plugin logs on the console
+Output = None
+
+_configuration = {}
+_heartbeat = 10
+_next_idx = 1
+
+# Domoticz TypeName to ( Type, Subtype, Switchtype ), for the most common widgets created by the plugin
+TYPENAMES = {
+    "Alert": (243, 22, 0),
+    "Barometer": (243, 26, 0),
+    "Custom": (243, 31, 0),
+    "Counter Incremental": (113, 0, 0),
+    "Current (Single)": (243, 23, 0),
+    "Distance": (243, 27, 0),
+    "Humidity": (81, 1, 0),
+    "Illumination": (246, 1, 0),
+    "kWh": (243, 29, 0),
+    "Percentage": (243, 6, 0),
+    "Pressure": (243, 9, 0),
+    "Selector Switch": (244, 62, 18),
+    "Switch": (244, 73, 0),
+    "Temp+Hum": (82, 5, 0),
+    "Temp+Hum+Baro": (84, 16, 0),
+    "Temperature": (80, 5, 0),
+    "Text": (243, 19, 0),
+    "Usage": (243, 31, 0),
+    "Voltage": (243, 8, 0),
+}
+
+
+def _log(kind, message):
+    Statistics[kind] += 1
+    if Output:
+        Output("%s %s: %s" % (time.strftime("%Y-%m-%d %H:%M:%S"), kind, message))
+
+
+def Log(message):
+    _log("Log", message)
+
+
+def Status(message):
+    _log("Status", message)
+
+
+def Error(message):
+    _log("Error", message)
+
+
+def Debug(message):
+    _log("Debug", message)
+
+
+def Debugging(level):
+    pass
+
+
+def Heartbeat(seconds=None):
+    global _heartbeat
+    if seconds is not None:
+        _heartbeat = seconds
+    return _heartbeat
+
+
+def Configuration(config=None):
+    if config is not None:
+        _configuration.clear()
+        _configuration.update(config)
+    return dict(_configuration)
+
+
+def Dump():
+    return Devices
+
+
+def reset():
+    """ Back to an empty Domoticz, and clear the statistics """
+    global _next_idx
+    Devices.clear()
+    Images.clear()
+    _configuration.clear()
+    _next_idx = 1
+    for x in Statistics:
+        Statistics[x] = 0
+
+
+def next_idx():
+    global _next_idx
+    idx = _next_idx
+    _next_idx += 1
+    return idx
+
+
+def reserve_idx(idx):
+    """ A widget has been created with a given idx, make sure it is not reused """
+    global _next_idx
+    _next_idx = max(_next_idx, idx + 1)
+
+
+def last_update():
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Widget:
+    """ Attributes and behaviour shared by the legacy Device and the extended Unit """
+
+    def __init__(self, Name="", Unit=0, DeviceID="", TypeName=None, Type=0, Subtype=0, Switchtype=0, Image=0, Options=None, Used=0, Description="", **kwargs):
+        self.ID = None
+        self.Name = Name
+        self.Unit = Unit
+        self.DeviceID = DeviceID
+        self.TypeName = TypeName or ""
+        if TypeName in TYPENAMES:
+            Type, Subtype, Switchtype = TYPENAMES[TypeName]
+        self.Type = Type or 0
+        self.SubType = Subtype or 0
+        self.SwitchType = Switchtype or 0
+        self.Image = Image or 0
+        self.Options = Options or {}
+        self.Used = Used
+        self.Description = Description
+        self.nValue = 0
+        self.sValue = ""
+        self.Color = ""
+        self.BatteryLevel = 255
+        self.SignalLevel = 12
+        self.TimedOut = 0
+        self.LastLevel = 0
+        self.LastUpdate = last_update()
+
+    def _assign(self, **kwargs):
+        for key, value in kwargs.items():
+            if key in ("Subtype", "Switchtype"):
+                key = {"Subtype": "SubType", "Switchtype": "SwitchType"}[key]
+            elif key == "TypeName" and value in TYPENAMES:
+                self.Type, self.SubType, self.SwitchType = TYPENAMES[value]
+            elif key in ("SuppressTriggers", "Log"):
+                continue
+            setattr(self, key, value)
+
+    def Touch(self):
+        Statistics["Touch"] += 1
+        self.LastUpdate = last_update()
+
+    def Refresh(self):
+        pass
+
+    def __repr__(self):
+        return "%s(ID: %s, Unit: %s, DeviceID: %s, Name: %s, nValue: %s, sValue: %s)" % (
+            type(self).__name__, self.ID, self.Unit, self.DeviceID, self.Name, self.nValue, self.sValue)
+
+
+class Device(Widget):
+    def Create(self):
+        Statistics["Create"] += 1
+        self.ID = next_idx()
+        Devices[self.Unit] = self
+
+    def Update(self, nValue=None, sValue=None, **kwargs):
+        Statistics["Update"] += 1
+        if nValue is not None:
+            self.nValue = nValue
+        if sValue is not None:
+            self.sValue = sValue
+        self._assign(**kwargs)
+        self.LastUpdate = last_update()
+
+    def Delete(self):
+        Statistics["Delete"] += 1
+        Devices.pop(self.Unit, None)
+
+
+class Image:
+    def __init__(self, Filename=""):
+        self.Filename = Filename
+        self.Base = Filename.rsplit(".", 1)[0]
+        self.Name = self.Base
+        self.Description = ""
+        self.ID = None
+
+    def Create(self):
+        self.ID = next_idx()
+        Images[self.Base] = self
+
+
+class Connection:
+    def __init__(self, Name="", Transport="", Protocol="", Address="", Port="", Baud=0):
+        self.Name = Name
+        self.Transport = Transport
+        self.Protocol = Protocol
+        self.Address = Address
+        self.Port = Port
+        self.Baud = Baud
+        self.Parent = None
+        self._connected = False
+
+    def Connect(self):
+        self._connected = True
+
+    def Listen(self):
+        self._connected = True
+
+    def Send(self, Message, Delay=0):
+        pass
+
+    def Disconnect(self):
+        self._connected = False
+
+    def Connected(self):
+        return self._connected
+
+    def Connecting(self):
+        return False
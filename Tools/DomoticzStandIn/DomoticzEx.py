@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: DomoticzEx.py
+#
+#    Description: Stand-in of the Domoticz python framework ( extended API ), to run the plugin outside of Domoticz
+#
+#    Devices are indexed by DeviceID ( the IEEE ) and hold their Units. Logs, Images, Connections and
+#    Statistics are shared with the legacy stand-in.
+#
+
+import Domoticz as _legacy
+from Domoticz import Statistics, Widget, last_update, next_idx
+
+Devices = {}  # { DeviceID: Device }
+
+
+def __getattr__(name):
+    # Anything not specific to the extended API ( Log, Images, Parameters, Connection ... ) is the legacy one
+    return getattr(_legacy, name)
+
+
+def reset():
+    Devices.clear()
+    _legacy.reset()
+
+
+class Device:
+    def __init__(self, DeviceID):
+        self.DeviceID = DeviceID
+        self.Units = {}
+        self.TimedOut = 0
+        self.LastUpdate = last_update()
+
+    def Touch(self):
+        Statistics["Touch"] += 1
+        self.LastUpdate = last_update()
+
+    def Refresh(self):
+        pass
+
+    def __repr__(self):
+        return "Device(DeviceID: %s, Units: %s)" % (self.DeviceID, list(self.Units))
+
+
+class Unit(Widget):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.Parent = None
+
+    def Create(self):
+        Statistics["Create"] += 1
+        self.ID = next_idx()
+        if self.DeviceID not in Devices:
+            Devices[self.DeviceID] = Device(self.DeviceID)
+        self.Parent = Devices[self.DeviceID]
+        self.Parent.Units[self.Unit] = self
+
+    def Update(self, Log=False, TypeName=None, UpdateProperties=False, UpdateOptions=False):
+        # In the extended API, attributes are set first, and Update() commits them
+        Statistics["Update"] += 1
+        if TypeName:
+            self._assign(TypeName=TypeName)
+        self.LastUpdate = last_update()
+        if self.Parent:
+            self.Parent.LastUpdate = self.LastUpdate
+
+    def Delete(self):
+        Statistics["Delete"] += 1
+        device = Devices.get(self.DeviceID)
+        if device is None:
+            return
+        device.Units.pop(self.Unit, None)
+        if not device.Units:
+            del Devices[self.DeviceID]
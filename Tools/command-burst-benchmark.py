@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: command-burst-benchmark.py
+#
+#    Description: Measure the time spent by the plugin to route a burst of onCommand ( as sent by Domoticz for a scene
+#                 switching many lights ), before the actual Zigbee command is built
+#
+#    Each device has a few widgets, so the widget index has --devices * --widgets entries. A scene of --scene lights
+#    is switched --bursts times, and the routing ( widget lookup, widget type, endpoint ) is timed with the former
+#    per command lookups, and with the routing plans of Modules/command.py.
+#
+#    Examples:
+#       python3 Tools/command-burst-benchmark.py
+#       python3 Tools/command-burst-benchmark.py --devices 300 --widgets 4 --scene 40 --bursts 200
+#
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PLUGIN_HOME = Path(__file__).resolve().parent.parent
+STANDIN_HOME = Path(__file__).resolve().parent / "DomoticzStandIn"
+
+
+class Log:
+    def logging(self, *args, **kwargs):
+        pass
+
+
+class PluginConf:
+    pluginConf = {"Command": False, "forcePassiveWidget": False}
+
+
+class Unit:
+    def __init__(self, name):
+        self.Name = name
+
+
+class Device:
+    def __init__(self):
+        self.Units = {}
+
+
+class Plugin:
+    def __init__(self):
+        self.log = Log()
+        self.pluginconf = PluginConf()
+        self.ZiGateModel = 2
+        self.ListOfDevices = {}
+        self.ListOfDomoticzWidget = {}
+        self.IEEE2NWK = {}
+
+
+def build_network(plugin, devices, nb_devices, nb_widgets):
+    """ Return the ( DeviceID, Unit, Nwkid ) of the light widget of each device """
+
+    lights = []
+    widget_idx = 1
+    for index in range(nb_devices):
+        ieee = "00158d%010x" % index
+        nwkid = "%04x" % (index + 1)
+        cluster_type = {}
+        for unit in range(1, nb_widgets + 1):
+            widget_type = "ColorControlRGBWW" if unit == 1 else "Voltage"
+            cluster_type[str(widget_idx)] = widget_type
+            plugin.ListOfDomoticzWidget[widget_idx] = {
+                "Name": "%s-%s" % (ieee, unit), "Unit": unit, "DeviceID": ieee, "Switchtype": 0, "Subtype": 0}
+            devices.setdefault(ieee, Device()).Units[unit] = Unit("%s-%s" % (ieee, unit))
+            widget_idx += 1
+        plugin.ListOfDevices[nwkid] = {
+            "IEEE": ieee, "Model": "bench", "LQI": 120, "Battery": "", "Ep": {"01": {"0006": {}, "ClusterType": cluster_type}}}
+        plugin.IEEE2NWK[ieee] = nwkid
+        lights.append((ieee, 1, nwkid))
+    return lights
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the routing of a burst of commands")
+    parser.add_argument("--devices", type=int, default=300, help="number of devices")
+    parser.add_argument("--widgets", type=int, default=4, help="number of widgets per device")
+    parser.add_argument("--scene", type=int, default=40, help="number of lights switched by the scene")
+    parser.add_argument("--bursts", type=int, default=200, help="number of times the scene is switched")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(STANDIN_HOME))
+    sys.path.insert(0, str(PLUGIN_HOME))
+    import Modules.domoticzAbstractLayer as abstract_layer
+    from Modules.command import command_plan
+    from Modules.domoTools import RetreiveSignalLvlBattery, RetreiveWidgetTypeList
+
+    # The benchmark widgets are indexed by ( DeviceID, Unit ), as with the extended Domoticz API
+    abstract_layer.DOMOTICZ_EXTENDED_API = True
+    devices = {}
+    plugin = Plugin()
+    lights = build_network(plugin, devices, args.devices, args.widgets)
+    scene = lights[-args.scene:]
+
+    def legacy_routing():
+        for device_id, unit, nwkid in scene:
+            abstract_layer.domo_read_Name(plugin, devices, device_id, unit)
+            RetreiveSignalLvlBattery(plugin, nwkid)
+            RetreiveWidgetTypeList(plugin, devices, device_id, nwkid, unit)
+
+    def plan_routing():
+        for device_id, unit, nwkid in scene:
+            command_plan(plugin, devices, device_id, unit, nwkid)
+            RetreiveSignalLvlBattery(plugin, nwkid)
+
+    results = {}
+    for name, routing in (("legacy", legacy_routing), ("plan", plan_routing)):
+        start = time.perf_counter()
+        for _ in range(args.bursts):
+            routing()
+        results[name] = (time.perf_counter() - start) / args.bursts * 1e3
+
+    print("Devices: %s Widgets: %s Scene: %s lights Bursts: %s" % (
+        args.devices, args.devices * args.widgets, len(scene), args.bursts))
+    for name, duration in results.items():
+        print("%-8s %8.3f ms per burst ( %6.1f us per command )" % (name, duration, duration * 1e3 / len(scene)))
+    print("Speedup  %8.1fx" % (results["legacy"] / results["plan"] if results["plan"] else 0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: deviceconf-lookup-benchmark.py
+#
+#    Description: Measure the cost of the DeviceConf lookups, plain dictionary against the compiled device templates
+#
+#    The templates are loaded as the plugin does ( Conf/DeviceConf.txt, Conf/Local-Devices and the certified devices
+#    database when z4d_certified_devices is installed ). Each lookup of Modules/tools is run --rounds times over all
+#    models with the former implementation on a plain dictionary and with the device templates registry, and the
+#    results of both are checked to be identical. The compile time and the size of the indexes are reported.
+#
+#    Examples:
+#       python3 Tools/deviceconf-lookup-benchmark.py
+#       python3 Tools/deviceconf-lookup-benchmark.py --rounds 50
+#
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+PLUGIN_HOME = Path(__file__).resolve().parent.parent
+STANDIN_HOME = Path(__file__).resolve().parent / "DomoticzStandIn"
+
+
+class Log:
+    def logging(self, *args, **kwargs):
+        pass
+
+
+class PluginConf:
+    def __init__(self):
+        self.pluginConf = {"pluginConfig": str(PLUGIN_HOME / "Conf") + "/", "Input": 0}
+
+
+class Plugin:
+    def __init__(self, device_conf):
+        self.log = Log()
+        self.pluginconf = PluginConf()
+        self.pluginParameters = {"PluginVersion": "99.0.0"}
+        self.DeviceConf = device_conf
+        self.ModelManufMapping = {}
+        self.ListOfDevices = {}
+
+
+# Former implementations, on a plain dictionary
+
+def legacy_parameter(self, model, attribute, return_default=None):
+    if model in ('', {}):
+        return return_default
+    if model not in self.DeviceConf:
+        return return_default
+    if attribute not in self.DeviceConf[model]:
+        return return_default
+    return self.DeviceConf[model][attribute]
+
+
+def legacy_clusters(self, Model, InOut):
+    listofCluster = []
+    if Model in self.DeviceConf and InOut in self.DeviceConf[Model]:
+        for ep in list(self.DeviceConf[Model][InOut].keys()):
+            seen = ""
+            for cluster in sorted(self.DeviceConf[Model][InOut][ep]):
+                if cluster in ("ClusterType", "Type", "ColorMode", seen):
+                    continue
+                listofCluster.append(cluster)
+                seen = cluster
+    return listofCluster
+
+
+def legacy_deviceconf_device(self, nwkid):
+    if "Model" in self.ListOfDevices[nwkid] and self.ListOfDevices[nwkid]["Model"] in self.DeviceConf:
+        return self.DeviceConf[self.ListOfDevices[nwkid]["Model"]]
+    return {}
+
+
+def legacy_model_by_profile_device(self, ZDeviceID, ProfileID):
+    # The former code raised KeyError on templates without ProfileID / ZDeviceID
+    for model in list(self.DeviceConf.keys()):
+        if self.DeviceConf[model].get("ProfileID") == ProfileID and self.DeviceConf[model].get("ZDeviceID") == ZDeviceID:
+            return model
+    return ""
+
+
+def legacy_device_config_param(self, NwkId, config_parameter):
+    self.log.logging("Input", "Debug", f"get_device_config_param: {NwkId} Config: {config_parameter}")
+    device = self.ListOfDevices.get(NwkId)
+    if not device:
+        return None
+    param_section = device.get("Param")
+    if not param_section:
+        return None
+    param_value = param_section.get(config_parameter)
+    self.log.logging("Input", "Debug", f"get_device_config_param: {NwkId} Config: {config_parameter} return {param_value}")
+    return param_value
+
+
+def measure(function, calls):
+    start = time.perf_counter()
+    results = [function(*args) for args in calls]
+    return (time.perf_counter() - start) / len(calls) * 1e9, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of the DeviceConf lookups")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(STANDIN_HOME))
+    sys.path.insert(0, str(PLUGIN_HOME))
+    import Modules.tools as tools
+    from Classes.DeviceTemplates import DeviceTemplates
+    from Modules.database import import_local_device_conf
+
+    random.seed(args.seed)
+    plugin = Plugin(DeviceTemplates())
+    import_local_device_conf(plugin)
+    try:
+        import z4d_certified_devices
+        z4d_certified_devices.z4d_import_device_configuration(plugin, os.path.dirname(z4d_certified_devices.__file__) + "/")
+    except ImportError:
+        print("z4d_certified_devices not installed, only the local templates are used")
+    # Templates in the former Epin / Epout format ( DeviceConf.txt of older releases )
+    for model in [model for model, template in plugin.DeviceConf.items() if "Ep" in template][:100]:
+        plugin.DeviceConf[model + "-Epin"] = {"Epin": plugin.DeviceConf[model]["Ep"], "Epout": {"01": {"0019": "", "000a": ""}}}
+    plugin.DeviceConf.compile()
+    legacy = Plugin(dict(plugin.DeviceConf))
+
+    models = list(plugin.DeviceConf)
+    attributes = ["BatteryDevice", "Param", "ClusterToBind", "TUYA_REGISTRATION", "HUE_RWL", "MissingAttribute"]
+    profile_devices = [(template["ZDeviceID"], template["ProfileID"]) for template in plugin.DeviceConf.values() if "ZDeviceID" in template and "ProfileID" in template]
+    profile_devices += [("ffff", "ffff")]
+    for index, model in enumerate(models):
+        nwkid = "%04x" % index
+        device = {"Model": model, "Param": dict(plugin.DeviceConf[model].get("Param", {}))}
+        plugin.ListOfDevices[nwkid] = legacy.ListOfDevices[nwkid] = device
+
+    lookups = {
+        "get_deviceconf_parameter_value": (
+            legacy_parameter, tools.get_deviceconf_parameter_value,
+            [(model, attribute) for model in models for attribute in attributes] + [("", "Param"), ("Unknown", "Param")]),
+        "getListofClusterbyModel": (
+            legacy_clusters, tools.getListofClusterbyModel,
+            [(model, in_out) for model in models for in_out in ("Epin", "Epout")]),
+        "getModelbyZDeviceIDProfileID": (
+            legacy_model_by_profile_device, tools.getModelbyZDeviceIDProfileID, profile_devices),
+        "deviceconf_device": (
+            legacy_deviceconf_device, tools.deviceconf_device,
+            [(nwkid,) for nwkid in plugin.ListOfDevices]),
+        "get_device_config_param": (
+            legacy_device_config_param, tools.get_device_config_param,
+            [(nwkid, parameter) for nwkid in plugin.ListOfDevices for parameter in ("PowerOnAfterOffOn", "ledMode")]),
+    }
+
+    report = plugin.DeviceConf.report()
+    print("Templates: %s models, %s ProfileID/ZDeviceID, %s clusters, %s manufacturers, compiled in %s ms" % (
+        report["Models"], report["ProfileDeviceIDs"], report["Clusters"], report["Manufacturers"], report["CompileTime_ms"]))
+    print("%-32s %8s %12s %12s %8s" % ("lookup", "calls", "legacy ns", "registry ns", "speedup"))
+    mismatches = 0
+    for name, (legacy_function, function, calls) in lookups.items():
+        calls = calls * args.rounds
+        random.shuffle(calls)
+        legacy_ns, expected = measure(lambda *call: legacy_function(legacy, *call), calls)
+        registry_ns, results = measure(lambda *call: function(plugin, *call), calls)
+        mismatches += sum(1 for result, reference in zip(results, expected) if result != reference)
+        print("%-32s %8s %12.0f %12.0f %7.1fx" % (name, len(calls), legacy_ns, registry_ns, legacy_ns / registry_ns if registry_ns else 0))
+
+    # Inverted indexes, against a scan of all templates
+    cluster = "0500"
+    start = time.perf_counter()
+    scanned = tools.getModelsbyCluster(legacy, cluster)
+    scan_ns = (time.perf_counter() - start) * 1e9
+    start = time.perf_counter()
+    indexed = tools.getModelsbyCluster(plugin, cluster)
+    index_ns = (time.perf_counter() - start) * 1e9
+    mismatches += scanned != indexed
+    print("%-32s %8s %12.0f %12.0f %7.1fx ( %s models )" % ("getModelsbyCluster %s" % cluster, 1, scan_ns, index_ns, scan_ns / index_ns if index_ns else 0, len(indexed)))
+
+    print("Mismatches: %s" % mismatches)
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
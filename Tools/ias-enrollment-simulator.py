@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: ias-enrollment-simulator.py
+#
+#    Description: Simulate the IAS zone enrollment of a security installation, and the alarm latency
+#
+#    --sensors IAS zones ( contact sensors, motion sensors, sirens ) are enrolled at once, as after a restart. Each
+#    simulated device answers the Read Attribute, Write Attribute and sends its Zone Enroll Request, but each frame is
+#    lost with the --loss probability. The heartbeats needed to enroll all zones, the frames sent, the retries and the
+#    failed zones are reported.
+#
+#    Then --alarms Zone Status Change Notifications ( with some retransmissions ) go through Decode8401, and the time
+#    to the alarm widget update is reported.
+#
+#    Examples:
+#       python3 Tools/ias-enrollment-simulator.py
+#       python3 Tools/ias-enrollment-simulator.py --sensors 200 --loss 0.2
+#
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+PLUGIN_HOME = Path(__file__).resolve().parent.parent
+STANDIN_HOME = Path(__file__).resolve().parent / "DomoticzStandIn"
+
+
+class Log:
+    def logging(self, *args, **kwargs):
+        pass
+
+
+class PluginConf:
+    def __init__(self, concurrency, timeout, retries):
+        self.pluginConf = {
+            "IASEnrollmentConcurrency": concurrency, "IASEnrollmentTimeout": timeout, "IASEnrollmentRetries": retries,
+            "LatencyHistograms": 1}
+
+
+class Statistics:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def record_latency(self, stage, elapsed):
+        self.histogram.record(int(elapsed * 1000000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulation of the IAS zones enrollment and alarms")
+    parser.add_argument("--sensors", type=int, default=100)
+    parser.add_argument("--loss", type=float, default=0.1, help="probability of a frame to be lost")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--alarms", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(STANDIN_HOME))
+    sys.path.insert(0, str(PLUGIN_HOME))
+    import Classes.IAS as ias
+    import Z4D_decoders.z4d_decoder_IAS as decoder
+    from Classes.LatencyHistogram import LatencyHistogram
+
+    random.seed(args.seed)
+    clock = [1000.0]
+    ias.time.time = lambda: clock[0]  # Simulated heartbeats, without waiting
+    frames = {"sent": 0}
+    inbound = []  # responses of the devices, processed at the next tick
+
+    def lost():
+        return random.random() < args.loss
+
+    def read_attribute(self, nwkid, EPin, EPout, cluster, *args, **kwargs):
+        frames["sent"] += 1
+        if not lost():
+            data = "00" * 6 + "0000" + "00" + "30" + "0001" + ("01" if devices[nwkid]["enrolled"] else "00")
+            inbound.append(lambda: manager.IAS_CIE_service_discovery_response(nwkid, EPout, data))
+
+    def write_attribute(self, nwkid, EPin, EPout, cluster, *args, **kwargs):
+        frames["sent"] += 1
+        if lost():
+            return
+        inbound.append(lambda: manager.IAS_CIE_write_response(nwkid, EPout, "00"))
+        if not lost():
+            inbound.append(lambda: manager.IAS_zone_enroll_request(nwkid, EPout, "0015", "01"))
+
+    def enroll_response(self, nwkid, EPin, EPout, *args, **kwargs):
+        frames["sent"] += 1
+        if not lost():
+            devices[nwkid]["enrolled"] = True
+
+    def counted(self, *args, **kwargs):
+        frames["sent"] += 1
+
+    ias.zcl_read_attribute = read_attribute
+    ias.zcl_write_attribute = write_attribute
+    ias.zcl_ias_zone_enroll_response = enroll_response
+    ias.bindDevice = counted
+    ias.zdp_simple_descriptor_request = counted
+
+    ListOfDevices = {}
+    devices = {}
+    for index in range(args.sensors):
+        nwkid = "%04x" % (index + 1)
+        ListOfDevices[nwkid] = {"Model": "Contact", "IEEE": "00158d00%08x" % index, "Ep": {"01": {"0500": {}, "0001": {}}}}
+        devices[nwkid] = {"enrolled": False}
+
+    manager = ias.IAS_Zone_Management(
+        PluginConf(args.concurrency, 10, args.retries), None, ListOfDevices, {}, {}, Log(), "zigpy", None, None, "00158d0000000000")
+    manager.resumed = True
+
+    t_start = time.perf_counter()
+    for nwkid in ListOfDevices:
+        manager.IAS_device_enrollment(nwkid)
+
+    heartbeats = 0
+    while manager.enrolling or manager.queued:
+        # Responses come back within the heartbeat
+        while inbound:
+            inbound.pop(0)()
+        heartbeats += 1
+        clock[0] += 5
+        manager.IAS_heartbeat()
+        if heartbeats > 10000:
+            break
+    elapsed = time.perf_counter() - t_start
+
+    report = manager.report()
+    print("Sensors: %s Frame loss: %s%% Concurrency: %s Retries: %s" % (args.sensors, int(args.loss * 100), args.concurrency, args.retries))
+    print("Enrollment: %s heartbeats ( %s s of plugin time ), %s frames sent, %.1f ms of cpu" % (heartbeats, heartbeats * 5, frames["sent"], elapsed * 1000))
+    print("Zones: %s Statistics: %s" % (report["Summary"], report["Statistics"]))
+
+    # Alarms
+    histogram = LatencyHistogram()
+    widgets = []
+
+    class Plugin:
+        pass
+
+    plugin = Plugin()
+    plugin.ListOfDevices = ListOfDevices
+    plugin.iaszonemgt = manager
+    plugin.statistics = Statistics(histogram)
+    plugin.log = Log()
+    decoder.MajDomoDevice = lambda self, Devices, NwkId, Ep, cluster, value, *args, **kwargs: widgets.append((NwkId, cluster, value))
+    decoder.lastSeenUpdate = lambda self, Devices, NwkId=None: None
+    decoder.timeStamped = decoder.updSQN = decoder.updLQI = lambda *args, **kwargs: None
+    decoder.get_deviceconf_parameter_value = lambda self, model, attribute, return_default=None: return_default
+    decoder.get_device_config_param = lambda self, nwkid, param: None
+
+    sqn = 0
+    retransmissions = 0
+    nwkids = list(ListOfDevices)
+    for _ in range(args.alarms):
+        nwkid = random.choice(nwkids)
+        sqn = (sqn + 1) % 256
+        frame = "%02x" % sqn + "01" + "0500" + "02" + nwkid + "%04x" % random.choice((0, 1, 5)) + "00" + "00" + "0000"
+        decoder.Decode8401(plugin, None, frame, "ff")
+        if random.random() < 0.1:
+            decoder.Decode8401(plugin, None, frame, "ff")
+            retransmissions += 1
+
+    summary = histogram.summary()
+    print("Alarms: %s ( %s retransmissions ), %s widget updates" % (args.alarms, retransmissions, len(widgets)))
+    print("Alarm latency ( decoded to widgets ): p50 %s us, p99 %s us, max %s us" % (
+        summary["quantiles_us"]["0.5"], summary["quantiles_us"]["0.99"], summary["max_us"]))
+
+    if report["Summary"].get("Enrolled", 0) + report["Summary"].get("Failed", 0) != args.sensors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
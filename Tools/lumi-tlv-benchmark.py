@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: lumi-tlv-benchmark.py
+#
+#    Description: Compare the decoding of the Xiaomi/Aqara TLV structure ( cluster 0x0000 attribute 0xff01,
+#                 0xfcc0/0x00f7 ... ) by the table driven decoder, against the former per tag string search
+#
+#    The corpus is either a built-in set of payloads, or a file with one "model;payload" per line ( payload as found
+#    in the plugin logs of lumi_private_cluster ). For each payload, both decoders are timed, and the values found
+#    by both are compared, so a regression of the table driven decoder shows up.
+#
+#    Examples:
+#       python3 Tools/lumi-tlv-benchmark.py
+#       python3 Tools/lumi-tlv-benchmark.py --corpus lumi-payloads.txt --loops 5000
+#
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PLUGIN_HOME = Path(__file__).resolve().parent.parent
+STANDIN_HOME = Path(__file__).resolve().parent / "DomoticzStandIn"
+
+BUILTIN_CORPUS = (
+    ("lumi.weather", "0121f70b0421a8130521090006240100000000642979096521161e662bde8601000a210000"),
+    ("lumi.sensor_ht", "0121b70b03281e0421a8130521140006240300000000642907086521b11a0a210000"),
+    ("lumi.sensor_magnet.aq2", "0121c70b0328190421a81305213e00062401000000000a210000641000"),
+    ("lumi.sensor_motion.aq2", "0121bd0b03281b0421a813052118000624060000000064100065213d000a210000"),
+    ("lumi.plug.maeu01", "03281e05214c00082119010921000b64100095393333933f9639e5e56b439739000000009839000000009b1000"),
+    ("lumi.relay.c2acn01", "03283705211a0008210d010a210000641001651000953928be47419639a8e764439739000000009839000000009b1000"),
+    ("lumi.motion.ac01", "03281d05210300082113010a2100000c20016520016620036720006820006920016a20016b2003"),
+    ("lumi.motion.ac02", "0121ea0b03281d0421a81305210e00062401000000000a21000065211a0069201e6a20016b2000"),
+    ("lumi.curtain.acn002", "03281d05214a00082115010a210000652164100d2055"),
+    ("lumi.light.aqcn02", "03281b0521050008210b010a2100006410016520ff"),
+)
+
+# Tags of the former decoder: ( name, searched string, number of hex digits )
+LEGACY_TAGS = (
+    ("BatteryVoltage", "0121", 4),
+    ("DeviceTemperature", "0328", 4),
+    ("RSSI", "0521", 4),
+    ("LQI", "0624", 4),
+    ("LightLevel", "0b21", 4),
+    ("OnOff", "6410", 2),
+    ("OnOff2", "6420", 2),
+    ("Temperature", "6429", 4),
+    ("Humidity", "6521", 4),
+    ("Humidity2", "6529", 4),
+    ("Level", "6520", 2),
+    ("Pressure", "662b", 8),
+    ("Consumption", "9539", 8),
+    ("Voltage", "9639", 8),
+    ("Current", "9739", 8),
+    ("Power", "9839", 8),
+    ("ConsumerConnected", "9b10", 2),
+    ("Presence", "6520", 2),
+    ("Sensibility", "6620", 2),
+    ("MonitoringMode", "6720", 2),
+    ("ApproachDistance", "6920", 2),
+    ("s68", "6820", 2),
+    ("s6a", "6a20", 2),
+    ("s6b", "6b20", 2),
+    ("Illuminance", "6521", 4),
+    ("DetectionInterval", "6920", 2),
+    ("MotionSensitivity", "6a20", 2),
+    ("TriggerIndicator", "6b20", 2),
+)
+
+
+class Log:
+    def logging(self, *args, **kwargs):
+        pass
+
+
+class Plugin:
+    log = Log()
+
+
+def legacy_search(payload):
+    values = {}
+    for name, tag, size in LEGACY_TAGS:
+        idx = payload.find(tag) + 4
+        if idx != 3:
+            values[name] = payload[idx:idx + size]
+    return values
+
+
+def load_corpus(filename):
+    corpus = []
+    with open(filename) as handle:
+        for line in handle:
+            line = line.strip()
+            if not line or line.startswith("#") or ";" not in line:
+                continue
+            model, payload = line.split(";", 1)
+            corpus.append((model.strip(), payload.strip().lower()))
+    return corpus
+
+
+def timeit(func, loops):
+    start = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return (time.perf_counter() - start) / loops * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the Lumi TLV decoder")
+    parser.add_argument("--corpus", help="file with one model;payload per line")
+    parser.add_argument("--loops", type=int, default=2000, help="number of decodings per payload")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(STANDIN_HOME))
+    sys.path.insert(0, str(PLUGIN_HOME))
+    from Modules.lumi import LUMI_TLV_MODEL_TAGS, LUMI_TLV_TAGS, lumi_tlv_decode
+
+    corpus = load_corpus(args.corpus) if args.corpus else BUILTIN_CORPUS
+    plugin = Plugin()
+
+    total_legacy = total_tlv = 0.0
+    print("%-25s %10s %10s %7s  %s" % ("Model", "legacy us", "tlv us", "ratio", "values"))
+    for model, payload in corpus:
+        tlv_tags = LUMI_TLV_MODEL_TAGS.get(model, LUMI_TLV_TAGS)
+        legacy_us = timeit(lambda: legacy_search(payload), args.loops)
+        tlv_us = timeit(lambda: lumi_tlv_decode(plugin, "0000", payload, tlv_tags), args.loops)
+        total_legacy += legacy_us
+        total_tlv += tlv_us
+        values = lumi_tlv_decode(plugin, "0000", payload, tlv_tags)
+        print("%-25s %10.2f %10.2f %6.1fx  %s" % (
+            model, legacy_us, tlv_us, legacy_us / tlv_us if tlv_us else 0,
+            ", ".join("%s=%s" % (name, value[0]) for name, value in values.items())))
+
+    print("%-25s %10.2f %10.2f %6.1fx" % (
+        "Total", total_legacy, total_tlv, total_legacy / total_tlv if total_tlv else 0))
+
+
+if __name__ == "__main__":
+    main()
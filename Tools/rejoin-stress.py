@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: rejoin-stress.py
+#
+#    Description: Simulate a mass rejoin ( all devices coming back with a new Short Address, as after a power cut ) and
+#                 check the identity of the devices ( ListOfDevices <-> IEEE2NWK ) remains consistent
+#
+#    Devices come back in random order, from several threads. Half of them are resolved by the Device Announcement
+#    path ( DeviceExist with the IEEE ), the other half by the neighbour tables of the routers ( lookupForIEEE ), as
+#    for a frame received from an unknown Short Address.
+#
+#    Examples:
+#       python3 Tools/rejoin-stress.py
+#       python3 Tools/rejoin-stress.py --devices 2000 --routers 200 --threads 8
+#
+
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+PLUGIN_HOME = Path(__file__).resolve().parent.parent
+STANDIN_HOME = Path(__file__).resolve().parent / "DomoticzStandIn"
+
+
+class Log:
+    def logging(self, *args, **kwargs):
+        pass
+
+
+class AdminWidgets:
+    def updateNotificationWidget(self, *args, **kwargs):
+        pass
+
+
+class PluginConf:
+    pluginConf = {"enableReadAttributes": False}
+
+
+class Plugin:
+    def __init__(self):
+        self.log = Log()
+        self.adminWidgets = AdminWidgets()
+        self.pluginconf = PluginConf()
+        self.groupmgt = None
+        self.HBcount = 0
+        self.ListOfDevices = {}
+        self.IEEE2NWK = {}
+
+
+def build_network(plugin, nb_devices, nb_routers):
+    """ Return { ieee: new nwkid }, after having created the devices with their old nwkid, and the neighbour tables
+    reporting the new ones """
+
+    old_nwkids = random.sample(range(0x0001, 0xfff0), nb_devices)
+    new_nwkids = random.sample([x for x in range(0x0001, 0xfff0) if x not in set(old_nwkids)], nb_devices)
+    rejoin = {}
+    for index, (old, new) in enumerate(zip(old_nwkids, new_nwkids)):
+        ieee = "00158d%010x" % index
+        nwkid = "%04x" % old
+        plugin.ListOfDevices[nwkid] = {
+            "IEEE": ieee, "Status": "inDB", "Heartbeat": "0", "Model": "stress", "Ep": {"01": {"0006": {}}},
+            "MacCapa": "8e" if index < nb_routers else "80",
+        }
+        plugin.IEEE2NWK[ieee] = nwkid
+        rejoin[ieee] = "%04x" % new
+
+    routers = [plugin.IEEE2NWK["00158d%010x" % index] for index in range(nb_routers)]
+    for index, (ieee, new) in enumerate(rejoin.items()):
+        router = routers[index % nb_routers]
+        plugin.ListOfDevices[router].setdefault("Neighbours", [{"Time": int(time.time()), "Devices": []}])
+        plugin.ListOfDevices[router]["Neighbours"][-1]["Devices"].append({new: {"_IEEE": ieee, "_relationshp": "Child"}})
+    return rejoin
+
+
+def check_consistency(plugin, rejoin):
+    errors = []
+    for ieee, new in rejoin.items():
+        if plugin.IEEE2NWK.get(ieee) != new:
+            errors.append("%s points to %s instead of %s" % (ieee, plugin.IEEE2NWK.get(ieee), new))
+        elif new not in plugin.ListOfDevices or plugin.ListOfDevices[new].get("IEEE") != ieee:
+            errors.append("%s has no record at %s" % (ieee, new))
+    if len(plugin.ListOfDevices) != len(rejoin):
+        errors.append("%s records for %s devices" % (len(plugin.ListOfDevices), len(rejoin)))
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mass rejoin stress test of the device identity")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--routers", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(STANDIN_HOME))
+    sys.path.insert(0, str(PLUGIN_HOME))
+    from Modules.deviceIdentity import address_changes
+    from Modules.tools import DeviceExist, lookupForIEEE
+
+    random.seed(args.seed)
+    plugin = Plugin()
+    rejoin = build_network(plugin, args.devices, min(args.routers, args.devices))
+    order = list(rejoin.items())
+    random.shuffle(order)
+
+    def rejoin_worker(items):
+        for index, (ieee, new) in items:
+            if index % 2:
+                DeviceExist(plugin, {}, new, ieee)
+            else:
+                lookupForIEEE(plugin, new, reconnect=True)
+
+    chunks = [list(enumerate(order))[thread::args.threads] for thread in range(args.threads)]
+    workers = [threading.Thread(target=rejoin_worker, args=(chunk,)) for chunk in chunks]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    duration = time.perf_counter() - start
+
+    errors = check_consistency(plugin, rejoin)
+    print("Devices: %s Routers: %s Threads: %s" % (args.devices, args.routers, args.threads))
+    print("Rejoin of all devices: %.3f sec ( %.1f us per device )" % (duration, duration / args.devices * 1e6))
+    print("Address changes recorded: %s" % len(address_changes()))
+    print("DeviceList write scheduled: %s" % (plugin.HBcount >= 1))
+    if errors:
+        print("%s inconsistencies" % len(errors))
+        for error in errors[:20]:
+            print("   %s" % error)
+        sys.exit(1)
+    print("Identity index consistent")
+
+
+if __name__ == "__main__":
+    main()
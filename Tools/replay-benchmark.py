@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: replay-benchmark.py
+#
+#    Description: Replay Zigbee frames through the plugin pipeline outside of Domoticz, and report per stage performances
+#
+#    The plugin runs against the Domoticz stand-in ( Tools/DomoticzStandIn ), with a stand-in transport which only
+#    counts the frames sent. Frames are either
+#    - the ones captured with the CaptureRxFrames option ( Logs/Capture-Zigbee-Rx-Frames-xx.csv ), replayed with
+#      the DeviceList of the same instance, or
+#    - synthetic Attribute Reports ( Temperature / Humidity ) sent by synthetic devices.
+#
+#    For each instrumented stage ( processFrame, decode8002, ReadCluster, MajDomoDevice, domo_update_api, onHeartbeat
+#    by default ), the benchmark reports the number of calls, the latency distribution, the CPU time and the net
+#    number of memory blocks allocated. Results can be saved as JSON and compared against a baseline, so performance
+#    regressions can be caught offline.
+#
+#    Examples:
+#       python3 Tools/replay-benchmark.py --synthetic 20000 --devices 50 --json baseline.json
+#       python3 Tools/replay-benchmark.py --synthetic 20000 --devices 50 --baseline baseline.json
+#       python3 Tools/replay-benchmark.py --capture Capture-Zigbee-Rx-Frames-01.csv --devicelist DeviceList-01.txt --speed 10
+#
+
+import argparse
+import importlib
+import json
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+PLUGIN_HOME = Path(__file__).resolve().parent.parent
+STANDIN_HOME = Path(__file__).resolve().parent / "DomoticzStandIn"
+
+HARDWARE_ID = 99
+DEFAULT_LQI = 0x80
+
+# ( label, "module:attribute path" )
+DEFAULT_STAGES = (
+    ("processFrame", "plugin:BasePlugin.processFrame"),
+    ("decode8002", "Zigbee.decode8002:decode8002_and_process"),
+    ("ReadCluster", "Modules.readClusters:ReadCluster"),
+    ("MajDomoDevice", "Modules.domoMaj:MajDomoDevice"),
+    ("domo_update_api", "Modules.domoticzAbstractLayer:domo_update_api"),
+    ("onHeartbeat", "plugin:BasePlugin.onHeartbeat"),
+)
+
+# Plugin widget type to Domoticz TypeName, used to create the stand-in widgets of a DeviceList
+WIDGET_TYPENAMES = {
+    "Baro": "Barometer",
+    "Humi": "Humidity",
+    "Lux": "Illumination",
+    "Meter": "kWh",
+    "Power": "Usage",
+    "Temp": "Temperature",
+    "Voltage": "Voltage",
+}
+
+CAPTURE_SENDER = re.compile(r"address=([0-9A-Fa-fx:]+)")
+
+
+# Stage instrumentation
+
+class Stage:
+    def __init__(self, label):
+        self.label = label
+        self.calls = 0
+        self.cpu = 0.0
+        self.blocks = 0
+        self.latencies = []  # in µs
+
+    def result(self):
+        latencies = sorted(self.latencies)
+        return {
+            "Calls": self.calls,
+            "TotalMs": round(sum(latencies) / 1000, 3),
+            "MeanUs": round(sum(latencies) / len(latencies), 1) if latencies else 0,
+            "P50Us": _percentile(latencies, 50),
+            "P95Us": _percentile(latencies, 95),
+            "P99Us": _percentile(latencies, 99),
+            "MaxUs": round(latencies[-1], 1) if latencies else 0,
+            "CpuMs": round(self.cpu * 1000, 3),
+            "CpuUsPerCall": round(self.cpu * 1000000 / self.calls, 1) if self.calls else 0,
+            "BlocksPerCall": round(self.blocks / self.calls, 2) if self.calls else 0,
+        }
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0
+    return round(sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))], 1)
+
+
+def instrument(stage, function):
+    perf_counter = time.perf_counter
+    process_time = time.process_time
+    allocated_blocks = sys.getallocatedblocks
+
+    def instrumented(*args, **kwargs):
+        blocks = allocated_blocks()
+        cpu = process_time()
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stage.latencies.append((perf_counter() - start) * 1000000)
+            stage.cpu += process_time() - cpu
+            stage.blocks += allocated_blocks() - blocks
+            stage.calls += 1
+
+    instrumented.__wrapped__ = function
+    instrumented.__name__ = getattr(function, "__name__", stage.label)
+    return instrumented
+
+
+def install_stage(label, target):
+    """ Wrap the target function everywhere it is referenced: its owner, and any module which imported it """
+
+    module_name, attribute_path = target.split(":", 1)
+    owner = importlib.import_module(module_name)
+    attributes = attribute_path.split(".")
+    for attribute in attributes[:-1]:
+        owner = getattr(owner, attribute)
+    original = getattr(owner, attributes[-1])
+
+    stage = Stage(label)
+    wrapper = instrument(stage, original)
+    setattr(owner, attributes[-1], wrapper)
+
+    for module in list(sys.modules.values()):
+        namespace = getattr(module, "__dict__", None)
+        if not namespace or not str(getattr(module, "__file__", "")).startswith(str(PLUGIN_HOME)):
+            continue
+        for name, value in list(namespace.items()):
+            if value is original:
+                setattr(module, name, wrapper)
+            elif isinstance(value, dict) and name.isupper():
+                # Dispatch tables such as DECODERS
+                for key in [x for x, y in value.items() if y is original]:
+                    value[key] = wrapper
+    return stage
+
+
+# Stand-in environment
+
+class ReplayApplication:
+    """ Stand-in of the zigpy application, as seen from the plugin """
+
+    def get_device_rssi(self, z4d_nwk=None, z4d_ieee=None):
+        return None
+
+    def get_topology(self):
+        return {}, {}
+
+    def is_zigpy_topology_in_progress(self):
+        return False
+
+
+class ReplayTransport:
+    """ Stand-in of the Zigbee transport: nothing is sent, requests are only counted """
+
+    def __init__(self):
+        self.app = ReplayApplication()
+        self.sqn = 0
+        self.sent = {}
+
+    def sendData(self, cmd, datas, sqn=None, highpriority=False, ackIsDisabled=False, waitForResponseIn=False, NwkId=None):
+        self.sent[cmd] = self.sent.get(cmd, 0) + 1
+        self.sqn = (self.sqn + 1) & 0xFF
+        return self.sqn
+
+    def loadTransmit(self):
+        return 0
+
+    def pdm_lock_status(self):
+        return False
+
+    def get_writer_queue(self):
+        return 0
+
+    def get_forwarder_queue(self):
+        return 0
+
+    def __getattr__(self, name):
+        # Any other transport service is a no-op
+        return lambda *args, **kwargs: None
+
+
+def setup_domoticz_standin(extended):
+    sys.path.insert(0, str(PLUGIN_HOME))
+    sys.path.insert(0, str(STANDIN_HOME))
+    import Domoticz
+    import DomoticzEx
+    if extended:
+        sys.modules["Domoticz"] = DomoticzEx
+    return Domoticz, (DomoticzEx if extended else Domoticz)
+
+
+def setup_workdir(args):
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="z4d-replay-"))
+    for folder in ("Conf", "Data", "Logs", "Reports", "OTAFirmware", "www"):
+        (workdir / folder).mkdir(parents=True, exist_ok=True)
+
+    # The configuration is read from a copy, as the plugin may update it
+    conf = PLUGIN_HOME / "Conf"
+    if (conf / "DeviceConf.txt").is_file():
+        shutil.copy(conf / "DeviceConf.txt", workdir / "Conf")
+    for folder in ("Local-Devices", "ZclDefinitions"):
+        if (conf / folder).is_dir() and not (workdir / "Conf" / folder).exists():
+            shutil.copytree(conf / folder, workdir / "Conf" / folder)
+
+    if args.pluginconf:
+        shutil.copy(args.pluginconf, workdir / "Conf" / ("PluginConf-%02d.json" % HARDWARE_ID))
+    if args.devicelist:
+        shutil.copy(args.devicelist, workdir / "Data" / ("DeviceList-%02d.txt" % HARDWARE_ID))
+    return workdir
+
+
+def bootstrap_plugin(args, workdir, domoticz):
+    """ Bring the plugin to its running state, as onStart() would do, without Domoticz database, transport and WebServer """
+
+    domoticz.Parameters.update({
+        "HomeFolder": str(workdir) + os.sep,
+        "StartupFolder": str(workdir) + os.sep,
+        "UserDataFolder": str(workdir) + os.sep,
+        "HardwareID": HARDWARE_ID,
+        "Key": "Zigate",
+        "Name": "Zigbee",
+        "Mode1": "ZigpyZNP",
+        "Mode2": "None",
+        "Mode3": "False",
+        "Mode4": "None",
+        "Mode5": "http://127.0.0.1:8080",
+        "Mode6": "0",
+        "SerialPort": "",
+        "DomoticzVersion": "2024.7 (build 16183)",
+    })
+
+    import plugin
+    from Classes.AdaptivePolling import AdaptivePolling
+    from Classes.AdminWidgets import AdminWidgets
+    from Classes.ConfigureReporting import ConfigureReporting
+    from Classes.IAS import IAS_Zone_Management
+    from Classes.LoggingManagement import LoggingManagement
+    from Classes.PluginConf import PluginConf
+    from Classes.TransportStats import TransportStatistics
+    from Modules import domoticzAbstractLayer
+    from Modules.database import LoadDeviceList, import_local_device_conf
+    from Modules.pluginHelpers import get_domoticz_version
+    from Modules.readZclClusters import load_zcl_cluster
+
+    if args.extended:
+        domoticzAbstractLayer.DOMOTICZ_EXTENDED_API = True
+
+    self = plugin._plugin
+    self.pluginParameters = dict(domoticz.Parameters)
+    self.pluginParameters.update({"PluginBranch": "replay", "PluginVersion": "replay", "CertifiedDbVersion": None})
+    self.zigbee_communication = "zigpy"
+    self.transport = "ZigpyReplay"
+    self.internet_available = False
+    self.HardwareID = HARDWARE_ID
+    self.homedirectory = domoticz.Parameters["HomeFolder"]
+    self.Key = domoticz.Parameters["Key"]
+    get_domoticz_version(self, domoticz.Parameters["DomoticzVersion"])
+
+    self.pluginconf = PluginConf(
+        self.zigbee_communication, self.VersionNewFashion, self.DomoticzMajor, self.DomoticzMinor, self.homedirectory, self.HardwareID
+    )
+    self.pluginconf.pluginConf["useDomoticzDatabase"] = 0
+    self.log = LoggingManagement(self.pluginconf, self.PluginHealth, self.HardwareID, self.ListOfDevices, self.permitTojoin)
+    self.log.openLogFile()
+
+    self.adminWidgets = AdminWidgets(self.log, self.pluginconf, self.pluginParameters, self.ListOfDomoticzWidget, plugin.Devices, self.ListOfDevices, self.HardwareID)
+    self.DeviceListName = "DeviceList-%02d.txt" % HARDWARE_ID
+    load_zcl_cluster(self)
+    import_local_device_conf(self)
+    try:
+        import z4d_certified_devices
+        z4d_certified_devices.z4d_import_device_configuration(self, os.path.dirname(z4d_certified_devices.__file__) + "/")
+    except ImportError:
+        print("z4d_certified_devices not available, running with the local device configurations only")
+
+    LoadDeviceList(self)
+    create_devicelist_widgets(self, domoticz)
+    domoticzAbstractLayer.load_list_of_domoticz_widget(self, plugin.Devices)
+
+    self.statistics = TransportStatistics(self.pluginconf, self.log, self.zigbee_communication)
+    self.adaptivePolling = AdaptivePolling(self.pluginconf, self.log)
+    self.ControllerLink = ReplayTransport()
+    self.iaszonemgt = IAS_Zone_Management(self.pluginconf, self.ControllerLink, self.ListOfDevices, self.IEEE2NWK, self.DeviceConf, self.log, self.zigbee_communication, self.readZclClusters, self.FirmwareVersion)
+    self.ControllerIEEE = "00124b0000000000"
+    self.ControllerNWKID = "0000"
+    self.FirmwareVersion = "0000"
+    self.configureReporting = ConfigureReporting(
+        self.zigbee_communication, self.pluginconf, self.DeviceConf, self.ControllerLink, self.ListOfDevices, plugin.Devices,
+        self.log, self.busy, self.FirmwareVersion, self.IEEE2NWK, self.ControllerIEEE, self.readZclClusters, self.HardwareID
+    )
+
+    self.PDMready = self.InitPhase1 = self.InitPhase2 = self.InitPhase3 = True
+    self.busy = False
+    return self
+
+
+def create_devicelist_widgets(self, domoticz):
+    """ Create the Domoticz widgets referenced by the DeviceList, with the same Widget Idx """
+
+    widget_class = domoticz.Unit if hasattr(domoticz, "Unit") else domoticz.Device
+    unit = 1
+    for nwkid, device in self.ListOfDevices.items():
+        cluster_types = dict(device.get("ClusterType", {}) or {})
+        for ep in (device.get("Ep", {}) or {}).values():
+            if isinstance(ep, dict):
+                cluster_types.update(ep.get("ClusterType", {}) or {})
+        for widget_idx, widget_type in cluster_types.items():
+            if not str(widget_idx).isdigit():
+                continue
+            widget = widget_class(
+                Name="%s %s %s" % (widget_type, nwkid, widget_idx), Unit=unit, DeviceID=device.get("IEEE", nwkid),
+                TypeName=WIDGET_TYPENAMES.get(widget_type, "Switch")
+            )
+            widget.Create()
+            widget.ID = int(widget_idx)
+            domoticz.reserve_idx(widget.ID)
+            unit += 1
+
+
+# Frames sources
+
+def build_8002_frame(sender, src_addrmode, profile, cluster, src_ep, dst_ep, payload, lqi=DEFAULT_LQI):
+    """ Same frame as the one built by the zigpy transport ( build_plugin_8002_frame_content ) """
+
+    from Zigbee.encoder_tools import encapsulate_plugin_frame
+
+    frame_payload = "00" + "%04x" % profile + "%04x" % cluster + "%02x" % src_ep + "%02x" % dst_ep
+    frame_payload += "%02x" % src_addrmode + sender + "02" + "0000" + payload
+    return encapsulate_plugin_frame("8002", frame_payload, "%02x" % lqi)
+
+
+def load_capture(filename, self):
+    """ Read a Capture-Zigbee-Rx-Frames file, return the list of ( timestamp, plugin frame ) """
+
+    frames = []
+    with open(filename, "rt") as handle:
+        for line in handle:
+            fields = line.strip().split(" | ")
+            if len(fields) < 9 or not re.match(r"^[0-9.]+$", fields[0].strip()):
+                continue
+            try:
+                timestamp = float(fields[0])
+                profile, cluster, src_ep, dst_ep = (int(x) for x in fields[2:6])
+                hex_message = fields[-2].strip()
+                bytes.fromhex(hex_message)
+            except ValueError:
+                continue
+
+            match = CAPTURE_SENDER.search(fields[1])
+            if match is None:
+                continue
+            address = match.group(1)
+            if ":" in address:
+                sender, src_addrmode = address.replace(":", "").lower(), 0x03
+            else:
+                sender, src_addrmode = "%04x" % int(address, 16), 0x02
+            lqi = _device_lqi(self, sender)
+            frames.append((timestamp, build_8002_frame(sender, src_addrmode, profile, cluster, src_ep, dst_ep, hex_message, lqi)))
+    return frames
+
+
+def _device_lqi(self, sender):
+    nwkid = self.IEEE2NWK.get(sender, sender)
+    lqi = self.ListOfDevices.get(nwkid, {}).get("LQI")
+    return lqi if isinstance(lqi, int) and 0 <= lqi <= 255 else DEFAULT_LQI
+
+
+def create_synthetic_devices(self, domoticz, nb_devices):
+    """ Temperature / Humidity sensors, with their Domoticz widgets """
+
+    from Modules.tools import initDeviceInList
+
+    widget_class = domoticz.Unit if hasattr(domoticz, "Unit") else domoticz.Device
+    devices = []
+    unit = 1 + max([0] + [x if isinstance(x, int) else 0 for x in domoticz.Devices])
+    for index in range(nb_devices):
+        nwkid = "%04x" % (0x1000 + index)
+        ieee = "00158d00%08x" % (0x1000 + index)
+        initDeviceInList(self, nwkid)
+        device = self.ListOfDevices[nwkid]
+        device.update({
+            "Status": "inDB", "IEEE": ieee, "Model": "", "MacCapa": "80", "PowerSource": "Battery", "Health": "Live",
+            "LogicalType": "End Device", "DeviceType": "RFD", "LQI": DEFAULT_LQI, "ProfileID": "0104", "ZDeviceID": "0302",
+            "Ep": {"01": {"0000": {}, "0001": {}, "0402": {}, "0405": {}, "ClusterType": {}}},
+        })
+        self.IEEE2NWK[ieee] = nwkid
+        for widget_type, typename in (("Temp", "Temperature"), ("Humi", "Humidity")):
+            widget = widget_class(Name="%s %s" % (widget_type, nwkid), Unit=unit, DeviceID=ieee, TypeName=typename)
+            widget.Create()
+            device["Ep"]["01"]["ClusterType"][str(widget.ID)] = widget_type
+            unit += 1
+        devices.append(nwkid)
+    return devices
+
+
+def synthetic_frames(devices, nb_frames, rate):
+    """ Temperature and Humidity Attribute Reports, sent in turn by each device """
+
+    frames = []
+    timestamp = time.time()
+    for index in range(nb_frames):
+        nwkid = devices[index % len(devices)]
+        sqn = index & 0xFF
+        if index % 2:
+            payload = "18%02x0a000029%s" % (sqn, struct.pack("<h", 1800 + (index % 700)).hex())
+            cluster = 0x0402
+        else:
+            payload = "18%02x0a000021%s" % (sqn, struct.pack("<H", 4000 + (index % 5000)).hex())
+            cluster = 0x0405
+        frames.append((timestamp + index / rate, build_8002_frame(nwkid, 0x02, 0x0104, cluster, 0x01, 0x01, payload)))
+    return frames
+
+
+# Replay
+
+def replay(self, frames, speed, heartbeat):
+    if not frames:
+        return 0
+    start = time.perf_counter()
+    first = frames[0][0]
+    next_heartbeat = first + 1
+    for timestamp, frame in frames:
+        if speed > 0:
+            delay = (timestamp - first) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        while heartbeat and next_heartbeat <= timestamp:
+            self.onHeartbeat()
+            next_heartbeat += 1
+        self.processFrame(frame)
+    return time.perf_counter() - start
+
+
+def report(results):
+    print()
+    print("Replayed %s frames in %.3f s ( %.0f frames/s ), CPU %.3f s" % (
+        results["Frames"], results["WallSeconds"], results["FramesPerSecond"], results["CpuSeconds"]))
+    print()
+    print("%-18s %8s %10s %9s %9s %9s %9s %10s %10s %9s" % (
+        "Stage", "Calls", "Total ms", "Mean µs", "p50 µs", "p95 µs", "p99 µs", "Max µs", "CPU µs/c", "Blk/call"))
+    for label, stage in results["Stages"].items():
+        print("%-18s %8s %10s %9s %9s %9s %9s %10s %10s %9s" % (
+            label, stage["Calls"], stage["TotalMs"], stage["MeanUs"], stage["P50Us"], stage["P95Us"], stage["P99Us"],
+            stage["MaxUs"], stage["CpuUsPerCall"], stage["BlocksPerCall"]))
+    print()
+    print("Domoticz API: %s" % ", ".join("%s: %s" % (x, y) for x, y in results["Domoticz"].items()))
+    print("Frames sent : %s" % (", ".join("%s: %s" % (x, y) for x, y in sorted(results["Sent"].items())) or "none"))
+    if results.get("TopAllocations"):
+        print()
+        print("Top allocations (peak %s KiB)" % results["PeakKiB"])
+        for line in results["TopAllocations"]:
+            print("   %s" % line)
+
+
+def compare_with_baseline(results, baseline_filename, tolerance):
+    """ Return the list of stages which are slower than the baseline ( mean latency or CPU per call ) """
+
+    with open(baseline_filename, "rt") as handle:
+        baseline = json.load(handle)
+
+    regressions = []
+    for label, stage in results["Stages"].items():
+        reference = baseline.get("Stages", {}).get(label)
+        if not reference or not stage["Calls"]:
+            continue
+        for metric in ("MeanUs", "CpuUsPerCall"):
+            if reference[metric] and stage[metric] > reference[metric] * (1 + tolerance):
+                regressions.append("%s %s: %s -> %s (+%.0f%%)" % (
+                    label, metric, reference[metric], stage[metric], 100 * (stage[metric] / reference[metric] - 1)))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay Zigbee frames through the plugin, outside of Domoticz")
+    parser.add_argument("--capture", help="Capture-Zigbee-Rx-Frames-xx.csv file to replay")
+    parser.add_argument("--devicelist", help="DeviceList-xx.txt matching the capture")
+    parser.add_argument("--pluginconf", help="PluginConf-xx.json to use")
+    parser.add_argument("--synthetic", type=int, default=0, help="Number of synthetic frames to replay")
+    parser.add_argument("--devices", type=int, default=20, help="Number of synthetic devices")
+    parser.add_argument("--rate", type=float, default=20.0, help="Synthetic frames per second ( in the trace time )")
+    parser.add_argument("--speed", type=float, default=0, help="Replay speed factor versus the trace time, 0 for as fast as possible")
+    parser.add_argument("--no-heartbeat", action="store_true", help="Do not call onHeartbeat while replaying")
+    parser.add_argument("--extended", action="store_true", help="Use the Domoticz extended API ( DomoticzEx )")
+    parser.add_argument("--stage", action="append", default=[], help="Additional stage to instrument, as label=module:function")
+    parser.add_argument("--tracemalloc", action="store_true", help="Trace allocations and report the top allocation sites")
+    parser.add_argument("--workdir", help="Working folder ( default: a temporary folder )")
+    parser.add_argument("--json", help="Save the results in this JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slow down versus the baseline ( 0.2 = 20%% )")
+    parser.add_argument("--verbose", action="store_true", help="Print the Domoticz logs")
+    args = parser.parse_args()
+
+    if not args.capture and not args.synthetic:
+        parser.error("--capture or --synthetic is required")
+
+    legacy, domoticz = setup_domoticz_standin(args.extended)
+    legacy.Output = print if args.verbose else None
+    workdir = setup_workdir(args)
+    self = bootstrap_plugin(args, workdir, domoticz)
+
+    if args.capture:
+        frames = load_capture(args.capture, self)
+    else:
+        devices = create_synthetic_devices(self, domoticz, max(1, args.devices))
+        from Modules.domoticzAbstractLayer import load_list_of_domoticz_widget
+        load_list_of_domoticz_widget(self, domoticz.Devices)
+        frames = synthetic_frames(devices, args.synthetic, args.rate)
+    print("%s frames to replay, %s devices, working folder %s" % (len(frames), len(self.ListOfDevices), workdir))
+
+    stages = {}
+    for label, target in DEFAULT_STAGES + tuple(tuple(x.split("=", 1)) for x in args.stage):
+        stages[label] = install_stage(label, target)
+
+    for x in legacy.Statistics:
+        legacy.Statistics[x] = 0
+    if frames:
+        # In the trace time, the plugin has been running for the duration of the trace
+        self.statistics._start -= int(frames[-1][0] - frames[0][0]) + 1
+    if args.tracemalloc:
+        tracemalloc.start(10)
+    cpu = time.process_time()
+    try:
+        wall = replay(self, frames, args.speed, not args.no_heartbeat)
+    finally:
+        self.log.closeLogFile()
+    cpu = time.process_time() - cpu
+
+    results = {
+        "Frames": len(frames),
+        "WallSeconds": round(wall, 3),
+        "CpuSeconds": round(cpu, 3),
+        "FramesPerSecond": round(len(frames) / wall, 1) if wall else 0,
+        "Stages": {label: stage.result() for label, stage in stages.items()},
+        "Domoticz": dict(legacy.Statistics),
+        "Sent": dict(self.ControllerLink.sent),
+    }
+    if args.tracemalloc:
+        snapshot = tracemalloc.take_snapshot()
+        results["PeakKiB"] = tracemalloc.get_traced_memory()[1] // 1024
+        results["TopAllocations"] = [str(x) for x in snapshot.statistics("lineno")[:10]]
+        tracemalloc.stop()
+
+    report(results)
+
+    if args.json:
+        with open(args.json, "wt") as handle:
+            json.dump(results, handle, indent=4)
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        print()
+        if regressions:
+            print("Performance regressions versus %s:" % args.baseline)
+            for line in regressions:
+                print("   %s" % line)
+            return 1
+        print("No regression versus %s" % args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: traffic-lanes-benchmark.py
+#
+#    Description: Compare the former FIFO writer queue with the traffic class lanes, under a synthetic mixed load
+#
+#    The coordinator sends one command every --service ms. During --duration seconds ( simulated clock ):
+#    - an OTA upgrade sends its blocks ( bulk ) continuously,
+#    - every heartbeat ( 5s ) the polling and the configure reporting checks queue a burst of maintenance commands,
+#    - every 4s a scene switches --scene lights ( interactive ),
+#    - every 30s an alarm panel starts its sirens ( alarm ).
+#    For each traffic class, the waiting time in the queue ( p50, p99, max ), the commands served within the SLO,
+#    and the share of the bandwidth are reported. With --load above 1, the offered load exceeds the capacity of the
+#    coordinator: the bulk class must still get its share ( no starvation ).
+#
+#    Examples:
+#       python3 Tools/traffic-lanes-benchmark.py
+#       python3 Tools/traffic-lanes-benchmark.py --load 1.5 --duration 1200
+#
+
+import argparse
+import random
+import sys
+from collections import deque
+from pathlib import Path
+
+PLUGIN_HOME = Path(__file__).resolve().parent.parent
+
+
+def build_arrivals(args):
+    """ Sorted list of ( time, traffic class ) """
+
+    arrivals = []
+    capacity = 1000 / args.service
+    # Bulk: the OTA client requests the next block continuously
+    bulk_rate = 0.30 * capacity * args.load
+    arrivals += [(index / bulk_rate, "bulk") for index in range(int(args.duration * bulk_rate))]
+    # Maintenance: bursts at each heartbeat
+    burst = int(0.45 * capacity * 5 * args.load)
+    for heartbeat in range(0, args.duration, 5):
+        arrivals += [(heartbeat + random.random() * 0.2, "maintenance") for _ in range(burst)]
+    # Interactive: scenes
+    for start in range(1, args.duration, 4):
+        arrivals += [(start + random.random() + index * 0.001, "interactive") for index in range(args.scene)]
+    # Alarm: sirens
+    for start in range(7, args.duration, 30):
+        arrivals += [(start + random.random() + index * 0.001, "alarm") for index in range(4)]
+    arrivals.sort()
+    return arrivals
+
+
+def simulate(arrivals, service, duration, scheduler=None):
+    """ Return { traffic class: [ waiting times ] } of the commands sent within the duration """
+
+    clock = [0.0]
+    fifo = deque()
+    if scheduler is not None:
+        scheduler = scheduler(clock)
+    waits = {}
+    index = 0
+    while clock[0] < duration:
+        while index < len(arrivals) and arrivals[index][0] <= clock[0]:
+            arrival, name = arrivals[index]
+            if scheduler is None:
+                fifo.append((arrival, name))
+            else:
+                scheduler.put((arrival, name), name)
+            index += 1
+        if scheduler is None:
+            entry = fifo.popleft() if fifo else None
+        else:
+            entry = scheduler.get(block=False) if scheduler.qsize() else None
+        if entry is None:
+            if index >= len(arrivals):
+                break
+            clock[0] = arrivals[index][0]
+            continue
+        arrival, name = entry
+        waits.setdefault(name, []).append(clock[0] - arrival)
+        clock[0] += service
+    return waits
+
+
+def quantile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def report(title, waits, settings, classes):
+    print(title)
+    print("  %-12s %8s %10s %10s %10s %8s %7s" % ("class", "sent", "p50 ms", "p99 ms", "max ms", "in SLO", "share"))
+    total = sum(len(values) for values in waits.values())
+    attainment = {}
+    for name in classes:
+        values = sorted(waits.get(name, []))
+        slo = settings[name]["SLO"]
+        attainment[name] = sum(1 for value in values if value <= slo) / len(values) if values else 1.0
+        print("  %-12s %8s %10.1f %10.1f %10.1f %7.1f%% %6.1f%%" % (
+            name, len(values), quantile(values, 0.5) * 1000, quantile(values, 0.99) * 1000,
+            (values[-1] if values else 0.0) * 1000, attainment[name] * 100, len(values) / total * 100 if total else 0))
+    return attainment
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Traffic class lanes against FIFO under a mixed load")
+    parser.add_argument("--duration", type=int, default=600, help="simulated seconds")
+    parser.add_argument("--service", type=float, default=25.0, help="ms to send one command")
+    parser.add_argument("--load", type=float, default=1.0, help="factor applied to the bulk and maintenance load")
+    parser.add_argument("--scene", type=int, default=20, help="lights switched by a scene")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(PLUGIN_HOME))
+    from Classes.TrafficScheduler import (TRAFFIC_CLASS_SETTINGS, TRAFFIC_CLASSES,
+                                          TrafficScheduler)
+
+    random.seed(args.seed)
+    arrivals = build_arrivals(args)
+    offered = len(arrivals) / args.duration
+    print("Duration: %ss Capacity: %.0f cmd/s Offered: %.1f cmd/s ( %.0f%% )" % (
+        args.duration, 1000 / args.service, offered, offered * args.service / 10))
+
+    service = args.service / 1000
+    report("FIFO writer queue", simulate(arrivals, service, args.duration), TRAFFIC_CLASS_SETTINGS, TRAFFIC_CLASSES)
+    waits = simulate(arrivals, service, args.duration, lambda clock: TrafficScheduler(clock=lambda: clock[0]))
+    attainment = report("Traffic class lanes", waits, TRAFFIC_CLASS_SETTINGS, TRAFFIC_CLASSES)
+
+    # Interactive and alarm commands within their SLO, and bulk traffic still served
+    if attainment["alarm"] < 0.99 or attainment["interactive"] < 0.99 or not waits.get("bulk"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: version-check-simulator.py
+#
+#    Description: Run the VersionChecker against a local DNS TXT stub and a local HTTP stub, healthy and broken uplinks
+#
+#    The HTTP stub replaces the Internet probe, the DNS stub ( TCP, as the plugin resolves the TXT records over TCP )
+#    serves the plugin and firmware records. Both can answer, hang or refuse. For each scenario the plugin side is
+#    simulated by a heartbeat calling poll(), and the time spent in poll() is measured: it must stay below 10 ms ( a
+#    thread switch ), whatever the state of the uplink, where the former check could block for seconds.
+#    The scenarios check:
+#    - healthy uplink: versions are available and persisted, the first answer waits for the firmware record,
+#    - hanging HTTP / hanging DNS / refused DNS: the checks are retried with a growing backoff,
+#    - restart with a broken uplink: the persisted answer is served at once, without any network access.
+#
+#    Requires dnspython.
+#
+#    Examples:
+#       python3 Tools/version-check-simulator.py
+#
+
+import argparse
+import functools
+import http.server
+import socketserver
+import struct
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PLUGIN_HOME = Path(__file__).resolve().parent.parent
+
+PLUGIN_RECORD = "stable7=7.1.5;beta7=7.1.6"
+FIRMWARE_RECORD = "firmMajor=0005;firmMinor=0322"
+
+
+class Log:
+    def __init__(self):
+        self.messages = []
+
+    def logging(self, module, logType, message, *args):
+        self.messages.append((logType, message))
+
+
+class PluginConf:
+    def __init__(self, plugin_data):
+        self.pluginConf = {"pluginData": plugin_data}
+
+
+class Stub:
+    """ Behaviour shared by the stubs: "answer", "hang" or "refuse" """
+
+    mode = "answer"
+    hang = 5.0
+    requests = 0
+
+
+class HttpStub(http.server.BaseHTTPRequestHandler):
+    stub = Stub()
+
+    def do_GET(self):
+        self.stub.requests += 1
+        if self.stub.mode == "hang":
+            time.sleep(self.stub.hang)
+        if self.stub.mode == "refuse":
+            self.send_response(503)
+        else:
+            self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class DnsStub(socketserver.BaseRequestHandler):
+    stub = Stub()
+    records = {}
+
+    def handle(self):
+        import dns.message
+        import dns.rdataclass
+        import dns.rdatatype
+        import dns.rrset
+
+        self.stub.requests += 1
+        if self.stub.mode == "hang":
+            time.sleep(self.stub.hang)
+            return
+        if self.stub.mode == "refuse":
+            return
+        length = struct.unpack("!H", self._read(2))[0]
+        query = dns.message.from_wire(self._read(length))
+        response = dns.message.make_response(query)
+        name = str(query.question[0].name).rstrip(".")
+        if name in self.records:
+            response.answer.append(dns.rrset.from_text(query.question[0].name, 60, dns.rdataclass.IN, dns.rdatatype.TXT, '"%s"' % self.records[name]))
+        wire = response.to_wire()
+        self.request.sendall(struct.pack("!H", len(wire)) + wire)
+
+    def _read(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("closed")
+            data += chunk
+        return data
+
+
+class ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_server(server):
+    threading.Thread(name="stub-%s" % server.server_address[1], target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+
+def heartbeats(checker, duration, period=0.05):
+    """ Plugin side: poll() at each heartbeat, return ( first versions, max poll time in s ) """
+
+    versions = None
+    worst = 0.0
+    end = time.time() + duration
+    while time.time() < end:
+        start = time.perf_counter()
+        answer = checker.poll("native", "stable7", "05")
+        worst = max(worst, time.perf_counter() - start)
+        if answer is not None and versions is None:
+            versions = answer
+        time.sleep(period)
+    return versions, worst
+
+
+def intervals(times):
+    return [round(later - earlier, 2) for earlier, later in zip(times, times[1:])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VersionChecker against local DNS and HTTP stubs")
+    parser.add_argument("--backoff", type=float, default=0.2, help="first retry delay, in seconds")
+    parser.add_argument("--duration", type=float, default=4.0, help="seconds per broken uplink scenario")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(PLUGIN_HOME))
+    from Classes.VersionChecker import VERSION_CHECK_FILENAME, VersionChecker
+    from Modules.checkingUpdate import (PLUGIN_TXT_RECORD, ZIGATE_DNS_RECORDS,
+                                        is_internet_available,
+                                        resolve_dns_txt_record)
+
+    DnsStub.records = {PLUGIN_TXT_RECORD: PLUGIN_RECORD, ZIGATE_DNS_RECORDS["05"]: FIRMWARE_RECORD}
+    http_port = start_server(ThreadingServer(("127.0.0.1", 0), HttpStub))
+    dns_port = start_server(ThreadingServer(("127.0.0.1", 0), DnsStub))
+
+    check_times = []
+
+    def probe():
+        check_times.append(time.time())
+        return is_internet_available(url="http://127.0.0.1:%s/" % http_port, timeout=0.5)
+
+    resolver = functools.partial(resolve_dns_txt_record, timeout=0.5, nameservers=["127.0.0.1"], port=dns_port)
+    plugin_data = tempfile.mkdtemp(prefix="z4d-version-check-")
+    failed = []
+
+    def new_checker():
+        checker = VersionChecker(PluginConf(plugin_data), 1, log=Log(), resolver=resolver, probe=probe,
+                                 backoff_min=args.backoff, backoff_max=args.backoff * 8)
+        checker.start()
+        return checker
+
+    def verdict(name, condition, detail):
+        print("  %-4s %-48s %s" % ("ok" if condition else "FAIL", name, detail))
+        if not condition:
+            failed.append(name)
+
+    # Healthy uplink
+    print("Healthy uplink")
+    checker = new_checker()
+    time.sleep(0.5)  # The plugin record is resolved before the first heartbeat asks for the firmware one
+    versions, worst = heartbeats(checker, 1.5)
+    checker.stop()
+    persisted = Path(plugin_data) / (VERSION_CHECK_FILENAME % 1)
+    verdict("versions available", versions == ("7.1.5", "0005", "0322"), versions)
+    verdict("answer persisted", persisted.is_file(), persisted.name)
+    verdict("poll() never waits", worst < 0.01, "max %.1f us" % (worst * 1e6))
+    errors = [message for logType, message in checker.log.messages if logType == "Error"]
+    verdict("first start: no partial answer", not errors, errors[:1])
+
+    # Broken uplinks, from an empty cache
+    for name, http_mode, dns_mode in (("Hanging HTTP", "hang", "answer"), ("Hanging DNS", "answer", "hang"), ("Refused DNS", "answer", "refuse")):
+        print(name)
+        persisted.unlink(missing_ok=True)
+        HttpStub.stub.mode, DnsStub.stub.mode = http_mode, dns_mode
+        del check_times[:]
+        checker = new_checker()
+        start = time.time()
+        internet = checker.internet_available()
+        versions, worst = heartbeats(checker, args.duration)
+        checker.stop()
+        verdict("startup does not wait", time.time() - start < args.duration + 0.5 and internet is None, "internet: %s" % internet)
+        verdict("no versions", versions is None, versions)
+        verdict("poll() never waits", worst < 0.01, "max %.1f us" % (worst * 1e6))
+        gaps = intervals(check_times)
+        verdict("retries with a growing backoff", len(gaps) >= 2 and all(later > earlier for earlier, later in zip(gaps, gaps[1:])), "intervals %s s" % gaps)
+
+    # Restart, uplink down: the last known answer is served from the cache
+    print("Restart with a broken uplink")
+    HttpStub.stub.mode, DnsStub.stub.mode = "answer", "answer"
+    checker = new_checker()
+    heartbeats(checker, 1.0)
+    checker.stop()
+    HttpStub.stub.mode, DnsStub.stub.mode = "hang", "hang"
+    requests = HttpStub.stub.requests + DnsStub.stub.requests
+    checker = new_checker()
+    start = time.perf_counter()
+    versions = checker.poll("native", "stable7", "05")
+    elapsed = time.perf_counter() - start
+    internet = checker.internet_available(wait=3)
+    time.sleep(0.5)
+    checker.stop()
+    verdict("last known versions served at once", versions == ("7.1.5", "0005", "0322"), "%s in %.1f us" % (versions, elapsed * 1e6))
+    verdict("last known Internet access", internet is True, internet)
+    verdict("no network access before the refresh", HttpStub.stub.requests + DnsStub.stub.requests == requests, "")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
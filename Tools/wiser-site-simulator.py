@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# coding: utf-8 -*-
+#
+# Author: zaraki673 & pipiche38
+#
+#
+#    Module: wiser-site-simulator.py
+#
+#    Description: Simulate a multi-room Schneider Wiser installation, to validate the Wiser rooms engine
+#
+#    Each room has a Wiser Thermostat, and a mix of iTRVs ( Pi Heating Demand ), FIP actuators ( instant power ) and
+#    On/Off relays. During --heartbeats heartbeats, some actuators report a new state, and the heating demand of each
+#    thermostat is checked against the former algorithm ( scan of all devices for each thermostat ). The widget
+#    updates and the time spent per heartbeat are reported for both.
+#
+#    The simulator also checks that a thermostat override is reverted on time without any frame from the thermostat,
+#    and counts the frames sent to answer a Read Attributes request of a thermostat.
+#
+#    Examples:
+#       python3 Tools/wiser-site-simulator.py
+#       python3 Tools/wiser-site-simulator.py --rooms 30 --actuators 6 --heartbeats 500
+#
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+PLUGIN_HOME = Path(__file__).resolve().parent.parent
+STANDIN_HOME = Path(__file__).resolve().parent / "DomoticzStandIn"
+
+
+class Log:
+    def logging(self, *args, **kwargs):
+        pass
+
+
+class Plugin:
+    def __init__(self, wiser_zones):
+        self.log = Log()
+        self.ListOfDevices = {}
+        self.wiserZones = wiser_zones
+        self.zigbee_communication = "zigpy"
+        self.FirmwareVersion = None
+
+
+def build_site(plugin, nb_rooms, nb_actuators):
+    """ Return the list of the actuators: ( nwkid, ep, cluster, attribute ) """
+
+    actuators = []
+    nwkid = 1
+    for room in range(1, nb_rooms + 1):
+        plugin.ListOfDevices["%04x" % nwkid] = {
+            "Model": "Wiser2-Thermostat", "Param": {"WiserRoomNumber": room},
+            "Ep": {"01": {"0201": {"0000": 19.5, "0012": 2000}, "0402": {"0000": 19.5}}}}
+        nwkid += 1
+        for index in range(nb_actuators):
+            kind = index % 3
+            if kind == 0:
+                ep = {"0201": {"0008": 0}}
+                actuators.append(("%04x" % nwkid, "01", "0201", "0008"))
+                model = "iTRV"
+            elif kind == 1:
+                ep = {"0201": {}, "0702": {"0400": 0}}
+                actuators.append(("%04x" % nwkid, "01", "0702", "0400"))
+                model = "EH-ZB-HACT"
+            else:
+                ep = {"0006": {"0000": "00"}}
+                actuators.append(("%04x" % nwkid, "01", "0006", "0000"))
+                model = "EH-ZB-SPD"
+            plugin.ListOfDevices["%04x" % nwkid] = {"Model": model, "Param": {"WiserRoomNumber": room}, "Ep": {"01": ep}}
+            nwkid += 1
+
+    # Devices of the installation without room, as the other devices of the network
+    for index in range(nb_rooms * nb_actuators):
+        plugin.ListOfDevices["%04x" % nwkid] = {"Model": "Light", "Param": {}, "Ep": {"01": {"0006": {"0000": "01"}}}}
+        nwkid += 1
+    return actuators
+
+
+def legacy_heating_demand(plugin):
+    """ Former algorithm: for each thermostat, scan of all devices """
+
+    demands = {}
+    for NwkId in list(plugin.ListOfDevices):
+        device = plugin.ListOfDevices[NwkId]
+        if device.get("Model") != "Wiser2-Thermostat" or "WiserRoomNumber" not in device.get("Param", {}):
+            continue
+        room = int(device["Param"]["WiserRoomNumber"])
+        demand = count = 0
+        for x in list(plugin.ListOfDevices):
+            if x == NwkId or int(plugin.ListOfDevices[x].get("Param", {}).get("WiserRoomNumber", -1)) != room:
+                continue
+            for ep in plugin.ListOfDevices[x]["Ep"].values():
+                if "0201" in ep:
+                    if "0008" in ep["0201"]:
+                        demand += int(ep["0201"]["0008"])
+                        count += 1
+                    elif "0702" in ep and "0400" in ep["0702"]:
+                        count += 1
+                        demand += 100 if int(ep["0702"]["0400"]) > 0 else 0
+                elif "0006" in ep and "0000" in ep["0006"]:
+                    count += 1
+                    demand += 100 if int(ep["0006"]["0000"]) else 0
+        if count:
+            demands[NwkId] = int(round(demand / count))
+    return demands
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulation of a multi-room Wiser installation")
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--actuators", type=int, default=5, help="number of actuators per room")
+    parser.add_argument("--heartbeats", type=int, default=300)
+    parser.add_argument("--reports", type=int, default=5, help="number of actuator reports per heartbeat")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(STANDIN_HOME))
+    sys.path.insert(0, str(PLUGIN_HOME))
+    import Modules.schneider_wiser as wiser
+    from Classes.WiserZones import WiserZones
+
+    widget_updates = []
+    frames = []
+    wiser.MajDomoDevice = lambda self, Devices, NwkId, Ep, cluster, value, Attribute_="": widget_updates.append((NwkId, value))
+    wiser.raw_APS_request = lambda self, NwkId, Ep, cluster, profile, payload, **kwargs: frames.append(payload)
+    wiser.is_ack_tobe_disabled = lambda self, NwkId: True
+    wiser.schneider_setpoint_thermostat = lambda self, NwkId, setpoint: frames.append(("setpoint", NwkId, setpoint))
+    wiser.schneider_update_ThermostatDevice = lambda self, Devices, NwkId, Ep, cluster, setpoint: None
+
+    random.seed(args.seed)
+    plugin = Plugin(WiserZones())
+    actuators = build_site(plugin, args.rooms, args.actuators)
+
+    errors = 0
+    legacy_time = engine_time = 0.0
+    legacy_updates = 0
+    for _ in range(args.heartbeats):
+        for nwkid, ep, cluster, attribute in random.sample(actuators, min(args.reports, len(actuators))):
+            if cluster == "0201":
+                value = random.choice((0, 25, 50, 75, 100))
+                wiser.receiving_heatingdemand_attribute(plugin, None, nwkid, ep, value, cluster, attribute)
+                continue
+            value = random.choice((0, 1500)) if cluster == "0702" else random.choice(("00", "01"))
+            plugin.ListOfDevices[nwkid]["Ep"][ep][cluster][attribute] = value
+
+        start = time.perf_counter()
+        expected = legacy_heating_demand(plugin)
+        legacy_time += time.perf_counter() - start
+        legacy_updates += len(expected)  # The former algorithm updated the widget of each thermostat every heartbeat
+
+        start = time.perf_counter()
+        wiser.wiser_thermostat_monitoring_heating_demand(plugin, None)
+        engine_time += time.perf_counter() - start
+
+        for nwkid, demand in expected.items():
+            if plugin.ListOfDevices[nwkid]["Ep"]["01"]["0201"]["0008"] != demand:
+                errors += 1
+
+    print("Rooms: %s Actuators per room: %s Devices: %s Heartbeats: %s" % (
+        args.rooms, args.actuators, len(plugin.ListOfDevices), args.heartbeats))
+    print("Heating demand  legacy: %8.1f us per heartbeat, %6s widget updates" % (legacy_time / args.heartbeats * 1e6, legacy_updates))
+    print("Heating demand  engine: %8.1f us per heartbeat, %6s widget updates" % (engine_time / args.heartbeats * 1e6, len(widget_updates)))
+    print("Heating demand mismatches: %s" % errors)
+
+    # Override reverted by the timer, without frame from the thermostat
+    thermostat = next(nwkid for nwkid, device in plugin.ListOfDevices.items() if device["Model"] == "Wiser2-Thermostat")
+    plugin.ListOfDevices[thermostat]["Schneider"] = {}
+    wiser.override_setpoint(plugin, thermostat, "01", 2300, 0)
+    frames.clear()
+    wiser.wiser_thermostat_monitoring_heating_demand(plugin, None)
+    reverted = ("setpoint", thermostat, 2000) in frames and "ThermostatOverride" not in plugin.ListOfDevices[thermostat]["Schneider"]
+    print("Override reverted on time: %s" % reverted)
+
+    # Read Attributes request of a thermostat
+    frames.clear()
+    attributes = ("0000", "0012", "0015", "0016", "001c", "001b", "0008", "e010")
+    wiser.schneider_thermostat_answer_attribute_request(plugin, thermostat, "01", "0201", "01", list(attributes))
+    print("Read Attributes request of %s attributes answered with %s frame(s)" % (len(attributes), len(frames)))
+
+    if errors or not reverted or len(frames) != 1:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -67,19 +67,17 @@ def Decode8400(self, Devices, MsgData, MsgLQI):
         self.iaszonemgt.IAS_zone_enroll_request(nwkid, ep, zonetype, sqn)
     
 def Decode8401(self, Devices, MsgData, MsgLQI):
+    # Zone Status Change Notification. This is the alarm path ( contact, motion, smoke, water ... ), so the widgets are
+    # updated first, and the book keeping ( last seen, sqn, lqi, IAS data structure ) is done afterward.
+    t_start = time.perf_counter()
     self.log.logging('Input', 'Debug', 'Decode8401 - Reception Zone status change notification: ' + MsgData)
 
     zone_status_fields =_extract_zone_status_info(self, MsgData)
-    MsgSQN, MsgEp, MsgClusterId, MsgSrcAddrMode, MsgSrcAddr, MsgZoneStatus, MsgExtStatus, MsgZoneID, MsgDelay = zone_status_fields
     if zone_status_fields is None:
-        error_message = f'Decode8401 - Reception Zone status change notification but incorrect Address Mode: {MsgSrcAddrMode} with MsgData {MsgData}'
+        error_message = f'Decode8401 - Reception Zone status change notification but incorrect Address Mode: {MsgData[8:10]} with MsgData {MsgData}'
         self.log.logging('Input', 'Error', error_message)
         return
-
-    ias_dic = self.ListOfDevices[MsgSrcAddr].setdefault('Ep', {}).setdefault(MsgEp, {}).setdefault(MsgClusterId, {})
-    ias_dic.setdefault('0002', {})
-
-    lastSeenUpdate(self, Devices, NwkId=MsgSrcAddr)
+    MsgSQN, MsgEp, MsgClusterId, MsgSrcAddrMode, MsgSrcAddr, MsgZoneStatus, MsgExtStatus, MsgZoneID, MsgDelay = zone_status_fields
 
     if MsgSrcAddr not in self.ListOfDevices:
         self.log.logging('Input', 'Error', 'Decode8401 - unknown IAS device %s from plugin' % MsgSrcAddr)
@@ -87,43 +85,63 @@ def Decode8401(self, Devices, MsgData, MsgLQI):
             handle_unknow_device(self, MsgSrcAddr)
         return
 
-    if 'Health' in self.ListOfDevices[MsgSrcAddr] and self.ListOfDevices[MsgSrcAddr]['Health'] not in ('Disabled',):
-        self.ListOfDevices[MsgSrcAddr]['Health'] = 'Live'
-
-    timeStamped(self, MsgSrcAddr, 33793)
-    updSQN(self, MsgSrcAddr, MsgSQN)
-    updLQI(self, MsgSrcAddr, MsgLQI)
+    if self.iaszonemgt and not self.iaszonemgt.zone_status_received(MsgSrcAddr, MsgEp, MsgSQN, MsgZoneStatus):
+        # Retransmission of the previous notification, the widgets are already up to date
+        lastSeenUpdate(self, Devices, NwkId=MsgSrcAddr)
+        return
 
     Model = self.ListOfDevices[MsgSrcAddr].get('Model', '')
     self.log.logging('Input', 'Debug', 'Decode8401 - MsgSQN: %s MsgSrcAddr: %s MsgEp:%s MsgClusterId: %s MsgZoneStatus: %s MsgExtStatus: %s MsgZoneID: %s MsgDelay: %s' % (MsgSQN, MsgSrcAddr, MsgEp, MsgClusterId, MsgZoneStatus, MsgExtStatus, MsgZoneID, MsgDelay), MsgSrcAddr)
 
     if Model == 'PST03A-v2.2.5':
         Decode8401_PST03Av225(self, Devices, MsgSrcAddr, MsgEp, Model, MsgZoneStatus)
+        _record_alarm_latency(self, t_start)
+        _zone_status_book_keeping(self, Devices, MsgSrcAddr, MsgSQN, MsgLQI)
         return
 
     status_bits = [int(MsgZoneStatus, 16) >> i & 1 for i in range(10)]
     alarm1, alarm2, tamper, battery, suprrprt, restrprt, trouble, acmain, test, battdef = status_bits
 
+    full_status = _zone_status_to_widgets(self, Devices, MsgSrcAddr, MsgEp, MsgClusterId, Model, MsgZoneStatus, alarm1, alarm2, tamper)
+    _record_alarm_latency(self, t_start)
+    _zone_status_book_keeping(self, Devices, MsgSrcAddr, MsgSQN, MsgLQI)
+
+    ias_dic = self.ListOfDevices[MsgSrcAddr].setdefault('Ep', {}).setdefault(MsgEp, {}).setdefault(MsgClusterId, {})
+    ias_dic.setdefault('0002', {})
     _ensure_ep_cluster_structure(self, MsgSrcAddr, MsgEp, MsgClusterId)
 
     self.ListOfDevices[MsgSrcAddr]['Ep'][MsgEp]['0500']['0002'] = 'alarm1: %s, alarm2: %s, tamper: %s, battery: %s, Support Reporting: %s, restore Reporting: %s, trouble: %s, acmain: %s, test: %s, battdef: %s' % (alarm1, alarm2, tamper, battery, suprrprt, restrprt, trouble, acmain, test, battdef)
     self.log.logging('Input', 'Debug', 'IAS Zone for device:%s  - %s' % (MsgSrcAddr, self.ListOfDevices[MsgSrcAddr]['Ep'][MsgEp]['0500']['0002']), MsgSrcAddr)
-    self.log.logging('Input', 'Debug', 'Decode8401 MsgZoneStatus: %s ' % MsgZoneStatus[2:4], MsgSrcAddr)
+    if not full_status:
+        return
 
-    heiman_door_bell_button = get_deviceconf_parameter_value(self, Model, "HeimanDoorBellButton", return_default=False)
-    self.log.logging('Input', 'Debug', 'HeimanDoorBellButton = %s' % heiman_door_bell_button)
+    if battery:
+        self.log.logging('Input', 'Log', 'Decode8401 Low Battery or defective battery: Device: %s %s/%s' % (MsgSrcAddr, battdef, battery), MsgSrcAddr)
+        self.ListOfDevices[MsgSrcAddr]['IASBattery'] = 5
+
+    else:
+        self.ListOfDevices[MsgSrcAddr]['IASBattery'] = 100
 
+    if 'IAS' in self.ListOfDevices[MsgSrcAddr] and 'ZoneStatus' in self.ListOfDevices[MsgSrcAddr]['IAS']:
+        if not isinstance(self.ListOfDevices[MsgSrcAddr]['IAS']['ZoneStatus'], dict):
+            self.ListOfDevices[MsgSrcAddr]['IAS']['ZoneStatus'] = {}
+
+        _update_ias_zone_status(self, MsgSrcAddr, MsgEp, MsgZoneStatus)
+
+
+def _zone_status_to_widgets(self, Devices, MsgSrcAddr, MsgEp, MsgClusterId, Model, MsgZoneStatus, alarm1, alarm2, tamper):
+    """ Update the alarm and tamper widgets, return False if the rest of the zone status is not used """
+
+    heiman_door_bell_button = get_deviceconf_parameter_value(self, Model, "HeimanDoorBellButton", return_default=False)
     if heiman_door_bell_button:
         self.log.logging('Input', 'Debug',f"Decode8401 HeimanDoorBellButton: {MsgSrcAddr} {MsgZoneStatus}", MsgSrcAddr)
         if tamper:
             MajDomoDevice(self, Devices, MsgSrcAddr, MsgEp, '0006', '01')
-        return
+        return False
 
     motion_via_IAS_alarm = get_device_config_param(self, MsgSrcAddr, 'MotionViaIASAlarm1')
-    self.log.logging('Input', 'Debug', 'MotionViaIASAlarm1 = %s' % motion_via_IAS_alarm)
-
     ias_alarm1_2_merged = get_deviceconf_parameter_value(self, Model, 'IASAlarmMerge', return_default=None)
-    self.log.logging('Input', 'Debug', 'IASAlarmMerge = %s' % ias_alarm1_2_merged)
+    self.log.logging('Input', 'Debug', 'MotionViaIASAlarm1 = %s IASAlarmMerge = %s' % (motion_via_IAS_alarm, ias_alarm1_2_merged))
 
     if ias_alarm1_2_merged:
         self.log.logging('Input', 'Debug', 'IASAlarmMerge alarm1 %s alarm2 %s' % (alarm1, alarm2))
@@ -135,30 +153,29 @@ def Decode8401(self, Devices, MsgData, MsgLQI):
         self.log.logging('Input', 'Debug', 'Motion detected sending to MajDomo %s/%s %s' % (MsgSrcAddr, MsgEp, alarm1 or alarm2))
         MajDomoDevice(self, Devices, MsgSrcAddr, MsgEp, '0406', '%02d' % (alarm1 or alarm2))
 
-    elif self.ListOfDevices[MsgSrcAddr]['Model'] in ('lumi.sensor_magnet', 'lumi.sensor_magnet.aq2', 'lumi.sensor_magnet.acn001', 'lumi.magnet.acn001'):
+    elif Model in ('lumi.sensor_magnet', 'lumi.sensor_magnet.aq2', 'lumi.sensor_magnet.acn001', 'lumi.magnet.acn001'):
         MajDomoDevice(self, Devices, MsgSrcAddr, MsgEp, '0006', '%02d' % alarm1)
 
     elif Model not in ('RC-EF-3.0', 'RC-EM'):
         MajDomoDevice(self, Devices, MsgSrcAddr, MsgEp, MsgClusterId, '%02d' % (alarm1 or alarm2))
 
-    if tamper:
-        MajDomoDevice(self, Devices, MsgSrcAddr, MsgEp, '0009', '01')
-
-    else:
-        MajDomoDevice(self, Devices, MsgSrcAddr, MsgEp, '0009', '00')
+    MajDomoDevice(self, Devices, MsgSrcAddr, MsgEp, '0009', '01' if tamper else '00')
+    return True
 
-    if battery:
-        self.log.logging('Input', 'Log', 'Decode8401 Low Battery or defective battery: Device: %s %s/%s' % (MsgSrcAddr, battdef, battery), MsgSrcAddr)
-        self.ListOfDevices[MsgSrcAddr]['IASBattery'] = 5
 
-    else:
-        self.ListOfDevices[MsgSrcAddr]['IASBattery'] = 100
+def _zone_status_book_keeping(self, Devices, MsgSrcAddr, MsgSQN, MsgLQI):
+    lastSeenUpdate(self, Devices, NwkId=MsgSrcAddr)
+    if 'Health' in self.ListOfDevices[MsgSrcAddr] and self.ListOfDevices[MsgSrcAddr]['Health'] not in ('Disabled',):
+        self.ListOfDevices[MsgSrcAddr]['Health'] = 'Live'
+    timeStamped(self, MsgSrcAddr, 33793)
+    updSQN(self, MsgSrcAddr, MsgSQN)
+    updLQI(self, MsgSrcAddr, MsgLQI)
 
-    if 'IAS' in self.ListOfDevices[MsgSrcAddr] and 'ZoneStatus' in self.ListOfDevices[MsgSrcAddr]['IAS']:
-        if not isinstance(self.ListOfDevices[MsgSrcAddr]['IAS']['ZoneStatus'], dict):
-            self.ListOfDevices[MsgSrcAddr]['IAS']['ZoneStatus'] = {}
 
-        _update_ias_zone_status(self, MsgSrcAddr, MsgEp, MsgZoneStatus)
+def _record_alarm_latency(self, t_start):
+    # From the Zone Status Change Notification decoded, to the alarm widgets updated
+    if self.statistics:
+        self.statistics.record_latency("ias_alarm", time.perf_counter() - t_start)
 
 
 def _extract_zone_status_info(self, msg_data):
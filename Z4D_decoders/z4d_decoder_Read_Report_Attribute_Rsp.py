@@ -118,5 +118,9 @@ def read_report_attributes( self, Devices, MsgType, MsgSQN, MsgSrcAddr, MsgSrcEp
     updSQN(self, MsgSrcAddr, str(MsgSQN))
     lastSeenUpdate(self, Devices, NwkId=MsgSrcAddr)
 
+    if MsgType == "8102" and MsgAttStatus == "00" and self.adaptivePolling:
+        # Learn the reporting cadence of this attribute
+        self.adaptivePolling.report_received(MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID)
+
     ReadCluster( self, Devices, MsgType, MsgSQN, MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, MsgAttStatus, MsgAttType, MsgAttSize, MsgClusterData, Source=MsgType, )
     return
@@ -127,7 +127,8 @@ def Decode8043(self, Devices, MsgData, MsgLQI):
                     self.log.logging('Input', 'Status', '[%s]       NEW OBJECT: %s Cluster Out %s: %s' % ('-', MsgDataShAddr, i, MsgDataCluster))
             MsgDataCluster = ''
             i += 1
-    if request_next_Ep(self, MsgDataShAddr) and (not inDB_status):
-        self.ListOfDevices[MsgDataShAddr]['Status'] = '8043'
-        self.ListOfDevices[MsgDataShAddr]['Heartbeat'] = '0'
+    with self.pairingEngine.lock:
+        if request_next_Ep(self, MsgDataShAddr) and (not inDB_status):
+            self.ListOfDevices[MsgDataShAddr]['Status'] = '8043'
+            self.ListOfDevices[MsgDataShAddr]['Heartbeat'] = '0'
     self.log.logging('Pairing', 'Debug', 'Decode8043 - Processed ' + MsgDataShAddr + ' end results is: ' + str(self.ListOfDevices[MsgDataShAddr]))
\ No newline at end of file
@@ -33,6 +33,9 @@ def Decode8110_raw(self, Devices, MsgSQN, MsgSrcAddr, MsgSrcEp, MsgClusterId, Ms
     updSQN(self, MsgSrcAddr, MsgSQN)
     updLQI(self, MsgSrcAddr, MsgLQI)
     lastSeenUpdate(self, Devices, NwkId=MsgSrcAddr)
+    if MsgClusterId == '0500' and MsgAttrID in (None, '0010') and self.iaszonemgt:
+        # IAS CIE Address written, the IAS zone enrollment moves forward
+        self.iaszonemgt.IAS_CIE_write_response(MsgSrcAddr, MsgSrcEp, MsgAttrStatus)
     if (self.zigbee_communication != 'native' or (self.FirmwareVersion and int(self.FirmwareVersion, 16) >= int('31d', 16))) and MsgAttrID:
         set_status_datastruct(self, 'WriteAttributes', MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, MsgAttrStatus)
         set_request_phase_datastruct(self, 'WriteAttributes', MsgSrcAddr, MsgSrcEp, MsgClusterId, MsgAttrID, 'fullfilled')
@@ -49,5 +52,3 @@ def Decode8110_raw(self, Devices, MsgSQN, MsgSrcAddr, MsgSrcEp, MsgClusterId, Ms
         set_request_phase_datastruct(self, 'WriteAttributes', MsgSrcAddr, MsgSrcEp, MsgClusterId, matchAttributeId, 'fullfilled')
         if MsgAttrStatus != '00':
             self.log.logging('Input', 'Debug', 'Decode8110 - Write Attribute Response response - ClusterID: %s/%s, MsgSrcAddr: %s, MsgSrcEp:%s , Status: %s' % (MsgClusterId, matchAttributeId, MsgSrcAddr, MsgSrcEp, MsgAttrStatus), MsgSrcAddr)
-    if MsgClusterId == '0500':
-        self.iaszonemgt.IAS_CIE_write_response(MsgSrcAddr, MsgSrcEp, MsgAttrStatus)
@@ -6,8 +6,6 @@
 
 
 import struct
-from distutils.command.build import build
-from os import stat
 
 from Modules.tools import (is_direction_to_client, is_direction_to_server,
                            retreive_cmd_payload_from_8002)
@@ -387,7 +387,8 @@ def buildframe_management_lqi_response(self, SrcNwkId, SrcEndPoint, ClusterId, P
     status = Payload[2:4]
     
     if status != "00":
-        buildPayload = sqn + status
+        # Empty table, so the source address can still be appended
+        buildPayload = sqn + status + "000000"
     else:
         NeighborTableEntries = Payload[4:6]
         StartIndex = Payload[6:8]
@@ -432,8 +433,9 @@ def buildframe_management_lqi_response(self, SrcNwkId, SrcEndPoint, ClusterId, P
             self.log.logging("zdpDecoder", "Debug", "buildframe_management_lqi_response relationship: %s" % relationship)
             self.log.logging("zdpDecoder", "Debug", "buildframe_management_lqi_response permitjoining: %s" % permitjoining)
             self.log.logging("zdpDecoder", "Debug", "buildframe_management_lqi_response _bitmap: %s %s" % (_bitmap, bin(_bitmap)))
-        
-        
+
+    # Like ZiGate firmware 3.1a and above, provide the source address so several requests can be in flight
+    buildPayload += SrcNwkId
     return encapsulate_plugin_frame("804E", buildPayload, frame[len(frame) - 4 : len(frame) - 2])
 
 def buildframe_leave_response(self, SrcNwkId, SrcEndPoint, ClusterId, Payload, frame):
@@ -109,41 +109,47 @@ import sys
 import threading
 import time
 
+# Start of the startup timeline, so the import of the plugin modules is accounted
+PLUGIN_LOAD_START = time.perf_counter()
+
 import z4d_certified_devices
 
+from Classes.AdaptivePolling import AdaptivePolling
 from Classes.AdminWidgets import AdminWidgets
-from Classes.ConfigureReporting import ConfigureReporting
+from Classes.DeviceTemplates import DeviceTemplates
 from Classes.DomoticzDB import (DomoticzDB_DeviceStatus, DomoticzDB_Hardware,
                                 DomoticzDB_Preferences)
-from Classes.GroupMgtv2.GroupManagement import GroupsManagement
 from Classes.IAS import IAS_Zone_Management
+from Classes.LivenessTracker import LivenessTracker
 from Classes.LoggingManagement import LoggingManagement
-from Classes.NetworkEnergy import NetworkEnergy
-from Classes.NetworkMap import NetworkMap
-from Classes.OTA import OTAManagement
 from Classes.PluginConf import PluginConf
+from Classes.PairingEngine import PairingEngine
+from Classes.StartupTimeline import StartupTimeline
+from Classes.TrafficScheduler import traffic_class
 from Classes.TransportStats import TransportStatistics
-from Classes.WebServer.WebServer import WebServer
-from Classes.ZigpyTopology import ZigpyTopology
+from Classes.VersionChecker import VersionChecker
+from Classes.WiserZones import WiserZones
 from Modules.basicOutputs import (ZigatePermitToJoin, leaveRequest,
                                   setExtendedPANID, setTimeServer,
                                   start_Zigate, zigateBlueLed)
 from Modules.casaia import restart_plugin_reset_ModuleIRCode
-from Modules.checkingUpdate import (check_plugin_version_against_dns,
-                                    is_internet_available,
-                                    is_plugin_update_available,
+from Modules.checkingUpdate import (is_plugin_update_available,
                                     is_zigate_firmware_available)
-from Modules.command import domoticz_command
+from Modules.command import domoticz_command, invalidate_command_plans
 from Modules.database import (LoadDeviceList, WriteDeviceList,
                               checkDevices2LOD, checkListOfDevice2Devices,
+                              compile_device_templates,
                               import_local_device_conf)
-from Modules.domoticzAbstractLayer import (domo_read_Name,
+from Modules.domoticzAbstractLayer import (device_status_invalidate,
+                                           domo_read_Name,
                                            find_legacy_DeviceID_from_unit,
                                            how_many_legacy_slot_available,
                                            is_domoticz_extended,
                                            load_list_of_domoticz_widget)
+from Modules.domoTools import liveness_flush
 from Modules.heartbeat import processListOfDevices
 from Modules.input import zigbee_receive_message
+from Modules.pairingProcess import pairing_advance
 from Modules.paramDevice import initialize_device_settings
 from Modules.piZigate import switchPiZigate_mode
 from Modules.pluginHelpers import (check_firmware_level,
@@ -155,6 +161,7 @@ from Modules.pluginHelpers import (check_firmware_level,
 from Modules.profalux import profalux_fake_deviceModel
 from Modules.readZclClusters import load_zcl_cluster
 from Modules.restartPlugin import restartPluginViaDomoticzJsonApi
+from Modules.sceneBurst import scene_burst_cancel, scene_burst_flush_due
 from Modules.schneider_wiser import wiser_thermostat_monitoring_heating_demand
 from Modules.tools import (build_list_of_device_model,
                            chk_and_update_IEEE_NWKID, lookupForIEEE,
@@ -188,13 +195,14 @@ class BasePlugin:
     def __init__(self):
 
         self.internet_available = None
+        self.versionChecker = None
         self.ListOfDevices = (
             {}
         )  # {DevicesAddresse : { status : status_de_detection, data : {ep list ou autres en fonctions du status}}, DevicesAddresse : ...}
         self.DiscoveryDevices = {}  # Used to collect pairing information
         self.IEEE2NWK = {}
         self.ControllerData = {}
-        self.DeviceConf = {}  # Store DeviceConf.txt, all known devices configuration
+        self.DeviceConf = DeviceTemplates()  # Store DeviceConf.txt, all known devices configuration, with indexes
         self.ModelManufMapping = {}
         self.readZclClusters = {}
         self.ListOfDomoticzWidget = {}
@@ -213,8 +221,13 @@ class BasePlugin:
         self.pluginconf = None  # PlugConf object / all configuration parameters
         self.OTA = None
         self.statistics = None
+        self.adaptivePolling = None  # Learn reporting cadences to reduce polling
         self.iaszonemgt = None  # Object to manage IAS Zone
+        self.pairingEngine = PairingEngine()  # Track the interview of the devices being paired
+        self.livenessTracker = LivenessTracker()  # Last seen of the devices, pushed to Domoticz in batches
+        self.wiserZones = WiserZones()  # Rooms of the Schneider Wiser installation
         self.webserver = None
+        self.startWebUINeeded = False  # WebUI is started at the first heartbeat, after the Coordinator transport
         self.transport = None  # USB or Wifi
         self.log = None
         self.zigpy_backup = None
@@ -303,8 +316,12 @@ class BasePlugin:
         self.device_settings = {}
         initialize_device_settings(self)
 
+        self.startupTimeline = StartupTimeline(PLUGIN_LOAD_START)
+        self.startupTimeline.mark("Plugin modules imported")
+
     def onStart(self):
         Domoticz.Status( "Welcome to Zigbee for Domoticz (Z4D) plugin.")
+        self.startupTimeline.mark("Domoticz onStart")
         
         _current_python_version_major = sys.version_info.major
         _current_python_version_minor = sys.version_info.minor
@@ -390,8 +407,12 @@ class BasePlugin:
             self.zigbee_communication, self.VersionNewFashion, self.DomoticzMajor, self.DomoticzMinor, Parameters["HomeFolder"], self.HardwareID
         )
 
-        if self.internet_available is None:
-            self.internet_available = is_internet_available()
+        # Internet access and latest versions are checked in background, the last known answer is used at startup.
+        # Only at the very first start ( nothing known yet ), wait a little for the first probe.
+        if self.versionChecker is None:
+            self.versionChecker = VersionChecker(self.pluginconf, self.HardwareID, check_versions=self.pluginconf.pluginConf["internetAccess"])
+            self.versionChecker.start()
+        self.internet_available = self.versionChecker.internet_available(wait=3)
 
         if self.internet_available:
             if check_requirements( Parameters[ "HomeFolder"] ):
@@ -399,6 +420,8 @@ class BasePlugin:
                 self.onStop()
                 return
 
+        self.startupTimeline.mark("Configuration and requirements")
+
         # Create Domoticz Sub menu
         if "DomoticzCustomMenu" in self.pluginconf.pluginConf and self.pluginconf.pluginConf["DomoticzCustomMenu"] :
             install_Z4D_to_domoticz_custom_ui( )
@@ -419,6 +442,7 @@ class BasePlugin:
                 str(self.pluginParameters["PluginBranch"] + "-" + self.pluginParameters["PluginVersion"])
             )
             self.log.openLogFile()
+        self.versionChecker.log = self.log
 
         # We can use from now the self.log.logging()
         self.log.logging( "Plugin", "Status", "Z4D starting with %s-%s" % (
@@ -484,6 +508,7 @@ class BasePlugin:
             self.DomoticzMinor,
             )
         self.WebUsername, self.WebPassword = self.domoticzdb_Preferences.retreiveWebUserNamePassword()
+        self.startupTimeline.mark("Domoticz database access")
 
         self.adminWidgets = AdminWidgets( self.log , self.pluginconf, self.pluginParameters, self.ListOfDomoticzWidget, Devices, self.ListOfDevices, self.HardwareID)
         self.adminWidgets.updateStatusWidget(Devices, "Starting up")
@@ -500,6 +525,7 @@ class BasePlugin:
         # Import Certified Device Configuration
         import_local_device_conf(self)
         z4d_certified_devices.z4d_import_device_configuration(self, z4d_certified_devices_pathname )
+        compile_device_templates(self)
         
         # if type(self.DeviceConf) is not dict:
         if not isinstance(self.DeviceConf, dict):
@@ -507,6 +533,8 @@ class BasePlugin:
             self.onStop()
             return
         
+        self.startupTimeline.mark("Device configurations loaded")
+
         # Initialize List of Domoticz Widgets
         load_list_of_domoticz_widget(self, Devices)
         
@@ -545,9 +573,14 @@ class BasePlugin:
         self.log.logging("Plugin", "Debug", "ListOfDevices after checkListOfDevice2Devices: " + str(self.ListOfDevices))
         self.log.logging("Plugin", "Debug", "IEEE2NWK after checkListOfDevice2Devices     : " + str(self.IEEE2NWK))
 
+        self.startupTimeline.mark("Plugin database loaded")
+
         # Create Statistics object
         self.statistics = TransportStatistics(self.pluginconf, self.log, self.zigbee_communication)
 
+        # Create Adaptive Polling object
+        self.adaptivePolling = AdaptivePolling(self.pluginconf, self.log)
+
         # Connect to Coordinator only when all initialisation are properly done.
         self.log.logging("Plugin", "Status", "Z4D configured to use transport mode: %s" % self.transport)
 
@@ -567,10 +600,12 @@ class BasePlugin:
             # Domoticz.Log("Init IAS_Zone_management ZigateComm: %s" %self.ControllerLink)
             self.iaszonemgt = IAS_Zone_Management(self.pluginconf, self.ControllerLink, self.ListOfDevices, self.IEEE2NWK, self.DeviceConf, self.log, self.zigbee_communication, self.readZclClusters, self.FirmwareVersion)
 
-        # Starting WebServer
+        self.startupTimeline.mark("Coordinator transport started")
+
+        # WebServer will be started at next heartbeat, so the inbound path is serviced first
         if self.webserver is None:
             if Parameters["Mode4"].isdigit() or ':' in Parameters["Mode4"]:
-                start_web_server(self, Parameters["Mode4"], Parameters["HomeFolder"])
+                self.startWebUINeeded = True
             else:
                 self.log.logging( "Plugin", "Error", "WebServer disabled du to Parameter Mode4 set to %s" % Parameters["Mode4"] )
 
@@ -583,6 +618,7 @@ class BasePlugin:
             self.log.logging("Plugin", "Status", f"Z4D Widgets usage is at {usage_percentage}% ({free_slots} units free)")
 
         self.log.logging("Plugin", "Status", f"Z4D started with {framework_status}")
+        self.startupTimeline.mark("onStart completed")
 
         self.busy = False
 
@@ -609,11 +645,18 @@ class BasePlugin:
         if self.pluginconf and self.log:
             self.log.logging("Plugin", "Log", "onStop called")
 
+        # Drop the scene commands not sent yet
+        scene_burst_cancel()
+
         # Close CIE connection and shutdown transport thread
         if self.pluginconf and self.ControllerLink:
             self.ControllerLink.thread_transport_shutdown()
             self.ControllerLink.close_cie_connection()
 
+        # Stop the version checking thread
+        if self.versionChecker:
+            self.versionChecker.stop()
+
         # Stop WebServer
         if self.pluginconf and self.webserver:
             self.webserver.onStop()
@@ -622,6 +665,10 @@ class BasePlugin:
         if self.pluginconf:
             WriteDeviceList(self, 0)
 
+        # Save Configure Reporting progress
+        if self.configureReporting:
+            self.configureReporting.save_reporting_plan()
+
         # Print and save statistics if configured
         if self.pluginconf and self.statistics:
             self.statistics.printSummary()
@@ -657,6 +704,7 @@ class BasePlugin:
             DeviceID = find_legacy_DeviceID_from_unit(self, Devices, Unit)
 
         device_name = domo_read_Name( self, Devices, DeviceID, Unit, )
+        device_status_invalidate(self)
         
         # Let's check if this is End Node, or Group related.
         if DeviceID in self.IEEE2NWK:
@@ -679,6 +727,11 @@ class BasePlugin:
 
             self.log.logging("Plugin", "Debug", f"ListOfDevices :After REMOVE {self.ListOfDevices}")
             load_list_of_domoticz_widget(self, Devices)
+            invalidate_command_plans(DeviceID)
+            if self.iaszonemgt:
+                self.iaszonemgt.IAS_forget(NwkId)
+            if fullyremoved:
+                self.livenessTracker.forget(DeviceID)
             return
 
         if self.groupmgt and DeviceID in self.groupmgt.ListOfGroups:
@@ -734,6 +787,7 @@ class BasePlugin:
         self.Ping["Nb Ticks"] = 0
         self.connectionState = 1
         self.ControllerLink.on_message(Data)
+        scene_burst_flush_due(self)
 
 
     def processFrame(self, Data):
@@ -742,6 +796,8 @@ class BasePlugin:
         self.connectionState = 1
         # start_time = int(time.time() *1000)
         zigbee_receive_message(self, Devices, Data)
+        if self.pairingEngine.ready:
+            pairing_advance(self, Devices)
         # stop_time = int(time.time() *1000)
         # Domoticz.Log("### Completion: %s is %s ms" %(Data, ( stop_time - start_time)))
 
@@ -785,12 +841,14 @@ class BasePlugin:
         restartPluginViaDomoticzJsonApi(self, stop=False, url_base_api=Parameters["Mode5"])
 
     #def onCommand(self, DeviceID, Unit, Command, Level, Color):
+    @traffic_class("interactive")
     def onCommand(self, Unit, Command, Level, Color):
         if (  self.ControllerLink is None or not self.VersionNewFashion or self.pluginconf is None or not self.log ):
             self.log.logging( "Command", "Log", "onCommand - Not yet ready, plugin not fully started, we drop the command")
             return
 
         self.log.logging( "Command", "Debug", "onCommand - unit: %s, command: %s, level: %s, color: %s" % (Unit, Command, Level, Color) )
+        scene_burst_flush_due(self)
 
         if not is_domoticz_extended():
             DeviceID = find_legacy_DeviceID_from_unit(self, Devices, Unit)
@@ -840,6 +898,11 @@ class BasePlugin:
             return
         
         self.internalHB += 1
+        scene_burst_flush_due(self)
+
+        if self.startWebUINeeded:
+            self.startWebUINeeded = False
+            start_web_server(self, Parameters["Mode4"], Parameters["HomeFolder"])
 
         if self.PDMready:
             if (self.internalHB % HEARTBEAT) != 0:
@@ -873,8 +936,7 @@ class BasePlugin:
             return
 
         # Checking Version
-        if self.internet_available:
-            _check_plugin_version( self )
+        _check_plugin_version( self )
 
         if self.transport == "None":
             return
@@ -885,8 +947,19 @@ class BasePlugin:
         # Manage all entries in  ListOfDevices (existing and up-coming devices)
         processListOfDevices(self, Devices)
 
+        # Push Touch and TimedOut to the Domoticz widgets
+        liveness_flush(self, Devices)
+
         # Check and Update Heating demand for Wiser if applicable (this will be check in the call)
         wiser_thermostat_monitoring_heating_demand(self, Devices)
+        # Network wide Configure Reporting, rate limited
+        if self.configureReporting:
+            self.configureReporting.reporting_planner_heartbeat()
+
+        # IAS Zone enrollment retries
+        if self.iaszonemgt:
+            self.iaszonemgt.IAS_heartbeat()
+
         # Group Management
         if self.groupmgt:
             self.groupmgt.hearbeat_group_mgt()
@@ -1236,6 +1309,8 @@ def zigateInit_Phase3(self):
 
         # Create Configure Reporting object
         if self.configureReporting is None:
+            from Classes.ConfigureReporting import ConfigureReporting
+
             self.log.logging("Plugin", "Status", "Z4D starts Configure Reporting handling")
             self.configureReporting = ConfigureReporting(
                 self.zigbee_communication,
@@ -1249,9 +1324,10 @@ def zigateInit_Phase3(self):
                 self.FirmwareVersion,
                 self.IEEE2NWK,
                 self.ControllerIEEE,
-                self.readZclClusters
+                self.readZclClusters,
+                self.HardwareID
             )
-        if self.configureReporting:
+        if self.configureReporting and self.webserver:
             self.webserver.update_configureReporting(self.configureReporting )
 
     # Enable Group Management
@@ -1261,25 +1337,31 @@ def zigateInit_Phase3(self):
 
     # Create Network Energy object
     if self.networkenergy is None:
+        from Classes.NetworkEnergy import NetworkEnergy
+
         self.networkenergy = NetworkEnergy(
             self.zigbee_communication, self.pluginconf, self.ControllerLink, self.ListOfDevices, Devices, self.HardwareID, self.log
         )
 
-    if self.networkenergy:
+    if self.networkenergy and self.webserver:
         self.webserver.update_networkenergy(self.networkenergy)
 
         # Create Network Map object
     if self.networkmap is None:
+        from Classes.NetworkMap import NetworkMap
+
         self.networkmap = NetworkMap(
             self.zigbee_communication ,self.pluginconf, self.ControllerLink, self.ListOfDevices, Devices, self.HardwareID, self.log
         )
     
     if self.zigpy_topology is None:
+        from Classes.ZigpyTopology import ZigpyTopology
+
         self.zigpy_topology = ZigpyTopology(
             self.zigbee_communication ,self.pluginconf, self.ControllerLink, self.ListOfDevices, self.IEEE2NWK, Devices, self.HardwareID, self.log
         )
 
-    if self.networkmap:
+    if self.networkmap and self.webserver:
         self.webserver.update_networkmap(self.networkmap)
 
     # Enable Over The Air Upgrade if applicable
@@ -1316,9 +1398,12 @@ def zigateInit_Phase3(self):
     if self.iaszonemgt and self.ControllerIEEE:
         self.iaszonemgt.setZigateIEEE(self.ControllerIEEE)
 
+    self.startupTimeline.complete("Coordinator configured", self.log)
+
 
 def start_GrpManagement(self, homefolder):
-    
+    from Classes.GroupMgtv2.GroupManagement import GroupsManagement
+
     self.groupmgt = GroupsManagement(
         self.zigbee_communication,
         self.VersionNewFashion,
@@ -1343,7 +1428,8 @@ def start_GrpManagement(self, homefolder):
         self.groupmgt.updateZigateIEEE(self.ControllerIEEE)
 
     if self.groupmgt:
-        self.webserver.update_groupManagement(self.groupmgt)
+        if self.webserver:
+            self.webserver.update_groupManagement(self.groupmgt)
         if self.zigbee_communication != "zigpy" and self.pluginconf.pluginConf["zigatePartOfGroup0000"]:
             # Add Zigate NwkId 0x0000 Ep 0x01 to GroupId 0x0000
             self.groupmgt.addGroupMemberShip("0000", "01", "0000")
@@ -1357,6 +1443,8 @@ def start_GrpManagement(self, homefolder):
 
 
 def start_OTAManagement(self, homefolder):
+    from Classes.OTA import OTAManagement
+
     self.OTA = OTAManagement(
         self.zigbee_communication,
         self.pluginconf,
@@ -1373,12 +1461,13 @@ def start_OTAManagement(self, homefolder):
         self.readZclClusters,
         self.internet_available
     )
-    if self.OTA:
+    if self.OTA and self.webserver:
         self.webserver.update_OTA(self.OTA)
 
 
 def start_web_server(self, webserver_port, webserver_homefolder):
- 
+    from Classes.WebServer.WebServer import WebServer
+
     self.log.logging("Plugin", "Status", "Z4D starts WebUI")
     self.webserver = WebServer(
         self.zigbee_communication,
@@ -1410,6 +1499,27 @@ def start_web_server(self, webserver_port, webserver_homefolder):
     )
     if self.FirmwareVersion:
         self.webserver.update_firmware(self.FirmwareVersion)
+    if self.adaptivePolling:
+        self.webserver.update_adaptivePolling(self.adaptivePolling)
+    self.webserver.update_startupTimeline(self.startupTimeline)
+    self.webserver.update_livenessTracker(self.livenessTracker)
+
+    # Objects created before the WebUI has been started
+    if self.ControllerIEEE:
+        self.webserver.setZigateIEEE(self.ControllerIEEE)
+    if self.configureReporting:
+        self.webserver.update_configureReporting(self.configureReporting)
+    if self.networkenergy:
+        self.webserver.update_networkenergy(self.networkenergy)
+    if self.networkmap:
+        self.webserver.update_networkmap(self.networkmap)
+    if self.groupmgt:
+        self.webserver.update_groupManagement(self.groupmgt)
+    if self.OTA:
+        self.webserver.update_OTA(self.OTA)
+    if self.iaszonemgt:
+        self.webserver.update_iaszonemgt(self.iaszonemgt)
+    self.startupTimeline.mark("WebUI started")
 
 
 def pingZigate(self):
@@ -1693,15 +1803,20 @@ def _trigger_coordinator_backup( self ):
 
 
 def _check_plugin_version( self ):
+    # Only reads the answers of the VersionChecker thread, never waits on the network
     self.pluginParameters["TimeStamp"] = int(time.time())
-    if self.transport != "None" and self.pluginconf.pluginConf["internetAccess"] and (
-        self.pluginParameters["available"] is None or self.HeartbeatCount % (12 * 3600 // HEARTBEAT) == 0
-    ):
+    if self.versionChecker is None:
+        return
+    self.internet_available = self.versionChecker.internet_available()
+    if self.transport == "None" or not self.pluginconf.pluginConf["internetAccess"]:
+        return
+    versions = self.versionChecker.poll(self.zigbee_communication, self.pluginParameters["PluginBranch"], self.FirmwareMajorVersion)
+    if versions is not None:
         (
             self.pluginParameters["available"],
             self.pluginParameters["available-firmMajor"],
             self.pluginParameters["available-firmMinor"],
-        ) = check_plugin_version_against_dns(self, self.zigbee_communication, self.pluginParameters["PluginBranch"], self.FirmwareMajorVersion)
+        ) = versions
         self.pluginParameters["FirmwareUpdate"] = False
         self.pluginParameters["PluginUpdate"] = False
 
@@ -1723,6 +1838,7 @@ def _check_plugin_version( self ):
 def _coordinator_ready( self ):
     self.log.logging( "Plugin", "Debug", "_coordinator_ready transport: %s PDMready: %s" %(self.transport, self.PDMready)) 
     if self.transport == "None" or self.PDMready:
+        self.startupTimeline.mark("Coordinator ready")
         return True
 
     if (